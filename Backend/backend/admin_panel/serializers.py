@@ -1,12 +1,32 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from bookings.models import Booking, Review
-from django.db.models import Avg, Sum
+from django.db.models import Avg, Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from .models import PlatformSettings
+from users.cdn import file_url
+from users.models import DocumentVerification
 
 User = get_user_model()
 
 
+def with_user_stats(queryset):
+    """
+    Annotate what AdminUserSerializer shows for each user (booking counts
+    and provider rating) so a page of users costs one query, not two per row.
+    """
+    def count(field):
+        bookings = Booking.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+        return Coalesce(Subquery(bookings.annotate(value=Count('id')).values('value')), 0)
+
+    reviews = Review.objects.filter(provider=OuterRef('pk')).order_by().values('provider')
+    return queryset.annotate(
+        provider_booking_count=count('provider'),
+        customer_booking_count=count('customer'),
+        rating_average=Subquery(reviews.annotate(value=Avg('rating')).values('value')),
+    )
+
+
 class AdminUserSerializer(serializers.ModelSerializer):
     """Serializer for user management in admin dashboard"""
     user_type_display = serializers.CharField(source='get_user_type_display', read_only=True)
@@ -27,16 +47,23 @@ class AdminUserSerializer(serializers.ModelSerializer):
                             'total_bookings', 'avg_rating']
     
     def get_total_bookings(self, obj):
-        """Count total bookings for user"""
+        """Count total bookings for user (annotated by with_user_stats when listing)"""
         if obj.user_type == 'offer':
+            if hasattr(obj, 'provider_booking_count'):
+                return obj.provider_booking_count
             return Booking.objects.filter(provider=obj).count()
         else:
+            if hasattr(obj, 'customer_booking_count'):
+                return obj.customer_booking_count
             return Booking.objects.filter(customer=obj).count()
     
     def get_avg_rating(self, obj):
         """Get average rating for provider"""
         if obj.user_type == 'offer':
-            avg = Review.objects.filter(provider=obj).aggregate(avg=Avg('rating'))['avg']
+            if hasattr(obj, 'rating_average'):
+                avg = obj.rating_average
+            else:
+                avg = Review.objects.filter(provider=obj).aggregate(avg=Avg('rating'))['avg']
             return round(avg, 2) if avg else 0
         return None
 
@@ -133,3 +160,27 @@ class PlatformSettingsSerializer(serializers.ModelSerializer):
             'notification_email', 'maintenance_mode', 'updated_at'
         ]
         read_only_fields = ['updated_at']
+
+
+class AdminDocumentVerificationSerializer(serializers.ModelSerializer):
+    """Verification results of a user's document, with its preview"""
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    certificate_name = serializers.CharField(source='certificate.name', read_only=True, default=None)
+    preview_url = serializers.SerializerMethodField()
+    document_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = DocumentVerification
+        fields = [
+            'id', 'kind', 'kind_display', 'certificate', 'certificate_name', 'status',
+            'content_type', 'size', 'width', 'height', 'phash', 'problems', 'duplicates',
+            'preview_url', 'document_url', 'created_at', 'processed_at'
+        ]
+        read_only_fields = fields
+    
+    def get_preview_url(self, obj):
+        return file_url(obj.preview.name) if obj.preview else None
+    
+    def get_document_url(self, obj):
+        """Full document, for when the preview is not enough"""
+        return file_url(obj.source, version=obj.created_at)
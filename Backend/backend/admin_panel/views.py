@@ -12,12 +12,14 @@ from datetime import timedelta
 from django.utils import timezone
 
 from bookings.models import Booking, Review
+from bookings.transitions import BookingTransitionService, TransitionError
 from .permissions import IsAdmin
 from .models import PlatformSettings
 from .serializers import (
     AdminUserSerializer, AdminBookingSerializer, 
     DashboardStatsSerializer, RecentBookingSerializer,
-    PlatformSettingsSerializer
+    PlatformSettingsSerializer, AdminDocumentVerificationSerializer,
+    with_user_stats,
 )
 from .models import PlatformSettings
 from users.authentication import SupabaseAuthentication
@@ -167,6 +169,11 @@ class AdminUsersViewSet(viewsets.ModelViewSet):
         if is_active is not None:
             queryset = queryset.filter(is_active=is_active.lower() == 'true')
         
+        # Filter by document verification status, e.g. ?documents=flagged
+        documents = self.request.query_params.get('documents', None)
+        if documents:
+            queryset = queryset.filter(document_verifications__status=documents).distinct()
+        
         # Search by email or name
         search = self.request.query_params.get('search', None)
         if search:
@@ -176,7 +183,7 @@ class AdminUsersViewSet(viewsets.ModelViewSet):
                 Q(last_name__icontains=search)
             )
         
-        return queryset.order_by('-created_at')
+        return with_user_stats(queryset).order_by('-created_at')
     
     def list(self, request, *args, **kwargs):
         """Override list to add success wrapper with pagination"""
@@ -290,6 +297,16 @@ class AdminUsersViewSet(viewsets.ModelViewSet):
             'data': AdminUserSerializer(user).data
         })
     
+    @action(detail=True, methods=['get'])
+    def documents(self, request, pk=None):
+        """Precomputed verification results and previews of the user's documents"""
+        user = self.get_object()
+        verifications = user.document_verifications.select_related('certificate').order_by('-created_at')
+        return Response({
+            'success': True,
+            'data': AdminDocumentVerificationSerializer(verifications, many=True).data
+        })
+    
     @action(detail=True, methods=['post'])
     def make_admin(self, request, pk=None):
         """Make user an admin"""
@@ -410,18 +427,19 @@ class AdminBookingsViewSet(viewsets.ModelViewSet):
     def approve(self, request, pk=None):
         """Approve a booking"""
         booking = self.get_object()
-        if booking.status == 'pending':
-            booking.status = 'confirmed'
-            booking.save()
+        try:
+            BookingTransitionService.apply(booking, 'admin_approve', actor=request.user)
+        except (TransitionError, Booking.DoesNotExist) as e:
+            current = getattr(e, 'booking', None) or booking
             return Response({
-                'success': True,
-                'message': "Booking approved",
-                'data': AdminBookingSerializer(booking).data
-            })
+                'success': False,
+                'message': f"Cannot approve booking with status {current.status}"
+            }, status=status.HTTP_400_BAD_REQUEST)
         return Response({
-            'success': False,
-            'message': f"Cannot approve booking with status {booking.status}"
-        }, status=status.HTTP_400_BAD_REQUEST)
+            'success': True,
+            'message': "Booking approved",
+            'data': AdminBookingSerializer(booking).data
+        })
     
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -429,15 +447,18 @@ class AdminBookingsViewSet(viewsets.ModelViewSet):
         booking = self.get_object()
         reason = request.data.get('reason', 'Cancelled by admin')
         
-        if booking.status not in ['pending', 'confirmed']:
+        try:
+            BookingTransitionService.apply(
+                booking, 'admin_cancel', actor=request.user,
+                fields={'cancelled_by': request.user, 'cancellation_reason': reason},
+            )
+        except (TransitionError, Booking.DoesNotExist) as e:
+            current = getattr(e, 'booking', None) or booking
             return Response({
                 'success': False,
-                'message': f"Cannot cancel booking with status {booking.status}"
+                'message': f"Cannot cancel booking with status {current.status}"
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        booking.status = 'cancelled'
-        booking.save()
-        
         return Response({
             'success': True,
             'message': f"Booking cancelled. Reason: {reason}",
@@ -466,7 +487,7 @@ class RecentUsersView(APIView):
             if user_type in ['find', 'offer']:
                 queryset = queryset.filter(user_type=user_type)
             
-            recent_users = queryset.order_by('-created_at')[:limit]
+            recent_users = with_user_stats(queryset).order_by('-created_at')[:limit]
             serializer = AdminUserSerializer(recent_users, many=True)
             return Response({
                 'success': True,
@@ -0,0 +1,103 @@
+"""
+HTTP conditional GET (ETag / Last-Modified) for read endpoints.
+
+Views using ConditionalGetMixin implement get_validators(), which returns a
+tuple of values that changes whenever the response would: updated_at
+timestamps, row counts (so deletions show) and the like, fetched in one
+small query (aggregates or subqueries, no serializers). The ETag is a hash
+of those values together with the request path, query string and accepted
+media type.
+
+A request whose If-None-Match (or, without it, If-Modified-Since) matches
+gets a 304 before the object is loaded and serialized; anything else runs
+the view as usual and the 200 response carries the validators. Validators
+are computed after authentication and permission checks, and a view that
+returns None from get_validators() (e.g. the object does not exist) is
+simply run, so 401/403/404 responses are unchanged.
+
+Last-Modified is only sent by views whose get_last_modified() can return
+the newest timestamp behind every change; one that also depends on
+deletions or on the clock relies on the ETag alone.
+
+    class ServicePublicDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
+        cache_control = PUBLIC_CACHE_CONTROL
+
+        def get_validators(self, request, pk):
+            return Service.objects.filter(pk=pk).values_list('updated_at', ...).first()
+
+Views that implement get() themselves wrap it with conditional_response().
+"""
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+# Bump to invalidate every ETag handed out so far, e.g. when a serializer's
+# output changes without any row changing
+ETAG_VERSION = 1
+
+# Public catalog endpoints: browsers revalidate after a minute, shared caches
+# (CDN, reverse proxy) keep them for five minutes
+PUBLIC_CACHE_CONTROL = {'public': True, 'max_age': 60, 's_maxage': 300}
+
+# Per-user endpoints: never stored by shared caches, always revalidated
+PRIVATE_CACHE_CONTROL = {'private': True, 'no_cache': True}
+
+
+def related_validators(name, model, fk, *fields):
+    """
+    Annotations for get_validators() querysets: `<name>_count`, the number of
+    `model` rows whose `fk` points at the outer row, and `<name>_<field>`,
+    the latest value of each of `fields` among them (`__` in a field
+    becomes `_`). Each is a subquery, so
+    several relations can be summarized in one query without joins
+    multiplying rows.
+    """
+    related = model.objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk)
+    annotations = {f'{name}_count': Subquery(related.annotate(value=Count('pk')).values('value'))}
+    for field in fields:
+        annotations[f"{name}_{field.replace('__', '_')}"] = Subquery(related.annotate(value=Max(field)).values('value'))
+    return annotations
+
+
+class ConditionalGetMixin:
+    """APIView mixin answering conditional GETs from get_validators(); see the module docstring."""
+    cache_control = PRIVATE_CACHE_CONTROL
+
+    def get_validators(self, request, *args, **kwargs):
+        """Values the response depends on, or None to skip conditional handling."""
+        raise NotImplementedError
+
+    def get_last_modified(self, validators):
+        """Last-Modified datetime for `validators`, or None to send only the ETag."""
+        return None
+
+    def get_etag(self, request, validators):
+        source = repr((ETAG_VERSION, request.get_full_path(), request.accepted_media_type, validators))
+        return quote_etag(hashlib.md5(source.encode()).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().get, *args, **kwargs)
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        """304 when the request's validators match, else handler(request, ...) with validators added."""
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return handler(request, *args, **kwargs)
+
+        etag = self.get_etag(request, validators)
+        last_modified = self.get_last_modified(validators)
+        timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, **self.cache_control)
+        patch_vary_headers(response, ['Accept'])
+        return response
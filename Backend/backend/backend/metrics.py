@@ -0,0 +1,268 @@
+"""
+Prometheus metrics: request latency per route, the time requests spend in
+the database and in external services, and cache hit rates.
+
+MetricsMiddleware times every request and labels it with the route's URL
+name (e.g. `booking-detail`; `unmatched` for URLs that resolve to nothing,
+so scans of random paths can't grow the label set). Code calling an
+external service wraps the call in external_call() (or decorates it with
+timed()); the time is added to the global per-service histogram and to the
+breakdown of the request it happens in, if any. Database time is recorded
+by the middleware itself through connection.execute_wrapper.
+
+    with metrics.external_call('khalti'):
+        response = requests.post(...)
+
+    metrics.record_cache('user_dashboard_stats', hit=cached is not None)
+
+metrics_view serves everything in the Prometheus text format at /metrics,
+to scrapers sending METRICS_TOKEN as a Bearer token or connecting from an
+address in METRICS_ALLOWED_IPS. With neither configured it is only served
+when DEBUG is on.
+
+Metrics are kept in memory per process (no dependency, ~1 µs per
+observation). Under gunicorn with several workers a scrape reads one
+worker's numbers; counters stay monotonic per worker, so rates remain
+right on average. benchmark_metrics_overhead measures the cost per
+request.
+"""
+import bisect
+import hmac
+import ipaddress
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Seconds; from a cached read to a slow external call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# {dependency: seconds} for the request being handled, None outside requests
+_breakdown = ContextVar('metrics_breakdown', default=None)
+# Dependencies whose external_call() is running, so nested calls count once
+_active = ContextVar('metrics_active', default=frozenset())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value:g}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # {labels: [count per bucket (last one +Inf), sum]}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labels):
+        series = self._values.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound:g}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {total:.6f}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests by route, method and status.', ('route', 'method', 'status'))
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route.', ('route', 'method')
+)
+REQUEST_DEPENDENCY_SECONDS = Histogram(
+    'http_request_dependency_seconds',
+    'Time a request spent in the database or an external service, for requests that used it.',
+    ('route', 'dependency'),
+)
+DB_QUERIES = Counter('db_queries_total', 'Database queries run by requests, by route.', ('route',))
+EXTERNAL_CALL_SECONDS = Histogram(
+    'external_call_duration_seconds', 'Duration of calls to external services (smtp, khalti, ...).', ('dependency',)
+)
+EXTERNAL_CALLS = Counter('external_calls_total', 'Calls to external services by outcome.', ('dependency', 'outcome'))
+CACHE_REQUESTS = Counter('cache_requests_total', 'Application cache lookups by cache and result.', ('cache', 'result'))
+
+REGISTRY = [
+    REQUESTS, REQUEST_SECONDS, REQUEST_DEPENDENCY_SECONDS, DB_QUERIES,
+    EXTERNAL_CALL_SECONDS, EXTERNAL_CALLS, CACHE_REQUESTS,
+]
+
+
+def render():
+    """All metrics in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def external_call(dependency):
+    """Time the block as a call to `dependency`; nested calls to the same dependency count once."""
+    active = _active.get()
+    if dependency in active:
+        yield
+        return
+    token = _active.set(active | {dependency})
+    outcome = 'error'
+    started = time.perf_counter()
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        elapsed = time.perf_counter() - started
+        _active.reset(token)
+        EXTERNAL_CALL_SECONDS.observe(elapsed, dependency)
+        EXTERNAL_CALLS.inc(dependency, outcome)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            breakdown[dependency] = breakdown.get(dependency, 0.0) + elapsed
+
+
+def timed(dependency):
+    """Decorator form of external_call()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with external_call(dependency):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache, 'hit' if hit else 'miss')
+
+
+class _DatabaseTimer:
+    """execute_wrapper adding query time to the request's breakdown."""
+
+    def __init__(self, breakdown):
+        self.breakdown = breakdown
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.breakdown['db'] = self.breakdown.get('db', 0.0) + time.perf_counter() - started
+            self.queries += 1
+
+
+class MetricsMiddleware:
+    """Record request metrics; see the module docstring."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        breakdown = {}
+        token = _breakdown.set(breakdown)
+        timer = _DatabaseTimer(breakdown)
+        started = time.perf_counter()
+        status = 500
+        # What connection.execute_wrapper() does, minus a context manager per alias
+        wrapped = connections.all()
+        for connection in wrapped:
+            connection.execute_wrappers.append(timer)
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            for connection in wrapped:
+                connection.execute_wrappers.remove(timer)
+            _breakdown.reset(token)
+            match = getattr(request, 'resolver_match', None)
+            route = (match.url_name or match.route) if match else 'unmatched'
+            REQUESTS.inc(route, request.method, status)
+            REQUEST_SECONDS.observe(elapsed, route, request.method)
+            if timer.queries:
+                DB_QUERIES.inc(route, amount=timer.queries)
+            for dependency, seconds in breakdown.items():
+                REQUEST_DEPENDENCY_SECONDS.observe(seconds, route, dependency)
+
+
+def _scrape_allowed(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return True
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    if allowed_ips:
+        try:
+            address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+        except ValueError:
+            return False
+        return any(address in ipaddress.ip_network(network, strict=False) for network in allowed_ips)
+    # Open only on development setups with no access rule at all
+    return settings.DEBUG and not token
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint."""
+    if not _scrape_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
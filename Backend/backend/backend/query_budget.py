@@ -0,0 +1,240 @@
+"""
+Per-request database query instrumentation and query budgets.
+
+QueryRecorder counts the queries run on every database connection while it
+is active (through connection.execute_wrapper), their total time, and the
+statements that ran more than once with the same SQL (only parameters
+differing) - the signature of an N+1 loop.
+
+QueryBudgetMiddleware records each request when QUERY_INSTRUMENTATION is
+on (default: DEBUG) and:
+- adds a Server-Timing header, e.g.
+      Server-Timing: db;dur=12.4;desc="9 queries", db-repeated;desc="3 repeated"
+  which browser dev tools show in the request's timing tab;
+- compares the count with the route's budget in QUERY_BUDGETS (by URL
+  name) and logs a warning naming the repeated statements when it is
+  exceeded, or raises QueryBudgetExceeded when QUERY_BUDGET_STRICT is on.
+
+Tests use assert_query_budget() (see its docstring) or turn on
+QUERY_BUDGET_STRICT so any request through the test client fails when it
+goes over budget.
+
+Budgets are counted with an authenticated user (the token lookup is one
+query) and fixtures holding several rows per list, so a budget that holds
+does not depend on the number of rows returned. Routes that expire overdue
+bookings on the way (my-bookings, provider-bookings, booking-detail) are
+budgeted for the expiry as well: it is one set-based transition, whatever
+the number of bookings expired, and its savepoint and release are counted
+too since tests run inside a transaction. Tests that authenticate with
+force_authenticate() skip the token lookup and so have one query of extra
+room.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Maximum queries per request, by URL name. Measured with several rows per
+# list, plus the token lookup and a query or two of headroom.
+QUERY_BUDGETS = {
+    # bookings/urls.py
+    # Includes expiring overdue bookings (lock, update, events, savepoints)
+    'my-bookings': 8,
+    'provider-bookings': 8,
+    'booking-detail': 9,
+    'booking-create': 14,
+    'booking-batch-create': 16,
+    'booking-upload-images': 8,
+    'booking-image-upload-urls': 4,
+    'booking-image-confirm': 10,
+    'booking-accept': 10,
+    'booking-decline': 10,
+    'booking-cancel': 10,
+    'booking-schedule': 10,
+    'booking-start': 10,
+    'booking-complete': 10,
+    'booking-dispute': 10,
+    'payments-my': 3,
+    'payments-provider-earnings': 3,
+    'dashboard-stats-user': 3,
+    'dashboard-stats-provider': 5,
+    'review-create': 5,
+    'reviews-my': 4,
+    'reviews-my-submitted': 4,
+    'review-respond': 7,
+    'provider-availability': 6,
+    'services-list-public': 3,
+    'services-detail-public': 3,
+    'services-my': 3,
+    'services-create': 4,
+    'services-update': 6,
+    'services-toggle': 6,
+    'services-delete': 7,
+    'providers-list': 5,
+    'providers-nearby': 5,
+    'providers-detail': 10,
+    'provider-availability-public': 4,
+    'provider-booked-slots': 5,
+    'recent-testimonials': 3,
+    'check-booking-conflict': 10,
+    'get-available-slots': 4,
+    'get-alternative-dates': 4,
+
+    # payments/urls.py
+    'payment-initiate': 12,
+    'khalti-verify': 14,
+    'khalti-public-key': 2,
+    'cash-confirm': 14,
+    'payment-history': 3,
+    'payment-pending': 4,
+    'transaction-detail': 3,
+    'provider-earnings-history': 4,
+    'provider-earnings-stats': 6,
+
+    # admin_panel/urls.py
+    'admin-dashboard-stats': 20,
+    'recent-users': 3,
+    'recent-bookings': 3,
+    'admin-settings': 7,
+    'api-root': 1,
+    'admin-users-list': 4,
+    'admin-users-detail': 3,
+    'admin-users-toggle-active': 4,
+    'admin-users-verify': 4,
+    'admin-users-documents': 4,
+    'admin-users-make-admin': 4,
+    'admin-users-remove-admin': 4,
+    'admin-bookings-list': 4,
+    'admin-bookings-detail': 3,
+    'admin-bookings-recent': 3,
+    'admin-bookings-approve': 7,
+    'admin-bookings-cancel': 7,
+}
+
+# A statement repeated this many times in one request is reported as a likely N+1
+REPEATED_QUERY_THRESHOLD = 3
+
+_WHITESPACE = re.compile(r'\s+')
+# "IN (%s, %s, %s)" -> "IN (...)", so batches of different sizes match
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more queries than its budget allows."""
+
+
+def fingerprint(sql):
+    """SQL with whitespace and placeholder lists normalised; equal for the same statement."""
+    return _PLACEHOLDER_LIST.sub('(...)', _WHITESPACE.sub(' ', sql).strip())
+
+
+class QueryRecorder:
+    """
+    Context manager recording the queries run on all database connections
+    of the current thread.
+
+        with QueryRecorder() as recorder:
+            ...
+        recorder.count, recorder.duration_ms, recorder.repeated()
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[fingerprint(sql)] += 1
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        return False
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    @property
+    def repeated_count(self):
+        """Queries that repeated an earlier statement of the same request."""
+        return sum(count - 1 for count in self.statements.values())
+
+    def repeated(self, threshold=REPEATED_QUERY_THRESHOLD):
+        """[(count, statement)] for statements run at least `threshold` times, most frequent first."""
+        return [
+            (count, sql)
+            for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.duration_ms:.1f};desc="{self.count} queries", '
+            f'db-repeated;desc="{self.repeated_count} repeated"'
+        )
+
+    def report(self, label, budget):
+        lines = [f"{label} ran {self.count} queries (budget {budget}, {self.duration_ms:.1f} ms in the database)"]
+        for count, sql in self.repeated():
+            lines.append(f"  {count}x {sql[:300]}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def assert_query_budget(url_name=None, max_queries=None):
+    """
+    Fail if the block runs more queries than `max_queries`, or than the
+    budget of `url_name` in QUERY_BUDGETS.
+
+        with assert_query_budget('my-bookings'):
+            response = self.client.get('/api/bookings/my-bookings/', **auth)
+    """
+    budget = max_queries if max_queries is not None else QUERY_BUDGETS[url_name]
+    with QueryRecorder() as recorder:
+        yield recorder
+    if recorder.count > budget:
+        raise QueryBudgetExceeded(recorder.report(url_name or 'Block', budget))
+
+
+class QueryBudgetMiddleware:
+    """Record queries per request; see the module docstring."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSTRUMENTATION', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        response['Server-Timing'] = recorder.server_timing()
+
+        match = getattr(request, 'resolver_match', None)
+        budget = QUERY_BUDGETS.get(match.url_name) if match else None
+        if budget is not None and recorder.count > budget:
+            report = recorder.report(f"{request.method} {request.path} ({match.url_name})", budget)
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(report)
+            logger.warning(report)
+        return response
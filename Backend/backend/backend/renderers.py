@@ -0,0 +1,92 @@
+"""
+JSON renderer and parser backed by orjson, with DRF's stdlib versions as
+the fallback.
+
+FastJSONRenderer produces the same bytes as rest_framework's JSONRenderer
+with the default settings (compact, UTF-8, strict): datetimes end in "Z"
+for UTC, Decimals become numbers, UUIDs, dates, times and lazy
+translation strings become strings, and U+2028/U+2029 are escaped.
+Dates, times, UUIDs and dicts/lists are encoded natively by orjson;
+Decimals and everything else DRF's encoder knows go through the `default`
+hook.
+
+It falls back to the stdlib renderer when orjson is not installed, for
+indented output (the browsable API, `Accept: application/json; indent=4`),
+when UNICODE_JSON/COMPACT_JSON/STRICT_JSON are changed, and for values
+orjson refuses (e.g. integers over 64 bits).
+
+Configured in settings.REST_FRAMEWORK:
+
+    'DEFAULT_RENDERER_CLASSES': ('backend.renderers.FastJSONRenderer', ...),
+    'DEFAULT_PARSER_CLASSES': ('backend.renderers.FastJSONParser', ...),
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+_encoder = encoders.JSONEncoder()
+
+
+def _default(obj):
+    # Decimal is by far the most common non-native type (hand-built stats)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """rest_framework.renderers.JSONRenderer, rendered with orjson when possible."""
+
+    def _use_orjson(self, indent):
+        return (
+            orjson is not None
+            and indent is None
+            and not self.ensure_ascii
+            and self.compact
+            and self.strict
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if not self._use_orjson(indent):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson.JSONEncodeError: a value orjson cannot encode
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Keep the output a strict JavaScript subset, as JSONRenderer does
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(parsers.JSONParser):
+    """rest_framework.parsers.JSONParser, parsed with orjson when possible."""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except ValueError as exc:
+            # orjson.JSONDecodeError and UnicodeDecodeError
+            raise ParseError('JSON parse error - %s' % str(exc))
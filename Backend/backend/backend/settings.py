@@ -2,7 +2,7 @@ import os
 from datetime import timedelta
 from pathlib import Path
 from urllib.parse import urlparse, parse_qsl
-from decouple import config
+from decouple import Csv, config
 import dj_database_url
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -39,9 +39,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'backend.metrics.MetricsMiddleware',  # Prometheus request/DB/external-call metrics, served at /metrics
     'django.middleware.security.SecurityMiddleware',
     'django.middleware.gzip.GZipMiddleware',  # Compress responses to reduce bandwidth by 60-70%
     'backend.middleware.ConnectionCloseMiddleware',  # Close DB connections immediately
+    'backend.query_budget.QueryBudgetMiddleware',  # Query counts / Server-Timing (when QUERY_INSTRUMENTATION)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -50,6 +52,17 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request query counting and budgets (see backend.query_budget)
+QUERY_INSTRUMENTATION = config('QUERY_INSTRUMENTATION', default=DEBUG, cast=bool)
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+
+# Prometheus metrics (see backend.metrics). Outside DEBUG, /metrics is only served to
+# scrapers sending METRICS_TOKEN as a Bearer token or connecting from METRICS_ALLOWED_IPS
+# (comma-separated addresses or networks, e.g. "10.0.0.0/8,127.0.0.1")
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='', cast=Csv())
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -176,8 +189,15 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-# Set default storage backend
-DEFAULT_FILE_STORAGE = 'users.supabase_storage.SupabaseStorage'
+# Set default storage backend (DEFAULT_FILE_STORAGE is ignored since Django 5.1)
+STORAGES = {
+    'default': {
+        'BACKEND': 'users.supabase_storage.ContentAddressedSupabaseStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
 
 # Media files configuration (for backward compatibility)
 MEDIA_URL = '/media/'
@@ -220,6 +240,16 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',  # Will use IsAuthenticated on specific views
     ),
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
+    # orjson-backed JSON with a stdlib fallback (see backend.renderers)
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'backend.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 # Supabase Settings
@@ -227,6 +257,10 @@ SUPABASE_URL = config('SUPABASE_URL', default='')
 SUPABASE_KEY = config('SUPABASE_ANON_KEY', default='')  # Used by storage backend
 SUPABASE_ANON_KEY = config('SUPABASE_ANON_KEY', default='')
 SUPABASE_JWT_SECRET = config('SUPABASE_JWT_SECRET', default='')
+# Public storage URLs (see users.cdn): optional CDN host in front of Supabase,
+# and whether Supabase image transformations (paid plans) may be used
+STORAGE_CDN_URL = config('STORAGE_CDN_URL', default='')
+SUPABASE_IMAGE_TRANSFORMATIONS = config('SUPABASE_IMAGE_TRANSFORMATIONS', default=False, cast=bool)
 
 # JWT Settings
 # SIMPLE_JWT = {
@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from backend.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('users.urls')),
@@ -26,6 +28,7 @@ urlpatterns = [
     path('api/bookings/', include('bookings.urls')),
     path('api/payments/', include('payments.urls')),
     path('api/admin/', include('admin_panel.urls')),  # Changed from 'admin.urls'
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -7,36 +7,46 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 import logging
 
+from backend import metrics
+
 logger = logging.getLogger(__name__)
 
 
-def send_booking_notification_to_provider(booking):
+@metrics.timed('smtp')
+def _send_mail(**kwargs):
+    return send_mail(**kwargs)
+
+
+def send_booking_notification_to_provider(booking, services=None):
     """
     Send email notification to provider when a new booking is created
     
     Args:
         booking: Booking instance
+        services: Optional list of Service instances already loaded by the
+            caller; when given, booking_services is not re-queried
     """
     try:
         provider_email = booking.provider.email
         if not provider_email:
             logger.warning(f"Provider {booking.provider.id} has no email address")
-            print(f"⚠️ Warning: Provider {booking.provider.id} has no email")
             return False
         
-        print(f"📧 Preparing to send email to provider: {provider_email}")
+        logger.debug(f"Preparing booking notification to provider {booking.provider.id} for booking {booking.id}")
         
         # Get all services booked
-        services_list = booking.booking_services.select_related('service', 'service__specialization').all()
-        if not services_list:
-            logger.warning(f"Booking {booking.id} has no booking_services")
-            print(f"⚠️ Warning: No booking_services found for booking {booking.id}")
-            # Still send email with just the primary service info
-            service_names = [booking.service.title or booking.service.specialization.name or 'Service']
+        if services:
+            service_names = [svc.title or svc.specialization.name or 'Service' for svc in services]
         else:
-            service_names = [bs.service.title or bs.service.specialization.name or 'Service' for bs in services_list]
+            services_list = booking.booking_services.select_related('service', 'service__specialization').all()
+            if not services_list:
+                logger.warning(f"Booking {booking.id} has no booking_services")
+                # Still send email with just the primary service info
+                service_names = [booking.service.title or booking.service.specialization.name or 'Service']
+            else:
+                service_names = [bs.service.title or bs.service.specialization.name or 'Service' for bs in services_list]
         
-        print(f"📋 Services: {', '.join(service_names)}")
+        logger.debug(f"Booking {booking.id} services: {', '.join(service_names)}")
         
         subject = f'New Booking Request - {booking.customer.get_full_name() or booking.customer.email}'
         
@@ -136,8 +146,7 @@ This is an automated message from SajiloFix.
 © 2025 SajiloFix. All rights reserved.
         """
         
-        print(f"📤 Sending email...")
-        send_mail(
+        _send_mail(
             subject=subject,
             message=plain_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -147,14 +156,152 @@ This is an automated message from SajiloFix.
         )
         
         logger.info(f"Booking notification sent to provider {booking.provider.id} for booking {booking.id}")
-        print(f"✅ Email successfully sent to provider {provider_email}")
         return True
         
     except Exception as e:
-        logger.error(f"Failed to send booking notification to provider: {str(e)}")
-        print(f"❌ Email failed: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        logger.exception(f"Failed to send booking notification to provider: {str(e)}")
+        return False
+
+
+def send_batch_booking_notification_to_provider(bookings, services):
+    """
+    Send a single email to the provider covering every booking created by
+    one batch/recurring request, instead of one email per booking.
+
+    Args:
+        bookings: list of Booking instances from the same batch (same
+            customer, provider and services), ordered by date
+        services: list of Service instances booked in each visit
+    """
+    if not bookings:
+        return False
+    first = bookings[0]
+    try:
+        provider_email = first.provider.email
+        if not provider_email:
+            logger.warning(f"Provider {first.provider.id} has no email address")
+            return False
+
+        service_names = [svc.title or svc.specialization.name or 'Service' for svc in services]
+        customer_label = first.customer.get_full_name() or first.customer.email
+        visits = [
+            f"{b.preferred_date.strftime('%a, %B %d, %Y')} at {b.preferred_time.strftime('%I:%M %p')} (Booking #{b.id})"
+            for b in bookings
+        ]
+
+        subject = f'{len(bookings)} New Booking Requests - {customer_label}'
+
+        html_message = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+                .header {{ background-color: #16a34a; color: white; padding: 20px; text-align: center; border-radius: 8px 8px 0 0; }}
+                .content {{ background-color: #f9fafb; padding: 30px; border: 1px solid #e5e7eb; }}
+                .info-box {{ background-color: white; padding: 15px; margin: 15px 0; border-left: 4px solid #16a34a; border-radius: 4px; }}
+                .info-label {{ font-weight: bold; color: #374151; margin-bottom: 5px; }}
+                .info-value {{ color: #1f2937; }}
+                .services-list {{ background-color: #ecfdf5; padding: 15px; border-radius: 4px; margin: 10px 0; }}
+                .service-item {{ padding: 8px 0; border-bottom: 1px solid #d1fae5; }}
+                .service-item:last-child {{ border-bottom: none; }}
+                .footer {{ background-color: #f3f4f6; padding: 20px; text-align: center; font-size: 12px; color: #6b7280; border-radius: 0 0 8px 8px; }}
+                .price {{ color: #16a34a; font-weight: bold; font-size: 18px; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1 style="margin: 0;">🔔 {len(bookings)} New Booking Requests</h1>
+                </div>
+                <div class="content">
+                    <p>Hello <strong>{first.provider.get_full_name() or 'Provider'}</strong>,</p>
+                    <p><strong>{customer_label}</strong> has requested <strong>{len(bookings)} visits</strong> for the same job.</p>
+
+                    <div class="info-box">
+                        <div class="info-label">📅 Requested Visits:</div>
+                        <div class="services-list">
+                            {''.join([f'<div class="service-item">• {visit}</div>' for visit in visits])}
+                        </div>
+                    </div>
+
+                    <div class="info-box">
+                        <div class="info-label">🛠️ Service{'' if len(service_names) == 1 else 's'} per Visit:</div>
+                        <div class="info-value">{'<br>'.join([f'• {name}' for name in service_names])}</div>
+                    </div>
+
+                    <div class="info-box">
+                        <div class="info-label">💰 Quoted Price per Visit:</div>
+                        <div class="price">Rs. {first.quoted_price}</div>
+                    </div>
+
+                    <div class="info-box">
+                        <div class="info-label">📍 Service Location:</div>
+                        <div class="info-value">{first.service_address}</div>
+                    </div>
+
+                    {f'''<div class="info-box">
+                        <div class="info-label">📝 Customer Note:</div>
+                        <div class="info-value">{first.description}</div>
+                    </div>''' if first.description else ''}
+
+                    <p style="margin-top: 30px; text-align: center;">
+                        <strong>Each visit is a separate booking. Please log in to your SajiloFix provider dashboard to accept or decline them.</strong>
+                    </p>
+                </div>
+                <div class="footer">
+                    <p>This is an automated message from SajiloFix. Please do not reply to this email.</p>
+                    <p>© 2025 SajiloFix. All rights reserved.</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+
+        plain_message = f"""
+{len(bookings)} New Booking Requests
+
+Hello {first.provider.get_full_name() or 'Provider'},
+
+{customer_label} has requested {len(bookings)} visits for the same job.
+
+Requested Visits:
+{chr(10).join([f'• {visit}' for visit in visits])}
+
+Service{'s' if len(service_names) > 1 else ''} per Visit:
+{chr(10).join([f'• {name}' for name in service_names])}
+
+Quoted Price per Visit: Rs. {first.quoted_price}
+
+Service Location: {first.service_address}
+
+{f'Customer Note: {first.description}' if first.description else ''}
+
+Each visit is a separate booking. Please log in to your SajiloFix provider dashboard to accept or decline them.
+
+---
+This is an automated message from SajiloFix.
+© 2025 SajiloFix. All rights reserved.
+        """
+
+        _send_mail(
+            subject=subject,
+            message=plain_message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[provider_email],
+            html_message=html_message,
+            fail_silently=False,
+        )
+
+        logger.info(
+            f"Batch booking notification sent to provider {first.provider.id} "
+            f"for bookings {', '.join(str(b.id) for b in bookings)}"
+        )
+        return True
+
+    except Exception as e:
+        logger.error(f"Failed to send batch booking notification to provider: {str(e)}")
         return False
 
 
@@ -169,21 +316,19 @@ def send_booking_acceptance_to_customer(booking):
         customer_email = booking.customer.email
         if not customer_email:
             logger.warning(f"Customer {booking.customer.id} has no email address")
-            print(f"⚠️ Warning: Customer {booking.customer.id} has no email")
             return False
         
-        print(f"📧 Preparing to send email to customer: {customer_email}")
+        logger.debug(f"Preparing booking acceptance to customer {booking.customer.id} for booking {booking.id}")
         
         # Get all services booked
         services_list = booking.booking_services.select_related('service', 'service__specialization').all()
         if not services_list:
             logger.warning(f"Booking {booking.id} has no booking_services")
-            print(f"⚠️ Warning: No booking_services found for booking {booking.id}")
             service_names = [booking.service.title or booking.service.specialization.name or 'Service']
         else:
             service_names = [bs.service.title or bs.service.specialization.name or 'Service' for bs in services_list]
         
-        print(f"📋 Services: {', '.join(service_names)}")
+        logger.debug(f"Booking {booking.id} services: {', '.join(service_names)}")
         
         subject = f'Booking Accepted - {booking.provider.get_full_name() or "Provider"}'
         
@@ -302,8 +447,7 @@ This is an automated message from SajiloFix.
 © 2025 SajiloFix. All rights reserved.
         """
         
-        print(f"📤 Sending email...")
-        send_mail(
+        _send_mail(
             subject=subject,
             message=plain_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -313,14 +457,10 @@ This is an automated message from SajiloFix.
         )
         
         logger.info(f"Booking acceptance notification sent to customer {booking.customer.id} for booking {booking.id}")
-        print(f"✅ Email successfully sent to customer {customer_email}")
         return True
         
     except Exception as e:
-        logger.error(f"Failed to send booking acceptance notification to customer: {str(e)}")
-        print(f"❌ Email failed: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
+        logger.exception(f"Failed to send booking acceptance notification to customer: {str(e)}")
         return False
 
 
@@ -420,7 +560,7 @@ This is an automated message from SajiloFix.
 © 2025 SajiloFix. All rights reserved.
             """
 
-            send_mail(
+            _send_mail(
                 subject=subject,
                 message=plain_message,
                 from_email=settings.DEFAULT_FROM_EMAIL,
@@ -429,11 +569,9 @@ This is an automated message from SajiloFix.
                 fail_silently=False,
             )
             logger.info(f"Expiry notification sent to customer {booking.customer.id} for booking {booking.id}")
-            print(f"✅ Expiry email sent to customer {customer_email}")
 
     except Exception as e:
         logger.error(f"Failed to send expiry notification to customer: {str(e)}")
-        print(f"❌ Customer expiry email failed: {str(e)}")
 
     # --- Email to Provider ---
     try:
@@ -510,7 +648,7 @@ This is an automated message from SajiloFix.
 © 2025 SajiloFix. All rights reserved.
             """
 
-            send_mail(
+            _send_mail(
                 subject=subject,
                 message=plain_message,
                 from_email=settings.DEFAULT_FROM_EMAIL,
@@ -519,8 +657,6 @@ This is an automated message from SajiloFix.
                 fail_silently=False,
             )
             logger.info(f"Expiry notification sent to provider {booking.provider.id} for booking {booking.id}")
-            print(f"✅ Expiry email sent to provider {provider_email}")
 
     except Exception as e:
         logger.error(f"Failed to send expiry notification to provider: {str(e)}")
-        print(f"❌ Provider expiry email failed: {str(e)}")
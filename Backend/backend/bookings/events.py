@@ -0,0 +1,257 @@
+"""
+Booking event log (outbox) and its consumers.
+
+Writers
+    record_bookings_created() and the booking_transitioned and
+    bookings_transitioned receivers below append BookingEvent rows in the same transaction as the change itself,
+    so an event exists if and only if the change was committed.
+
+Consumers
+    Each entry in CONSUMERS reads the log in id order and keeps its own
+    offset in BookingEventConsumer. process_events() is run by the
+    process_booking_events management command; a consumer that fails on an
+    event stops there and retries it on the next run, and resetting its
+    offset replays the log from any point.
+
+    Handlers run inside the transaction holding the consumer's row lock, so
+    their database writes commit with the offset advance. Emails are only
+    queued there (transaction.on_commit) and sent once that transaction has
+    committed: a slow mail server holds no lock, and an event retried after
+    a failure is not emailed twice. A send that fails is logged and not
+    retried; replay the consumer to send again.
+
+Gaps
+    Event ids are assigned at INSERT but become visible at COMMIT, so a
+    missing id below a visible one may belong to a transaction that is still
+    running (a lock wait, an upload inside the atomic block) or to one that
+    rolled back. Consumers read past it and keep the id in pending_gaps,
+    re-checking it on every run until the event shows up or the id is
+    provably unused:
+
+    - PostgreSQL: with each gap the xmax of a snapshot taken after the gap
+      was seen is stored. The writer of the missing event had a transaction
+      id below it (events are written after the change they record, so the
+      transaction already had an id when it drew the event id). Once the
+      snapshot xmin passes that xmax, the writer has finished; if the event
+      is still missing it was rolled back.
+    - SQLite runs one write transaction at a time, so a missing id below a
+      committed one is always a rollback and is not kept.
+    - Other databases keep gaps until the event appears.
+"""
+import logging
+from functools import partial
+
+from django.db import connection, models, transaction
+from django.dispatch import receiver
+
+from .emails import (
+    send_booking_notification_to_provider,
+    send_batch_booking_notification_to_provider,
+    send_booking_acceptance_to_customer,
+    send_booking_expiry_notification
+)
+from .models import Booking, BookingEvent, BookingEventConsumer
+from .signals import booking_transitioned, bookings_transitioned
+
+logger = logging.getLogger(__name__)
+
+def _jsonable_changes(changes):
+    """Store related objects by primary key in the event payload."""
+    return {
+        field: value.pk if isinstance(value, models.Model) else value
+        for field, value in (changes or {}).items()
+    }
+
+
+def record_bookings_created(bookings, actor=None):
+    """
+    Append a 'created' event for each new booking. Bookings created together
+    (batch/recurring requests) carry the ids of the whole batch so the
+    notification consumer can send one consolidated email.
+    """
+    batch_ids = [booking.id for booking in bookings] if len(bookings) > 1 else None
+    BookingEvent.objects.bulk_create([
+        BookingEvent(
+            booking=booking,
+            event_type='created',
+            to_status=booking.status,
+            actor=actor,
+            payload={'batch_booking_ids': batch_ids} if batch_ids else {},
+        )
+        for booking in bookings
+    ])
+
+
+@receiver(booking_transitioned)
+def record_transition(sender, booking, transition, to_status, actor=None, changes=None, **kwargs):
+    BookingEvent.objects.create(
+        booking=booking,
+        event_type=transition,
+        to_status=to_status,
+        actor=actor,
+        payload={'changes': _jsonable_changes(changes)},
+    )
+
+
+@receiver(bookings_transitioned)
+def record_transitions(sender, bookings, transition, to_status, actor=None, changes=None, **kwargs):
+    payload = {'changes': _jsonable_changes(changes)}
+    BookingEvent.objects.bulk_create([
+        BookingEvent(booking=booking, event_type=transition, to_status=to_status, actor=actor, payload=payload)
+        for booking in bookings
+    ])
+
+
+# --- Consumers ---------------------------------------------------------------
+
+def _send_after_commit(send, *args, **kwargs):
+    """Send an email once the consumer's transaction has committed."""
+    transaction.on_commit(partial(send, *args, **kwargs), robust=True)
+
+
+def notify_parties(event):
+    """Emails for new, accepted and expired bookings."""
+    booking = event.booking
+    if event.event_type == 'created':
+        services = [bs.service for bs in booking.booking_services.all()]
+        batch_ids = event.payload.get('batch_booking_ids')
+        if not batch_ids:
+            _send_after_commit(send_booking_notification_to_provider, booking, services=services)
+        elif booking.id == min(batch_ids):
+            # One email for the whole batch, sent from its first booking
+            bookings = list(
+                Booking.objects.filter(id__in=batch_ids)
+                .select_related('customer', 'provider')
+                .order_by('preferred_date', 'preferred_time')
+            )
+            _send_after_commit(send_batch_booking_notification_to_provider, bookings, services)
+    elif event.event_type == 'accept':
+        _send_after_commit(send_booking_acceptance_to_customer, booking)
+    elif event.event_type == 'expire':
+        _send_after_commit(send_booking_expiry_notification, booking)
+
+
+def settle_payments(event):
+    """Release payment on completion, hold it on dispute."""
+    from .services import PaymentService
+
+    if event.event_type == 'complete':
+        PaymentService.release_payment(event.booking)
+    elif event.event_type == 'dispute':
+        PaymentService.hold_payment(event.booking, reason=event.booking.dispute_reason)
+
+
+def rollup_dashboard_stats(event):
+    """Recompute the dashboard stats rollups of both parties on any booking change."""
+    from .services import DashboardStatsService
+
+    DashboardStatsService.refresh(event.booking.customer_id, event.booking.provider_id)
+
+
+CONSUMERS = {
+    'payments': settle_payments,
+    'notifications': notify_parties,
+    'dashboard_stats': rollup_dashboard_stats,
+}
+
+
+def _snapshot_bounds():
+    """
+    (xmin, xmax) of a new PostgreSQL snapshot: every transaction with an id
+    below xmin has finished, every one with an id from xmax on started after
+    it. None on other databases.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_snapshot_xmin(s)::text::bigint, pg_snapshot_xmax(s)::text::bigint "
+            "FROM pg_current_snapshot() AS s"
+        )
+        return cursor.fetchone()
+
+
+def _writes_serialized():
+    """True if the database runs one write transaction at a time (no in-flight gaps)."""
+    return connection.vendor == 'sqlite'
+
+
+def _run_handler(name, handler, event):
+    try:
+        with transaction.atomic():
+            handler(event)
+    except Exception:
+        logger.exception(f"Consumer '{name}' failed on booking event {event.id}; will retry")
+        return False
+    return True
+
+
+def process_events(name, batch_size=100):
+    """
+    Run consumer `name` over the events of its pending gaps that have been
+    committed since the last run, then over the next `batch_size` unread
+    events. Returns the number of events processed.
+
+    The consumer's offset row is locked for the duration, so several workers
+    can run without handling the same event twice. Database writes made by a
+    handler are committed together with the offset advance.
+    """
+    handler = CONSUMERS[name]
+    BookingEventConsumer.objects.get_or_create(name=name)
+    related = (
+        BookingEvent.objects
+        .select_related('booking', 'booking__customer', 'booking__provider', 'booking__service', 'booking__service__specialization')
+        .prefetch_related('booking__booking_services__service__specialization')
+    )
+
+    with transaction.atomic():
+        cursor = BookingEventConsumer.objects.select_for_update().get(name=name)
+        gaps = {gap['id']: gap for gap in cursor.pending_gaps}
+        processed, failed = 0, False
+
+        if gaps:
+            # Bounds first: a writer that finished before them has its event in the query below
+            bounds = _snapshot_bounds()
+            for event in related.filter(id__in=gaps).order_by('id'):
+                if not _run_handler(name, handler, event):
+                    failed = True
+                    break
+                del gaps[event.id]
+                processed += 1
+            if bounds is not None and not failed:
+                for gap in [gap for gap in gaps.values() if gap['xmax'] is not None and gap['xmax'] <= bounds[0]]:
+                    logger.info(f"Consumer '{name}': booking event {gap['id']} was rolled back")
+                    del gaps[gap['id']]
+
+        events = [] if failed else list(related.filter(id__gt=cursor.last_event_id).order_by('id')[:batch_size])
+        track_gaps = not _writes_serialized()
+        xmax = None
+        if events and track_gaps:
+            # Taken after the events were read, so the writers of any gaps among them have ids below xmax
+            bounds = _snapshot_bounds()
+            xmax = bounds[1] if bounds is not None else None
+
+        for event in events:
+            if not _run_handler(name, handler, event):
+                break
+            if track_gaps:
+                for missing in range(cursor.last_event_id + 1, event.id):
+                    gaps[missing] = {'id': missing, 'xmax': xmax}
+            cursor.last_event_id = event.id
+            processed += 1
+
+        pending_gaps = sorted(gaps.values(), key=lambda gap: gap['id'])
+        if processed or pending_gaps != cursor.pending_gaps:
+            cursor.pending_gaps = pending_gaps
+            cursor.save(update_fields=['last_event_id', 'pending_gaps', 'updated_at'])
+    return processed
+
+
+def reset_offset(name, event_id):
+    """Make consumer `name` continue after `event_id` (replay or skip)."""
+    with transaction.atomic():
+        cursor, _ = BookingEventConsumer.objects.select_for_update().get_or_create(name=name)
+        # Gaps past the new offset are read again in order
+        cursor.pending_gaps = [gap for gap in cursor.pending_gaps if gap['id'] <= event_id]
+        cursor.last_event_id = event_id
+        cursor.save(update_fields=['last_event_id', 'pending_gaps', 'updated_at'])
@@ -0,0 +1,352 @@
+"""
+Read-only serializers for high-volume list endpoints.
+
+The DRF serializers in bookings.serializers build a model instance per row
+and then run every field's get_attribute/to_representation, method fields
+and nested serializers on it. The classes here produce the same output
+from a `.values()` queryset instead:
+
+- fields the DRF serializer reads straight from a column (including
+  related columns like `provider.city`) are compiled once into
+  (key, values() path, converter) accessors, where the converter is the DRF
+  field's own to_representation for the types whose formatting matters
+  (dates, times, decimals) and nothing for strings, numbers and booleans;
+- the remaining fields have a `get_<name>(row)` method working on the row
+  dict, mirroring the DRF serializer's method;
+- anything that needs other tables for a whole page (a provider's
+  services, for example) is loaded once per page in prepare().
+
+They honour the request's sparse fieldset (?fields=/?expand=, see
+bookings.fieldsets): only the requested fields are represented, and only
+their columns are selected.
+
+The output matches the DRF serializer field for field and in the same key
+order; bookings.tests.CompiledSerializerGoldenTests renders both and
+compares the JSON. When changing one of the DRF serializers, change its
+compiled counterpart too.
+
+Views use them through CompiledListMixin:
+
+    class MyBookingsView(CompiledListMixin, generics.ListAPIView):
+        serializer_class = BookingListSerializer
+        compiled_serializer_class = CompiledBookingListSerializer
+"""
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from users.cdn import file_url
+from users.models import UserSpeciality
+from .fieldsets import Fieldset
+from .models import Service
+from .serializers import (
+    AVATAR_LIST_WIDTH,
+    PROVIDER_RATING_FIELDS,
+    PROVIDER_SERVICE_FIELDS,
+    BookingListSerializer,
+    PaymentStatusSerializer,
+    ProviderListSerializer,
+    ReviewSerializer,
+    ServiceSerializer,
+)
+
+# DRF fields whose representation of a database value is the value itself
+_PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def _converter(field):
+    if isinstance(field, _PASSTHROUGH_FIELDS):
+        return None
+    return field.to_representation
+
+
+def _compile_fields(serializer_class, names, prefix=''):
+    """[(key, values() path, converter)] for plain fields `names` of serializer_class."""
+    fields = serializer_class().fields
+    return [
+        (name, prefix + fields[name].source.replace('.', '__'), _converter(fields[name]))
+        for name in names
+    ]
+
+
+def _full_name_or_email(row, prefix):
+    """User.get_full_name() or the email, from a row holding the user's columns under `prefix`."""
+    full_name = f"{row[prefix + 'first_name']} {row[prefix + 'last_name']}".strip()
+    return full_name or row[prefix + 'email']
+
+
+class CompiledListSerializer:
+    """
+    Base class; see the module docstring.
+
+    Subclasses set serializer_class (the DRF serializer reproduced) and
+    implement get_<name>(row) for its fields that are not plain columns,
+    listing the columns each of those methods reads in extra_values.
+    """
+    serializer_class = None
+    # {field: columns its get_<field>() method reads}
+    extra_values = {}
+    # Fields the DRF serializer leaves out of its output
+    skip_fields = ()
+
+    _accessors = None
+
+    def __init__(self, context=None, fieldset=None):
+        self.context = context or {}
+        if fieldset is None:
+            fieldset = Fieldset.from_request(self.context.get('request'))
+        self.fields = self.accessors()
+        if fieldset is not None:
+            expandable = getattr(self.serializer_class.Meta, 'expandable_fields', ())
+            keep = set(fieldset.select([name for name, _, _ in self.fields], expandable))
+            self.fields = [accessor for accessor in self.fields if accessor[0] in keep]
+        self.field_names = {name for name, _, _ in self.fields}
+
+    @classmethod
+    def accessors(cls):
+        """[(key, values() path or None, converter or get_<key>)] in the serializer's field order."""
+        if cls.__dict__.get('_accessors') is None:
+            accessors = []
+            for name, field in cls.serializer_class().fields.items():
+                if name in cls.skip_fields:
+                    continue
+                getter = getattr(cls, f'get_{name}', None)
+                if getter is not None:
+                    accessors.append((name, None, getter))
+                else:
+                    accessors.append((name, field.source.replace('.', '__'), _converter(field)))
+            cls._accessors = accessors
+        return cls._accessors
+
+    def get_queryset(self, queryset):
+        """Hook to add annotations the row methods need."""
+        return queryset
+
+    def values(self, queryset):
+        """`queryset` as the dicts to_representation() expects."""
+        paths = []
+        for name, path, _ in self.fields:
+            paths.extend(self.extra_values.get(name, ()) if path is None else [path])
+        return self.get_queryset(queryset).prefetch_related(None).values(*dict.fromkeys(paths or ['pk']))
+
+    def prepare(self, rows):
+        """Hook to load per-page data for `rows` before they are represented."""
+
+    def to_representation(self, row):
+        data = {}
+        for name, path, convert in self.fields:
+            if path is None:
+                data[name] = convert(self, row)
+            else:
+                value = row[path]
+                data[name] = value if value is None or convert is None else convert(value)
+        return data
+
+    def many(self, rows):
+        """Represent a page of rows from values()."""
+        rows = list(rows)
+        self.prepare(rows)
+        return [self.to_representation(row) for row in rows]
+
+
+class CompiledListMixin:
+    """
+    ListAPIView mixin serving list() with compiled_serializer_class.
+    serializer_class is still used for everything else (schema, browsable API).
+    """
+    compiled_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        compiled = self.compiled_serializer_class(context=self.get_serializer_context())
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.many(page))
+        return Response(compiled.many(queryset))
+
+
+class CompiledBookingListSerializer(CompiledListSerializer):
+    """BookingListSerializer from values()."""
+    serializer_class = BookingListSerializer
+    extra_values = {
+        'service_title': (
+            'service__title', 'service__specialization', 'service__specialization__name',
+            'service__specialization__speciality__name',
+        ),
+        'provider_name': ('provider__first_name', 'provider__last_name', 'provider__email'),
+        'customer_name': ('customer__first_name', 'customer__last_name', 'customer__email'),
+        'payment': ('payment__id', 'payment__status', 'payment__payment_method', 'payment__amount', 'payment__paid_at'),
+        'is_expired': ('status', 'confirmation_deadline'),
+    }
+
+    _payment_accessors = None
+
+    @classmethod
+    def payment_accessors(cls):
+        if cls._payment_accessors is None:
+            cls._payment_accessors = _compile_fields(
+                PaymentStatusSerializer, PaymentStatusSerializer.Meta.fields, prefix='payment__'
+            )
+        return cls._payment_accessors
+
+    def prepare(self, rows):
+        self.now = timezone.now()
+
+    def get_service_title(self, row):
+        # Booking.service and Service.specialization are required, so
+        # BookingListSerializer's booking_services fallback never applies
+        if row['service__title']:
+            return row['service__title']
+        if row['service__specialization'] is not None:
+            return row['service__specialization__name'] or row['service__specialization__speciality__name']
+        return None
+
+    def get_provider_name(self, row):
+        return _full_name_or_email(row, 'provider__')
+
+    def get_customer_name(self, row):
+        return _full_name_or_email(row, 'customer__')
+
+    def get_payment(self, row):
+        if row['payment__id'] is None:
+            return None
+        payment = {}
+        for name, path, convert in self.payment_accessors():
+            value = row[path]
+            payment[name] = value if value is None or convert is None else convert(value)
+        return payment
+
+    def get_is_expired(self, row):
+        # Booking.is_expired
+        if row['status'] != 'pending' or not row['confirmation_deadline']:
+            return False
+        return self.now >= row['confirmation_deadline']
+
+
+class CompiledServiceSerializer(CompiledListSerializer):
+    """ServiceSerializer from values()."""
+    serializer_class = ServiceSerializer
+    extra_values = {'provider_name': ('provider__first_name', 'provider__last_name', 'provider__email')}
+
+    def get_provider_name(self, row):
+        return _full_name_or_email(row, 'provider__')
+
+
+class CompiledReviewSerializer(CompiledListSerializer):
+    """ReviewSerializer from values()."""
+    serializer_class = ReviewSerializer
+    # Their source, User.full_name, does not exist, so DRF skips them
+    skip_fields = ('customer_name', 'provider_name')
+
+
+class CompiledProviderListSerializer(CompiledListSerializer):
+    """
+    ProviderListSerializer from values(): rating stats are annotated
+    (ProviderDiscoveryService.with_list_stats), active services and selected
+    specialities are loaded for the whole page in two queries. Each of the
+    three is skipped when none of the requested fields needs it.
+    """
+    serializer_class = ProviderListSerializer
+    extra_values = {
+        'profile_picture': ('profile_picture', 'updated_at'),
+        'average_rating': ('rating_average',),
+        'review_count': ('rating_count',),
+        **{name: ('id',) for name in PROVIDER_SERVICE_FIELDS},
+    }
+
+    def get_queryset(self, queryset):
+        from .services import ProviderDiscoveryService
+
+        if self.field_names & PROVIDER_RATING_FIELDS and 'rating_average' not in queryset.query.annotations:
+            queryset = ProviderDiscoveryService.with_list_stats(queryset, services=False, specialities=False)
+        return queryset
+
+    def prepare(self, rows):
+        if not self.field_names & PROVIDER_SERVICE_FIELDS:
+            return
+        ids = [row['id'] for row in rows]
+        self.services = {pk: [] for pk in ids}
+        for service in Service.objects.filter(provider_id__in=ids, is_active=True).values(
+            'provider_id', 'title', 'minimum_charge', 'base_price', 'price_type',
+            'specialization', 'specialization__name', 'specialization__speciality__name',
+        ):
+            service['effective_price'] = self._effective_price(service)
+            self.services[service['provider_id']].append(service)
+
+        if 'specializations' in self.field_names:
+            self.specialities = {pk: [] for pk in ids}
+            for user_id, name in UserSpeciality.objects.filter(user_id__in=ids).values_list('user_id', 'speciality__name'):
+                self.specialities[user_id].append(name)
+
+    @staticmethod
+    def _effective_price(service):
+        if service['minimum_charge'] is not None and service['minimum_charge'] > 0:
+            return service['minimum_charge']
+        return service['base_price']
+
+    def _priced(self, row):
+        return [s for s in self.services[row['id']] if s['effective_price'] is not None]
+
+    def get_profile_picture(self, row):
+        return file_url(row['profile_picture'], width=AVATAR_LIST_WIDTH, version=row['updated_at'])
+
+    def get_average_rating(self, row):
+        average = row['rating_average']
+        return round(average, 1) if average else 0.0
+
+    def get_review_count(self, row):
+        return row['rating_count']
+
+    def get_specializations(self, row):
+        specializations = list(dict.fromkeys(self.specialities[row['id']]))
+        if not specializations:
+            specializations = list(dict.fromkeys(
+                s['specialization__speciality__name'] if s['specialization'] is not None else None
+                for s in self.services[row['id']]
+            ))
+        return specializations
+
+    def get_service_count(self, row):
+        return len(self.services[row['id']])
+
+    def _cheapest(self, row):
+        cheapest = None
+        for service in self._priced(row):
+            if cheapest is None or service['effective_price'] < cheapest['effective_price']:
+                cheapest = service
+        return cheapest
+
+    def get_starting_price(self, row):
+        cheapest = self._cheapest(row)
+        return cheapest['effective_price'] if cheapest else None
+
+    def get_starting_price_type(self, row):
+        cheapest = self._cheapest(row)
+        return cheapest['price_type'] if cheapest else None
+
+    def get_services_preview(self, row):
+        services = sorted(self._priced(row), key=lambda s: s['effective_price'])
+        return [
+            {
+                'title': s['title'],
+                'specialization_name': s['specialization__name'] if s['specialization'] is not None else 'Service',
+                'price': s['effective_price'],
+                'price_type': s['price_type'],
+            }
+            for s in services[:3]
+        ]
+
+    def get_price_range_min(self, row):
+        prices = [s['effective_price'] for s in self._priced(row)]
+        return min(prices) if prices else None
+
+    def get_price_range_max(self, row):
+        prices = [s['effective_price'] for s in self._priced(row)]
+        return max(prices) if prices else None
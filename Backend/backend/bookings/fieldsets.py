@@ -0,0 +1,97 @@
+"""
+Sparse fieldsets for the booking and provider APIs.
+
+Clients pick the fields of a response with two query parameters:
+
+    ?fields=id,status,scheduled_date     only these fields
+    ?expand=payment                      the default fields plus `payment`
+    ?fields=id,status&expand=images      both: id, status and images
+
+Serializers using SparseFieldsetMixin list their heavy fields (nested
+objects, aggregates) in Meta.expandable_fields. Without either parameter
+every field is returned, as before; once `expand` is given, expandable
+fields not named in it are left out. Unknown names are ignored.
+
+Pruning a field also prunes what it needs from the database: views load
+relations through SparseFieldsetMixin.optimize_queryset(), which only adds
+the select_related/prefetch_related lookups listed for the returned fields
+in Meta.field_select_related and Meta.field_prefetch_related. The compiled
+list serializers (bookings.fast_serializers) read the same parameters and
+leave the unrequested columns out of their values() query.
+"""
+
+
+def _split(value):
+    return frozenset(name.strip() for name in (value or '').split(',') if name.strip())
+
+
+class Fieldset:
+    """The fields requested with ?fields= and ?expand= (None when not given)."""
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        """Fieldset of a DRF request, or None if it asks for the default fields."""
+        params = getattr(request, 'query_params', None)
+        if not params or ('fields' not in params and 'expand' not in params):
+            return None
+        return cls(
+            fields=_split(params.get('fields')) if 'fields' in params else None,
+            expand=_split(params.get('expand')) if 'expand' in params else None,
+        )
+
+    def select(self, names, expandable=()):
+        """The requested ones among `names`, in their original order."""
+        names = list(dict.fromkeys(names))
+        expand = self.expand or frozenset()
+        if self.fields is not None:
+            return [name for name in names if name in self.fields or name in expand]
+        if self.expand is None:
+            return names
+        return [name for name in names if name not in expandable or name in expand]
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin dropping the fields a request did not ask for.
+
+    The fieldset comes from the `fieldset` keyword or, failing that, from the
+    request in the serializer context. Serializers given input data keep
+    their writable fields, so `?fields=` never changes what gets saved.
+    """
+
+    def __init__(self, *args, fieldset=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fieldset is None:
+            fieldset = Fieldset.from_request(self.context.get('request'))
+        if fieldset is None:
+            return
+        keep = set(fieldset.select(self.fields, getattr(self.Meta, 'expandable_fields', ())))
+        for name, field in list(self.fields.items()):
+            if name in keep or field.write_only:
+                continue
+            if field.read_only or not hasattr(self, 'initial_data'):
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, fieldset):
+        """Names of Meta.fields a serializer built with `fieldset` returns."""
+        if fieldset is None:
+            return list(dict.fromkeys(cls.Meta.fields))
+        return fieldset.select(cls.Meta.fields, getattr(cls.Meta, 'expandable_fields', ()))
+
+    @classmethod
+    def optimize_queryset(cls, queryset, fieldset):
+        """`queryset` with the relations of the requested fields loaded."""
+        select, prefetch = [], []
+        for name in cls.requested_fields(fieldset):
+            select.extend(getattr(cls.Meta, 'field_select_related', {}).get(name, ()))
+            prefetch.extend(getattr(cls.Meta, 'field_prefetch_related', {}).get(name, ()))
+        if select:
+            queryset = queryset.select_related(*dict.fromkeys(select))
+        if prefetch:
+            queryset = queryset.prefetch_related(*dict.fromkeys(prefetch))
+        return queryset
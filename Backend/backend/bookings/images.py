@@ -0,0 +1,182 @@
+"""
+Booking image variants.
+
+Originals are kept as uploaded (up to 5MB). The process_booking_images
+worker renders resized copies of each BookingImage off the request path:
+
+    thumb   320px  (long side)
+    medium  960px
+    full    1920px
+
+each as AVIF, WebP and JPEG (the fallback), with EXIF/GPS metadata removed
+and the EXIF orientation applied to the pixels. Variants are never upscaled.
+
+render_variants() is pure CPU work on bytes so it can run in a process pool;
+process_images() handles the storage and database side.
+"""
+import io
+import logging
+import math
+import os
+from concurrent.futures import Future
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .models import BookingImage
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels of each variant
+VARIANT_SIZES = {
+    'thumb': 320,
+    'medium': 960,
+    'full': 1920,
+}
+
+# Format -> (file extension, Pillow save options). AVIF is skipped when
+# Pillow is built without it.
+FORMATS = {
+    'avif': ('avif', {'quality': 50, 'speed': 8}),
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt != 'avif' or features.check('avif')]
+
+
+def render_variants(data, formats=None):
+    """
+    Render every size/format variant of the image in `data`.
+
+    Returns {size: {'width': w, 'height': h, 'files': {format: bytes}}}.
+    No metadata is copied from the original except the ICC colour profile.
+    """
+    formats = formats or available_formats()
+    with Image.open(io.BytesIO(data)) as original:
+        # Let the JPEG decoder scale down by 1/2..1/8 while decoding, as long
+        # as the result still covers the largest variant
+        ratio = max(VARIANT_SIZES.values()) / max(original.size)
+        if ratio < 1:
+            original.draft('RGB', (math.ceil(original.width * ratio), math.ceil(original.height * ratio)))
+        image = ImageOps.exif_transpose(original)
+        icc_profile = original.info.get('icc_profile')
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Flatten transparency onto white; JPEG has no alpha channel
+            rgba = image.convert('RGBA')
+            image = Image.new('RGB', image.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel('A'))
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        variants = {}
+        # Largest first, so each smaller size is resized from the previous one
+        for size, longest in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+            image = image.copy()
+            image.thumbnail((longest, longest), Image.Resampling.LANCZOS)
+            files = {}
+            for fmt in formats:
+                out = io.BytesIO()
+                options = dict(FORMATS[fmt][1])
+                if icc_profile:
+                    options['icc_profile'] = icc_profile
+                image.save(out, format=fmt.upper(), **options)
+                files[fmt] = out.getvalue()
+            variants[size] = {'width': image.width, 'height': image.height, 'files': files}
+    return variants
+
+
+def variant_name(image_name, size, fmt):
+    """Storage name of a variant: next to the original, under variants/."""
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return f"{directory}/variants/{stem}_{size}.{FORMATS[fmt][0]}"
+
+
+def store_variants(booking_image, rendered):
+    """
+    Upload rendered variants and return the `variants` value for the model.
+    Variants recorded by an earlier run are left alone; process_images()
+    deletes them once the new ones are saved.
+    """
+    variants = {}
+    for size, variant in rendered.items():
+        names = {}
+        for fmt, content in variant['files'].items():
+            name = variant_name(booking_image.image.name, size, fmt)
+            names[fmt] = default_storage.save(name, ContentFile(content))
+        variants[size] = {'width': variant['width'], 'height': variant['height'], **names}
+    return variants
+
+
+def _run_now(fn, *args):
+    """Run fn in this process, returning a completed Future like an executor would."""
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def process_images(images, executor=None):
+    """
+    Create and store the variants of `images` (BookingImage instances).
+
+    With an `executor` (e.g. a ProcessPoolExecutor) the rendering runs in
+    parallel; downloads, uploads and database writes stay in this process.
+    A failing image is marked 'failed' and does not stop the others.
+    Returns (processed, failed) counts.
+    """
+    submit = executor.submit if executor is not None else _run_now
+    jobs = []
+    for image in images:
+        try:
+            with default_storage.open(image.image.name) as f:
+                jobs.append((image, submit(render_variants, f.read())))
+        except Exception as e:
+            job = Future()
+            job.set_exception(e)
+            jobs.append((image, job))
+
+    processed = failed = 0
+    for image, job in jobs:
+        try:
+            variants = store_variants(image, job.result())
+        except Exception as e:
+            logger.warning(f"Could not create variants for booking image {image.pk}: {e}")
+            BookingImage.objects.filter(pk=image.pk).update(
+                variants_status='failed', variants={'error': str(e)[:500]}
+            )
+            failed += 1
+            continue
+        BookingImage.objects.filter(pk=image.pk).update(
+            variants=variants, variants_status='ready', variants_processed_at=timezone.now()
+        )
+        # Release the variants of an earlier run (a reference each, under content-addressed storage)
+        _delete_files(variant_names(image.variants))
+        image.variants, image.variants_status = variants, 'ready'
+        processed += 1
+    return processed, failed
+
+
+def _delete_files(names):
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except Exception as e:
+            logger.warning(f"Could not delete old image variant {name}: {e}")
+
+
+def variant_names(variants):
+    """Storage names referenced by a BookingImage.variants value."""
+    return [
+        name
+        for size in VARIANT_SIZES
+        for fmt in FORMATS
+        if (name := (variants or {}).get(size, {}).get(fmt))
+    ]
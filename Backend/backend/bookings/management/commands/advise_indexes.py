@@ -0,0 +1,69 @@
+"""
+Index advisor for the hot booking queries.
+
+EXPLAINs every query in bookings.query_catalog against the configured
+database and reports, for each, the indexes the plan uses and whether it
+scans the whole bookings table. A query that does is reported MISSING when
+its index is not in the database (run migrate) and UNUSED when the index
+exists but the planner prefers a full scan, which is normal on small
+tables. The command exits with status 1 when any index is missing, so it
+can run in CI against a migrated database.
+
+On PostgreSQL, full scans are discouraged (enable_seqscan=off) while
+explaining, so the plans show whether an index can serve the query even
+on a nearly empty database; --planner-choice keeps the planner's own plans.
+
+    python manage.py advise_indexes
+    python manage.py advise_indexes --verbose
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from bookings.models import Booking
+from bookings.query_catalog import CANONICAL_QUERIES, read_plan, sample_values
+
+
+class Command(BaseCommand):
+    help = "Report hot booking queries that are not served by an index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--planner-choice', action='store_true', help="Don't discourage full scans on PostgreSQL.")
+        parser.add_argument('--verbose', action='store_true', help='Print every plan.')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f"Plans from {connection.vendor} are not supported; use PostgreSQL or SQLite.")
+
+        with connection.cursor() as cursor:
+            existing = set(connection.introspection.get_constraints(cursor, Booking._meta.db_table))
+        samples = sample_values()
+
+        missing = 0
+        with transaction.atomic():
+            if connection.vendor == 'postgresql' and not options['planner_choice']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for query in CANONICAL_QUERIES:
+                plan = query.build(samples).explain()
+                full_scan, used = read_plan(plan, connection.vendor)
+                if not full_scan:
+                    verdict = self.style.SUCCESS('OK')
+                elif query.index and query.index not in existing:
+                    verdict = self.style.ERROR('MISSING')
+                    missing += 1
+                else:
+                    verdict = self.style.WARNING('UNUSED' if query.index else 'FULL SCAN')
+
+                self.stdout.write(
+                    f"{verdict:<9} {query.name:<18} uses {', '.join(used) or 'no index'}"
+                    + (f" (expected {query.index})" if query.index and query.index not in used else '')
+                    + f"  [{query.source}]"
+                )
+                if options['verbose'] or full_scan:
+                    for line in plan.splitlines():
+                        self.stdout.write(f"    {line}")
+
+        if missing:
+            self.stderr.write(self.style.ERROR(f"{missing} queries are missing their index; run migrate."))
+            raise SystemExit(1)
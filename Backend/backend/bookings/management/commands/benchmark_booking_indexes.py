@@ -0,0 +1,140 @@
+"""
+Benchmark the hot booking queries with and without their indexes.
+
+Synthetic bookings are created inside a transaction that is rolled back at
+the end, so the database is left unchanged (indexes included). For every
+query in bookings.query_catalog the command prints the plan and the
+median time, first with the indexes from migration 0007 dropped
+("before"), then with them in place ("after").
+
+    python manage.py benchmark_booking_indexes
+    python manage.py benchmark_booking_indexes --bookings 200000 --repeat 20
+
+Run it against PostgreSQL for meaningful numbers; SQLite shows the plans
+but its planner and timings differ.
+"""
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from bookings.models import Booking, Service
+from bookings.query_catalog import CANONICAL_QUERIES, read_plan, sample_values
+from users.models import Speciality, Specialization, User
+
+# The indexes added for the catalog (bookings migration 0007)
+HOT_QUERY_INDEXES = [
+    'booking_pending_deadline_idx', 'booking_prov_pref_date_idx',
+    'booking_prov_sched_date_idx', 'booking_cust_prov_status_idx',
+]
+
+STATUSES = ['pending', 'confirmed', 'scheduled', 'in_progress', 'completed', 'cancelled', 'declined', 'expired']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark the catalogued booking queries before and after their indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=50_000, help='Synthetic bookings (default 50000).')
+        parser.add_argument('--providers', type=int, default=200, help='Synthetic providers (default 200).')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per query (default 10).')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._seed(options['bookings'], options['providers'])
+                samples = sample_values()
+                indexes = [index for index in Booking._meta.indexes if index.name in HOT_QUERY_INDEXES]
+                # Statements only: a schema editor can't be entered inside a transaction on SQLite
+                editor = connection.schema_editor()
+
+                self._execute([f'DROP INDEX {connection.ops.quote_name(index.name)}' for index in indexes])
+                before = self._run(samples, options['repeat'])
+                self._execute([index.create_sql(Booking, editor) for index in indexes])
+                after = self._run(samples, options['repeat'])
+                self._report(before, after)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, bookings, providers):
+        self.stdout.write(f"Creating {bookings} bookings for {providers} providers...")
+        speciality, _ = Speciality.objects.get_or_create(slug='benchmark', defaults={'name': 'Benchmark'})
+        specialization = Specialization.objects.create(speciality=speciality, name='Benchmark index service')
+        provider_users = User.objects.bulk_create([
+            User(username=f'benchmark-provider-{i}', email=f'benchmark-provider-{i}@example.com', user_type='offer')
+            for i in range(providers)
+        ])
+        customers = User.objects.bulk_create([
+            User(username=f'benchmark-customer-{i}', email=f'benchmark-customer-{i}@example.com', user_type='find')
+            for i in range(providers * 5)
+        ])
+        services = Service.objects.bulk_create([
+            Service(
+                provider=provider, specialization=specialization, title='Benchmark service',
+                description='Benchmark', base_price=Decimal('1000.00'), minimum_charge=Decimal('0'), price_type='fixed'
+            )
+            for provider in provider_users
+        ])
+
+        rng = random.Random(7)
+        now = timezone.now()
+        today = timezone.localdate()
+        rows = []
+        for _ in range(bookings):
+            index = rng.randrange(providers)
+            booking_status = rng.choice(STATUSES)
+            day = today + timedelta(days=rng.randint(-60, 30))
+            slot = f'{rng.randint(8, 18):02d}:00'
+            scheduled = booking_status in ('confirmed', 'scheduled', 'in_progress', 'completed')
+            rows.append(Booking(
+                customer=rng.choice(customers), provider=provider_users[index], service=services[index],
+                status=booking_status, preferred_date=day, preferred_time=slot,
+                scheduled_date=day if scheduled else None, scheduled_time=slot if scheduled else None,
+                confirmation_deadline=now + timedelta(hours=rng.randint(-48, 24)) if booking_status == 'pending' else None,
+                service_address='Baneshwor', service_city='Kathmandu', description='Benchmark booking',
+                customer_phone='9800000000',
+            ))
+        Booking.objects.bulk_create(rows, batch_size=5000)
+
+    def _execute(self, statements):
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(str(statement))
+            cursor.execute(f'ANALYZE {Booking._meta.db_table}')
+
+    def _run(self, samples, repeat):
+        results = {}
+        for query in CANONICAL_QUERIES:
+            queryset = query.build(samples)
+            plan = queryset.explain()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - start)
+            results[query.name] = (statistics.median(timings), plan)
+        return results
+
+    def _report(self, before, after):
+        for query in CANONICAL_QUERIES:
+            (before_time, before_plan), (after_time, after_plan) = before[query.name], after[query.name]
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"\n{query.name} [{query.source}]: {before_time * 1000:.2f} ms -> {after_time * 1000:.2f} ms "
+                f"({before_time / after_time:.1f}x)"
+            ))
+            for label, plan in (('before', before_plan), ('after', after_plan)):
+                full_scan, used = read_plan(plan, connection.vendor)
+                summary = 'full scan' if full_scan else ', '.join(used) or 'no index'
+                self.stdout.write(f"  {label} ({summary}):")
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
@@ -0,0 +1,87 @@
+"""
+Benchmark booking image variant rendering throughput.
+
+Renders synthetic camera-sized JPEGs (with EXIF, including GPS) through
+bookings.images.render_variants with 1..N worker processes and reports
+images per second overall and per core. Storage and the database are not
+involved, so this measures the CPU cost of the pipeline only.
+
+    python manage.py benchmark_image_pipeline
+    python manage.py benchmark_image_pipeline --images 48 --processes 1 2 4 --width 4032 --height 3024
+"""
+
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from bookings.images import available_formats, render_variants
+
+
+def _synthetic_photo(width, height, seed):
+    """A JPEG with gradients and noise (so it compresses like a photo) and EXIF."""
+    noise = Image.effect_noise((width, height), 40 + seed % 20)
+    gradient = Image.linear_gradient('L').resize((width, height))
+    image = Image.merge('RGB', (noise, gradient, gradient.rotate(90)))
+    exif = Image.Exif()
+    exif[0x010F] = 'BenchmarkCam'  # Make
+    exif[0x0112] = 6  # Orientation: rotate 90
+    exif[0x8825] = {1: 'N', 2: (27.0, 42.0, 0.0), 3: 'E', 4: (85.0, 19.0, 0.0)}  # GPS
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=90, exif=exif)
+    return out.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Benchmark image variant rendering (images per second per core)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=24, help='Images to render per run (default 24).')
+        parser.add_argument('--width', type=int, default=4032, help='Source width (default 4032).')
+        parser.add_argument('--height', type=int, default=3024, help='Source height (default 3024).')
+        parser.add_argument(
+            '--processes',
+            type=int,
+            nargs='+',
+            default=sorted({1, os.cpu_count() or 1}),
+            help='Process counts to compare (default: 1 and the CPU count).',
+        )
+
+    def handle(self, *args, **options):
+        count = options['images']
+        self.stdout.write(f"Generating {count} {options['width']}x{options['height']} source images...")
+        sources = [_synthetic_photo(options['width'], options['height'], i) for i in range(min(count, 4))]
+        sources = [sources[i % len(sources)] for i in range(count)]
+        source_mb = sum(len(s) for s in sources) / count / (1024 * 1024)
+        self.stdout.write(f"Formats: {', '.join(available_formats())}; average source {source_mb:.1f} MB")
+
+        sample = render_variants(sources[0])
+        self._check_sample(sample)
+
+        for processes in options['processes']:
+            start = time.perf_counter()
+            if processes == 1:
+                for source in sources:
+                    render_variants(source)
+            else:
+                with ProcessPoolExecutor(processes) as pool:
+                    list(pool.map(render_variants, sources))
+            elapsed = time.perf_counter() - start
+            rate = count / elapsed
+            self.stdout.write(
+                f"{processes:>3} process(es): {elapsed:7.2f} s | {rate:6.2f} images/s | {rate / processes:6.2f} images/s/core"
+            )
+
+    def _check_sample(self, sample):
+        sizes = []
+        for size, variant in sample.items():
+            total_kb = sum(len(data) for data in variant['files'].values()) / 1024
+            sizes.append(f"{size} {variant['width']}x{variant['height']} ({total_kb:.0f} KB all formats)")
+            for fmt, data in variant['files'].items():
+                with Image.open(io.BytesIO(data)) as image:
+                    if image.getexif():
+                        self.stderr.write(self.style.ERROR(f"{size}/{fmt} still has EXIF data"))
+        self.stdout.write("Variants: " + '; '.join(sizes))
@@ -0,0 +1,133 @@
+"""
+Benchmark JSON rendering: DRF's stdlib JSONRenderer against the
+orjson-backed backend.renderers.FastJSONRenderer.
+
+Payloads are built in memory (no database needed) in the shape of real
+responses:
+- bookings:  a 100-booking page from BookingListSerializer
+- providers: a 50-provider list as ProviderListSerializer returns it
+             (method fields hold raw Decimals)
+- earnings:  the hand-built stats dict of ProviderEarningsStatsView,
+             with Decimals, datetimes and a transaction UUID
+
+    python manage.py benchmark_json_rendering
+    python manage.py benchmark_json_rendering --iterations 2000
+"""
+import statistics
+import time
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from backend import renderers
+from bookings.models import Booking, Payment, Service
+from bookings.serializers import BookingListSerializer
+from users.models import Specialization, User
+
+
+def _booking_page(count):
+    now = datetime(2025, 1, 15, 9, 30, tzinfo=dt_timezone.utc)
+    provider = User(id=2, email='ram@example.com', first_name='Ram', last_name='Thapa')
+    customer = User(id=1, email='sita@example.com', first_name='Sītā', last_name='Shrestha')
+    service = Service(id=1, title='Pipe Repair', specialization=Specialization(id=1, name='Plumbing'))
+    bookings = []
+    for i in range(count):
+        booking = Booking(
+            id=i + 1, customer=customer, provider=provider, service=service,
+            status='completed' if i % 2 else 'pending',
+            preferred_date=date(2025, 1, 16) + timedelta(days=i % 30), preferred_time=dt_time(10, 0),
+            quoted_price=Decimal('1500.00'), final_price=Decimal('1450.00') if i % 2 else None,
+            service_address='Baneshwor-10, near the temple', service_city='Kathmandu', service_district='Kathmandu',
+            description='Kitchen sink leaking under the cabinet; needs a new trap.', customer_phone='9800000000',
+            created_at=now - timedelta(hours=i), confirmation_deadline=now + timedelta(hours=24),
+        )
+        if i % 2:
+            booking.payment = Payment(
+                id=i + 1, status='completed', payment_method='khalti', amount=Decimal('1450.00'), paid_at=now
+            )
+        bookings.append(booking)
+    return {
+        'count': count * 10, 'next': 'https://api.sajilofix.com/api/bookings/my-bookings/?page=2', 'previous': None,
+        'results': BookingListSerializer(bookings, many=True).data,
+    }
+
+
+def _provider_list(count):
+    return [
+        {
+            'id': i, 'first_name': 'Hari', 'last_name': f'Provider {i}', 'email': f'provider{i}@example.com',
+            'phone_number': '9800000000', 'profile_picture': f'https://cdn.example.com/avatars/{i}.jpg',
+            'bio': 'Licensed electrician with ten years of residential experience.',
+            'city': 'Lalitpur', 'district': 'Lalitpur', 'years_of_experience': 10,
+            'average_rating': 4.6, 'review_count': 37, 'specializations': ['Electrician', 'Plumbing'],
+            'service_count': 3, 'starting_price': Decimal('500.00'), 'starting_price_type': 'fixed',
+            'services_preview': [
+                {'title': title, 'specialization_name': 'Wiring', 'price': price, 'price_type': 'fixed'}
+                for title, price in (('Switch repair', Decimal('500.00')), ('Rewiring', Decimal('3500.00')))
+            ],
+            'price_range_min': Decimal('500.00'), 'price_range_max': Decimal('3500.00'),
+        }
+        for i in range(count)
+    ]
+
+
+def _earnings_stats():
+    return {
+        'total_earnings': Decimal('125000.00'), 'provider_earnings': Decimal('112500.00'),
+        'platform_fees': Decimal('12500.00'), 'completed_jobs': 80, 'avg_job_value': Decimal('1406.25'),
+        'pending_amount': Decimal('500.00'), 'pending_count': 1,
+        'payment_methods_breakdown': {
+            'khalti': {'count': 50, 'amount': Decimal('80000.00')},
+            'cash': {'count': 30, 'amount': Decimal('32500.00')},
+        },
+        'last_transaction': {
+            'transaction_uid': uuid.UUID('6f1c2d3e-4b5a-4c6d-8e7f-0a1b2c3d4e5f'),
+            'created_at': datetime(2025, 1, 15, 9, 30, 12, 345678, tzinfo=dt_timezone.utc),
+            'date': date(2025, 1, 15),
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark the orjson JSON renderer against DRF's stdlib renderer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500, help='Renders per payload and renderer (default 500).')
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stderr.write(self.style.WARNING("orjson is not installed; FastJSONRenderer falls back to the stdlib."))
+
+        payloads = {
+            'bookings (100)': _booking_page(100),
+            'providers (50)': _provider_list(50),
+            'earnings stats': _earnings_stats(),
+        }
+        iterations = options['iterations']
+        mismatches = 0
+        for label, payload in payloads.items():
+            timings = {}
+            outputs = {}
+            for name, renderer in (('stdlib', JSONRenderer()), ('orjson', renderers.FastJSONRenderer())):
+                outputs[name] = renderer.render(payload)
+                runs = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    renderer.render(payload)
+                    runs.append(time.perf_counter() - start)
+                timings[name] = statistics.median(runs)
+            size_kb = len(outputs['stdlib']) / 1024
+            self.stdout.write(
+                f"{label:>15} ({size_kb:6.1f} KB): stdlib {timings['stdlib'] * 1e6:8.1f} us | "
+                f"orjson {timings['orjson'] * 1e6:8.1f} us | "
+                f"{1 / timings['orjson']:9,.0f} renders/s | {timings['stdlib'] / timings['orjson']:5.1f}x"
+            )
+            if outputs['stdlib'] != outputs['orjson']:
+                mismatches += 1
+                self.stderr.write(self.style.ERROR(f"  output differs from JSONRenderer for {label}"))
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("FastJSONRenderer output matched JSONRenderer byte for byte."))
@@ -0,0 +1,123 @@
+"""
+Benchmark the booking list serializers: DRF BookingListSerializer against
+the compiled values()-based CompiledBookingListSerializer.
+
+Synthetic bookings (half of them paid) are created inside a transaction
+that is rolled back at the end, so the database is left unchanged. Each
+run serializes one page of --rows bookings the way MyBookingsView does,
+queries included, and the two outputs are checked to be identical.
+
+    python manage.py benchmark_list_serializers
+    python manage.py benchmark_list_serializers --rows 1000 --repeat 10
+"""
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from bookings.fast_serializers import CompiledBookingListSerializer
+from bookings.models import Booking, Payment, Service
+from bookings.serializers import BookingListSerializer
+from users.models import Speciality, Specialization, User
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark DRF vs compiled serialization of booking list pages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Bookings per page (default 1000).')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per serializer (default 5).')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                customer = self._seed(options['rows'])
+                self._benchmark(customer, options['rows'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, rows):
+        self.stdout.write(f"Creating {rows} bookings...")
+        customer = User.objects.create(
+            username='benchmark-customer', email='benchmark-customer@example.com',
+            user_type='find', first_name='Benchmark', last_name='Customer'
+        )
+        provider = User.objects.create(
+            username='benchmark-provider', email='benchmark-provider@example.com', user_type='offer'
+        )
+        speciality, _ = Speciality.objects.get_or_create(slug='benchmark', defaults={'name': 'Benchmark'})
+        service = Service.objects.create(
+            provider=provider,
+            specialization=Specialization.objects.create(speciality=speciality, name='Benchmark service'),
+            title='Benchmark service', description='Benchmark', base_price=1000, price_type='fixed'
+        )
+        now = timezone.now()
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                customer=customer, provider=provider, service=service,
+                status='completed' if i % 2 else 'pending',
+                preferred_date=(now + timedelta(days=i % 60)).date(), preferred_time='10:00',
+                confirmation_deadline=now + timedelta(hours=i % 48 - 24),
+                service_address='Baneshwor', service_city='Kathmandu', service_district='Kathmandu',
+                description='Benchmark booking', customer_phone='9800000000',
+                quoted_price=Decimal('1000.00'), final_price=Decimal('1000.00') if i % 2 else None,
+            )
+            for i in range(rows)
+        ])
+        Payment.objects.bulk_create([
+            Payment(
+                booking=booking, customer=customer, provider=provider, amount=Decimal('1000.00'),
+                platform_fee=Decimal('100.00'), provider_amount=Decimal('900.00'),
+                payment_method='khalti', status='completed', paid_at=now
+            )
+            for booking in bookings if booking.status == 'completed'
+        ])
+        return customer
+
+    def _benchmark(self, customer, rows, repeat):
+        # Same queryset as MyBookingsView
+        queryset = (
+            Booking.objects
+            .filter(customer=customer)
+            .select_related('service', 'service__specialization', 'service__specialization__speciality', 'provider', 'customer', 'payment')
+            .prefetch_related('booking_services__service', 'booking_services__service__specialization', 'booking_services__service__specialization__speciality')
+            .order_by('-created_at', '-id')
+        )
+
+        def drf():
+            return BookingListSerializer(queryset[:rows], many=True).data
+
+        def compiled():
+            serializer = CompiledBookingListSerializer()
+            return serializer.many(serializer.values(queryset)[:rows])
+
+        outputs = {}
+        results = {}
+        for label, run in (('DRF', drf), ('compiled', compiled)):
+            outputs[label] = JSONRenderer().render(run())
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+            results[label] = statistics.median(timings)
+            self.stdout.write(
+                f"{label:>9}: median {results[label] * 1000:8.1f} ms per {rows}-row page | "
+                f"{rows / results[label]:10,.0f} rows/s"
+            )
+
+        self.stdout.write(f"  speedup: {results['DRF'] / results['compiled']:.1f}x")
+        if outputs['DRF'] != outputs['compiled']:
+            self.stderr.write(self.style.ERROR("Mismatch: compiled output differs from BookingListSerializer."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Compiled output matched BookingListSerializer."))
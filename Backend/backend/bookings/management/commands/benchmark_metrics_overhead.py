@@ -0,0 +1,97 @@
+"""
+Benchmark the cost of backend.metrics: the same request served with and
+without MetricsMiddleware, the middleware alone around a view that does
+nothing, and the raw cost of one histogram observation and one counter
+increment.
+
+Requests go through the test client in-process, so the difference is the
+middleware's own work (timing, the execute_wrapper on each query, label
+lookups) without network noise. The default URL is served from the
+reference-data cache; pass a database-heavy one to see the per-query cost.
+Batches with and without the middleware alternate (in swapped order each
+round), and the medians are compared.
+
+    python manage.py benchmark_metrics_overhead
+    python manage.py benchmark_metrics_overhead --url /api/bookings/providers/ --requests 200
+"""
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import resolve
+
+from backend.metrics import Counter, Histogram, MetricsMiddleware
+
+MIDDLEWARE = 'backend.metrics.MetricsMiddleware'
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request overhead of the Prometheus metrics middleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/auth/specialities/', help='URL to request (GET).')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per batch (default 500).')
+        parser.add_argument('--rounds', type=int, default=5, help='Batches per configuration (default 5).')
+
+    def handle(self, *args, **options):
+        with_metrics = list(settings.MIDDLEWARE)
+        if MIDDLEWARE not in with_metrics:
+            with_metrics.insert(0, MIDDLEWARE)
+        without_metrics = [name for name in with_metrics if name != MIDDLEWARE]
+        hosts = list(settings.ALLOWED_HOSTS) + ['testserver']
+
+        timings = {'with': [], 'without': []}
+        configurations = [('without', without_metrics), ('with', with_metrics)]
+        for _ in range(options['rounds']):
+            for label, middleware in configurations:
+                with override_settings(MIDDLEWARE=middleware, METRICS_ENABLED=True, ALLOWED_HOSTS=hosts):
+                    timings[label].append(self._batch(options['url'], options['requests']))
+            # Swap the order each round so warm-up and drift hit both sides
+            configurations.reverse()
+
+        base = statistics.median(timings['without'])
+        instrumented = statistics.median(timings['with'])
+        self.stdout.write(f"GET {options['url']}, {options['requests']} requests x {options['rounds']} rounds")
+        self.stdout.write(f"  without metrics  {base * 1e6:8.1f} µs/request")
+        self.stdout.write(f"  with metrics     {instrumented * 1e6:8.1f} µs/request")
+        self.stdout.write(self.style.SUCCESS(
+            f"  overhead         {(instrumented - base) * 1e6:8.1f} µs/request "
+            f"({(instrumented - base) / base:+.1%})"
+        ))
+
+        n = 100_000
+        request = RequestFactory().get(options['url'])
+        request.resolver_match = resolve(options['url'])
+        response = HttpResponse()
+        with override_settings(METRICS_ENABLED=True):
+            middleware = MetricsMiddleware(lambda request: response)
+        start = time.perf_counter()
+        for i in range(n):
+            middleware(request)
+        alone = (time.perf_counter() - start) / n
+        self.stdout.write(f"  middleware alone {alone * 1e6:8.1f} µs/request")
+
+        histogram = Histogram('benchmark_seconds', 'Benchmark.', ('route', 'method'))
+        counter = Counter('benchmark_total', 'Benchmark.', ('route', 'method', 'status'))
+        start = time.perf_counter()
+        for i in range(n):
+            histogram.observe(0.042, 'booking-detail', 'GET')
+        observe = (time.perf_counter() - start) / n
+        start = time.perf_counter()
+        for i in range(n):
+            counter.inc('booking-detail', 'GET', 200)
+        inc = (time.perf_counter() - start) / n
+        self.stdout.write(f"  Histogram.observe {observe * 1e6:7.2f} µs, Counter.inc {inc * 1e6:.2f} µs")
+
+    def _batch(self, url, requests):
+        client = Client()
+        response = client.get(url)
+        if response.status_code >= 400:
+            raise CommandError(f"GET {url} returned {response.status_code}")
+        start = time.perf_counter()
+        for _ in range(requests):
+            client.get(url)
+        return (time.perf_counter() - start) / requests
@@ -0,0 +1,124 @@
+"""
+Benchmark nearby-provider search: geohash prefix index vs. full scan.
+
+By default this runs in memory over synthetic providers scattered across
+Nepal. A sorted list of geohash cells stands in for the B-tree index on
+User.geo_cell, so the numbers reflect the search strategy rather than the
+database.
+
+    python manage.py benchmark_nearby_providers
+    python manage.py benchmark_nearby_providers --providers 100000 --queries 500 --radius 10
+
+With --db, the real ProviderDiscoveryService query is timed against the
+configured database instead (seed it first, e.g. with generate_demo_data).
+"""
+
+import bisect
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from users import geo
+
+# Rough bounding box of Nepal
+LAT_RANGE = (26.35, 30.45)
+LNG_RANGE = (80.05, 88.20)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = "Benchmark geohash-indexed nearby provider search against a full scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--providers', type=int, default=100_000, help='Number of synthetic providers (default 100000).')
+        parser.add_argument('--queries', type=int, default=200, help='Number of searches to time (default 200).')
+        parser.add_argument('--radius', type=float, default=10.0, help='Search radius in km (default 10).')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed.')
+        parser.add_argument('--db', action='store_true', help='Time the real database query instead of the in-memory model.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        queries = [
+            (rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE))
+            for _ in range(options['queries'])
+        ]
+        radius = options['radius']
+
+        if options['db']:
+            self._benchmark_db(queries, radius)
+            return
+
+        count = options['providers']
+        self.stdout.write(f"Generating {count} providers...")
+        points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)) for _ in range(count)]
+        index = sorted((geo.encode(lat, lng), i) for i, (lat, lng) in enumerate(points))
+        keys = [cell for cell, _ in index]
+
+        def indexed_search(lat, lng):
+            matches = []
+            examined = 0
+            min_lat, max_lat, min_lng, max_lng = geo.bounding_box(lat, lng, radius)
+            for prefix in geo.covering_cells(lat, lng, radius):
+                lo = bisect.bisect_left(keys, prefix)
+                hi = bisect.bisect_left(keys, prefix + '~')
+                for _, i in index[lo:hi]:
+                    examined += 1
+                    plat, plng = points[i]
+                    if not (min_lat <= plat <= max_lat and min_lng <= plng <= max_lng):
+                        continue
+                    if geo.haversine_km(lat, lng, plat, plng) <= radius:
+                        matches.append(i)
+            return matches, examined
+
+        def full_scan(lat, lng):
+            return [
+                i for i, (plat, plng) in enumerate(points)
+                if geo.haversine_km(lat, lng, plat, plng) <= radius
+            ], len(points)
+
+        results = {}
+        for label, search in (('geohash index', indexed_search), ('full scan', full_scan)):
+            timings = []
+            examined_total = 0
+            found = []
+            for lat, lng in queries:
+                start = time.perf_counter()
+                matches, examined = search(lat, lng)
+                timings.append((time.perf_counter() - start) * 1000)
+                examined_total += examined
+                found.append(sorted(matches))
+            results[label] = found
+            self._report(label, timings, examined_total / len(queries))
+
+        if results['geohash index'] != results['full scan']:
+            self.stderr.write(self.style.ERROR("Mismatch: indexed search returned different providers than the full scan."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Indexed search matched the full scan for every query."))
+
+    def _benchmark_db(self, queries, radius):
+        from django.db import connection, reset_queries
+        from bookings.services import ProviderDiscoveryService
+
+        timings = []
+        found = 0
+        for lat, lng in queries:
+            start = time.perf_counter()
+            providers = ProviderDiscoveryService.find_nearby_providers(lat, lng, radius_km=radius)
+            timings.append((time.perf_counter() - start) * 1000)
+            found += len(providers)
+        self._report(f"db ({connection.vendor})", timings, found / len(queries), unit='results/query')
+        reset_queries()
+
+    def _report(self, label, timings, per_query, unit='rows examined/query'):
+        self.stdout.write(
+            f"{label:>14}: mean {statistics.mean(timings):8.3f} ms | "
+            f"p50 {_percentile(timings, 50):8.3f} ms | p95 {_percentile(timings, 95):8.3f} ms | "
+            f"{per_query:,.0f} {unit}"
+        )
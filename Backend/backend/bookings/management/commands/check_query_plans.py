@@ -0,0 +1,133 @@
+"""
+Query-plan regression check for the booking, payment and search querysets
+(bookings.plan_regressions.PLAN_QUERIES). PostgreSQL only: point
+DATABASE_URL at a local server.
+
+A synthetic marketplace (bookings.synthetic) is created inside a
+transaction that is rolled back at the end, the tables are ANALYZEd, and
+every query runs --repeat times under EXPLAIN (ANALYZE, BUFFERS); the
+median timings and the plan shape are kept.
+
+Record a baseline, make the change, then check against it:
+
+    python manage.py check_query_plans --record
+    python manage.py check_query_plans
+    python manage.py check_query_plans --providers 2000 --baseline /tmp/plans-2000.json --record
+
+The check exits with status 1 when a query regressed: a table that was
+read through an index is now seq-scanned, or execution time or shared
+buffers grew by more than --threshold. Compare at the scale the baseline
+was recorded at; plans depend on table sizes.
+"""
+import json
+import statistics
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from bookings.plan_regressions import PLAN_QUERIES, compare, sample_values, summarize_plan
+from bookings.synthetic import seed_marketplace
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'plan_baseline.json'
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Record or check the query plans of the booking, payment and search querysets."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--record', action='store_true', help='Write the baseline instead of checking against it.')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file.')
+        parser.add_argument('--providers', type=int, default=500, help='Synthetic providers (default 500).')
+        parser.add_argument('--customers', type=int, default=None, help='Synthetic customers (default 5 per provider).')
+        parser.add_argument('--bookings-per-provider', type=int, default=40, help='Bookings per provider (default 40).')
+        parser.add_argument('--repeat', type=int, default=5, help='EXPLAIN ANALYZE runs per query (default 5).')
+        parser.add_argument(
+            '--threshold', type=float, default=0.5,
+            help='Tolerated growth in execution time and buffers, as a fraction (default 0.5).'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("EXPLAIN (ANALYZE, BUFFERS) plans need PostgreSQL; set DATABASE_URL to a local server.")
+
+        scale = {
+            'providers': options['providers'], 'customers': options['customers'],
+            'bookings_per_provider': options['bookings_per_provider'],
+        }
+        baseline = None
+        if not options['record']:
+            baseline = self._read_baseline(options['baseline'], scale)
+
+        try:
+            with transaction.atomic():
+                counts = seed_marketplace(**scale, prefix='plan-check')
+                self.stdout.write('Seeded ' + ', '.join(f'{n} {model}' for model, n in counts.items()))
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                results = self._explain(sample_values(), options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if options['record']:
+            with open(options['baseline'], 'w') as f:
+                json.dump({'scale': scale, 'server_version': connection.pg_version, 'queries': results}, f, indent=2)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Recorded {len(results)} plans in {options['baseline']}"))
+            return
+
+        if self._report(baseline['queries'], results, options['threshold']):
+            raise SystemExit(1)
+
+    def _read_baseline(self, path, scale):
+        try:
+            with open(path) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f"No baseline at {path}; record one with --record.")
+        if baseline['scale'] != scale:
+            raise CommandError(f"The baseline was recorded at scale {baseline['scale']}; pass the same options.")
+        return baseline
+
+    def _explain(self, samples, repeat):
+        results = {}
+        for query in PLAN_QUERIES:
+            queryset = query.build(samples)
+            summaries = [
+                summarize_plan(queryset.explain(format='json', analyze=True, buffers=True))
+                for _ in range(repeat)
+            ]
+            summary = summaries[-1]
+            for key in ('execution_ms', 'planning_ms'):
+                summary[key] = round(statistics.median(s[key] for s in summaries), 3)
+            summary['source'] = query.source
+            results[query.name] = summary
+        return results
+
+    def _report(self, baseline, results, threshold):
+        """Print the comparison; returns the number of regressed queries."""
+        regressed = 0
+        for name, current in results.items():
+            if name not in baseline:
+                self.stdout.write(self.style.WARNING(f"NEW       {name}: no baseline, record one"))
+                continue
+            regressions, changes = compare(baseline[name], current, threshold)
+            if regressions:
+                regressed += 1
+                self.stdout.write(self.style.ERROR(f"REGRESSED {name} [{current['source']}]"))
+            else:
+                self.stdout.write(
+                    self.style.SUCCESS('OK       ') + f" {name}: {current['execution_ms']:.2f} ms "
+                    f"(baseline {baseline[name]['execution_ms']:.2f} ms)"
+                )
+            for line in regressions + changes:
+                self.stdout.write(f"    {line}")
+
+        if regressed:
+            self.stderr.write(self.style.ERROR(f"{regressed} queries regressed against the baseline."))
+        return regressed
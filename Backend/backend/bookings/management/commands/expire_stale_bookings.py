@@ -2,7 +2,8 @@
 Management command to expire stale bookings whose confirmation deadline has passed.
 
 This is the safety-net cron job that catches any pending bookings that were not
-lazy-expired by being accessed through the API views.
+lazy-expired by being accessed through the API views. Each expiry records a
+booking event; the expiry emails are sent by process_booking_events.
 
 Run this every 15-30 minutes via Windows Task Scheduler or cron:
     python manage.py expire_stale_bookings
@@ -20,11 +21,10 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 
 from bookings.models import Booking
-from bookings.emails import send_booking_expiry_notification
 
 
 class Command(BaseCommand):
-    help = "Expire pending bookings whose confirmation deadline has passed and notify both parties."
+    help = "Expire pending bookings whose confirmation deadline has passed (notifications go through the event worker)."
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -55,8 +55,6 @@ class Command(BaseCommand):
         self.stdout.write(f"Found {count} overdue pending booking(s).")
 
         expired_count = 0
-        email_success = 0
-        email_fail = 0
 
         for booking in overdue_bookings:
             if dry_run:
@@ -72,16 +70,9 @@ class Command(BaseCommand):
                 expired_count += 1
                 self.stdout.write(f"  ✅ Expired Booking #{booking.id}")
 
-                try:
-                    send_booking_expiry_notification(booking)
-                    email_success += 1
-                except Exception as e:
-                    email_fail += 1
-                    self.stderr.write(f"  ❌ Email failed for Booking #{booking.id}: {e}")
-
         if dry_run:
             self.stdout.write(self.style.WARNING(f"Dry run complete. {count} booking(s) would be expired."))
         else:
             self.stdout.write(self.style.SUCCESS(
-                f"Done. Expired: {expired_count}, Emails sent: {email_success}, Email failures: {email_fail}"
+                f"Done. Expired: {expired_count} (expiry emails queued for process_booking_events)"
             ))
@@ -0,0 +1,64 @@
+"""
+Fill the database with a realistic demo marketplace (bookings.synthetic):
+providers with weekly availability and services across the
+populate_specialities catalog, customers, bookings in every status,
+payments and reviews. Unlike the benchmarks, the data is committed.
+
+    python manage.py generate_demo_data
+    python manage.py generate_demo_data --providers 2000 --bookings-per-provider 100
+    python manage.py generate_demo_data --reset
+
+Accounts are named <prefix>-provider-<n> / <prefix>-customer-<n>
+(@example.com); --reset deletes the accounts of an earlier run with the
+same prefix, and everything attached to them, first. The load_test command
+signs in as these accounts.
+"""
+import io
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from bookings.models import Booking
+from bookings.synthetic import seed_marketplace
+from users import reference_data
+from users.models import Specialization, User
+
+
+class Command(BaseCommand):
+    help = "Generate a demo marketplace: providers, customers, services, bookings, payments and reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--providers', type=int, default=200, help='Providers (default 200).')
+        parser.add_argument('--customers', type=int, default=None, help='Customers (default 5 per provider).')
+        parser.add_argument('--bookings-per-provider', type=int, default=50, help='Bookings per provider (default 50).')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed (default 7).')
+        parser.add_argument('--prefix', default='demo', help="Username prefix (default 'demo').")
+        parser.add_argument('--reset', action='store_true', help='Delete the accounts of an earlier run first.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        existing = User.objects.filter(username__startswith=f'{prefix}-')
+        if existing.exists() and not options['reset']:
+            raise CommandError(f"Demo accounts with prefix '{prefix}' exist; pass --reset or another --prefix.")
+
+        call_command('populate_specialities', stdout=io.StringIO())
+        with transaction.atomic():
+            if options['reset']:
+                # Bookings protect their services, so they go first
+                deleted, _ = Booking.objects.filter(Q(customer__in=existing) | Q(provider__in=existing)).delete()
+                deleted += existing.delete()[0]
+                self.stdout.write(f"Deleted {deleted} rows from the previous run")
+            counts = seed_marketplace(
+                providers=options['providers'], customers=options['customers'],
+                bookings_per_provider=options['bookings_per_provider'], seed=options['seed'], prefix=prefix,
+                catalog=Specialization.objects.all(),
+            )
+        # bulk_create sends no signals, so the cached catalog/locations are rebuilt explicitly
+        reference_data.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(
+            'Created ' + ', '.join(f'{n} {model}' for model, n in counts.items())
+        ))
+        self.stdout.write(f"Sign in as {prefix}-customer-0@example.com or {prefix}-provider-0@example.com")
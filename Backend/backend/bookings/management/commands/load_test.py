@@ -0,0 +1,215 @@
+"""
+Load test of the API's main flows against a running server.
+
+Each virtual user repeatedly walks one customer journey, with the provider
+side played by the provider of the chosen service:
+
+    browse   specialities, services, providers
+    search   services ?q=, providers ?city=, provider detail
+    slots    available-slots, booked-slots
+    book     bookings/create/
+    accept   accept, start, complete (provider)
+    pay      payments/initiate/ (cash, customer), payments/cash/confirm/ (provider)
+    history  my-bookings, provider-bookings
+
+Accounts come from generate_demo_data and are authenticated with HS256
+tokens signed locally with SUPABASE_JWT_SECRET, which the server must share
+(no Supabase round trip). The server must also use the same database.
+
+    python manage.py generate_demo_data
+    gunicorn backend.wsgi -w 4 &
+    python manage.py load_test --base-url http://localhost:8000 --users 20 --duration 60
+
+The report lists, per endpoint, requests, errors, throughput and
+p50/p95/p99 latency. A booking flow that hits an expected refusal (slot
+taken, open booking with the same provider) stops there and starts over.
+"""
+import asyncio
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import httpx
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bookings.synthetic import supabase_uid
+from users.models import User
+
+SEARCH_TERMS = ['plumber', 'electrician', 'carpenter', 'painting', 'cleaning', 'repair']
+CITIES = ['Kathmandu', 'Lalitpur', 'Bhaktapur', 'Pokhara']
+
+
+def _token(user):
+    now = int(time.time())
+    payload = {
+        'sub': user.supabase_uid or supabase_uid(user.email), 'email': user.email,
+        'aud': 'authenticated', 'role': 'authenticated', 'iat': now, 'exp': now + 6 * 60 * 60,
+    }
+    return jwt.encode(payload, settings.SUPABASE_JWT_SECRET, algorithm='HS256')
+
+
+def _percentile(ordered, q):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _items(data):
+    return data.get('results', []) if isinstance(data, dict) else data
+
+
+class _Refused(Exception):
+    """The server turned the flow down (4xx); start the next iteration."""
+
+
+class LoadTest:
+    def __init__(self, client, customers, providers, seed):
+        self.client = client
+        self.customers = customers
+        self.providers = providers
+        self.rng = random.Random(seed)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.flows = 0
+
+    async def call(self, method, label, url, user=None, expect=(200, 201), **kwargs):
+        headers = {'Authorization': f'Bearer {user.token}'} if user is not None else {}
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.errors[f'{method} {label}'] += 1
+            raise _Refused
+        self.latencies[f'{method} {label}'].append((time.perf_counter() - start) * 1000)
+        if response.status_code not in expect:
+            self.errors[f'{method} {label}'] += 1
+            raise _Refused
+        return response.json() if response.content else None
+
+    async def flow(self):
+        customer = self.rng.choice(self.customers)
+        await self.call('GET', '/api/auth/specialities/', '/api/auth/specialities/')
+        await self.call('GET', '/api/bookings/services/', '/api/bookings/services/')
+        await self.call('GET', '/api/bookings/providers/', '/api/bookings/providers/')
+
+        services = _items(await self.call(
+            'GET', '/api/bookings/services/?q=', '/api/bookings/services/',
+            params={'q': self.rng.choice(SEARCH_TERMS)},
+        ))
+        await self.call(
+            'GET', '/api/bookings/providers/?city=', '/api/bookings/providers/', params={'city': self.rng.choice(CITIES)}
+        )
+        services = [service for service in services if service['provider'] in self.providers]
+        if not services:
+            return
+        service = self.rng.choice(services)
+        provider = self.providers[service['provider']]
+        await self.call('GET', '/api/bookings/providers/<id>/', f'/api/bookings/providers/{provider.pk}/')
+
+        date = (timezone.localdate() + timedelta(days=self.rng.randint(1, 4))).isoformat()
+        slots = await self.call(
+            'GET', '/api/bookings/available-slots/', '/api/bookings/available-slots/', customer,
+            params={'provider_id': provider.pk, 'date': date},
+        )
+        await self.call(
+            'GET', '/api/bookings/providers/<id>/booked-slots/', f'/api/bookings/providers/{provider.pk}/booked-slots/',
+            params={'date': date},
+        )
+        available = [slot['time'] for slot in slots.get('available_slots', [])]
+        if not available:
+            return
+
+        booking = await self.call(
+            'POST', '/api/bookings/bookings/create/', '/api/bookings/bookings/create/', customer, json={
+                'service': service['id'], 'preferred_date': date, 'preferred_time': self.rng.choice(available),
+                'service_address': 'Load test address', 'service_city': provider.city or 'Kathmandu',
+                'description': 'Load test booking', 'customer_phone': '9800000000',
+            },
+        )
+        path = f"/api/bookings/bookings/{booking['id']}"
+        await self.call('POST', '/api/bookings/bookings/<id>/accept/', f'{path}/accept/', provider)
+        await self.call('POST', '/api/bookings/bookings/<id>/start/', f'{path}/start/', provider)
+        await self.call(
+            'POST', '/api/bookings/bookings/<id>/complete/', f'{path}/complete/', provider,
+            json={'completion_note': 'Done', 'final_price': service['base_price']},
+        )
+        await self.call(
+            'POST', '/api/payments/initiate/', '/api/payments/initiate/', customer,
+            json={'booking_id': booking['id'], 'payment_method': 'cash'},
+        )
+        await self.call(
+            'POST', '/api/payments/cash/confirm/', '/api/payments/cash/confirm/', provider,
+            json={'booking_id': booking['id']},
+        )
+        await self.call('GET', '/api/bookings/my-bookings/', '/api/bookings/my-bookings/', customer)
+        await self.call('GET', '/api/bookings/provider-bookings/', '/api/bookings/provider-bookings/', provider)
+        self.flows += 1
+
+    async def virtual_user(self, deadline):
+        while time.monotonic() < deadline:
+            try:
+                await self.flow()
+            except _Refused:
+                pass
+
+
+class Command(BaseCommand):
+    help = "Load test the browse, search, booking and payment flows against a running server."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000', help='Server to test.')
+        parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users (default 10).')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds to run (default 60).')
+        parser.add_argument('--prefix', default='demo', help="generate_demo_data prefix (default 'demo').")
+        parser.add_argument('--seed', type=int, default=1, help='Random seed (default 1).')
+
+    def handle(self, *args, **options):
+        if not settings.SUPABASE_JWT_SECRET:
+            raise CommandError("SUPABASE_JWT_SECRET is needed to sign test tokens.")
+
+        prefix = options['prefix']
+        customers = list(User.objects.filter(username__startswith=f'{prefix}-customer-'))
+        providers = {user.pk: user for user in User.objects.filter(username__startswith=f'{prefix}-provider-')}
+        if not customers or not providers:
+            raise CommandError(f"No '{prefix}' accounts; run generate_demo_data first.")
+        for user in customers + list(providers.values()):
+            user.token = _token(user)
+
+        self.stdout.write(
+            f"{options['users']} users for {options['duration']:.0f}s against {options['base_url']} "
+            f"({len(customers)} customers, {len(providers)} providers)"
+        )
+        test, elapsed = asyncio.run(self._run(options, customers, providers))
+        self._report(test, elapsed)
+
+    async def _run(self, options, customers, providers):
+        limits = httpx.Limits(max_connections=options['users'])
+        async with httpx.AsyncClient(base_url=options['base_url'], timeout=30, limits=limits) as client:
+            test = LoadTest(client, customers, providers, options['seed'])
+            start = time.monotonic()
+            deadline = start + options['duration']
+            await asyncio.gather(*(test.virtual_user(deadline) for _ in range(options['users'])))
+            return test, time.monotonic() - start
+
+    def _report(self, test, elapsed):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n{'endpoint':<52} {'requests':>8} {'errors':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8}"
+        ))
+        total = 0
+        for endpoint in sorted(set(test.latencies) | set(test.errors)):
+            ordered = sorted(test.latencies[endpoint])
+            total += len(ordered)
+            percentiles = (
+                ''.join(f' {_percentile(ordered, q):>6.1f}ms' for q in (50, 95, 99)) if ordered else ''
+            )
+            self.stdout.write(
+                f"{endpoint:<52} {len(ordered):>8} {test.errors[endpoint]:>6} {len(ordered) / elapsed:>7.1f}{percentiles}"
+            )
+        self.stdout.write(
+            f"\n{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s), "
+            f"{sum(test.errors.values())} errors, {test.flows} complete booking flows"
+        )
@@ -0,0 +1,98 @@
+"""
+Management command that runs the booking event consumers.
+
+Booking creations and status transitions append rows to BookingEvent; this
+worker fans them out to the consumers in bookings.events.CONSUMERS
+(payments, notifications, dashboard_stats), each tracking its own offset.
+
+This worker must run wherever the web process runs: the web process only
+records events, so without it no booking emails are sent (new, accepted and
+expired bookings), payments are not released on completion or held on
+dispute, and dashboard stats are only refreshed when their cache expires.
+Events wait in the log, so starting the worker late catches up.
+
+Run it continuously next to the web process:
+    python manage.py process_booking_events --loop
+
+or from cron / Task Scheduler every minute:
+    python manage.py process_booking_events
+
+Setup (Windows Task Scheduler):
+    1. Open Task Scheduler → Create Basic Task
+    2. Trigger: At startup (for --loop), or daily repeating every minute
+    3. Action: Start a program
+       Program: python (or path to your venv python)
+       Arguments: manage.py process_booking_events --loop
+       Start in: E:\\SajiloFix\\Backend\\backend
+
+Check that it keeps up (offsets should follow the newest event id):
+    python manage.py process_booking_events --status
+
+Replay one consumer from an event id (e.g. after fixing an email outage):
+    python manage.py process_booking_events --consumer notifications --replay-from 1200
+
+--replay-from can also skip forward past an event a consumer keeps failing on.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.events import CONSUMERS, process_events, reset_offset
+from bookings.models import BookingEventConsumer
+
+
+class Command(BaseCommand):
+    help = "Process booking events for payments, notifications and dashboard stats."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--consumer',
+            action='append',
+            choices=sorted(CONSUMERS),
+            help='Only run this consumer (can be repeated). Default: all.',
+        )
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new events.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls when idle (default 2).')
+        parser.add_argument('--batch-size', type=int, default=100, help='Events per consumer per pass (default 100).')
+        parser.add_argument(
+            '--replay-from',
+            type=int,
+            metavar='EVENT_ID',
+            help='Reset the selected consumers so they (re)process events starting at EVENT_ID.',
+        )
+        parser.add_argument('--status', action='store_true', help='Show consumer offsets and exit.')
+
+    def handle(self, *args, **options):
+        consumers = options['consumer'] or sorted(CONSUMERS)
+
+        if options['status']:
+            offsets = dict(BookingEventConsumer.objects.values_list('name', 'last_event_id'))
+            for name in consumers:
+                self.stdout.write(f"{name}: last_event_id={offsets.get(name, 0)}")
+            return
+
+        if options['replay_from'] is not None:
+            if options['replay_from'] < 1:
+                raise CommandError('--replay-from must be a positive event id')
+            for name in consumers:
+                reset_offset(name, options['replay_from'] - 1)
+                self.stdout.write(f"{name}: replaying from event {options['replay_from']}")
+
+        try:
+            while True:
+                processed = self._run_once(consumers, options['batch_size'])
+                if not options['loop']:
+                    break
+                if not processed:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+
+    def _run_once(self, consumers, batch_size):
+        total = 0
+        for name in consumers:
+            count = process_events(name, batch_size=batch_size)
+            if count:
+                self.stdout.write(f"{name}: processed {count} event(s)")
+            total += count
+        return total
@@ -0,0 +1,68 @@
+"""
+Management command that creates resized variants of booking images.
+
+New BookingImage rows start with variants_status='pending'; this worker
+renders their thumb/medium/full variants (AVIF, WebP, JPEG, EXIF stripped)
+in a process pool and records them on the row. See bookings.images.
+
+Run it continuously next to the web process:
+    python manage.py process_booking_images --loop
+
+or from cron / Task Scheduler every minute:
+    python manage.py process_booking_images
+
+Retry images that failed (e.g. after a storage outage):
+    python manage.py process_booking_images --retry-failed
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from bookings.images import process_images
+from bookings.models import BookingImage
+
+
+class Command(BaseCommand):
+    help = "Create resized AVIF/WebP/JPEG variants of booking images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new images.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls when idle (default 5).')
+        parser.add_argument('--batch-size', type=int, default=8, help='Images per pass (default 8).')
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes for rendering (default: CPU count; 1 renders in this process).',
+        )
+        parser.add_argument('--retry-failed', action='store_true', help='Mark failed images pending again first.')
+        parser.add_argument('--booking', type=int, help='Only process images of this booking.')
+
+    def handle(self, *args, **options):
+        queryset = BookingImage.objects.all()
+        if options['booking']:
+            queryset = queryset.filter(booking_id=options['booking'])
+
+        if options['retry_failed']:
+            count = queryset.filter(variants_status='failed').update(variants_status='pending', variants={})
+            self.stdout.write(f"Retrying {count} failed image(s)")
+
+        pending = queryset.filter(variants_status='pending').order_by('id')
+        executor = ProcessPoolExecutor(options['processes']) if options['processes'] > 1 else None
+        try:
+            while True:
+                batch = list(pending[:options['batch_size']])
+                if batch:
+                    processed, failed = process_images(batch, executor=executor)
+                    self.stdout.write(f"Processed {processed} image(s), {failed} failed")
+                elif not options['loop']:
+                    break
+                else:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+        finally:
+            if executor is not None:
+                executor.shutdown()
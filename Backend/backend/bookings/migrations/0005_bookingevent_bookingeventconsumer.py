@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:40
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_confirmation_deadline_booking_expired_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingEventConsumer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0, help_text='Id of the last event this consumer has processed')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Booking Event Consumer',
+                'verbose_name_plural': 'Booking Event Consumers',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(help_text="'created' or the name of the transition (accept, complete, ...)", max_length=30)),
+                ('to_status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('scheduled', 'Scheduled'), ('in_progress', 'In Progress'), ('provider_completed', 'Provider Completed'), ('completed', 'Completed'), ('disputed', 'Disputed'), ('cancelled', 'Cancelled'), ('declined', 'Declined'), ('expired', 'Expired')], help_text='Booking status after the event', max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Fields changed by the event and other event data')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('actor', models.ForeignKey(blank=True, help_text='User who triggered the event (empty for system events)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='booking_events', to=settings.AUTH_USER_MODEL)),
+                ('booking', models.ForeignKey(help_text='Booking the event belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='events', to='bookings.booking')),
+            ],
+            options={
+                'verbose_name': 'Booking Event',
+                'verbose_name_plural': 'Booking Events',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['booking', 'id'], name='bookings_bo_booking_fa888e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_bookingevent_bookingeventconsumer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Storage names of the resized variants by size and format'),
+        ),
+        migrations.AddField(
+            model_name='bookingimage',
+            name='variants_processed_at',
+            field=models.DateTimeField(blank=True, help_text='When the variants were created', null=True),
+        ),
+        migrations.AddField(
+            model_name='bookingimage',
+            name='variants_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='pending', help_text='Whether the resized variants have been created', max_length=10),
+        ),
+    ]
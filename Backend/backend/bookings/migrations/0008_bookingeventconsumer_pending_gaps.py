@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingeventconsumer',
+            name='pending_gaps',
+            field=models.JSONField(blank=True, default=list, help_text='Ids below last_event_id not seen yet (transactions still in flight): [{id, xmax}], see bookings.events'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
 from users.models import Specialization
 from datetime import datetime, timedelta
@@ -16,6 +17,14 @@ MAX_AFTER_IMAGES = 3
 MAX_DURING_IMAGES = 5
 MAX_IMAGE_SIZE_MB = 5
 
+# Maximum images per booking, by image type
+IMAGE_TYPE_LIMITS = {
+    'before': MAX_BEFORE_IMAGES,
+    'after': MAX_AFTER_IMAGES,
+    'during': MAX_DURING_IMAGES,
+    'approval_photos': 5,  # Allow up to 5 customer approval photos
+}
+
 
 def booking_image_path(instance, filename):
     """Generate file path for booking images"""
@@ -27,6 +36,11 @@ def booking_image_path(instance, filename):
     return os.path.join('bookings', f'booking_{booking_id}', filename)
 
 
+def booking_image_prefix(booking_id, image_type):
+    """Storage name prefix for directly uploaded booking images (see users.uploads)"""
+    return f'bookings/booking_{booking_id}/{image_type}'
+
+
 class Service(models.Model):
     """
     Service Model - Represents services offered by service providers
@@ -198,6 +212,9 @@ class Booking(models.Model):
     EMERGENCY_RESPONSE_HOURS = 2       # Tighter deadline for emergency services
     MIN_HOURS_BEFORE_SERVICE = 2       # Must respond at least 2h before service time
     MAX_ADVANCE_BOOKING_DAYS = 5       # Customers can book at most 5 days in advance
+    MAX_BATCH_BOOKINGS = 8             # Most bookings a single batch/recurring request may create
+
+    CANCELLABLE_STATUSES = ('pending', 'confirmed', 'scheduled')
     
     # Core relationships
     customer = models.ForeignKey(
@@ -417,6 +434,22 @@ class Booking(models.Model):
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['customer', '-created_at']),
             models.Index(fields=['provider', '-created_at']),
+            # Hot queries, see bookings.query_catalog (checked by advise_indexes).
+            # Expiry: only pending bookings have a live deadline
+            models.Index(
+                fields=['confirmation_deadline'], condition=models.Q(status='pending'),
+                name='booking_pending_deadline_idx',
+            ),
+            # Booked slots for a provider's day
+            models.Index(fields=['provider', 'preferred_date', 'status'], name='booking_prov_pref_date_idx'),
+            # Schedule conflicts; covers the slot lookups, which only read
+            # scheduled_date and scheduled_time
+            models.Index(
+                fields=['provider', 'scheduled_date', 'scheduled_time', 'status'],
+                name='booking_prov_sched_date_idx',
+            ),
+            # Open bookings between a customer and a provider
+            models.Index(fields=['customer', 'provider', 'status'], name='booking_cust_prov_status_idx'),
         ]
     
     def __str__(self):
@@ -424,7 +457,7 @@ class Booking(models.Model):
     
     def is_cancellable(self):
         """Check if booking can be cancelled"""
-        return self.status in ['pending', 'confirmed', 'scheduled']
+        return self.status in self.CANCELLABLE_STATUSES
     
     def is_editable(self):
         """Check if booking can be edited"""
@@ -501,10 +534,12 @@ class Booking(models.Model):
         if timezone.now() < self.confirmation_deadline:
             return False
 
-        self.status = 'expired'
-        self.expired_at = timezone.now()
-        self.cancellation_reason = 'Auto-expired: provider did not respond before the deadline.'
-        self.save(update_fields=['status', 'expired_at', 'cancellation_reason', 'updated_at'])
+        from .transitions import BookingTransitionService, TransitionError
+        try:
+            BookingTransitionService.apply(self, 'expire')
+        except (TransitionError, Booking.DoesNotExist):
+            # Accepted/declined concurrently, or no longer overdue
+            return False
         return True
 
 
@@ -643,6 +678,35 @@ class BookingImage(models.Model):
         help_text="When the image was uploaded"
     )
     
+    # Resized/re-encoded copies, created by the process_booking_images worker
+    # (see bookings.images). Shape when ready:
+    #   {'thumb': {'width': 320, 'height': 240, 'avif': name, 'webp': name, 'jpeg': name}, 'medium': ..., 'full': ...}
+    VARIANTS_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
+    variants = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Storage names of the resized variants by size and format"
+    )
+    
+    variants_status = models.CharField(
+        max_length=10,
+        choices=VARIANTS_STATUS_CHOICES,
+        default='pending',
+        db_index=True,
+        help_text="Whether the resized variants have been created"
+    )
+    
+    variants_processed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the variants were created"
+    )
+    
     class Meta:
         ordering = ['image_type', 'uploaded_at']
         verbose_name = 'Booking Image'
@@ -675,14 +739,7 @@ class BookingImage(models.Model):
                 image_type=self.image_type
             ).exclude(pk=self.pk).count()
             
-            limits = {
-                'before': MAX_BEFORE_IMAGES,
-                'after': MAX_AFTER_IMAGES,
-                'during': MAX_DURING_IMAGES,
-                'approval_photos': 5,  # Allow up to 5 customer approval photos
-            }
-            
-            max_allowed = limits.get(self.image_type, 5)
+            max_allowed = IMAGE_TYPE_LIMITS.get(self.image_type, 5)
             
             if existing_count >= max_allowed:
                 raise ValidationError(
@@ -1049,3 +1106,93 @@ class ProviderAvailability(models.Model):
     
     def __str__(self):
         return f"Availability for {self.provider.full_name}"
+
+
+class BookingEvent(models.Model):
+    """
+    BookingEvent Model - Append-only log of booking lifecycle events
+
+    One row is written in the same transaction as every booking creation and
+    status transition (see bookings.events). Side effects such as payment
+    release/hold, emails and dashboard cache invalidation are run from this
+    log by the process_booking_events worker, not inside the request.
+
+    The auto-increment id is the log offset consumers track their progress by.
+    """
+
+    booking = models.ForeignKey(
+        Booking,
+        on_delete=models.CASCADE,
+        related_name='events',
+        help_text="Booking the event belongs to"
+    )
+
+    event_type = models.CharField(
+        max_length=30,
+        help_text="'created' or the name of the transition (accept, complete, ...)"
+    )
+
+    to_status = models.CharField(
+        max_length=20,
+        choices=Booking.STATUS_CHOICES,
+        help_text="Booking status after the event"
+    )
+
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='booking_events',
+        help_text="User who triggered the event (empty for system events)"
+    )
+
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+        help_text="Fields changed by the event and other event data"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Booking Event'
+        verbose_name_plural = 'Booking Events'
+        indexes = [
+            models.Index(fields=['booking', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Event #{self.id} {self.event_type} for Booking #{self.booking_id}"
+
+
+class BookingEventConsumer(models.Model):
+    """
+    Tracks how far each BookingEvent consumer has read the event log.
+    Resetting last_event_id replays events from that offset.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+
+    last_event_id = models.BigIntegerField(
+        default=0,
+        help_text="Id of the last event this consumer has processed"
+    )
+
+    pending_gaps = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Ids below last_event_id not seen yet (transactions still in flight): "
+                  "[{id, xmax}], see bookings.events"
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Booking Event Consumer'
+        verbose_name_plural = 'Booking Event Consumers'
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_event_id}"
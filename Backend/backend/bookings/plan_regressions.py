@@ -0,0 +1,170 @@
+"""
+Query-plan regression checks for the booking, payment and search endpoints.
+
+PLAN_QUERIES lists the querysets to watch. Most are built by the view
+itself (get_queryset(), filter_queryset(), the compiled serializer's
+values() and the first page), for a request with the given query
+parameters, so a change to a view's get_queryset shows up here without
+editing this module. The booking queries from bookings.query_catalog are
+included as well.
+
+The check_query_plans command runs each one with
+EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) on PostgreSQL and summarizes it
+with summarize_plan(). `--record` saves the summaries as the baseline.
+Without it, the command compares the new summaries with the baseline
+(compare()) and fails on:
+
+- a table that was read through an index and is now read by a Seq Scan;
+- execution time or shared buffers grown by more than the threshold.
+
+Plans that changed shape without getting slower are reported but pass.
+"""
+import json
+from collections import namedtuple
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from admin_panel.views import AdminBookingsViewSet
+from payments.views import ProviderEarningsHistoryView
+from users.models import User
+from .models import Service
+from .query_catalog import CANONICAL_QUERIES, sample_values as booking_sample_values
+from .views import ProviderListView, ServicePublicListView
+
+PlanQuery = namedtuple('PlanQuery', 'name source build')
+
+# Differences below these are noise whatever the threshold
+MIN_SLOWDOWN_MS = 1.0
+MIN_EXTRA_BUFFERS = 100
+
+
+def view_queryset(view_class, user=None, params=None, action='list'):
+    """The queryset `view_class` lists for a GET with `params`, limited to its first page."""
+    request = APIRequestFactory().get('/', params or {})
+    if user is not None:
+        force_authenticate(request, user)
+    view = view_class()
+    # Read by viewsets' initialize_request() to set view.action
+    view.action_map = {'get': action}
+    view.args, view.kwargs, view.format_kwarg = (), {}, None
+    view.request = view.initialize_request(request)
+
+    queryset = view.filter_queryset(view.get_queryset())
+    compiled_class = getattr(view, 'compiled_serializer_class', None)
+    if compiled_class is not None:
+        queryset = compiled_class(context=view.get_serializer_context()).values(queryset)
+    if view.paginator is not None:
+        queryset = queryset[:view.paginator.get_page_size(view.request)]
+    return queryset
+
+
+PLAN_QUERIES = [
+    PlanQuery('provider-list', 'ProviderListView', lambda s: view_queryset(ProviderListView)),
+    PlanQuery(
+        'provider-list-city', 'ProviderListView',
+        lambda s: view_queryset(ProviderListView, params={'city': s['city']}),
+    ),
+    PlanQuery(
+        'provider-search', 'ProviderListView',
+        lambda s: view_queryset(ProviderListView, params={'q': 'plumber'}),
+    ),
+    PlanQuery('service-list', 'ServicePublicListView', lambda s: view_queryset(ServicePublicListView)),
+    PlanQuery(
+        'service-list-filtered', 'ServicePublicListView',
+        lambda s: view_queryset(
+            ServicePublicListView, params={'specialization': s['specialization'], 'city': s['city']}
+        ),
+    ),
+    PlanQuery(
+        'service-search', 'ServicePublicListView',
+        lambda s: view_queryset(ServicePublicListView, params={'q': 'plumber'}),
+    ),
+    PlanQuery('admin-bookings', 'AdminBookingsViewSet', lambda s: view_queryset(AdminBookingsViewSet)),
+    PlanQuery(
+        'admin-bookings-status', 'AdminBookingsViewSet',
+        lambda s: view_queryset(AdminBookingsViewSet, params={'status': 'pending'}),
+    ),
+    PlanQuery(
+        'admin-bookings-search', 'AdminBookingsViewSet',
+        lambda s: view_queryset(AdminBookingsViewSet, params={'search': s['search']}),
+    ),
+    PlanQuery(
+        'earnings-history', 'ProviderEarningsHistoryView',
+        lambda s: view_queryset(ProviderEarningsHistoryView, user=s['provider_user']),
+    ),
+    PlanQuery(
+        'earnings-history-month', 'ProviderEarningsHistoryView',
+        lambda s: view_queryset(
+            ProviderEarningsHistoryView, user=s['provider_user'], params={'period': 'this_month', 'status': 'completed'}
+        ),
+    ),
+] + [PlanQuery(query.name, query.source, query.build) for query in CANONICAL_QUERIES]
+
+
+def sample_values():
+    """Parameters for PLAN_QUERIES: query_catalog's sample values plus a city, specialization and search term."""
+    samples = booking_sample_values()
+    provider = User.objects.filter(pk=samples['provider']).first()
+    samples['provider_user'] = provider
+    samples['city'] = (provider.city if provider else None) or 'Kathmandu'
+    samples['search'] = provider.email.split('@')[0] if provider else 'provider'
+    samples['specialization'] = (
+        Service.objects.filter(provider=provider).values_list('specialization', flat=True).first() or 0
+    )
+    return samples
+
+
+def summarize_plan(explain_output):
+    """
+    Summary of an EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) result: the plan's
+    nodes in order ("Index Scan using x on t"), the tables read by a Seq
+    Scan, and its timings and shared buffers.
+    """
+    result = json.loads(explain_output) if isinstance(explain_output, str) else explain_output
+    if isinstance(result, list):
+        result = result[0]
+    root = result['Plan']
+
+    shape, seq_scans = [], set()
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        description = node['Node Type']
+        if 'Index Name' in node:
+            description += f" using {node['Index Name']}"
+        if 'Relation Name' in node:
+            description += f" on {node['Relation Name']}"
+            if node['Node Type'] == 'Seq Scan':
+                seq_scans.add(node['Relation Name'])
+        shape.append(description)
+        nodes.extend(reversed(node.get('Plans', [])))
+
+    return {
+        'shape': shape,
+        'seq_scans': sorted(seq_scans),
+        'execution_ms': round(result.get('Execution Time', 0.0), 3),
+        'planning_ms': round(result.get('Planning Time', 0.0), 3),
+        'shared_buffers': root.get('Shared Hit Blocks', 0) + root.get('Shared Read Blocks', 0),
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    ([regressions], [changes]) between two summaries of the same query;
+    `threshold` is the tolerated growth as a fraction (0.5 = 50%).
+    """
+    regressions, changes = [], []
+    for table in sorted(set(current['seq_scans']) - set(baseline['seq_scans'])):
+        regressions.append(f"{table} is now read by a Seq Scan")
+
+    slower = current['execution_ms'] - baseline['execution_ms']
+    if slower > MIN_SLOWDOWN_MS and current['execution_ms'] > baseline['execution_ms'] * (1 + threshold):
+        regressions.append(f"execution {baseline['execution_ms']:.2f} ms -> {current['execution_ms']:.2f} ms")
+
+    extra = current['shared_buffers'] - baseline['shared_buffers']
+    if extra > MIN_EXTRA_BUFFERS and current['shared_buffers'] > baseline['shared_buffers'] * (1 + threshold):
+        regressions.append(f"shared buffers {baseline['shared_buffers']} -> {current['shared_buffers']}")
+
+    if current['shape'] != baseline['shape']:
+        changes.append('plan changed: ' + ' > '.join(current['shape']))
+    return regressions, changes
@@ -0,0 +1,103 @@
+"""
+Canonical booking queries and the indexes they are meant to use.
+
+Each entry mirrors a hot query in the views, services or workers, with the
+index from Booking.Meta.indexes that serves it. The advise_indexes command
+EXPLAINs every entry against the configured database and reports the ones
+that fall back to a full table scan; benchmark_booking_indexes times them
+with and without the indexes. When adding a query on a hot path, add it
+here too.
+
+Plans are read for PostgreSQL (production) and SQLite (development):
+
+    Seq Scan on bookings_booking                  full scan
+    Index Scan using booking_pending_deadline_idx index
+    SCAN bookings_booking                         full scan (SQLite)
+    SEARCH bookings_booking USING INDEX ...       index (SQLite)
+"""
+import re
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Booking
+
+CanonicalQuery = namedtuple('CanonicalQuery', 'name source index build')
+
+ACTIVE_STATUSES = ['confirmed', 'scheduled', 'in_progress']
+
+
+def sample_values():
+    """Parameters for the catalog: the busiest customer/provider pair and today."""
+    pair = (
+        Booking.objects.values('customer', 'provider')
+        .annotate(n=Count('id')).order_by('-n')
+        .values_list('customer', 'provider').first()
+    )
+    customer, provider = pair or (0, 0)
+    return {'customer': customer, 'provider': provider, 'now': timezone.now(), 'date': timezone.localdate()}
+
+
+CANONICAL_QUERIES = [
+    CanonicalQuery(
+        'expire-overdue', 'expire_stale_bookings, _lazy_expire_overdue_bookings',
+        'booking_pending_deadline_idx',
+        lambda s: Booking.objects.filter(status='pending', confirmation_deadline__lte=s['now']),
+    ),
+    CanonicalQuery(
+        'booked-slots', 'ProviderBookedSlotsView',
+        'booking_prov_pref_date_idx',
+        lambda s: Booking.objects.filter(provider=s['provider'], preferred_date=s['date'], status__in=ACTIVE_STATUSES),
+    ),
+    CanonicalQuery(
+        'slot-conflict', 'BookingConflictService.check_time_slot_conflict',
+        'booking_prov_sched_date_idx',
+        lambda s: Booking.objects.filter(
+            provider=s['provider'], scheduled_date=s['date'], scheduled_time='10:00', status__in=ACTIVE_STATUSES
+        ),
+    ),
+    CanonicalQuery(
+        'alternative-dates', 'BookingConflictService.get_alternative_dates',
+        'booking_prov_sched_date_idx',
+        lambda s: Booking.objects.filter(
+            provider=s['provider'], scheduled_date__range=(s['date'], s['date'] + timedelta(days=7)),
+            scheduled_time__isnull=False, status__in=ACTIVE_STATUSES,
+        ).values_list('scheduled_date', 'scheduled_time'),
+    ),
+    CanonicalQuery(
+        'customer-pending', 'BookingConflictService.check_customer_pending_bookings',
+        'booking_cust_prov_status_idx',
+        lambda s: Booking.objects.filter(
+            customer=s['customer'], provider=s['provider'], status__in=['pending', 'confirmed', 'scheduled']
+        ).order_by('-created_at'),
+    ),
+    CanonicalQuery(
+        'my-bookings', 'MyBookingsView',
+        None,
+        lambda s: Booking.objects.filter(customer=s['customer']).order_by('-created_at')[:20],
+    ),
+    CanonicalQuery(
+        'provider-bookings', 'ProviderBookingsView',
+        None,
+        lambda s: Booking.objects.filter(provider=s['provider']).order_by('-created_at')[:20],
+    ),
+]
+
+_FULL_SCAN = {
+    'postgresql': r'Seq Scan on "?{table}"?',
+    'sqlite': r'\bSCAN "?{table}"?(?! USING)',
+}
+_INDEX = {
+    'postgresql': r'(?:Index Scan|Index Only Scan|Bitmap Index Scan)(?: Backward)? (?:using|on) "?(\w+)"?',
+    'sqlite': r'USING (?:COVERING )?INDEX "?(\w+)"?',
+}
+
+
+def read_plan(plan, vendor, table=Booking._meta.db_table):
+    """(whether `plan` scans all of `table`, names of the indexes it uses)."""
+    if vendor not in _FULL_SCAN:
+        return None, []
+    full_scan = re.search(_FULL_SCAN[vendor].format(table=table), plan) is not None
+    return full_scan, list(dict.fromkeys(re.findall(_INDEX[vendor], plan)))
@@ -1,8 +1,15 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.db.models import Avg, Count
+from django.db import transaction
+from django.db.models import Avg, Count, Prefetch
+from datetime import timedelta
+from decimal import Decimal
 from typing import Optional
 from .models import Service, Booking, BookingImage, Payment, Review, ProviderAvailability, BookingService
+from .events import record_bookings_created
+from .fieldsets import SparseFieldsetMixin
+from .images import FORMATS, VARIANT_SIZES
+from users.cdn import file_url
 
 User = get_user_model()
 
@@ -30,20 +37,68 @@ class ServiceSerializer(serializers.ModelSerializer):
 
 class BookingImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    original_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     uploader_name = serializers.SerializerMethodField()
 
     class Meta:
         model = BookingImage
-        fields = ['id', 'image', 'image_url', 'image_type', 'uploaded_by', 'uploader_name', 'description', 'uploaded_at']
-        read_only_fields = ['image_url', 'uploader_name', 'uploaded_at']
+        fields = [
+            'id', 'image', 'image_url', 'original_url', 'thumbnail_url', 'srcset', 'variants_status',
+            'image_type', 'uploaded_by', 'uploader_name', 'description', 'uploaded_at'
+        ]
+        read_only_fields = ['image_url', 'original_url', 'thumbnail_url', 'srcset', 'variants_status', 'uploader_name', 'uploaded_at']
+
+    def _absolute_url(self, name, **transform):
+        request = self.context.get('request')
+        if request:
+            return request.build_absolute_uri(file_url(name, **transform))
+        return None
+
+    def _variant_url(self, obj, size):
+        """
+        JPEG variant of `size` once processed, otherwise the original
+        (resized on the fly where image transformations are enabled).
+        """
+        if obj.variants_status == 'ready' and size in obj.variants:
+            return self._absolute_url(obj.variants[size]['jpeg'])
+        if obj.image:
+            return self._absolute_url(obj.image.name, width=VARIANT_SIZES[size])
+        return None
 
     def get_image_url(self, obj):
+        # Full-size variant (max 1920px, no EXIF) rather than the original upload
+        return self._variant_url(obj, 'full')
+
+    def get_original_url(self, obj):
         if obj.image:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.image.url)
+            return self._absolute_url(obj.image.name)
         return None
 
+    def get_thumbnail_url(self, obj):
+        return self._variant_url(obj, 'thumb')
+
+    def get_srcset(self, obj):
+        """
+        srcset strings per format, e.g.
+        {'avif': '<url> 320w, <url> 960w, <url> 1920w', 'webp': ..., 'jpeg': ...}
+        Empty until the variants are ready.
+        """
+        if obj.variants_status != 'ready' or not self.context.get('request'):
+            return {}
+        srcset = {}
+        for fmt in FORMATS:
+            candidates = {}
+            for size in VARIANT_SIZES:
+                variant = obj.variants.get(size)
+                if variant and fmt in variant:
+                    # Small originals give identical widths; list each width once
+                    candidates.setdefault(variant['width'], self._absolute_url(variant[fmt]))
+            if candidates:
+                srcset[fmt] = ', '.join(f"{url} {width}w" for width, url in sorted(candidates.items()))
+        return srcset
+
     def get_uploader_name(self, obj):
         return obj.get_uploader_name()
 
@@ -72,7 +127,12 @@ class BookingServiceSerializer(serializers.ModelSerializer):
         )
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    # Provider and specialization are needed right after validation (provider
+    # assignment, deadline, notification), so load them with the service
+    service = serializers.PrimaryKeyRelatedField(
+        queryset=Service.objects.select_related('provider', 'specialization')
+    )
     service_title = serializers.SerializerMethodField()
     provider_name = serializers.SerializerMethodField()
     customer_name = serializers.SerializerMethodField()
@@ -107,6 +167,23 @@ class BookingSerializer(serializers.ModelSerializer):
             'images', 'customer_email', 'provider_name', 'customer_name', 'booking_services', 'payment',
             'confirmation_deadline', 'expired_at', 'is_expired'
         ]
+        # Sparse fieldsets (bookings.fieldsets): left out once ?expand= is given
+        # unless named, and relations loaded only for the fields returned
+        expandable_fields = ['images', 'booking_services', 'payment']
+        field_select_related = {
+            'service_title': ['service__specialization__speciality'],
+            'provider_name': ['provider'],
+            'customer_name': ['customer'],
+            'customer_email': ['customer'],
+            'payment': ['payment'],
+        }
+        field_prefetch_related = {
+            'images': ['images'],
+            'booking_services': [Prefetch(
+                'booking_services',
+                queryset=BookingService.objects.select_related('service__specialization__speciality')
+            )],
+        }
 
     def get_provider_name(self, obj):
         return obj.provider.get_full_name() or obj.provider.email
@@ -141,13 +218,19 @@ class BookingSerializer(serializers.ModelSerializer):
             return serializer.data.get('service_title')
         return None
 
-    def create(self, validated_data):
-        # Extract optional services list (for multi-service bookings)
-        service_ids = validated_data.pop('services', None)
-        primary_service = validated_data.get('service', None)
+    @staticmethod
+    def resolve_services(service_ids, primary_service):
+        """
+        Return (primary_service, services) for a booking request.
 
+        `service_ids` (multi-service bookings) takes precedence over the single
+        `service` field; all services must be active and share one provider.
+        """
         if service_ids:
-            services = list(Service.objects.filter(id__in=service_ids, is_active=True))
+            services = list(
+                Service.objects.filter(id__in=service_ids, is_active=True)
+                .select_related('provider', 'specialization')
+            )
             if len(services) != len(set(service_ids)):
                 raise serializers.ValidationError({'services': 'One or more services not found or inactive.'})
             # Ensure all services belong to the same provider
@@ -155,28 +238,24 @@ class BookingSerializer(serializers.ModelSerializer):
             if len(provider_ids) != 1:
                 raise serializers.ValidationError({'services': 'All services must belong to the same provider.'})
             # Use first as primary (legacy field compatibility)
-            primary_service = services[0]
-        elif primary_service is None:
+            return services[0], services
+        if primary_service is None:
             raise serializers.ValidationError({'service': 'Service is required.'})
-        else:
-            services = [primary_service]
+        return primary_service, [primary_service]
 
-        # Set provider from primary service
-        validated_data['service'] = primary_service
-        validated_data['provider'] = primary_service.provider
-
-        # Calculate quoted_price as sum of all service base prices
-        from decimal import Decimal
+    @staticmethod
+    def quoted_price_for(services):
+        """Sum of the base prices of all services in the booking."""
         total_price = Decimal('0.00')
         for svc in services:
             total_price += svc.base_price or Decimal('0.00')
-        validated_data['quoted_price'] = total_price
-
-        booking = Booking.objects.create(**validated_data)
+        return total_price
 
-        # Create BookingService snapshot entries
-        for order, svc in enumerate(services):
-            BookingService.objects.create(
+    @staticmethod
+    def snapshot_services(booking, services):
+        """Build (unsaved) BookingService snapshot rows for `booking`."""
+        return [
+            BookingService(
                 booking=booking,
                 service=svc,
                 price_at_booking=svc.base_price,
@@ -185,11 +264,161 @@ class BookingSerializer(serializers.ModelSerializer):
                 estimated_duration_at_booking=svc.estimated_duration,
                 order=order
             )
+            for order, svc in enumerate(services)
+        ]
+
+    def create(self, validated_data):
+        # Extract optional services list (for multi-service bookings)
+        service_ids = validated_data.pop('services', None)
+        primary_service, services = self.resolve_services(service_ids, validated_data.get('service', None))
+
+        # Set provider from primary service
+        validated_data['service'] = primary_service
+        validated_data['provider'] = primary_service.provider
 
+        # Calculate quoted_price as sum of all service base prices
+        validated_data['quoted_price'] = self.quoted_price_for(services)
+
+        # Deadline is computed on the unsaved instance so the booking is written once
+        booking = Booking(**validated_data)
+        booking.calculate_confirmation_deadline()
+
+        with transaction.atomic():
+            booking.save(force_insert=True)
+            # Create BookingService snapshot entries
+            BookingService.objects.bulk_create(self.snapshot_services(booking, services))
+            # Provider notification etc. run from the event log
+            record_bookings_created([booking], actor=booking.customer)
         return booking
 
 
-class BookingListSerializer(serializers.ModelSerializer):
+class BookingSlotSerializer(serializers.Serializer):
+    preferred_date = serializers.DateField()
+    preferred_time = serializers.TimeField()
+
+
+class BookingBatchSerializer(serializers.ModelSerializer):
+    """
+    Input for creating several bookings of the same job in one request.
+
+    Either pass explicit `slots` (multi-visit jobs), or a first
+    `preferred_date`/`preferred_time` plus `repeat` and `occurrences`
+    (recurring jobs, e.g. weekly cleaning for 4 weeks). Address, contact
+    and description are shared by every booking in the batch.
+    """
+    REPEAT_INTERVALS = {
+        'daily': timedelta(days=1),
+        'weekly': timedelta(weeks=1),
+        'biweekly': timedelta(weeks=2),
+    }
+
+    services = serializers.ListField(
+        child=serializers.IntegerField(),
+        write_only=True,
+        required=False,
+        help_text="List of service IDs to include in each booking (all must belong to same provider)"
+    )
+    slots = BookingSlotSerializer(many=True, required=False)
+    repeat = serializers.ChoiceField(choices=list(REPEAT_INTERVALS), required=False)
+    occurrences = serializers.IntegerField(min_value=1, max_value=Booking.MAX_BATCH_BOOKINGS, required=False)
+
+    class Meta:
+        model = Booking
+        fields = [
+            'service', 'services', 'preferred_date', 'preferred_time',
+            'slots', 'repeat', 'occurrences',
+            'service_address', 'service_city', 'service_district', 'latitude', 'longitude',
+            'description', 'special_instructions', 'customer_phone', 'customer_name',
+        ]
+        extra_kwargs = {
+            'service': {'required': False, 'queryset': Service.objects.select_related('provider', 'specialization')},
+            'preferred_date': {'required': False},
+            'preferred_time': {'required': False},
+            'customer_name': {'required': False},
+        }
+
+    def validate(self, attrs):
+        slots = attrs.pop('slots', None)
+        repeat = attrs.pop('repeat', None)
+        occurrences = attrs.pop('occurrences', None)
+        first_date = attrs.pop('preferred_date', None)
+        first_time = attrs.pop('preferred_time', None)
+
+        if slots:
+            if repeat or occurrences:
+                raise serializers.ValidationError({'slots': 'Pass either slots or repeat/occurrences, not both.'})
+            slot_list = [(slot['preferred_date'], slot['preferred_time']) for slot in slots]
+        elif first_date and first_time:
+            if not repeat or not occurrences:
+                raise serializers.ValidationError({'repeat': 'repeat and occurrences are required for recurring bookings.'})
+            interval = self.REPEAT_INTERVALS[repeat]
+            slot_list = [(first_date + interval * i, first_time) for i in range(occurrences)]
+        else:
+            raise serializers.ValidationError({'slots': 'Provide slots, or preferred_date/preferred_time with repeat and occurrences.'})
+
+        if len(slot_list) > Booking.MAX_BATCH_BOOKINGS:
+            raise serializers.ValidationError({'slots': f'At most {Booking.MAX_BATCH_BOOKINGS} bookings can be created at once.'})
+        if len(set(slot_list)) != len(slot_list):
+            raise serializers.ValidationError({'slots': 'The same date and time appears more than once.'})
+
+        attrs['slots'] = sorted(slot_list)
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Insert every booking of the batch, its service snapshots and its
+        'created' events with three bulk INSERTs. Confirmation deadlines are
+        computed on the unsaved instances, so nothing is written twice.
+        Services already resolved by the caller are taken from
+        context['resolved_services'] as (primary_service, services).
+        Returns the list of bookings.
+        """
+        slots = validated_data.pop('slots')
+        service_ids = validated_data.pop('services', None)
+        primary_service = validated_data.pop('service', None)
+        resolved = self.context.get('resolved_services')
+        if resolved is None:
+            resolved = BookingSerializer.resolve_services(service_ids, primary_service)
+        primary_service, services = resolved
+        quoted_price = BookingSerializer.quoted_price_for(services)
+
+        bookings = []
+        for preferred_date, preferred_time in slots:
+            booking = Booking(
+                service=primary_service,
+                provider=primary_service.provider,
+                preferred_date=preferred_date,
+                preferred_time=preferred_time,
+                quoted_price=quoted_price,
+                **validated_data
+            )
+            booking.calculate_confirmation_deadline()
+            bookings.append(booking)
+
+        with transaction.atomic():
+            Booking.objects.bulk_create(bookings)
+            BookingService.objects.bulk_create([
+                snapshot
+                for booking in bookings
+                for snapshot in BookingSerializer.snapshot_services(booking, services)
+            ])
+            record_bookings_created(bookings, actor=validated_data.get('customer'))
+        return bookings
+
+
+class BookingCompletionSerializer(serializers.ModelSerializer):
+    """Input of CompleteBookingView; final_price is validated against the model field."""
+
+    class Meta:
+        model = Booking
+        fields = ['completion_note', 'final_price']
+        extra_kwargs = {
+            'completion_note': {'required': False, 'allow_blank': True},
+            'final_price': {'min_value': 0},
+        }
+
+
+class BookingListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Lightweight serializer for dashboard lists to reduce payload size."""
 
     service_title = serializers.SerializerMethodField()
@@ -211,6 +440,7 @@ class BookingListSerializer(serializers.ModelSerializer):
             'confirmation_deadline', 'expired_at', 'is_expired'
         ]
         read_only_fields = fields
+        expandable_fields = ['payment']
 
     def get_provider_name(self, obj):
         return obj.provider.get_full_name() or obj.provider.email
@@ -316,8 +546,23 @@ class ProviderAvailabilitySerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("settings must be a dict")
         return value
 
-class ProviderListSerializer(serializers.ModelSerializer):
+# Avatar widths requested from the image transformation endpoint (see users.cdn)
+AVATAR_LIST_WIDTH = 160
+AVATAR_DETAIL_WIDTH = 480
+
+
+# ProviderListSerializer fields computed from a provider's reviews, and from
+# their active services (see ProviderDiscoveryService.with_list_stats)
+PROVIDER_RATING_FIELDS = frozenset(['average_rating', 'review_count'])
+PROVIDER_SERVICE_FIELDS = frozenset([
+    'specializations', 'service_count', 'starting_price', 'starting_price_type',
+    'services_preview', 'price_range_min', 'price_range_max',
+])
+
+
+class ProviderListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for listing providers with stats"""
+    profile_picture = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
     review_count = serializers.SerializerMethodField()
     specializations = serializers.SerializerMethodField()
@@ -337,42 +582,76 @@ class ProviderListSerializer(serializers.ModelSerializer):
             'specializations', 'service_count', 'starting_price', 'starting_price_type',
             'services_preview', 'price_range_min', 'price_range_max'
         ]
+        expandable_fields = ['services_preview', 'price_range_min', 'price_range_max']
+
+    @classmethod
+    def list_stats_options(cls, fieldset):
+        """ProviderDiscoveryService.with_list_stats() options for the fields `fieldset` returns"""
+        names = set(cls.requested_fields(fieldset))
+        return {
+            'ratings': bool(names & PROVIDER_RATING_FIELDS),
+            'services': bool(names & PROVIDER_SERVICE_FIELDS),
+            'specialities': 'specializations' in names,
+        }
+    
+    def get_profile_picture(self, obj):
+        """Cacheable (versioned) avatar URL, resized for list cards"""
+        return file_url(obj.profile_picture, width=AVATAR_LIST_WIDTH, version=obj.updated_at)
+    
+    # Querysets from ProviderDiscoveryService.with_list_stats carry the
+    # rating stats and prefetched services/specialities; other instances
+    # fall back to one query per value.
     
     def get_average_rating(self, obj):
         """Calculate average rating from reviews"""
-        avg_rating = Review.objects.filter(
-            provider=obj
-        ).aggregate(avg=Avg('rating'))['avg']
+        if hasattr(obj, 'rating_average'):
+            avg_rating = obj.rating_average
+        else:
+            avg_rating = Review.objects.filter(
+                provider=obj
+            ).aggregate(avg=Avg('rating'))['avg']
         return round(avg_rating, 1) if avg_rating else 0.0
     
     def get_review_count(self, obj):
         """Count total reviews for this provider"""
+        if hasattr(obj, 'rating_count'):
+            return obj.rating_count
         return Review.objects.filter(provider=obj).count()
     
+    def _active_services(self, obj):
+        if not hasattr(obj, 'active_services'):
+            obj.active_services = list(obj.services.filter(is_active=True).select_related('specialization__speciality'))
+        return obj.active_services
+    
     def get_specializations(self, obj):
         """Get list of speciality names that the provider selected during registration.
         Primary source: UserSpeciality (direct selections during registration)
         Fallback: Extract from services' speciality if user_specialities empty"""
         # First try: Get from user_specialities (what provider selected during registration)
-        specializations = list(obj.user_specialities.values_list('speciality__name', flat=True).distinct())
+        if hasattr(obj, 'selected_specialities'):
+            names = [us.speciality.name for us in obj.selected_specialities]
+        else:
+            names = obj.user_specialities.values_list('speciality__name', flat=True)
+        specializations = list(dict.fromkeys(names))
         
         # Fallback: If no user specialities, extract from services' specialization's speciality
         if not specializations:
-            specializations = list(obj.services.filter(is_active=True).values_list('specialization__speciality__name', flat=True).distinct())
+            specializations = list(dict.fromkeys(
+                s.specialization.speciality.name if s.specialization else None for s in self._active_services(obj)
+            ))
         
         return specializations
     
     def get_service_count(self, obj):
         """Count active services offered"""
-        return obj.services.filter(is_active=True).count()
+        return len(self._active_services(obj))
 
     def get_starting_price(self, obj) -> Optional[float]:
         """Return lowest effective starting price among active services.
         Effective start = minimum_charge (>0) else base_price.
         """
-        services = obj.services.filter(is_active=True).only('minimum_charge', 'base_price')
         lowest = None
-        for s in services:
+        for s in self._active_services(obj):
             val = s.minimum_charge if (s.minimum_charge is not None and s.minimum_charge > 0) else s.base_price
             if val is None:
                 continue
@@ -381,10 +660,9 @@ class ProviderListSerializer(serializers.ModelSerializer):
 
     def get_starting_price_type(self, obj) -> Optional[str]:
         """Return price_type of the service that determines starting price."""
-        services = obj.services.filter(is_active=True).only('minimum_charge', 'base_price', 'price_type')
         lowest_val = None
         lowest_type = None
-        for s in services:
+        for s in self._active_services(obj):
             val = s.minimum_charge if (s.minimum_charge is not None and s.minimum_charge > 0) else s.base_price
             if val is None:
                 continue
@@ -400,20 +678,16 @@ class ProviderListSerializer(serializers.ModelSerializer):
         return service.base_price
 
     def get_price_range_min(self, obj) -> Optional[float]:
-        services = obj.services.filter(is_active=True).only('minimum_charge', 'base_price')
-        prices = [self._effective_price(s) for s in services if self._effective_price(s) is not None]
+        prices = [self._effective_price(s) for s in self._active_services(obj) if self._effective_price(s) is not None]
         return min(prices) if prices else None
 
     def get_price_range_max(self, obj) -> Optional[float]:
-        services = obj.services.filter(is_active=True).only('minimum_charge', 'base_price')
-        prices = [self._effective_price(s) for s in services if self._effective_price(s) is not None]
+        prices = [self._effective_price(s) for s in self._active_services(obj) if self._effective_price(s) is not None]
         return max(prices) if prices else None
 
     def get_services_preview(self, obj):
         """Return up to 3 lowest-priced active services with key info."""
-        services = obj.services.filter(is_active=True).select_related('specialization').only(
-            'title', 'minimum_charge', 'base_price', 'price_type', 'specialization__name'
-        )
+        services = self._active_services(obj)
         # sort by effective price ascending
         annotated = [
             (
@@ -432,8 +706,18 @@ class ProviderListSerializer(serializers.ModelSerializer):
         return [item[1] for item in annotated[:3]]
 
 
-class ProviderDetailSerializer(serializers.ModelSerializer):
+class NearbyProviderSerializer(ProviderListSerializer):
+    """Provider list entry with distance from the searched location"""
+    distance_km = serializers.FloatField(read_only=True)
+    service_radius_km = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta(ProviderListSerializer.Meta):
+        fields = ProviderListSerializer.Meta.fields + ['latitude', 'longitude', 'distance_km', 'service_radius_km']
+
+
+class ProviderDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for detailed provider information"""
+    profile_picture = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
     review_count = serializers.SerializerMethodField()
     specializations = serializers.SerializerMethodField()
@@ -448,6 +732,11 @@ class ProviderDetailSerializer(serializers.ModelSerializer):
             'years_of_experience', 'average_rating', 'review_count',
             'specializations', 'services'
         ]
+        expandable_fields = ['services']
+    
+    def get_profile_picture(self, obj):
+        """Cacheable (versioned) avatar URL"""
+        return file_url(obj.profile_picture, width=AVATAR_DETAIL_WIDTH, version=obj.updated_at)
     
     def get_average_rating(self, obj):
         """Calculate average rating from reviews"""
@@ -475,5 +764,5 @@ class ProviderDetailSerializer(serializers.ModelSerializer):
     
     def get_services(self, obj):
         """Get active services offered by this provider"""
-        services = obj.services.filter(is_active=True)
+        services = obj.services.filter(is_active=True).select_related('provider', 'specialization')
         return ServiceSerializer(services, many=True).data
\ No newline at end of file
@@ -1,8 +1,17 @@
 from django.utils import timezone
 from django.db import transaction
-from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Q, Avg, Count, DecimalField, F, Max, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.contrib.auth import get_user_model
+from datetime import datetime, timedelta
+from decimal import Decimal
 
-from .models import Payment, Booking
+from users import geo
+from users.models import UserSpeciality
+from .models import Payment, Booking, BookingService, Review, Service
+
+User = get_user_model()
 
 
 class PaymentService:
@@ -266,20 +275,32 @@ class BookingConflictService:
         alternatives = []
         day_names = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
         
+        # One query for the whole window instead of one per day
+        first_date = preferred_date + timedelta(days=1)
+        last_date = preferred_date + timedelta(days=days_ahead)
+        booked = Booking.objects.filter(
+            provider=provider,
+            scheduled_date__range=(first_date, last_date),
+            scheduled_time__isnull=False,
+            status__in=['confirmed', 'scheduled', 'in_progress']
+        )
+        if exclude_booking_id:
+            booked = booked.exclude(id=exclude_booking_id)
+        booked_by_date = {}
+        for scheduled_date, scheduled_time in booked.values_list('scheduled_date', 'scheduled_time'):
+            booked_by_date.setdefault(scheduled_date, []).append(scheduled_time.strftime('%H:%M:%S'))
+        
+        # Same hourly slots as get_available_time_slots (8 AM to 5 PM)
+        slot_times = {f"{hour:02d}:00:00" for hour in range(8, 18)}
+        
         # Check next 7 days
         for i in range(1, days_ahead + 1):
             check_date = preferred_date + timedelta(days=i)
             date_str = check_date.strftime('%Y-%m-%d')
             
-            # Get available slots for this date
-            slot_info = BookingConflictService.get_available_time_slots(
-                provider, 
-                check_date, 
-                exclude_booking_id=exclude_booking_id
-            )
-            
-            available_count = len(slot_info['available_slots'])
-            total_count = len(slot_info['available_slots']) + len(slot_info['booked_times'])
+            booked_times = booked_by_date.get(check_date, [])
+            available_count = len(slot_times - set(booked_times))
+            total_count = available_count + len(booked_times)
             
             if available_count > 0:
                 alternatives.append({
@@ -298,6 +319,97 @@ class BookingConflictService:
             'message': message
         }
 
+    # Break kept between two visits when the provider hasn't set bufferTime
+    DEFAULT_BUFFER_MINUTES = 15
+
+    @staticmethod
+    def buffer_minutes(value):
+        """Provider's bufferTime setting ("15 minutes" or a number) in minutes."""
+        if value is None:
+            return BookingConflictService.DEFAULT_BUFFER_MINUTES
+        try:
+            if isinstance(value, str):
+                return int(value.split()[0])
+            return int(value)
+        except (ValueError, IndexError, TypeError):
+            return BookingConflictService.DEFAULT_BUFFER_MINUTES
+
+    @staticmethod
+    def duration_minutes(hours):
+        """Minutes a visit of `hours` (sum of its service durations) takes; one hour when unknown."""
+        if not hours or hours <= 0:
+            hours = Decimal('1')
+        return int(hours * 60)
+
+    @staticmethod
+    def find_slot_conflicts(provider, slots, services=()):
+        """
+        Check many (date, time) slots against the provider's calendar at once.
+
+        A requested visit takes the estimated duration of `services` and
+        conflicts with every booking it overlaps once the provider's buffer
+        is kept on both sides, the same ranges ProviderBookedSlotsView shows.
+        Accepted bookings sit at their scheduled (or else preferred) slot;
+        pending requests, which the provider may still accept, count at
+        their preferred slot.
+
+        One query fetches every booking of the provider on any of the
+        requested dates, with its duration and the provider's buffer setting;
+        overlaps are then found in memory, so a batch of N slots costs a
+        single round trip instead of N.
+
+        Args:
+            provider: Provider user object
+            slots: Iterable of (date, time) tuples
+            services: Services of the requested visits
+
+        Returns:
+            [{'preferred_date': date, 'preferred_time': time, 'booking_id': int}]
+            for every requested slot that overlaps a booking, with the first
+            booking it overlaps.
+        """
+        slots = list(slots)
+        if not slots:
+            return []
+
+        statuses_to_check = ['pending', 'confirmed', 'scheduled', 'in_progress']
+        service_hours = BookingService.objects.filter(booking=OuterRef('pk')).values('booking').annotate(
+            total=Sum(Coalesce('estimated_duration_at_booking', 'service__estimated_duration', Value(Decimal('1'))))
+        ).values('total')
+        booked = Booking.objects.filter(provider=provider, status__in=statuses_to_check).annotate(
+            slot_date=Coalesce('scheduled_date', 'preferred_date'),
+            slot_time=Coalesce('scheduled_time', 'preferred_time'),
+            hours=Subquery(service_hours),
+        ).filter(
+            slot_date__in={slot_date for slot_date, _ in slots}
+        ).order_by('slot_date', 'slot_time').values_list(
+            'id', 'slot_date', 'slot_time', 'hours', 'provider__availability__settings__bufferTime'
+        )
+
+        buffer = timedelta(minutes=BookingConflictService.DEFAULT_BUFFER_MINUTES)
+        ranges_by_date = {}
+        for booking_id, slot_date, slot_time, hours, buffer_setting in booked:
+            if slot_time is None:
+                continue
+            # Same provider, so the same setting, on every row
+            buffer = timedelta(minutes=BookingConflictService.buffer_minutes(buffer_setting))
+            start = datetime.combine(slot_date, slot_time)
+            end = start + timedelta(minutes=BookingConflictService.duration_minutes(hours))
+            ranges_by_date.setdefault(slot_date, []).append((start, end, booking_id))
+
+        length = timedelta(minutes=BookingConflictService.duration_minutes(
+            sum((svc.estimated_duration or Decimal('1') for svc in services), Decimal('0'))
+        ))
+        conflicts = []
+        for slot_date, slot_time in slots:
+            start = datetime.combine(slot_date, slot_time)
+            end = start + length
+            for booked_start, booked_end, booking_id in ranges_by_date.get(slot_date, ()):
+                if start < booked_end + buffer and booked_start < end + buffer:
+                    conflicts.append({'preferred_date': slot_date, 'preferred_time': slot_time, 'booking_id': booking_id})
+                    break
+        return conflicts
+
     @staticmethod
     def validate_booking_request(customer, provider, service, preferred_date, preferred_time=None):
         """
@@ -394,3 +506,183 @@ class BookingConflictService:
             'warnings': warnings,
             'suggestions': suggestions
         }
+
+
+class ProviderDiscoveryService:
+    """
+    Location-based provider search backed by the User.geo_cell geohash index.
+
+    A search narrows candidates with prefix scans over the geohash cells that
+    cover the search circle (index range scans), tightens them with a lat/lng
+    bounding box, and only then computes exact great-circle distances in
+    Python for the few rows left.
+    """
+
+    DEFAULT_RADIUS_KM = 10
+    MAX_RADIUS_KM = 100
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 100
+
+    @staticmethod
+    def with_list_stats(queryset, ratings=True, services=True, specialities=True):
+        """
+        Load everything ProviderListSerializer shows for a page of providers
+        in a fixed number of queries: rating average/count as subqueries,
+        active services and selected specialities prefetched.
+
+        Responses with a sparse fieldset turn off the parts they do not show
+        (ProviderListSerializer.list_stats_options).
+        """
+        if ratings:
+            reviews = Review.objects.filter(provider=OuterRef('pk')).order_by().values('provider')
+            queryset = queryset.annotate(
+                rating_average=Subquery(reviews.annotate(value=Avg('rating')).values('value')),
+                rating_count=Coalesce(Subquery(reviews.annotate(value=Count('id')).values('value')), 0),
+            )
+        if services:
+            queryset = queryset.prefetch_related(Prefetch(
+                'services',
+                queryset=Service.objects.filter(is_active=True).select_related('specialization__speciality'),
+                to_attr='active_services',
+            ))
+        if specialities:
+            queryset = queryset.prefetch_related(Prefetch(
+                'user_specialities',
+                queryset=UserSpeciality.objects.select_related('speciality'),
+                to_attr='selected_specialities',
+            ))
+        return queryset
+
+    @staticmethod
+    def candidate_queryset(latitude, longitude, radius_km, queryset=None):
+        """
+        Return providers whose stored location falls inside the cells and
+        bounding box around the point. Distances are not checked yet.
+        """
+        if queryset is None:
+            queryset = User.objects.filter(user_type='offer', is_active=True)
+
+        cell_filter = Q()
+        for cell in geo.covering_cells(latitude, longitude, radius_km):
+            cell_filter |= Q(geo_cell__startswith=cell)
+
+        min_lat, max_lat, min_lng, max_lng = geo.bounding_box(latitude, longitude, radius_km)
+        return queryset.filter(
+            cell_filter,
+            latitude__gte=min_lat,
+            latitude__lte=max_lat,
+            longitude__gte=min_lng,
+            longitude__lte=max_lng,
+        )
+
+    @staticmethod
+    def find_nearby_providers(latitude, longitude, radius_km=DEFAULT_RADIUS_KM, limit=DEFAULT_LIMIT, queryset=None,
+                              stats=None):
+        """
+        Find providers within `radius_km` of the customer whose service area
+        covers the customer's location, nearest first.
+
+        A provider covers the location when any active service has no
+        service_radius (unlimited) or a service_radius at least as large as
+        the distance. Providers without active services are not restricted.
+
+        Each returned provider has `distance_km` and `service_radius_km`
+        attributes set (the latter is None when unrestricted). `stats` are
+        the with_list_stats() options for the fields being shown.
+        """
+        active = Q(services__is_active=True)
+        candidates = (
+            ProviderDiscoveryService.candidate_queryset(latitude, longitude, radius_km, queryset)
+            .annotate(
+                active_service_count=Count('services', filter=active, distinct=True),
+                unlimited_service_count=Count(
+                    'services', filter=active & Q(services__service_radius__isnull=True), distinct=True
+                ),
+                max_service_radius=Max('services__service_radius', filter=active),
+            )
+        )
+        candidates = ProviderDiscoveryService.with_list_stats(candidates, **(stats or {}))
+
+        results = []
+        for provider in candidates:
+            distance = geo.haversine_km(latitude, longitude, provider.latitude, provider.longitude)
+            if distance > radius_km:
+                continue
+            restricted = provider.active_service_count > 0 and provider.unlimited_service_count == 0
+            if restricted and provider.max_service_radius < distance:
+                continue
+            provider.distance_km = round(distance, 2)
+            provider.service_radius_km = provider.max_service_radius if restricted else None
+            results.append(provider)
+
+        results.sort(key=lambda p: p.distance_km)
+        return results[:limit]
+
+
+class DashboardStatsService:
+    """
+    Dashboard stats of customers and providers, rolled up into the cache.
+
+    The dashboard views serve the cached rollup and only compute it on a
+    miss. The booking event worker (bookings.events, 'dashboard_stats'
+    consumer) recomputes both parties' rollups after every booking change,
+    so the next dashboard request is a cache hit with fresh numbers.
+    Changes that are not booking events (reviews, payments recorded
+    outside the lifecycle) show once the rollup expires.
+    """
+
+    CACHE_TIMEOUT = 60
+    USER_ACTIVE_STATUSES = ['pending', 'confirmed', 'scheduled', 'in_progress', 'provider_completed']
+    PROVIDER_ACTIVE_STATUSES = ['pending', 'confirmed', 'scheduled', 'in_progress']
+
+    @staticmethod
+    def user_cache_key(user_id):
+        return f"user_dashboard_stats:{user_id}"
+
+    @staticmethod
+    def provider_cache_key(provider_id):
+        return f"provider_dashboard_stats:{provider_id}"
+
+    @staticmethod
+    def user_stats(user_id):
+        """Booking totals and spending of customer `user_id`."""
+        money = DecimalField(max_digits=12, decimal_places=2)
+        agg = Booking.objects.filter(customer_id=user_id).aggregate(
+            total_bookings=Count('id'),
+            active_jobs=Count('id', filter=Q(status__in=DashboardStatsService.USER_ACTIVE_STATUSES)),
+            completed_jobs=Count('id', filter=Q(status='completed')),
+            total_spent=Sum(Coalesce(F('final_price'), F('quoted_price'), Value(0), output_field=money), output_field=money),
+        )
+        return {
+            "total_bookings": agg.get('total_bookings') or 0,
+            "active_jobs": agg.get('active_jobs') or 0,
+            "completed_jobs": agg.get('completed_jobs') or 0,
+            "total_spent": float(agg.get('total_spent') or 0),
+        }
+
+    @staticmethod
+    def provider_stats(provider_id):
+        """Job counts, earnings and rating of provider `provider_id`."""
+        agg_bookings = Booking.objects.filter(provider_id=provider_id).aggregate(
+            total_jobs=Count('id', filter=Q(status='completed')),
+            active_jobs=Count('id', filter=Q(status__in=DashboardStatsService.PROVIDER_ACTIVE_STATUSES)),
+        )
+        agg_payments = Payment.objects.filter(provider_id=provider_id, status='completed').aggregate(
+            total_earnings=Sum('provider_amount')
+        )
+        agg_reviews = Review.objects.filter(provider_id=provider_id).aggregate(avg_rating=Avg('rating'), review_count=Count('id'))
+        return {
+            "total_jobs": agg_bookings.get('total_jobs') or 0,
+            "active_jobs": agg_bookings.get('active_jobs') or 0,
+            "total_earnings": float(agg_payments.get('total_earnings') or 0),
+            "average_rating": round(agg_reviews.get('avg_rating') or 0, 1),
+            "review_count": agg_reviews.get('review_count') or 0,
+        }
+
+    @staticmethod
+    def refresh(customer_id, provider_id):
+        """Recompute and cache the rollups of both parties of a booking."""
+        cache.set_many({
+            DashboardStatsService.user_cache_key(customer_id): DashboardStatsService.user_stats(customer_id),
+            DashboardStatsService.provider_cache_key(provider_id): DashboardStatsService.provider_stats(provider_id),
+        }, timeout=DashboardStatsService.CACHE_TIMEOUT)
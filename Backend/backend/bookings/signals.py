@@ -0,0 +1,22 @@
+"""
+Signals for the booking app.
+
+booking_transitioned is sent by bookings.transitions after a lifecycle
+transition has been written, inside the same database transaction.
+
+    Arguments:
+        booking:     the Booking after the transition
+        transition:  name of the transition (e.g. 'accept', 'complete')
+        from_statuses: statuses the transition was allowed from
+        to_status:   the new status
+        actor:       user who triggered it (None for system transitions)
+        changes:     dict of the fields written by the transition
+
+bookings_transitioned is sent instead by BookingTransitionService.apply_all(),
+once for all the bookings one set-based transition changed. It takes the
+same arguments, with `bookings` (a list) in place of `booking`.
+"""
+from django.dispatch import Signal
+
+booking_transitioned = Signal()
+bookings_transitioned = Signal()
@@ -0,0 +1,204 @@
+"""
+Synthetic marketplace data for benchmarks and load tests.
+
+seed_marketplace() bulk-creates providers (with their specialities and
+weekly availability), customers, services, bookings in every status,
+payments for the completed bookings and reviews for some of them. The data is generated from a seeded random number generator, so the
+same arguments give the same dataset (row ids aside), which is what plan
+and timing comparisons need.
+
+Rows are created with bulk_create, so model save() logic does not run; the
+derived fields it would fill (geo_cell, confirmation_deadline, payment
+split) are set here instead. Accounts get a stable supabase_uid
+(supabase_uid()), so tokens signed locally for them match their row.
+
+    with transaction.atomic():
+        summary = seed_marketplace(providers=500)
+        ...
+"""
+import random
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from users.geo import encode as geohash_encode
+from users.models import Speciality, Specialization, User, UserSpeciality, UserSpecialization
+from .models import Booking, Payment, ProviderAvailability, Review, Service
+
+# Cities with their districts and a point near their centre
+CITIES = [
+    ('Kathmandu', 'Kathmandu', 27.7172, 85.3240),
+    ('Lalitpur', 'Lalitpur', 27.6644, 85.3188),
+    ('Bhaktapur', 'Bhaktapur', 27.6710, 85.4298),
+    ('Pokhara', 'Kaski', 28.2096, 83.9856),
+    ('Biratnagar', 'Morang', 26.4525, 87.2718),
+    ('Butwal', 'Rupandehi', 27.7006, 83.4484),
+]
+
+CATALOG = {
+    'Plumber': ['Pipe Repair', 'Drain Cleaning', 'Water Tank Installation'],
+    'Electrician': ['Wiring', 'Fan Installation', 'Inverter Repair'],
+    'Carpenter': ['Furniture Repair', 'Door Fitting', 'Cabinet Making'],
+    'Painter': ['Interior Painting', 'Exterior Painting'],
+    'Cleaner': ['Home Cleaning', 'Sofa Cleaning'],
+}
+
+# Relative frequency of each booking status
+STATUS_WEIGHTS = {
+    'pending': 10, 'confirmed': 8, 'scheduled': 8, 'in_progress': 4, 'provider_completed': 3,
+    'completed': 45, 'disputed': 1, 'cancelled': 10, 'declined': 5, 'expired': 6,
+}
+
+_SCHEDULED_STATUSES = {'confirmed', 'scheduled', 'in_progress', 'provider_completed', 'completed', 'disputed'}
+
+_DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+_UID_NAMESPACE = uuid.UUID('5b0c1f1e-9a53-4c61-8a4e-6d2f1f0e7a11')
+
+
+def supabase_uid(email):
+    """The supabase_uid given to the synthetic account with this email."""
+    return str(uuid.uuid5(_UID_NAMESPACE, email))
+
+
+def _weekly_schedule(rng):
+    start, end = rng.choice([('8:00 AM', '5:00 PM'), ('9:00 AM', '6:00 PM'), ('7:00 AM', '3:00 PM')])
+    return [
+        {
+            'day': day, 'enabled': index < 5 or rng.random() < 0.4, 'start_time': start, 'end_time': end,
+            'break_start': '12:00 PM', 'break_end': '1:00 PM',
+        }
+        for index, day in enumerate(_DAYS)
+    ]
+
+
+def specializations():
+    """The benchmark catalog's Specialization rows, created when missing."""
+    rows = []
+    for name, children in CATALOG.items():
+        speciality, _ = Speciality.objects.get_or_create(slug=name.lower(), defaults={'name': name})
+        for child in children:
+            specialization, _ = Specialization.objects.get_or_create(speciality=speciality, name=child)
+            rows.append(specialization)
+    return rows
+
+
+def seed_marketplace(providers=200, customers=None, bookings_per_provider=50, seed=7, prefix='synthetic',
+                     catalog=None):
+    """
+    Create a marketplace of `providers` providers and return the number of
+    rows created per model. `customers` defaults to five per provider;
+    usernames and emails start with `prefix`, which must not be in use.
+    Services are spread over the Specializations in `catalog` (default:
+    specializations()).
+    """
+    rng = random.Random(seed)
+    customers = providers * 5 if customers is None else customers
+    now = timezone.now()
+    today = timezone.localdate()
+    catalog = specializations() if catalog is None else list(catalog)
+
+    provider_rows = []
+    for i in range(providers):
+        city, district, lat, lng = rng.choice(CITIES)
+        lat, lng = lat + rng.uniform(-0.05, 0.05), lng + rng.uniform(-0.05, 0.05)
+        email = f'{prefix}-provider-{i}@example.com'
+        provider_rows.append(User(
+            username=f'{prefix}-provider-{i}', email=email, supabase_uid=supabase_uid(email),
+            first_name='Provider', last_name=str(i), user_type='offer', registration_completed=True,
+            city=city, district=district, latitude=lat, longitude=lng, geo_cell=geohash_encode(lat, lng),
+            years_of_experience=rng.randint(0, 20),
+        ))
+    provider_rows = User.objects.bulk_create(provider_rows)
+
+    customer_rows = User.objects.bulk_create([
+        User(
+            username=f'{prefix}-customer-{i}', email=f'{prefix}-customer-{i}@example.com',
+            supabase_uid=supabase_uid(f'{prefix}-customer-{i}@example.com'),
+            first_name='Customer', last_name=str(i), user_type='find', registration_completed=True,
+            city=rng.choice(CITIES)[0],
+        )
+        for i in range(customers)
+    ])
+
+    service_rows = []
+    for provider in provider_rows:
+        for specialization in rng.sample(catalog, rng.randint(1, 3)):
+            price = Decimal(rng.randrange(500, 5000, 50))
+            service_rows.append(Service(
+                provider=provider, specialization=specialization, title=specialization.name,
+                description=f'{specialization.name} in {provider.city}', base_price=price,
+                minimum_charge=price if rng.random() < 0.3 else Decimal('0'),
+                price_type=rng.choice(['fixed', 'hourly', 'negotiable']),
+                emergency_service=rng.random() < 0.2, is_active=rng.random() < 0.9,
+            ))
+    service_rows = Service.objects.bulk_create(service_rows)
+    services_by_provider = {}
+    for service in service_rows:
+        services_by_provider.setdefault(service.provider_id, []).append(service)
+
+    UserSpecialization.objects.bulk_create([
+        UserSpecialization(user_id=service.provider_id, specialization=service.specialization)
+        for service in service_rows
+    ], ignore_conflicts=True)
+    UserSpeciality.objects.bulk_create([
+        UserSpeciality(user_id=service.provider_id, speciality_id=service.specialization.speciality_id)
+        for service in service_rows
+    ], ignore_conflicts=True)
+    ProviderAvailability.objects.bulk_create([
+        ProviderAvailability(
+            provider=provider, weekly_schedule=_weekly_schedule(rng),
+            settings={'emergency_availability': rng.random() < 0.3, 'advance_booking': '5 days'},
+        )
+        for provider in provider_rows
+    ])
+
+    statuses, weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+    booking_rows = []
+    for provider in provider_rows:
+        for _ in range(bookings_per_provider):
+            service = rng.choice(services_by_provider[provider.pk])
+            booking_status = rng.choices(statuses, weights)[0]
+            day = today + timedelta(days=rng.randint(-120, 30))
+            slot = f'{rng.randint(8, 18):02d}:00'
+            scheduled = booking_status in _SCHEDULED_STATUSES
+            booking_rows.append(Booking(
+                customer=rng.choice(customer_rows), provider=provider, service=service, status=booking_status,
+                preferred_date=day, preferred_time=slot,
+                scheduled_date=day if scheduled else None, scheduled_time=slot if scheduled else None,
+                confirmation_deadline=(
+                    now + timedelta(hours=rng.randint(-48, 24)) if booking_status == 'pending' else None
+                ),
+                service_address='Synthetic address', service_city=provider.city, service_district=provider.district,
+                description=f'{service.title} needed', customer_phone='9800000000',
+                quoted_price=service.base_price,
+                final_price=service.base_price if booking_status == 'completed' else None,
+            ))
+    booking_rows = Booking.objects.bulk_create(booking_rows, batch_size=5000)
+
+    completed = [booking for booking in booking_rows if booking.status == 'completed']
+    payment_rows = []
+    for booking in completed:
+        payment_status = rng.choices(['completed', 'pending', 'failed', 'refunded'], [80, 12, 5, 3])[0]
+        fee = (booking.final_price * Decimal('0.10')).quantize(Decimal('0.01'))
+        payment_rows.append(Payment(
+            booking=booking, customer=booking.customer, provider=booking.provider, amount=booking.final_price,
+            platform_fee=fee, provider_amount=booking.final_price - fee,
+            payment_method=rng.choice(['khalti', 'cash']), status=payment_status,
+            paid_at=now - timedelta(days=rng.randint(0, 120)) if payment_status == 'completed' else None,
+        ))
+    Payment.objects.bulk_create(payment_rows, batch_size=5000)
+
+    review_rows = Review.objects.bulk_create([
+        Review(
+            booking=booking, customer=booking.customer, provider=booking.provider,
+            rating=rng.choices([1, 2, 3, 4, 5], [3, 5, 12, 35, 45])[0], comment='Synthetic review',
+        )
+        for booking in completed if rng.random() < 0.6
+    ], batch_size=5000)
+
+    return {
+        'providers': len(provider_rows), 'customers': len(customer_rows), 'services': len(service_rows),
+        'bookings': len(booking_rows), 'payments': len(payment_rows), 'reviews': len(review_rows),
+    }
@@ -1,3 +1,1602 @@
-from django.test import TestCase
+import io
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import InMemoryStorage, storages
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from backend import metrics
+from backend.query_budget import QUERY_BUDGETS, QueryBudgetExceeded, assert_query_budget
+
+from users import geo
+from users.content_addressed import ContentAddressedStorageMixin
+from users.models import StoredObject, User, Speciality, Specialization, UserSpeciality
+from .models import Service, Booking, BookingService, BookingEvent, BookingEventConsumer, BookingImage, Payment, ProviderAvailability, Review
+from .services import BookingConflictService, ProviderDiscoveryService
+from .transitions import TRANSITIONS, BookingTransitionService, TransitionError
+from .serializers import (
+    BookingSerializer, BookingImageSerializer, BookingListSerializer, ServiceSerializer, ReviewSerializer,
+    ProviderListSerializer,
+)
+from .fast_serializers import (
+    CompiledBookingListSerializer, CompiledServiceSerializer, CompiledReviewSerializer, CompiledProviderListSerializer,
+)
+from . import emails
+from . import events
+from .events import process_events
+from .fieldsets import Fieldset
+from .management.commands.load_test import _percentile, _token
+from .synthetic import supabase_uid
+from .plan_regressions import compare, summarize_plan, view_queryset
+from .query_catalog import read_plan
+from .images import render_variants, process_images, variant_names
+from .views import BookingImageUploadUrlsView, BookingImageConfirmView, UploadBookingImagesView
+
+
+class BookingCreateQueryBudgetTests(TestCase):
+    """Pin the number of queries the single-booking create path and CreateBookingView may issue."""
+
+    # service lookup, savepoint, booking INSERT, snapshot bulk INSERT,
+    # 'created' event INSERT, release
+    CREATE_QUERY_BUDGET = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        cls.provider = User.objects.create(username='provider', email='provider@example.com', user_type='offer')
+        speciality = Speciality.objects.create(name='Cleaning')
+        cls.services = [
+            Service.objects.create(
+                provider=cls.provider,
+                specialization=Specialization.objects.create(speciality=speciality, name=title),
+                title=title, description='Test service', base_price=price, price_type='fixed'
+            )
+            for title, price in (('Deep Clean', 1500), ('Window Clean', 500))
+        ]
+
+    def _payload(self, **extra):
+        return {
+            'service': self.services[0].id,
+            'preferred_date': (timezone.now() + timedelta(days=2)).date().isoformat(),
+            'preferred_time': '10:00:00',
+            'service_address': 'Baneshwor, Kathmandu',
+            'service_city': 'Kathmandu',
+            'description': 'Two bedroom flat',
+            'customer_phone': '9800000000',
+            **extra,
+        }
+
+    def _create(self, payload):
+        serializer = BookingSerializer(data=payload)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save(customer=self.customer)
+
+    def test_single_service_booking_within_budget(self):
+        with self.assertNumQueries(self.CREATE_QUERY_BUDGET):
+            booking = self._create(self._payload())
+
+        self.assertIsNotNone(booking.confirmation_deadline)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).confirmation_deadline, booking.confirmation_deadline)
+        self.assertEqual(BookingService.objects.filter(booking=booking).count(), 1)
+        self.assertEqual(list(booking.events.values_list('event_type', flat=True)), ['created'])
+        # Notification is left to the event worker
+        self.assertEqual(len(mail.outbox), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_events('notifications'), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(process_events('notifications'), 0)
+
+    def test_multi_service_booking_within_budget(self):
+        payload = self._payload(services=[svc.id for svc in self.services])
+        # One extra query resolves the `services` list
+        with self.assertNumQueries(self.CREATE_QUERY_BUDGET + 1):
+            booking = self._create(payload)
+
+        self.assertEqual(booking.quoted_price, 2000)
+        self.assertEqual(
+            set(booking.booking_services.values_list('service_id', flat=True)),
+            {svc.id for svc in self.services}
+        )
+        self.assertEqual(BookingEvent.objects.filter(booking=booking).count(), 1)
+
+    def test_create_view_within_budget(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        payload = self._payload(services=[svc.id for svc in self.services])
+        # The create path plus one reload of the booking and one query each for
+        # its images and services, however many services were booked
+        with self.assertNumQueries(self.CREATE_QUERY_BUDGET + 1 + 3):
+            response = client.post('/api/bookings/bookings/create/', payload, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertCountEqual(
+            [(row['service'], row['service_title'], row['specialization_name']) for row in response.data['booking_services']],
+            [(svc.id, svc.title, svc.specialization.name) for svc in self.services],
+        )
+        self.assertEqual(response.data['images'], [])
+        self.assertIsNone(response.data['payment'])
+        self.assertEqual(response.data['quoted_price'], '2000.00')
+
+
+class BookingBatchCreateTests(TestCase):
+    """CreateBookingBatchView: slot expansion, limits, conflicts and the bulk insert."""
+
+    URL = '/api/bookings/bookings/batch-create/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        cls.provider = User.objects.create(username='provider', email='provider@example.com', user_type='offer')
+        speciality = Speciality.objects.create(name='Cleaning')
+        cls.services = [
+            Service.objects.create(
+                provider=cls.provider,
+                specialization=Specialization.objects.create(speciality=speciality, name=title),
+                title=title, description='Test service', base_price=price, price_type='fixed'
+            )
+            for title, price in (('Deep Clean', 1500), ('Window Clean', 500))
+        ]
+        cls.day = (timezone.now() + timedelta(days=2)).date()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def _payload(self, **extra):
+        return {
+            'services': [svc.id for svc in self.services],
+            'service_address': 'Baneshwor, Kathmandu',
+            'service_city': 'Kathmandu',
+            'description': 'Weekly cleaning',
+            'customer_phone': '9800000000',
+            **extra,
+        }
+
+    def _slots(self, *offsets, time='10:00:00'):
+        return [{'preferred_date': (self.day + timedelta(days=d)).isoformat(), 'preferred_time': time} for d in offsets]
+
+    def test_repeat_expands_to_slots(self):
+        response = self.client.post(self.URL, self._payload(
+            preferred_date=self.day.isoformat(), preferred_time='10:00:00', repeat='weekly', occurrences=3
+        ), format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['count'], 3)
+        bookings = Booking.objects.order_by('preferred_date')
+        self.assertEqual(
+            [(b.preferred_date, b.preferred_time.strftime('%H:%M')) for b in bookings],
+            [(self.day + timedelta(weeks=i), '10:00') for i in range(3)]
+        )
+        self.assertEqual({b.quoted_price for b in bookings}, {2000})
+        self.assertEqual(BookingService.objects.count(), 6)
+
+    def test_batch_cap(self):
+        too_many = Booking.MAX_BATCH_BOOKINGS + 1
+        response = self.client.post(self.URL, self._payload(slots=self._slots(*range(too_many))), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('slots', response.json())
+        response = self.client.post(self.URL, self._payload(
+            preferred_date=self.day.isoformat(), preferred_time='10:00:00', repeat='daily', occurrences=too_many
+        ), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('occurrences', response.json())
+        self.assertFalse(Booking.objects.exists())
+
+    def test_duplicate_slots(self):
+        response = self.client.post(self.URL, self._payload(slots=self._slots(0, 1, 0)), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('slots', response.json())
+        self.assertFalse(Booking.objects.exists())
+
+    def test_conflicting_slot(self):
+        Booking.objects.create(
+            customer=self.customer, provider=self.provider, service=self.services[0], status='confirmed',
+            preferred_date=self.day + timedelta(days=1), preferred_time='10:30',
+            service_address='Baneshwor', service_city='Kathmandu', description='Flat', customer_phone='9800000000'
+        )
+        response = self.client.post(self.URL, self._payload(slots=self._slots(0, 1, 2)), format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['conflicts'], [
+            {'preferred_date': (self.day + timedelta(days=1)).isoformat(), 'preferred_time': '10:00:00'}
+        ])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_single_bulk_insert(self):
+        with mock.patch.object(
+            BookingSerializer, 'resolve_services', wraps=BookingSerializer.resolve_services
+        ) as resolve, CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.URL, self._payload(slots=self._slots(0, 1, 2)), format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        resolve.assert_called_once()
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(
+            [sql.split('"')[1] for sql in inserts],
+            [Booking._meta.db_table, BookingService._meta.db_table, BookingEvent._meta.db_table]
+        )
+        self.assertEqual(Booking.objects.count(), 3)
+        self.assertEqual(BookingEvent.objects.filter(event_type='created').count(), 3)
+
+
+class BookingSlotConflictTests(TestCase):
+    """BookingConflictService.find_slot_conflicts: visit durations, buffers and pending requests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        cls.provider = User.objects.create(username='provider', email='provider@example.com', user_type='offer')
+        cls.service = Service.objects.create(
+            provider=cls.provider, specialization=Specialization.objects.create(
+                speciality=Speciality.objects.create(name='Cleaning'), name='Deep Clean'
+            ),
+            title='Deep Clean', description='Test service', base_price=500, price_type='fixed',
+            estimated_duration=Decimal('2.00')
+        )
+        cls.day = (timezone.now() + timedelta(days=2)).date()
+
+    def _booking(self, status, preferred_time='10:00', **fields):
+        booking = Booking.objects.create(
+            customer=self.customer, provider=self.provider, service=self.service, status=status,
+            preferred_date=self.day, preferred_time=preferred_time,
+            service_address='Baneshwor', service_city='Kathmandu', description='Flat', customer_phone='9800000000',
+            **fields
+        )
+        BookingService.objects.bulk_create(BookingSerializer.snapshot_services(booking, [self.service]))
+        return booking
+
+    def _conflicts(self, *times, services=None):
+        slots = [(self.day, datetime.strptime(t, '%H:%M').time()) for t in times]
+        conflicts = BookingConflictService.find_slot_conflicts(self.provider, slots, services or [self.service])
+        return {c['preferred_time'].strftime('%H:%M'): c['booking_id'] for c in conflicts}
+
+    def test_overlap_includes_duration_and_buffer(self):
+        booking = self._booking('confirmed')
+        # Booked 10:00-12:00; a two-hour visit needs 15 minutes either side
+        with self.assertNumQueries(1):
+            conflicts = self._conflicts('07:45', '07:50', '10:00', '11:00', '12:10', '12:15')
+        self.assertEqual(conflicts, {'07:50': booking.id, '10:00': booking.id, '11:00': booking.id, '12:10': booking.id})
+
+    def test_provider_buffer_setting(self):
+        ProviderAvailability.objects.create(provider=self.provider, settings={'bufferTime': '30 minutes'})
+        booking = self._booking('in_progress')
+        self.assertEqual(self._conflicts('12:15', '12:30'), {'12:15': booking.id})
+
+    def test_pending_requests_count(self):
+        pending = self._booking('pending')
+        self._booking('declined', preferred_time='14:00')
+        self._booking('cancelled', preferred_time='14:00')
+        self.assertEqual(self._conflicts('10:00', '14:00'), {'10:00': pending.id})
+
+    def test_scheduled_slot_wins_over_preferred(self):
+        booking = self._booking('scheduled', scheduled_date=self.day, scheduled_time='15:00')
+        self.assertEqual(self._conflicts('10:00', '15:30'), {'15:30': booking.id})
+
+    def test_no_bookings(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self._conflicts('10:00'), {})
+        with self.assertNumQueries(0):
+            self.assertEqual(BookingConflictService.find_slot_conflicts(self.provider, []), [])
+
+
+class NearbyProvidersTests(TestCase):
+    """ProviderDiscoveryService.find_nearby_providers and NearbyProvidersView."""
+
+    URL = '/api/bookings/providers/nearby/'
+    # Kathmandu; km -> degrees of latitude
+    LAT, LNG = 27.7172, 85.3240
+    KM = 1 / geo.KM_PER_DEGREE_LAT
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.specialization = Specialization.objects.create(speciality=Speciality.objects.create(name='Cleaning'), name='Deep Clean')
+        cls.unlimited = cls._provider('unlimited', 1.0, service_radius=None)
+        cls.no_services = cls._provider('no_services', 2.0)
+        cls.inactive_only = cls._provider('inactive_only', 3.0, service_radius=1, is_active_service=False)
+        cls.covers = cls._provider('covers', 4.0, service_radius=10)
+        cls.too_small = cls._provider('too_small', 5.0, service_radius=3)
+        cls.outside = cls._provider('outside', 15.0, service_radius=None)
+        # Customers are not listed, wherever they are
+        User.objects.create(username='customer', email='customer@example.com', user_type='find', latitude=cls.LAT, longitude=cls.LNG)
+
+    @classmethod
+    def _provider(cls, name, km_north, service_radius=..., is_active_service=True):
+        provider = User.objects.create(
+            username=name, email=f'{name}@example.com', user_type='offer',
+            latitude=cls.LAT + km_north * cls.KM, longitude=cls.LNG
+        )
+        if service_radius is not ...:
+            Service.objects.create(
+                provider=provider, specialization=cls.specialization, title=name, description='Test service',
+                base_price=500, price_type='fixed', service_radius=service_radius, is_active=is_active_service
+            )
+        return provider
+
+    def _nearby(self, latitude=LAT, longitude=LNG, **kwargs):
+        return ProviderDiscoveryService.find_nearby_providers(latitude, longitude, **kwargs)
+
+    def test_radius_coverage_and_order(self):
+        providers = self._nearby(radius_km=10)
+        self.assertEqual(
+            [p.username for p in providers], ['unlimited', 'no_services', 'inactive_only', 'covers']
+        )
+        self.assertEqual([p.distance_km for p in providers], [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual([p.service_radius_km for p in providers], [None, None, None, 10])
+
+        # A wider search reaches the far provider; too_small's own radius still excludes it
+        self.assertEqual([p.username for p in self._nearby(radius_km=20)][-1], 'outside')
+        self.assertNotIn('too_small', [p.username for p in self._nearby(radius_km=20)])
+        self.assertEqual([p.username for p in self._nearby(radius_km=2.5)], ['unlimited', 'no_services'])
+
+    def test_limit_keeps_the_nearest(self):
+        self.assertEqual([p.username for p in self._nearby(radius_km=20, limit=2)], ['unlimited', 'no_services'])
+
+    def test_provider_in_neighbouring_cell(self):
+        # Away from the other providers (Pokhara)
+        latitude, longitude = 28.2096, 83.9856
+        precision = geo.precision_for_radius(latitude, 2)
+        lat_lo, lat_hi, _, _ = geo.decode_bounds(geo.encode(latitude, longitude, precision))
+        # Search just south of a cell's northern edge; the provider is 1 km north, across it
+        searched = lat_hi - 0.5 * self.KM
+        across = User.objects.create(
+            username='across', email='across@example.com', user_type='offer',
+            latitude=lat_hi + 0.5 * self.KM, longitude=longitude
+        )
+        self.assertNotEqual(across.geo_cell[:precision], geo.encode(searched, longitude, precision))
+
+        providers = self._nearby(latitude=searched, longitude=longitude, radius_km=2)
+        self.assertEqual([p.username for p in providers], ['across'])
+        self.assertAlmostEqual(providers[0].distance_km, 1.0, places=1)
+
+    def test_view(self):
+        response = self.client.get(self.URL, {'lat': self.LAT, 'lng': self.LNG, 'radius_km': 10, 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['radius_km'], body['count']), (10, 3))
+        self.assertEqual([r['id'] for r in body['results']], [self.unlimited.pk, self.no_services.pk, self.inactive_only.pk])
+        self.assertEqual(body['results'][0]['distance_km'], 1.0)
+
+        # Radius and limit are capped
+        body = self.client.get(self.URL, {'lat': self.LAT, 'lng': self.LNG, 'radius_km': 5000, 'limit': 5000}).json()
+        self.assertEqual(body['radius_km'], ProviderDiscoveryService.MAX_RADIUS_KM)
+
+    def test_view_validation(self):
+        for params in (
+            {}, {'lat': self.LAT}, {'lat': 'north', 'lng': self.LNG},
+            {'lat': 91, 'lng': self.LNG}, {'lat': self.LAT, 'lng': -181}, {'lat': 'nan', 'lng': self.LNG},
+            {'lat': self.LAT, 'lng': self.LNG, 'radius_km': 0}, {'lat': self.LAT, 'lng': self.LNG, 'radius_km': -5},
+            {'lat': self.LAT, 'lng': self.LNG, 'radius_km': 'nan'}, {'lat': self.LAT, 'lng': self.LNG, 'radius_km': 'far'},
+            {'lat': self.LAT, 'lng': self.LNG, 'limit': 'all'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.URL, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class BookingTransitionTests(TestCase):
+    """BookingTransitionService: the transition table, scoping, guards and racing updates."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        cls.provider = User.objects.create(username='provider', email='provider@example.com', user_type='offer')
+        cls.other_provider = User.objects.create(username='other', email='other@example.com', user_type='offer')
+        cls.service = Service.objects.create(
+            provider=cls.provider, specialization=Specialization.objects.create(
+                speciality=Speciality.objects.create(name='Cleaning'), name='Deep Clean'
+            ),
+            title='Deep Clean', description='Test service', base_price=500, price_type='fixed'
+        )
+
+    def _booking(self, status='pending', deadline=timedelta(hours=12), days_ahead=2, **fields):
+        booking = Booking.objects.create(
+            customer=self.customer, provider=self.provider, service=self.service,
+            preferred_date=(timezone.now() + timedelta(days=days_ahead)).date(), preferred_time='10:00',
+            service_address='Baneshwor', service_city='Kathmandu', description='Flat', customer_phone='9800000000'
+        )
+        Booking.objects.filter(pk=booking.pk).update(
+            status=status, confirmation_deadline=timezone.now() + deadline, **fields
+        )
+        return Booking.objects.get(pk=booking.pk)
+
+    def _client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_admin_cancel_records_who_when_and_why(self):
+        admin = User.objects.create(username='admin', email='admin@example.com', user_type='find', is_staff=True)
+        booking = self._booking('confirmed')
+        response = self._client(admin).post(f'/api/admin/bookings/{booking.id}/cancel/', {'reason': 'Duplicate request'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'cancelled')
+        self.assertIsNotNone(booking.cancelled_at)
+        self.assertEqual(booking.cancelled_by, admin)
+        self.assertEqual(booking.cancellation_reason, 'Duplicate request')
+        event = booking.events.get(event_type='admin_cancel')
+        self.assertEqual(event.actor, admin)
+        self.assertEqual(event.payload['changes']['cancelled_by'], admin.id)
+        self.assertEqual(event.payload['changes']['cancellation_reason'], 'Duplicate request')
+
+    def test_source_statuses(self):
+        for name, spec in TRANSITIONS.items():
+            # Satisfy the guards so only the status decides
+            deadline = timedelta(hours=-1) if name == 'expire' else timedelta(hours=12)
+            for status, _ in Booking.STATUS_CHOICES:
+                with self.subTest(transition=name, status=status):
+                    booking = self._booking(status, deadline=deadline)
+                    if status in spec['from']:
+                        result = BookingTransitionService.apply(booking.pk, name)
+                        self.assertEqual(result.status, spec['to'])
+                        self.assertEqual(Booking.objects.get(pk=booking.pk).status, spec['to'])
+                        self.assertEqual(list(result.events.values_list('event_type', flat=True)), [name])
+                    else:
+                        with self.assertRaises(TransitionError):
+                            BookingTransitionService.apply(booking.pk, name)
+                        self.assertEqual(Booking.objects.get(pk=booking.pk).status, status)
+                        self.assertFalse(booking.events.exists())
+
+    def test_status_specific_error(self):
+        booking = self._booking('expired')
+        with self.assertRaisesMessage(TransitionError, 'This booking has already expired.'):
+            BookingTransitionService.apply(booking.pk, 'decline')
+
+    def test_scope(self):
+        booking = self._booking()
+        with self.assertRaises(Booking.DoesNotExist):
+            BookingTransitionService.apply(booking.pk, 'accept', scope=Q(provider=self.other_provider))
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'pending')
+
+        url = f'/api/bookings/bookings/{booking.pk}/accept/'
+        # Another provider's booking looks missing; customers may not accept at all
+        self.assertEqual(self._client(self.other_provider).post(url).status_code, 404)
+        self.assertEqual(self._client(self.customer).post(url).status_code, 403)
+        self.assertEqual(self._client(self.provider).post(url).status_code, 200)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'confirmed')
+
+    def test_accept_after_deadline(self):
+        booking = self._booking(deadline=timedelta(hours=-1))
+        with self.assertRaisesMessage(TransitionError, TRANSITIONS['accept']['condition_error']):
+            BookingTransitionService.apply(booking.pk, 'accept')
+
+        response = self._client(self.provider).post(f'/api/bookings/bookings/{booking.pk}/accept/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('expired', response.json()['error'])
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'expired')
+
+    def test_accept_after_service_time(self):
+        booking = self._booking(days_ahead=-1)
+        with self.assertRaisesMessage(TransitionError, TRANSITIONS['accept']['condition_error']):
+            BookingTransitionService.apply(booking.pk, 'accept')
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'pending')
+
+    def test_accepted_at_is_set_once(self):
+        first_accepted = timezone.now() - timedelta(days=1)
+        booking = self._booking(accepted_at=first_accepted)
+        result = BookingTransitionService.apply(booking, 'accept')
+        self.assertEqual(result.accepted_at, first_accepted)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).accepted_at, first_accepted)
+
+        booking = self._booking()
+        result = BookingTransitionService.apply(booking, 'accept')
+        self.assertIsNotNone(result.accepted_at)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).accepted_at, result.accepted_at)
+
+    def test_racing_transitions(self):
+        # Both requests loaded the booking while it was pending
+        booking = self._booking()
+        seen_by_accept = Booking.objects.get(pk=booking.pk)
+        seen_by_decline = Booking.objects.get(pk=booking.pk)
+
+        BookingTransitionService.apply(seen_by_accept, 'accept')
+        with self.assertRaises(TransitionError) as raised:
+            BookingTransitionService.apply(seen_by_decline, 'decline')
+        self.assertEqual(raised.exception.booking.status, 'confirmed')
+        with self.assertRaises(TransitionError):
+            BookingTransitionService.apply(seen_by_decline, 'accept')
+
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'confirmed')
+        self.assertEqual(list(booking.events.values_list('event_type', flat=True)), ['accept'])
+
+    def test_complete_validates_final_price(self):
+        client = self._client(self.provider)
+        for final_price in ('NaN', 'Infinity', 'abc', '12.345', '123456789.00', '-5'):
+            with self.subTest(final_price=final_price):
+                booking = self._booking('in_progress')
+                response = client.post(
+                    f'/api/bookings/bookings/{booking.pk}/complete/', {'final_price': final_price}, format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('final_price', response.json())
+                self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'in_progress')
+
+        booking = self._booking('in_progress')
+        response = client.post(
+            f'/api/bookings/bookings/{booking.pk}/complete/', {'final_price': '1500.50', 'completion_note': 'Done'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        booking.refresh_from_db()
+        self.assertEqual((booking.status, booking.final_price, booking.completion_note), ('completed', Decimal('1500.50'), 'Done'))
+
+
+class BookingEventGapTests(TestCase):
+    """Consumers read past ids that are not visible yet and pick the events up once committed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        provider = User.objects.create(username='provider', email='provider@example.com', user_type='offer')
+        service = Service.objects.create(
+            provider=provider, specialization=Specialization.objects.create(
+                speciality=Speciality.objects.create(name='Cleaning'), name='Deep Clean'
+            ),
+            title='Deep Clean', description='Test service', base_price=500, price_type='fixed'
+        )
+        cls.booking = Booking.objects.create(
+            customer=customer, provider=provider, service=service,
+            preferred_date=(timezone.now() + timedelta(days=2)).date(), preferred_time='10:00',
+            service_address='Baneshwor', service_city='Kathmandu', description='Flat', customer_phone='9800000000'
+        )
+
+    def setUp(self):
+        self.seen = []
+        patches = [
+            mock.patch.dict(events.CONSUMERS, {'test': lambda event: self.seen.append(event.id)}),
+            # Behave like PostgreSQL, where transactions can commit out of id order
+            mock.patch.object(events, '_writes_serialized', return_value=False),
+            mock.patch.object(events, '_snapshot_bounds', return_value=(100, 105)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.base = BookingEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        events.reset_offset('test', self.base)
+
+    def _event(self, event_id):
+        return BookingEvent.objects.create(id=event_id, booking=self.booking, event_type='note', to_status='pending')
+
+    def _gaps(self):
+        return BookingEventConsumer.objects.get(name='test').pending_gaps
+
+    def test_late_commit_is_delivered(self):
+        self._event(self.base + 1)
+        self._event(self.base + 3)
+        self.assertEqual(process_events('test'), 2)
+        self.assertEqual(self.seen, [self.base + 1, self.base + 3])
+        self.assertEqual(self._gaps(), [{'id': self.base + 2, 'xmax': 105}])
+
+        # Writer still running: nothing to do, however long it takes
+        self.assertEqual(process_events('test'), 0)
+        self.assertEqual(len(self._gaps()), 1)
+
+        self._event(self.base + 2)
+        self._event(self.base + 4)
+        self.assertEqual(process_events('test'), 2)
+        self.assertEqual(self.seen[2:], [self.base + 2, self.base + 4])
+        self.assertEqual(self._gaps(), [])
+
+    def test_rolled_back_ids_are_dropped_once_their_writers_finished(self):
+        self._event(self.base + 2)
+        process_events('test')
+        self.assertEqual(self._gaps(), [{'id': self.base + 1, 'xmax': 105}])
+
+        # Transactions below 105 may still be running
+        with mock.patch.object(events, '_snapshot_bounds', return_value=(104, 110)):
+            process_events('test')
+        self.assertEqual(len(self._gaps()), 1)
+
+        with mock.patch.object(events, '_snapshot_bounds', return_value=(105, 110)):
+            process_events('test')
+        self.assertEqual(self._gaps(), [])
+        self.assertEqual(self.seen, [self.base + 2])
+
+    def test_failed_gap_event_is_retried(self):
+        self._event(self.base + 2)
+        process_events('test')
+        self._event(self.base + 1)
+        with mock.patch.dict(events.CONSUMERS, {'test': mock.Mock(side_effect=RuntimeError)}), \
+                self.assertLogs('bookings.events', 'ERROR'):
+            self.assertEqual(process_events('test'), 0)
+        self.assertEqual(len(self._gaps()), 1)
+        self.assertEqual(process_events('test'), 1)
+        self.assertEqual(self.seen, [self.base + 2, self.base + 1])
+
+    def test_serialized_writes_keep_no_gaps(self):
+        self._event(self.base + 2)
+        with mock.patch.object(events, '_writes_serialized', return_value=True):
+            self.assertEqual(process_events('test'), 1)
+        self.assertEqual(self._gaps(), [])
+
+
+JPEG_MAGIC = b'\xff\xd8\xff\xe0'
+
+
+class BookingEventConsumerTests(TestCase):
+    """The consumers in bookings.events.CONSUMERS."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        cls.provider = User.objects.create(username='provider', email='provider@example.com', user_type='offer')
+        cls.service = Service.objects.create(
+            provider=cls.provider, specialization=Specialization.objects.create(
+                speciality=Speciality.objects.create(name='Cleaning'), name='Deep Clean'
+            ),
+            title='Deep Clean', description='Test service', base_price=500, price_type='fixed'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.booking = Booking.objects.create(
+            customer=self.customer, provider=self.provider, service=self.service, quoted_price=500,
+            preferred_date=(timezone.now() + timedelta(days=2)).date(), preferred_time='10:00',
+            service_address='Baneshwor', service_city='Kathmandu', description='Flat', customer_phone='9800000000'
+        )
+        BookingService.objects.bulk_create(BookingSerializer.snapshot_services(self.booking, [self.service]))
+        events.record_bookings_created([self.booking], actor=self.customer)
+
+    def test_dashboard_stats_are_rolled_up(self):
+        self.assertEqual(process_events('dashboard_stats'), 1)
+        self.assertEqual(cache.get(f'user_dashboard_stats:{self.customer.id}')['active_jobs'], 1)
+        self.assertEqual(cache.get(f'provider_dashboard_stats:{self.provider.id}')['active_jobs'], 1)
+
+        for name in ('schedule', 'start'):
+            BookingTransitionService.apply(self.booking, name, actor=self.provider)
+        BookingTransitionService.apply(self.booking, 'complete', actor=self.provider, fields={'final_price': 800})
+        self.assertEqual(process_events('dashboard_stats'), 3)
+        self.assertEqual(
+            cache.get(f'user_dashboard_stats:{self.customer.id}'),
+            {'total_bookings': 1, 'active_jobs': 0, 'completed_jobs': 1, 'total_spent': 800.0},
+        )
+
+        # The dashboard is served from the rollup
+        client = APIClient()
+        client.force_authenticate(self.provider)
+        with self.assertNumQueries(0):
+            response = client.get('/api/bookings/dashboard/stats/provider/')
+        self.assertEqual(response.data['total_jobs'], 1)
+
+    def test_emails_are_sent_after_the_offset_commits(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(process_events('notifications'), 1)
+            # Nothing is sent while the consumer's transaction is open
+            self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(BookingEventConsumer.objects.get(name='notifications').last_event_id, self.booking.events.get().id)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.provider.email])
+
+    def test_email_is_not_sent_when_the_consumer_fails(self):
+        BookingEventConsumer.objects.get_or_create(name='notifications')
+        with mock.patch.object(BookingEventConsumer, 'save', side_effect=RuntimeError('database went away')), \
+                self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                process_events('notifications')
+        # The offset did not advance, so the retry sends the email once
+        self.assertEqual(len(mail.outbox), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_events('notifications'), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class SignedUploadTestStorage(InMemoryStorage):
+    """
+    Local stand-in for SupabaseStorage's signed upload API. `client_put`
+    plays the part of the client uploading to the signed URL.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.content_types = {}
+
+    def signed_upload_url(self, name):
+        return {'url': f'https://storage.test/upload/{name}', 'token': 'test-token'}
+
+    def client_put(self, name, data, content_type):
+        self._save(name, ContentFile(data))
+        self.content_types[name] = content_type
+
+    def object_info(self, name):
+        if not self.exists(name):
+            return None
+        return {'size': self.size(name), 'content_type': self.content_types.get(name)}
+
+
+class ContentAddressedSignedUploadTestStorage(ContentAddressedStorageMixin, SignedUploadTestStorage):
+    """In-memory stand-in for ContentAddressedSupabaseStorage."""
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'bookings.tests.SignedUploadTestStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class BookingImageSignedUploadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        cls.provider = User.objects.create(username='provider', email='provider@example.com', user_type='offer')
+        speciality = Speciality.objects.create(name='Plumbing')
+        service = Service.objects.create(
+            provider=cls.provider,
+            specialization=Specialization.objects.create(speciality=speciality, name='Pipe Repair'),
+            title='Pipe Repair', description='Test service', base_price=800, price_type='fixed'
+        )
+        cls.booking = Booking.objects.create(
+            customer=cls.customer, provider=cls.provider, service=service,
+            preferred_date=(timezone.now() + timedelta(days=1)).date(), preferred_time='10:00',
+            service_address='Lalitpur', service_city='Lalitpur', description='Leak', customer_phone='9800000000'
+        )
+
+    def _post(self, view, data, booking=None):
+        request = APIRequestFactory().post('/', data, format='json')
+        force_authenticate(request, user=self.customer)
+        return view.as_view()(request, booking_id=(booking or self.booking).id)
+
+    def _issue(self, *sizes):
+        files = [{'content_type': 'image/jpeg', 'size': size} for size in sizes]
+        response = self._post(BookingImageUploadUrlsView, {'image_type': 'before', 'files': files})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['uploads']
+
+    def test_upload_then_confirm_records_images(self):
+        uploads = self._issue(1000, 2000)
+        for upload, size in zip(uploads, (1000, 2000)):
+            self.assertTrue(upload['path'].startswith(f'bookings/booking_{self.booking.id}/before_'))
+            storages['default'].client_put(upload['path'], JPEG_MAGIC + b'x' * (size - len(JPEG_MAGIC)), 'image/jpeg')
+
+        body = {'uploads': [{'upload_id': u['upload_id'], 'description': 'Leak'} for u in uploads]}
+        response = self._post(BookingImageConfirmView, body)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(
+            set(BookingImage.objects.filter(booking=self.booking).values_list('image', flat=True)),
+            {u['path'] for u in uploads}
+        )
+
+        # Confirming again does not duplicate rows
+        response = self._post(BookingImageConfirmView, body)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(BookingImage.objects.filter(booking=self.booking).count(), 2)
+
+    def test_rejects_declared_size_and_count_over_limit(self):
+        response = self._post(BookingImageUploadUrlsView, {
+            'image_type': 'before', 'files': [{'content_type': 'image/jpeg', 'size': 6 * 1024 * 1024}]
+        })
+        self.assertEqual(response.status_code, 400)
+        response = self._post(BookingImageUploadUrlsView, {
+            'image_type': 'before', 'files': [{'content_type': 'image/jpeg', 'size': 10}] * 4
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_confirm_checks_stored_object(self):
+        missing, oversized, wrong_type = self._issue(1000, 1000, 1000)
+        disguised, mislabelled = self._issue(1000, 1000)
+        storages['default'].client_put(oversized['path'], JPEG_MAGIC + b'x' * (6 * 1024 * 1024), 'image/jpeg')
+        storages['default'].client_put(wrong_type['path'], b'x' * 10, 'text/html')
+        # The declared type is right, the bytes are not
+        storages['default'].client_put(disguised['path'], b'<html><script>alert(1)</script></html>', 'image/jpeg')
+        storages['default'].client_put(mislabelled['path'], b'\x89PNG\r\n\x1a\n' + b'x' * 100, 'image/jpeg')
+
+        errors = {}
+        for label, upload in (
+            ('missing', missing), ('oversized', oversized), ('wrong_type', wrong_type),
+            ('disguised', disguised), ('mislabelled', mislabelled),
+        ):
+            response = self._post(BookingImageConfirmView, {'uploads': [{'upload_id': upload['upload_id']}]})
+            self.assertEqual(response.status_code, 400)
+            errors[label] = response.data['error']
+        self.assertIn('detected: unknown', errors['disguised'])
+        self.assertEqual(errors['mislabelled'], 'File content is image/png, not image/jpeg')
+        # Offending objects are removed from storage
+        for upload in (oversized, wrong_type, disguised, mislabelled):
+            self.assertFalse(storages['default'].exists(upload['path']))
+        self.assertFalse(BookingImage.objects.exists())
+
+    def _multipart(self, *files, image_type='before'):
+        request = APIRequestFactory().post('/', {'image_type': image_type, 'images': list(files)}, format='multipart')
+        force_authenticate(request, user=self.customer)
+        return UploadBookingImagesView.as_view()(request, booking_id=self.booking.id)
+
+    def test_multipart_batch_upload(self):
+        photos = [SimpleUploadedFile(f'p{i}.jpg', b'x' * 100, content_type='image/jpeg') for i in range(2)]
+        response = self._multipart(*photos)
+        self.assertEqual(response.status_code, 200, response.data)
+        names = list(BookingImage.objects.filter(booking=self.booking).values_list('image', flat=True))
+        self.assertEqual(len(names), 2)
+        self.assertTrue(all(storages['default'].exists(name) for name in names))
+
+        # Two more would exceed the limit of 3: rejected before anything is stored
+        photos = [SimpleUploadedFile(f'q{i}.jpg', b'y' * 100, content_type='image/jpeg') for i in range(2)]
+        self.assertEqual(self._multipart(*photos).status_code, 400)
+        self.assertEqual(BookingImage.objects.filter(booking=self.booking).count(), 2)
+
+    def test_multipart_upload_failure_leaves_nothing_behind(self):
+        storage = storages['default']
+        saved = []
+        original_save = storage._save
+
+        def flaky_save(name, content):
+            if content.name == 'bad.jpg':
+                raise OSError('storage unavailable')
+            saved.append(original_save(name, content))
+            return saved[-1]
+
+        storage._save = flaky_save
+        try:
+            response = self._multipart(
+                SimpleUploadedFile('good.jpg', b'x' * 100, content_type='image/jpeg'),
+                SimpleUploadedFile('bad.jpg', b'x' * 100, content_type='image/jpeg'),
+            )
+        finally:
+            del storage._save
+        self.assertEqual(response.status_code, 502)
+        self.assertFalse(BookingImage.objects.exists())
+        # The upload that succeeded was removed again
+        self.assertEqual(len(saved), 1)
+        self.assertFalse(storage.exists(saved[0]))
+
+    def test_confirm_rejects_tampered_or_foreign_upload(self):
+        upload = self._issue(1000)[0]
+        storages['default'].client_put(upload['path'], b'x' * 1000, 'image/jpeg')
+
+        response = self._post(BookingImageConfirmView, {'uploads': [{'upload_id': upload['upload_id'] + 'x'}]})
+        self.assertEqual(response.status_code, 400)
+
+        other = Booking.objects.create(
+            customer=self.customer, provider=self.provider, service=self.booking.service,
+            preferred_date=self.booking.preferred_date, preferred_time='12:00',
+            service_address='Lalitpur', service_city='Lalitpur', description='Other', customer_phone='9800000000'
+        )
+        response = self._post(BookingImageConfirmView, {'uploads': [{'upload_id': upload['upload_id']}]}, booking=other)
+        self.assertEqual(response.status_code, 400)
+
+
+def _jpeg_with_exif(width, height):
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90
+    exif[0x8825] = {1: 'N', 2: (27.0, 42.0, 0.0)}  # GPS
+    out = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 100, 50)).save(out, format='JPEG', exif=exif)
+    return out.getvalue()
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'bookings.tests.SignedUploadTestStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class BookingImageVariantTests(TestCase):
+
+    def test_render_variants_resizes_and_strips_exif(self):
+        variants = render_variants(_jpeg_with_exif(4000, 3000), formats=['webp', 'jpeg'])
+        # Orientation is applied to the pixels, so portrait output
+        self.assertEqual((variants['full']['width'], variants['full']['height']), (1440, 1920))
+        self.assertEqual((variants['thumb']['width'], variants['thumb']['height']), (240, 320))
+        for variant in variants.values():
+            for data in variant['files'].values():
+                with Image.open(io.BytesIO(data)) as image:
+                    self.assertFalse(image.getexif())
+
+        # Small images are not upscaled
+        small = render_variants(_jpeg_with_exif(400, 300), formats=['jpeg'])
+        self.assertEqual(small['full']['height'], 400)
+
+    def test_process_images_records_variants_and_srcset(self):
+        customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        provider = User.objects.create(username='provider', email='provider@example.com', user_type='offer')
+        service = Service.objects.create(
+            provider=provider,
+            specialization=Specialization.objects.create(speciality=Speciality.objects.create(name='Painting'), name='Walls'),
+            title='Walls', description='Test service', base_price=800, price_type='fixed'
+        )
+        booking = Booking.objects.create(
+            customer=customer, provider=provider, service=service,
+            preferred_date=(timezone.now() + timedelta(days=1)).date(), preferred_time='10:00',
+            service_address='Lalitpur', service_city='Lalitpur', description='Paint', customer_phone='9800000000'
+        )
+        image = BookingImage.objects.create(
+            booking=booking, image_type='before', uploaded_by=customer,
+            image=ContentFile(_jpeg_with_exif(2000, 1500), name='wall.jpg')
+        )
+        broken = BookingImage.objects.create(
+            booking=booking, image_type='before', uploaded_by=customer,
+            image=ContentFile(b'not an image', name='broken.jpg')
+        )
+        self.assertEqual(image.variants_status, 'pending')
+
+        processed, failed = process_images(BookingImage.objects.filter(booking=booking).order_by('id'))
+        self.assertEqual((processed, failed), (1, 1))
+
+        image.refresh_from_db()
+        broken.refresh_from_db()
+        self.assertEqual(broken.variants_status, 'failed')
+        self.assertEqual(image.variants_status, 'ready')
+        self.assertTrue(storages['default'].exists(image.variants['thumb']['webp']))
+
+        request = APIRequestFactory().get('/')
+        data = BookingImageSerializer(image, context={'request': request}).data
+        self.assertIn(image.variants['full']['jpeg'], data['image_url'])
+        self.assertIn(image.variants['thumb']['jpeg'], data['thumbnail_url'])
+        self.assertIn(image.image.name, data['original_url'])
+        self.assertEqual(data['srcset']['jpeg'].count('w,'), 2)
+
+
+    def _image(self):
+        customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        provider = User.objects.create(username='provider', email='provider@example.com', user_type='offer')
+        service = Service.objects.create(
+            provider=provider,
+            specialization=Specialization.objects.create(speciality=Speciality.objects.create(name='Painting'), name='Walls'),
+            title='Walls', description='Test service', base_price=800, price_type='fixed'
+        )
+        booking = Booking.objects.create(
+            customer=customer, provider=provider, service=service,
+            preferred_date=(timezone.now() + timedelta(days=1)).date(), preferred_time='10:00',
+            service_address='Lalitpur', service_city='Lalitpur', description='Paint', customer_phone='9800000000'
+        )
+        return BookingImage.objects.create(
+            booking=booking, image_type='before', uploaded_by=customer,
+            image=ContentFile(_jpeg_with_exif(1200, 900), name='wall.jpg')
+        )
+
+    def test_reprocessing_deletes_previous_variants(self):
+        image = self._image()
+        process_images([image])
+        first = variant_names(image.variants)
+
+        process_images([BookingImage.objects.get(pk=image.pk)])
+        second = variant_names(BookingImage.objects.get(pk=image.pk).variants)
+        storage = storages['default']
+        self.assertEqual(len(second), len(first))
+        self.assertFalse(any(storage.exists(name) for name in first))
+        self.assertTrue(all(storage.exists(name) for name in second))
+
+    @override_settings(STORAGES={
+        'default': {'BACKEND': 'bookings.tests.ContentAddressedSignedUploadTestStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    })
+    def test_reprocessing_under_content_addressed_storage(self):
+        image = self._image()
+        process_images([image])
+        first = variant_names(image.variants)
+
+        image = BookingImage.objects.get(pk=image.pk)
+        with mock.patch.object(storages['default'], 'exists', side_effect=AssertionError('no existence check')):
+            self.assertEqual(process_images([image]), (1, 0))
+        # Same content, same names, and still one reference each
+        self.assertEqual(variant_names(image.variants), first)
+        self.assertEqual(set(StoredObject.objects.filter(name__in=first).values_list('refcount', flat=True)), {1})
+
+
+def _url_names(patterns):
+    """URL names of every route in `patterns`, including nested includes."""
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= _url_names(pattern.url_patterns)
+        elif pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+@override_settings(QUERY_INSTRUMENTATION=True, QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """List endpoints stay within their QUERY_BUDGETS however many rows they return."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='admin', email='admin@example.com', user_type='find', is_staff=True)
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        speciality = Speciality.objects.create(name='Cleaning')
+        cls.providers = []
+        for index in range(3):
+            provider = User.objects.create(
+                username=f'provider{index}', email=f'provider{index}@example.com', user_type='offer',
+                city='Kathmandu', latitude=27.70 + index * 0.001, longitude=85.30
+            )
+            cls.providers.append(provider)
+            for name in ('Deep Clean', 'Window Clean'):
+                Service.objects.create(
+                    provider=provider,
+                    specialization=Specialization.objects.create(speciality=speciality, name=f'{name} {index}'),
+                    title=name, description='Test service', base_price=500, price_type='fixed'
+                )
+        provider = cls.providers[0]
+        service = provider.services.first()
+        for day in range(1, 5):
+            booking = Booking.objects.create(
+                customer=cls.customer, provider=provider, service=service, status='completed', final_price=1000,
+                preferred_date=(timezone.now() + timedelta(days=day)).date(), preferred_time='10:00',
+                service_address='Baneshwor', service_city='Kathmandu', description='Flat', customer_phone='9800000000'
+            )
+            Payment.objects.create(
+                booking=booking, customer=cls.customer, provider=provider, amount=1000,
+                platform_fee=100, provider_amount=900, payment_method='cash', status='completed'
+            )
+            Review.objects.create(booking=booking, customer=cls.customer, provider=provider, rating=4, title='Good')
+
+    def _get(self, user, url):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def test_list_endpoints_within_budget(self):
+        provider = self.providers[0]
+        for user, url in (
+            (self.customer, '/api/bookings/my-bookings/'),
+            (provider, '/api/bookings/provider-bookings/'),
+            (provider, '/api/bookings/services/my/'),
+            (provider, '/api/bookings/reviews/my/'),
+            (None, '/api/bookings/providers/'),
+            (None, '/api/bookings/providers/nearby/?lat=27.7&lng=85.3'),
+            (None, f'/api/bookings/providers/{provider.id}/'),
+            (self.customer, f'/api/bookings/alternative-dates/?provider_id={provider.id}'
+                            f'&preferred_date={timezone.now().date().isoformat()}'),
+            (self.customer, '/api/payments/history/'),
+            (self.admin, '/api/admin/users/'),
+            (self.admin, '/api/admin/recent-users/'),
+            (self.admin, '/api/admin/bookings/'),
+        ):
+            with self.subTest(url=url):
+                # Strict mode raises QueryBudgetExceeded from the middleware
+                self._get(user, url)
+
+    def _overdue_booking(self):
+        return Booking.objects.create(
+            customer=self.customer, provider=self.providers[0], service=self.providers[0].services.first(),
+            status='pending', confirmation_deadline=timezone.now() - timedelta(minutes=5),
+            preferred_date=(timezone.now() + timedelta(days=1)).date(), preferred_time='10:00',
+            service_address='Baneshwor', service_city='Kathmandu', description='Flat', customer_phone='9800000000'
+        )
+
+    @override_settings(SUPABASE_JWT_SECRET='query-budget-secret-with-32-bytes')
+    def test_token_requests_with_overdue_bookings_within_budget(self):
+        provider = self.providers[0]
+        for user in (self.customer, provider):
+            user.supabase_uid = supabase_uid(user.email)
+            user.save(update_fields=['supabase_uid'])
+        detail = self._overdue_booking()
+        Booking.objects.filter(pk=detail.pk).update(confirmation_deadline=timezone.now() + timedelta(hours=1))
+
+        # Plain requests with a signed token pay for the token lookup, and
+        # overdue bookings are expired on the way; strict mode raises
+        # QueryBudgetExceeded from the middleware
+        for user, url, overdue in (
+            (self.customer, '/api/bookings/my-bookings/', 3),
+            (self.customer, '/api/bookings/my-bookings/', 0),
+            (provider, '/api/bookings/provider-bookings/', 3),
+            (provider, '/api/bookings/provider-bookings/', 0),
+            (self.customer, f'/api/bookings/bookings/{detail.id}/', 0),
+            (self.customer, f'/api/bookings/bookings/{detail.id}/', 1),
+        ):
+            with self.subTest(url=url, overdue=overdue):
+                if url.endswith(f'/{detail.id}/') and overdue:
+                    Booking.objects.filter(pk=detail.pk).update(confirmation_deadline=timezone.now() - timedelta(minutes=5))
+                    expiring = [detail]
+                else:
+                    expiring = [self._overdue_booking() for _ in range(overdue)]
+                response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {_token(user)}')
+                self.assertEqual(response.status_code, 200)
+                for booking in expiring:
+                    booking.refresh_from_db()
+                    self.assertEqual(booking.status, 'expired')
+        self.assertEqual(BookingEvent.objects.filter(event_type='expire').count(), 7)
+
+    def test_server_timing_header(self):
+        response = self._get(self.customer, '/api/bookings/my-bookings/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[0-9.]+;desc="\d+ queries", db-repeated;desc="0 repeated"$')
+
+    def test_assert_query_budget_reports_repeated_statements(self):
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            with assert_query_budget(max_queries=2):
+                for provider in self.providers:
+                    list(provider.services.all())
+        self.assertIn('3x SELECT', str(raised.exception))
+
+    def test_every_route_has_a_budget(self):
+        names = set()
+        for urlconf in ('bookings.urls', 'payments.urls', 'admin_panel.urls'):
+            names |= _url_names(get_resolver(urlconf).url_patterns)
+        self.assertEqual(names - set(QUERY_BUDGETS), set())
+
+
+class CompiledSerializerGoldenTests(TestCase):
+    """The compiled list serializers render exactly what the DRF serializers render."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find', first_name='Sita')
+        cls.anonymous = User.objects.create(username='anon', email='anon@example.com', user_type='find')
+        plumbing = Speciality.objects.create(name='Plumbing', slug='plumbing')
+        cleaning = Speciality.objects.create(name='Cleaning', slug='cleaning')
+        cls.providers = [
+            User.objects.create(
+                username='ram', email='ram@example.com', user_type='offer', first_name='Ram', last_name='Thapa',
+                city='Kathmandu', years_of_experience=5, profile_picture='https://cdn.example.com/ram.jpg'
+            ),
+            User.objects.create(username='hari', email='hari@example.com', user_type='offer', district='Lalitpur'),
+            User.objects.create(username='idle', email='idle@example.com', user_type='offer'),
+        ]
+        UserSpeciality.objects.create(user=cls.providers[0], speciality=plumbing)
+        UserSpeciality.objects.create(user=cls.providers[0], speciality=cleaning)
+        services = []
+        for provider, name, speciality, title, base, minimum, active in (
+            (cls.providers[0], 'Pipe Repair', plumbing, 'Pipe Repair', '800.00', None, True),
+            (cls.providers[0], 'Drain Cleaning', plumbing, '', '1200.50', '1000.00', True),
+            (cls.providers[0], 'Tap Fitting', plumbing, 'Tap Fitting', '300.00', '0', True),
+            (cls.providers[0], 'Geyser', plumbing, 'Geyser', '200.00', None, False),
+            (cls.providers[1], 'Deep Clean', cleaning, 'Deep Clean', '1500.00', None, True),
+        ):
+            services.append(Service.objects.create(
+                provider=provider, specialization=Specialization.objects.create(speciality=speciality, name=name),
+                title=title, description='Test service', base_price=Decimal(base),
+                minimum_charge=Decimal(minimum or '0'), price_type='fixed'
+            ))
+
+        now = timezone.now()
+        for index, (customer, provider, service, booking_status, deadline, price) in enumerate((
+            (cls.customer, cls.providers[0], services[0], 'pending', now - timedelta(hours=1), None),
+            (cls.customer, cls.providers[0], services[1], 'pending', now + timedelta(hours=5), Decimal('950.00')),
+            (cls.anonymous, cls.providers[0], services[2], 'completed', None, Decimal('1200.00')),
+            (cls.customer, cls.providers[1], services[4], 'confirmed', None, None),
+        )):
+            booking = Booking.objects.create(
+                customer=customer, provider=provider, service=service, status=booking_status,
+                preferred_date=(now + timedelta(days=index + 1)).date(), preferred_time='10:30',
+                scheduled_date=(now + timedelta(days=index + 1)).date() if booking_status == 'confirmed' else None,
+                service_address='Baneshwor', service_city='Kathmandu', description='Job', customer_phone='9800000000',
+                quoted_price=price, final_price=price
+            )
+            Booking.objects.filter(pk=booking.pk).update(confirmation_deadline=deadline)
+            if booking_status == 'completed':
+                Payment.objects.create(
+                    booking=booking, customer=customer, provider=provider, amount=Decimal('1200.00'),
+                    platform_fee=Decimal('120.00'), provider_amount=Decimal('1080.00'),
+                    payment_method='khalti', status='completed', paid_at=now
+                )
+                Review.objects.create(
+                    booking=booking, customer=customer, provider=provider, rating=5, title='Great',
+                    comment='Fixed quickly', provider_response='Thanks!', responded_at=now
+                )
+
+    def assertSameOutput(self, serializer_class, compiled_class, queryset):
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        compiled = compiled_class()
+        actual = JSONRenderer().render(compiled.many(compiled.values(queryset)))
+        self.assertEqual(actual, expected)
+
+    def test_booking_list(self):
+        self.assertSameOutput(
+            BookingListSerializer, CompiledBookingListSerializer,
+            Booking.objects.order_by('-created_at', '-id')
+        )
+
+    def test_services(self):
+        self.assertSameOutput(ServiceSerializer, CompiledServiceSerializer, Service.objects.order_by('id'))
+
+    def test_reviews(self):
+        self.assertSameOutput(ReviewSerializer, CompiledReviewSerializer, Review.objects.all())
+
+    def test_provider_list(self):
+        self.assertSameOutput(
+            ProviderListSerializer, CompiledProviderListSerializer,
+            User.objects.filter(user_type='offer').order_by('id')
+        )
+
+    def test_list_view_uses_compiled_serializer(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        response = client.get('/api/bookings/my-bookings/')
+        expected = BookingListSerializer(
+            Booking.objects.filter(customer=self.customer).order_by('-created_at'), many=True
+        ).data
+        self.assertEqual(JSONRenderer().render(response.data['results']), JSONRenderer().render(expected))
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= and ?expand= prune both the response and the queries behind it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        cls.provider = User.objects.create(
+            username='provider', email='provider@example.com', user_type='offer', first_name='Ram'
+        )
+        plumbing = Speciality.objects.create(name='Plumbing', slug='plumbing')
+        UserSpeciality.objects.create(user=cls.provider, speciality=plumbing)
+        service = Service.objects.create(
+            provider=cls.provider, specialization=Specialization.objects.create(speciality=plumbing, name='Pipe Repair'),
+            title='Pipe Repair', description='Test service', base_price=800, price_type='fixed'
+        )
+        cls.booking = Booking.objects.create(
+            customer=cls.customer, provider=cls.provider, service=service, status='completed',
+            preferred_date=(timezone.now() + timedelta(days=1)).date(), preferred_time='10:00',
+            service_address='Baneshwor', service_city='Kathmandu', description='Leak', customer_phone='9800000000'
+        )
+        BookingService.objects.create(booking=cls.booking, service=service, price_at_booking=800)
+        Payment.objects.create(
+            booking=cls.booking, customer=cls.customer, provider=cls.provider, amount=Decimal('800.00'),
+            platform_fee=Decimal('80.00'), provider_amount=Decimal('720.00'), payment_method='cash', status='completed'
+        )
+        Review.objects.create(booking=cls.booking, customer=cls.customer, provider=cls.provider, rating=4, comment='Good')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_select(self):
+        names = ['id', 'status', 'images', 'payment']
+        self.assertEqual(Fieldset().select(names, ['images', 'payment']), names)
+        self.assertEqual(Fieldset(fields={'payment', 'id', 'bogus'}).select(names), ['id', 'payment'])
+        self.assertEqual(Fieldset(expand={'payment'}).select(names, ['images', 'payment']), ['id', 'status', 'payment'])
+        self.assertEqual(Fieldset(expand=set()).select(names, ['images', 'payment']), ['id', 'status'])
+        self.assertEqual(Fieldset(fields={'id'}, expand={'images'}).select(names, ['images']), ['id', 'images'])
+
+    def test_booking_detail(self):
+        url = f'/api/bookings/bookings/{self.booking.pk}/'
+        full, full_queries = self.get(url)
+        self.assertIn('booking_services', full)
+
+        data, queries = self.get(url + '?fields=id,status')
+        self.assertEqual(data, {'id': self.booking.pk, 'status': 'completed'})
+        self.assertLess(queries, full_queries)
+
+        data, _ = self.get(url + '?expand=payment')
+        self.assertEqual(data['payment']['payment_method'], 'cash')
+        self.assertNotIn('images', data)
+        self.assertNotIn('booking_services', data)
+        self.assertEqual(data['service_title'], 'Pipe Repair')
+
+    def test_input_keeps_writable_fields(self):
+        serializer = BookingSerializer(data={}, fieldset=Fieldset(fields={'id'}))
+        self.assertIn('description', serializer.fields)
+        self.assertNotIn('images', serializer.fields)
+
+    def test_provider_list(self):
+        full, full_queries = self.get('/api/bookings/providers/')
+        self.assertIn('services_preview', full[0])
+
+        data, queries = self.get('/api/bookings/providers/?fields=id,first_name')
+        self.assertEqual(data, [{'id': self.provider.pk, 'first_name': 'Ram'}])
+        self.assertLess(queries, full_queries)
+
+        data, _ = self.get('/api/bookings/providers/?expand=')
+        self.assertEqual(data[0]['average_rating'], 4.0)
+        self.assertEqual(data[0]['specializations'], ['Plumbing'])
+        self.assertNotIn('price_range_min', data[0])
+
+    def test_compiled_serializers_match_drf(self):
+        for fieldset in (Fieldset(fields={'id', 'review_count', 'service_count'}), Fieldset(expand={'payment'})):
+            for serializer_class, compiled_class, queryset in (
+                (BookingListSerializer, CompiledBookingListSerializer, Booking.objects.all()),
+                (ProviderListSerializer, CompiledProviderListSerializer, User.objects.filter(user_type='offer')),
+            ):
+                compiled = compiled_class(fieldset=fieldset)
+                self.assertEqual(
+                    JSONRenderer().render(compiled.many(compiled.values(queryset))),
+                    JSONRenderer().render(serializer_class(queryset, many=True, fieldset=fieldset).data),
+                )
+
+
+class ConditionalGetTests(TestCase):
+    """Detail endpoints answer If-None-Match/If-Modified-Since with 304 from one validator query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        cls.provider = User.objects.create(username='provider', email='provider@example.com', user_type='offer')
+        plumbing = Speciality.objects.create(name='Plumbing', slug='plumbing')
+        cls.service = Service.objects.create(
+            provider=cls.provider, specialization=Specialization.objects.create(speciality=plumbing, name='Pipe Repair'),
+            title='Pipe Repair', description='Test service', base_price=800, price_type='fixed'
+        )
+        cls.booking = Booking.objects.create(
+            customer=cls.customer, provider=cls.provider, service=cls.service, status='confirmed',
+            preferred_date=(timezone.now() + timedelta(days=1)).date(), preferred_time='10:00',
+            service_address='Baneshwor', service_city='Kathmandu', description='Leak', customer_phone='9800000000'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def revalidate(self, url, response, queries):
+        with self.assertNumQueries(queries):
+            return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_booking_detail(self):
+        url = f'/api/bookings/bookings/{self.booking.pk}/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('private', first['Cache-Control'])
+
+        response = self.revalidate(url, first, 1)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+        # A new service snapshot and a renamed specialization both show
+        BookingService.objects.create(booking=self.booking, service=self.service, price_at_booking=800)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+        second = self.client.get(url)
+        self.service.specialization.name = 'Pipe Fitting'
+        self.service.specialization.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=second['ETag']).status_code, 200)
+
+        # Other fieldsets have their own ETag
+        self.assertEqual(self.client.get(url + '?fields=id', HTTP_IF_NONE_MATCH=second['ETag']).status_code, 200)
+
+        outsider = User.objects.create(username='outsider', email='outsider@example.com', user_type='find')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 404)
+
+    def test_overdue_booking_is_revalidated(self):
+        url = f'/api/bookings/bookings/{self.booking.pk}/'
+        now = timezone.now()
+        Booking.objects.filter(pk=self.booking.pk).update(status='pending', confirmation_deadline=now + timedelta(hours=1))
+        first = self.client.get(url)
+        # Nothing changed in the database, but the deadline has passed
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(hours=2)):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'expired')
+
+    def test_public_service_detail(self):
+        url = f'/api/bookings/services/{self.service.pk}/'
+        first = self.client.get(url)
+        self.assertIn('public', first['Cache-Control'])
+        self.assertIn('s-maxage=300', first['Cache-Control'])
+        self.assertEqual(self.revalidate(url, first, 1).status_code, 304)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_provider_detail(self):
+        url = f'/api/bookings/providers/{self.provider.pk}/'
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first, 1).status_code, 304)
+        self.assertNotIn('Last-Modified', first)
+
+        Booking.objects.filter(pk=self.booking.pk).update(status='completed')
+        Review.objects.create(
+            booking=Booking.objects.get(pk=self.booking.pk), customer=self.customer, provider=self.provider, rating=5
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['review_count'], 1)
+
+
+class IndexAdvisorTests(TestCase):
+    """The hot booking queries are catalogued and their indexes are migrated."""
+
+    def test_read_plan(self):
+        self.assertEqual(
+            read_plan('Index Scan using booking_pending_deadline_idx on bookings_booking', 'postgresql'),
+            (False, ['booking_pending_deadline_idx']),
+        )
+        self.assertEqual(read_plan('Seq Scan on bookings_booking\n  Filter: (status = ...)', 'postgresql'), (True, []))
+        self.assertEqual(
+            read_plan('SEARCH bookings_booking USING INDEX booking_prov_pref_date_idx (provider_id=?)', 'sqlite'),
+            (False, ['booking_prov_pref_date_idx']),
+        )
+        self.assertEqual(read_plan('SCAN bookings_booking', 'sqlite'), (True, []))
+
+    def test_no_missing_indexes(self):
+        out = io.StringIO()
+        call_command('advise_indexes', stdout=out, stderr=io.StringIO())
+        self.assertNotIn('MISSING', out.getvalue())
+        self.assertIn('expire-overdue', out.getvalue())
+
+
+class PlanRegressionTests(TestCase):
+    """check_query_plans summaries and their comparison against a baseline."""
+
+    PLAN = [{
+        'Plan': {
+            'Node Type': 'Limit', 'Shared Hit Blocks': 40, 'Shared Read Blocks': 2,
+            'Plans': [{
+                'Node Type': 'Nested Loop',
+                'Plans': [
+                    {'Node Type': 'Index Scan', 'Index Name': 'booking_prov_pref_date_idx', 'Relation Name': 'bookings_booking'},
+                    {'Node Type': 'Seq Scan', 'Relation Name': 'bookings_service'},
+                ],
+            }],
+        },
+        'Planning Time': 0.21, 'Execution Time': 1.5,
+    }]
+
+    def test_summarize_plan(self):
+        summary = summarize_plan(json.dumps(self.PLAN))
+        self.assertEqual(summary['shape'], [
+            'Limit', 'Nested Loop', 'Index Scan using booking_prov_pref_date_idx on bookings_booking',
+            'Seq Scan on bookings_service',
+        ])
+        self.assertEqual(summary['seq_scans'], ['bookings_service'])
+        self.assertEqual(summary['shared_buffers'], 42)
+
+    def test_compare(self):
+        baseline = summarize_plan(self.PLAN)
+        self.assertEqual(compare(baseline, dict(baseline), 0.5), ([], []))
+
+        # Slower by less than MIN_SLOWDOWN_MS is noise
+        self.assertEqual(compare(baseline, {**baseline, 'execution_ms': 2.4}, 0.5), ([], []))
+        regressions, _ = compare(baseline, {**baseline, 'execution_ms': 10.0}, 0.5)
+        self.assertEqual(len(regressions), 1)
+
+        seq_scan = {
+            **baseline, 'seq_scans': ['bookings_booking', 'bookings_service'],
+            'shape': ['Limit', 'Seq Scan on bookings_booking'],
+        }
+        regressions, changes = compare(baseline, seq_scan, 0.5)
+        self.assertEqual(regressions, ['bookings_booking is now read by a Seq Scan'])
+        self.assertEqual(len(changes), 1)
+
+    def test_view_queryset(self):
+        from admin_panel.views import AdminBookingsViewSet
+
+        queryset = view_queryset(AdminBookingsViewSet, params={'status': 'pending'})
+        self.assertEqual(queryset.query.high_mark, 20)
+        self.assertIn('"status" = pending', str(queryset.query).replace("'", ''))
+
+
+class DemoDataTests(TestCase):
+    """generate_demo_data and the load test's locally signed tokens."""
+
+    def test_generate_demo_data(self):
+        call_command('generate_demo_data', providers=5, bookings_per_provider=20, stdout=io.StringIO())
+        self.assertEqual(User.objects.filter(username__startswith='demo-provider-').count(), 5)
+        self.assertEqual(ProviderAvailability.objects.filter(provider__username__startswith='demo-').count(), 5)
+        # Services come from the populate_specialities catalog
+        self.assertEqual(
+            set(Service.objects.values_list('specialization__speciality__slug', flat=True))
+            - {'plumbing', 'electrical', 'carpentry', 'ac-repair', 'painting', 'cleaning'},
+            set(),
+        )
+        self.assertGreater(len(set(Booking.objects.values_list('status', flat=True))), 5)
+        self.assertEqual(Payment.objects.count(), Booking.objects.filter(status='completed').count())
+
+        call_command('generate_demo_data', providers=2, bookings_per_provider=5, reset=True, stdout=io.StringIO())
+        self.assertEqual(User.objects.filter(username__startswith='demo-provider-').count(), 2)
+        self.assertEqual(Booking.objects.count(), 10)
+
+    @override_settings(SUPABASE_JWT_SECRET='load-test-secret-with-32-bytes!!')
+    def test_signed_token_authenticates(self):
+        call_command('generate_demo_data', providers=1, bookings_per_provider=1, stdout=io.StringIO())
+        customer = User.objects.get(username='demo-customer-0')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {_token(customer)}')
+        self.assertEqual(client.get('/api/bookings/my-bookings/').status_code, 200)
+        self.assertEqual(User.objects.filter(email=customer.email).count(), 1)
+
+    def test_percentile(self):
+        ordered = list(range(1, 101))
+        self.assertEqual([_percentile(ordered, q) for q in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(_percentile([7], 99), 7)
+
+
+class MetricsTests(TestCase):
+    """backend.metrics: the Prometheus exposition, request breakdown and cache counters."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def test_render(self):
+        requests = metrics.Counter('test_requests_total', 'Requests.', ('route',))
+        requests.inc('a"b')
+        requests.inc('a"b', amount=2)
+        latency = metrics.Histogram('test_seconds', 'Latency.', ('route',), buckets=(0.1, 1.0))
+        latency.observe(0.05, 'home')
+        latency.observe(0.5, 'home')
+        latency.observe(5, 'home')
+        self.assertEqual(requests.render(), [
+            '# HELP test_requests_total Requests.', '# TYPE test_requests_total counter',
+            'test_requests_total{route="a\\"b"} 3',
+        ])
+        self.assertEqual(latency.render()[2:], [
+            'test_seconds_bucket{route="home",le="0.1"} 1',
+            'test_seconds_bucket{route="home",le="1"} 2',
+            'test_seconds_bucket{route="home",le="+Inf"} 3',
+            'test_seconds_sum{route="home"} 5.550000',
+            'test_seconds_count{route="home"} 3',
+        ])
+
+    def test_request_records_route_and_database_time(self):
+        before = metrics.REQUESTS.value('my-bookings', 'GET', 200)
+        db_before = metrics.REQUEST_DEPENDENCY_SECONDS.count('my-bookings', 'db')
+        self.assertEqual(self.client.get('/api/bookings/my-bookings/').status_code, 200)
+        self.assertEqual(metrics.REQUESTS.value('my-bookings', 'GET', 200), before + 1)
+        self.assertEqual(metrics.REQUEST_DEPENDENCY_SECONDS.count('my-bookings', 'db'), db_before + 1)
+        self.assertGreater(metrics.DB_QUERIES.value('my-bookings'), 0)
+
+        unmatched = metrics.REQUESTS.value('unmatched', 'GET', 404)
+        self.client.get('/no/such/path/')
+        self.assertEqual(metrics.REQUESTS.value('unmatched', 'GET', 404), unmatched + 1)
+
+    def test_nested_external_calls_count_once(self):
+        before = metrics.EXTERNAL_CALLS.value('test-service', 'ok')
+        with metrics.external_call('test-service'):
+            with metrics.external_call('test-service'):
+                pass
+        self.assertEqual(metrics.EXTERNAL_CALLS.value('test-service', 'ok'), before + 1)
+
+        failed = metrics.EXTERNAL_CALLS.value('test-service', 'error')
+        with self.assertRaises(ValueError), metrics.external_call('test-service'):
+            raise ValueError
+        self.assertEqual(metrics.EXTERNAL_CALLS.value('test-service', 'error'), failed + 1)
+
+    def test_smtp_time_is_recorded(self):
+        before = metrics.EXTERNAL_CALLS.value('smtp', 'ok')
+        emails._send_mail(
+            subject='Test', message='Body', from_email='noreply@example.com', recipient_list=[self.customer.email]
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(metrics.EXTERNAL_CALLS.value('smtp', 'ok'), before + 1)
+
+    def test_dashboard_cache_hits_and_misses(self):
+        misses = metrics.CACHE_REQUESTS.value('user_dashboard_stats', 'miss')
+        hits = metrics.CACHE_REQUESTS.value('user_dashboard_stats', 'hit')
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/bookings/dashboard/stats/user/').status_code, 200)
+        self.assertEqual(metrics.CACHE_REQUESTS.value('user_dashboard_stats', 'miss'), misses + 1)
+        self.assertEqual(metrics.CACHE_REQUESTS.value('user_dashboard_stats', 'hit'), hits + 1)
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_endpoint(self):
+        self.client.get('/api/bookings/my-bookings/')
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_requests_total{route="my-bookings",method="GET",status="200"}', body)
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='', METRICS_ALLOWED_IPS=['10.0.0.0/8', '192.168.1.5'])
+    def test_metrics_allowed_ips(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.2.3.4').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='192.168.1.5').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.7').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='', METRICS_ALLOWED_IPS=[])
+    def test_metrics_closed_without_access_rules(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
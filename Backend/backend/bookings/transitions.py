@@ -0,0 +1,274 @@
+"""
+Booking lifecycle state machine.
+
+Every status change on a Booking goes through BookingTransitionService.apply(),
+which looks the transition up in TRANSITIONS and writes it as a single
+conditional UPDATE:
+
+    UPDATE bookings_booking SET status=..., <changed fields>, updated_at=...
+    WHERE id=? AND status IN (<allowed sources>) [AND <scope>] [AND <condition>]
+
+If two requests race (e.g. provider accepts while the booking expires), only
+one UPDATE matches and the other gets a TransitionError, instead of both
+reading the old status and the last full-row save() winning. Only when the
+UPDATE matches nothing is the row loaded, to explain why.
+
+After a successful transition the booking_transitioned signal is sent inside
+the same database transaction.
+
+apply_all() applies one transition to every booking of a queryset it is
+allowed for (e.g. expiring all overdue bookings of a user) with a constant
+number of queries: the matching rows are locked, updated with one UPDATE and
+reported with one bookings_transitioned signal.
+"""
+from zoneinfo import ZoneInfo
+
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Booking
+from .signals import booking_transitioned, bookings_transitioned
+
+NPT = ZoneInfo("Asia/Kathmandu")
+
+
+def _service_time_not_passed(now):
+    """Preferred service date/time (Nepal time) is still in the future."""
+    now_npt = now.astimezone(NPT)
+    return Q(preferred_date__gt=now_npt.date()) | Q(preferred_date=now_npt.date(), preferred_time__gt=now_npt.time())
+
+
+def _deadline_not_passed(now):
+    return Q(confirmation_deadline__isnull=True) | Q(confirmation_deadline__gt=now)
+
+
+def _deadline_passed(now):
+    return Q(confirmation_deadline__isnull=False, confirmation_deadline__lte=now)
+
+
+# Transition table over Booking.STATUS_CHOICES.
+#
+#   from:          statuses the transition is allowed from
+#   to:            resulting status
+#   timestamps:    fields set to the transition time
+#   set_once:      fields set to the transition time only if still empty
+#   values:        constant field values written with the transition
+#   condition:     extra guard, f(now) -> Q, checked in the same UPDATE
+#   error:         message when the booking is in a status not in `from`
+#   status_errors: per-status overrides of `error`
+#   condition_error: message when the status is fine but `condition` fails
+TRANSITIONS = {
+    'accept': {
+        'from': ('pending',),
+        'to': 'confirmed',
+        'set_once': ('accepted_at',),
+        'condition': lambda now: _deadline_not_passed(now) & _service_time_not_passed(now),
+        'error': 'Only pending bookings can be accepted',
+        'condition_error': 'Cannot accept this booking — the requested service date/time has already passed.',
+    },
+    'decline': {
+        'from': ('pending',),
+        'to': 'declined',
+        'timestamps': ('cancelled_at',),
+        'error': 'Only pending bookings can be declined',
+        'status_errors': {'expired': 'This booking has already expired.'},
+    },
+    'cancel': {
+        'from': Booking.CANCELLABLE_STATUSES,
+        'to': 'cancelled',
+        'timestamps': ('cancelled_at',),
+        'error': 'Booking cannot be cancelled at this stage',
+    },
+    'schedule': {
+        'from': ('confirmed', 'pending'),
+        'to': 'scheduled',
+        'error': 'Only confirmed/pending bookings can be scheduled',
+    },
+    'start': {
+        'from': ('scheduled', 'confirmed'),
+        'to': 'in_progress',
+        'error': 'Only scheduled/confirmed bookings can be started',
+    },
+    'complete': {
+        'from': ('in_progress', 'scheduled'),
+        'to': 'completed',
+        'timestamps': ('provider_completed_at', 'completed_at'),
+        'error': 'Only in-progress/scheduled bookings can be completed',
+    },
+    'dispute': {
+        'from': ('completed',),
+        'to': 'disputed',
+        'error': 'Only completed bookings can be disputed',
+    },
+    'admin_approve': {
+        'from': ('pending',),
+        'to': 'confirmed',
+        'error': 'Only pending bookings can be approved',
+    },
+    'admin_cancel': {
+        'from': ('pending', 'confirmed'),
+        'to': 'cancelled',
+        'timestamps': ('cancelled_at',),
+        'error': 'Only pending or confirmed bookings can be cancelled',
+    },
+    'expire': {
+        'from': ('pending',),
+        'to': 'expired',
+        'timestamps': ('expired_at',),
+        'values': {'cancellation_reason': 'Auto-expired: provider did not respond before the deadline.'},
+        'condition': _deadline_passed,
+        'error': 'Only pending bookings can expire',
+        'condition_error': 'Booking has not reached its confirmation deadline',
+    },
+}
+
+
+class TransitionError(Exception):
+    """
+    Raised when a transition is not allowed for the booking's current state.
+    `booking` is the booking as currently stored.
+    """
+
+    def __init__(self, message, booking=None):
+        super().__init__(message)
+        self.message = message
+        self.booking = booking
+
+
+class BookingTransitionService:
+    """Applies TRANSITIONS to bookings with conditional updates."""
+
+    # Relations loaded with the booking returned after a transition
+    RELATED = ('customer', 'provider', 'service', 'service__specialization', 'service__specialization__speciality')
+
+    @staticmethod
+    def apply(booking, name, actor=None, scope=None, fields=None):
+        """
+        Apply transition `name` to `booking`.
+
+        Args:
+            booking: Booking instance or booking id. An instance is updated in
+                memory; with an id the booking is loaded after the update.
+            name: key of TRANSITIONS
+            actor: user performing the transition (passed to the signal)
+            scope: optional Q the booking must also match (e.g. ownership)
+            fields: extra field values to write with the transition
+
+        Returns:
+            The booking after the transition.
+
+        Raises:
+            Booking.DoesNotExist: no booking with this id within `scope`
+            TransitionError: the booking exists but the transition is not allowed
+        """
+        spec = TRANSITIONS[name]
+        now = timezone.now()
+        instance = booking if isinstance(booking, Booking) else None
+        booking_id = instance.pk if instance is not None else booking
+
+        changes = {'status': spec['to']}
+        changes.update(spec.get('values', {}))
+        for field in spec.get('timestamps', ()):
+            changes[field] = now
+        changes.update(fields or {})
+
+        update = dict(changes, updated_at=now)
+        for field in spec.get('set_once', ()):
+            update[field] = Coalesce(F(field), Value(now))
+
+        queryset = Booking.objects.filter(pk=booking_id, status__in=spec['from'])
+        if scope is not None:
+            queryset = queryset.filter(scope)
+        if 'condition' in spec:
+            queryset = queryset.filter(spec['condition'](now))
+
+        with transaction.atomic():
+            updated = queryset.update(**update)
+            if updated:
+                if instance is not None:
+                    for field, value in changes.items():
+                        setattr(instance, field, value)
+                    for field in spec.get('set_once', ()):
+                        if getattr(instance, field) is None:
+                            setattr(instance, field, now)
+                    instance.updated_at = now
+                else:
+                    instance = Booking.objects.select_related(*BookingTransitionService.RELATED).get(pk=booking_id)
+                for field in spec.get('set_once', ()):
+                    changes[field] = getattr(instance, field)
+
+                booking_transitioned.send(
+                    sender=Booking,
+                    booking=instance,
+                    transition=name,
+                    from_statuses=spec['from'],
+                    to_status=spec['to'],
+                    actor=actor,
+                    changes=changes,
+                )
+
+        if not updated:
+            raise BookingTransitionService._failure(booking_id, spec, scope)
+        return instance
+
+    @staticmethod
+    def apply_all(queryset, name, actor=None):
+        """
+        Apply transition `name` to every booking of `queryset` it is allowed for.
+
+        Bookings in other statuses, or failing the transition's condition, are
+        left alone. Transitions with set_once fields are not supported.
+
+        Returns:
+            List of the bookings transitioned, updated in memory.
+        """
+        spec = TRANSITIONS[name]
+        if spec.get('set_once'):
+            raise ValueError(f"Transition '{name}' sets fields once and can only be applied to one booking")
+        now = timezone.now()
+
+        changes = {'status': spec['to']}
+        changes.update(spec.get('values', {}))
+        for field in spec.get('timestamps', ()):
+            changes[field] = now
+
+        queryset = queryset.filter(status__in=spec['from'])
+        if 'condition' in spec:
+            queryset = queryset.filter(spec['condition'](now))
+
+        with transaction.atomic():
+            # Locked, so the UPDATE below changes exactly these rows
+            bookings = list(queryset.select_for_update().order_by('pk'))
+            if not bookings:
+                return []
+            Booking.objects.filter(pk__in=[booking.pk for booking in bookings]).update(**changes, updated_at=now)
+            for booking in bookings:
+                for field, value in changes.items():
+                    setattr(booking, field, value)
+                booking.updated_at = now
+
+            bookings_transitioned.send(
+                sender=Booking,
+                bookings=bookings,
+                transition=name,
+                from_statuses=spec['from'],
+                to_status=spec['to'],
+                actor=actor,
+                changes=changes,
+            )
+        return bookings
+
+    @staticmethod
+    def _failure(booking_id, spec, scope):
+        """Load the booking to explain why the conditional update matched nothing."""
+        queryset = Booking.objects.filter(pk=booking_id)
+        if scope is not None:
+            queryset = queryset.filter(scope)
+        current = queryset.select_related(*BookingTransitionService.RELATED).first()
+        if current is None:
+            return Booking.DoesNotExist(f"Booking {booking_id} not found")
+        if current.status in spec['from']:
+            return TransitionError(spec.get('condition_error', spec['error']), booking=current)
+        return TransitionError(spec.get('status_errors', {}).get(current.status, spec['error']), booking=current)
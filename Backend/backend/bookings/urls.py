@@ -4,7 +4,10 @@ from .views import (
     ProviderBookingsView,
     BookingDetailView,
     CreateBookingView,
+    CreateBookingBatchView,
     UploadBookingImagesView,
+    BookingImageUploadUrlsView,
+    BookingImageConfirmView,
     MyPaymentsView,
     ProviderEarningsView,
     UserDashboardStatsView,
@@ -31,6 +34,7 @@ from .views import (
     ProviderAvailabilityPublicView,
     ProviderBookedSlotsView,
     ProviderListView,
+    NearbyProvidersView,
     ProviderDetailView,
     CheckBookingConflictView,
     GetAvailableTimeSlotsView,
@@ -44,7 +48,10 @@ urlpatterns = [
     path('provider-bookings/', ProviderBookingsView.as_view(), name='provider-bookings'),
     path('bookings/<int:pk>/', BookingDetailView.as_view(), name='booking-detail'),
     path('bookings/create/', CreateBookingView.as_view(), name='booking-create'),
+    path('bookings/batch-create/', CreateBookingBatchView.as_view(), name='booking-batch-create'),
     path('bookings/<int:booking_id>/images/', UploadBookingImagesView.as_view(), name='booking-upload-images'),
+    path('bookings/<int:booking_id>/images/upload-urls/', BookingImageUploadUrlsView.as_view(), name='booking-image-upload-urls'),
+    path('bookings/<int:booking_id>/images/confirm/', BookingImageConfirmView.as_view(), name='booking-image-confirm'),
     path('bookings/<int:booking_id>/accept/', AcceptBookingView.as_view(), name='booking-accept'),
     path('bookings/<int:booking_id>/decline/', DeclineBookingView.as_view(), name='booking-decline'),
     path('bookings/<int:booking_id>/cancel/', CancelBookingView.as_view(), name='booking-cancel'),
@@ -81,6 +88,7 @@ urlpatterns = [
 
     # Providers
     path('providers/', ProviderListView.as_view(), name='providers-list'),
+    path('providers/nearby/', NearbyProvidersView.as_view(), name='providers-nearby'),
     path('providers/<int:id>/', ProviderDetailView.as_view(), name='providers-detail'),
     path('providers/<int:provider_id>/availability/', ProviderAvailabilityPublicView.as_view(), name='provider-availability-public'),
     path('providers/<int:provider_id>/booked-slots/', ProviderBookedSlotsView.as_view(), name='provider-booked-slots'),
@@ -8,30 +8,55 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import BasePermission
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 from django.utils import timezone
+from django.db import connections, transaction
 from django.db.models import Q, Avg, Count, Sum, Case, When, Value, F, DecimalField
 from django.db.models.functions import Coalesce
 from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from decimal import Decimal
 from zoneinfo import ZoneInfo
 
+from backend import metrics
+from backend.conditional import PUBLIC_CACHE_CONTROL, ConditionalGetMixin, related_validators
 from users.authentication import SupabaseAuthentication
-from .models import Service, Booking, BookingImage, Payment, Review, ProviderAvailability
+from users.models import UserSpeciality
+from users.uploads import (
+	IMAGE_CONTENT_TYPES, UploadError,
+	check_declared_size, issue_upload, read_upload, unique_name, verify_uploaded_object
+)
+from .models import (
+	Service, Booking, BookingImage, BookingService, Payment, Review, ProviderAvailability,
+	IMAGE_TYPE_LIMITS, MAX_IMAGE_SIZE_MB, booking_image_prefix
+)
+from .transitions import BookingTransitionService, TransitionError
+from .fieldsets import Fieldset
 from .serializers import (
 	ServiceSerializer,
 	BookingSerializer,
+	BookingBatchSerializer,
+	BookingCompletionSerializer,
 	BookingListSerializer,
 	BookingImageSerializer,
 	PaymentSerializer,
 	ReviewSerializer,
 	ProviderAvailabilitySerializer,
 	ProviderListSerializer,
+	NearbyProviderSerializer,
 	ProviderDetailSerializer
 )
-from .emails import send_booking_notification_to_provider, send_booking_acceptance_to_customer, send_booking_expiry_notification
-
+from .fast_serializers import (
+	CompiledListMixin,
+	CompiledBookingListSerializer,
+	CompiledServiceSerializer,
+	CompiledReviewSerializer,
+	CompiledProviderListSerializer,
+)
 User = get_user_model()
 NPT = ZoneInfo("Asia/Kathmandu")
 
@@ -43,7 +68,9 @@ def _lazy_expire_overdue_bookings(customer=None, provider=None):
 	"""
 	Lazy-expire any pending bookings that are past their confirmation_deadline.
 	Called when listing bookings so expired ones are updated before the user sees them.
-	Sends expiry notification emails for each expired booking.
+	All overdue bookings are expired with one set-based transition, so the cost does
+	not grow with their number. Each expiry records a booking event; the event worker
+	sends the notification emails.
 	"""
 	filters = {'status': 'pending', 'confirmation_deadline__lte': timezone.now()}
 	if customer:
@@ -51,13 +78,43 @@ def _lazy_expire_overdue_bookings(customer=None, provider=None):
 	if provider:
 		filters['provider'] = provider
 
-	overdue = Booking.objects.filter(**filters).select_related('customer', 'provider', 'service')
-	for booking in overdue:
-		if booking.expire_if_overdue():
-			try:
-				send_booking_expiry_notification(booking)
-			except Exception as e:
-				logger.error(f"Failed to send expiry email for booking {booking.id}: {e}")
+	BookingTransitionService.apply_all(Booking.objects.filter(**filters), 'expire')
+
+
+def _validate_preferred_slot(preferred_date, preferred_time, service, enforce_max_advance=True):
+	"""
+	Validate a requested service date/time against Nepal time.
+	Raises ValidationError if the slot is in the past, too far ahead
+	(unless enforce_max_advance is False) or too close to now.
+	"""
+	try:
+		requested_dt = datetime.combine(preferred_date, preferred_time, tzinfo=NPT)
+	except Exception:
+		raise ValidationError({'preferred_time': 'Invalid preferred date/time'})
+	now_npt = timezone.now().astimezone(NPT)
+	if requested_dt <= now_npt:
+		raise ValidationError({'preferred_time': f'Selected time is in the past. Current Nepal time: {now_npt.strftime("%Y-%m-%d %H:%M:%S")}'})
+
+	# Maximum advance booking check: at most 5 days ahead
+	time_until_service = requested_dt - now_npt
+	if enforce_max_advance:
+		max_advance = timedelta(days=Booking.MAX_ADVANCE_BOOKING_DAYS)
+		if time_until_service > max_advance:
+			raise ValidationError({
+				'preferred_date': f'Bookings can only be made up to {Booking.MAX_ADVANCE_BOOKING_DAYS} days in advance. '
+				f'Please select a date within the next {Booking.MAX_ADVANCE_BOOKING_DAYS} days.'
+			})
+
+	# Minimum advance booking check
+	# Emergency services: at least 30 min | Normal services: at least 1 hour
+	is_emergency = service.emergency_service if service else False
+	min_advance = timedelta(minutes=30) if is_emergency else timedelta(hours=1)
+	min_label = "30 minutes" if is_emergency else "1 hour"
+	if time_until_service < min_advance:
+		raise ValidationError({
+			'preferred_time': f'You must book at least {min_label} before the service time. '
+			f'Please select a later time slot.'
+		})
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -84,11 +141,12 @@ class IsServiceProvider(BasePermission):
 		return bool(request.user and request.user.is_authenticated and request.user.user_type == 'offer')
 
 
-class MyBookingsView(generics.ListAPIView):
+class MyBookingsView(CompiledListMixin, generics.ListAPIView):
 	"""List bookings for the current customer"""
 	authentication_classes = [SupabaseAuthentication]
 	permission_classes = [IsAuthenticated, IsServiceSeeker]
 	serializer_class = BookingListSerializer
+	compiled_serializer_class = CompiledBookingListSerializer
 	pagination_class = StandardResultsSetPagination
 	
 	@method_decorator(csrf_exempt)
@@ -101,17 +159,18 @@ class MyBookingsView(generics.ListAPIView):
 		return (
 			Booking.objects
 			.filter(customer=self.request.user)
-			.select_related('service', 'service__specialization', 'service__specialization__speciality', 'provider', 'customer')
+			.select_related('service', 'service__specialization', 'service__specialization__speciality', 'provider', 'customer', 'payment')
 			.prefetch_related('booking_services__service', 'booking_services__service__specialization', 'booking_services__service__specialization__speciality')
 			.order_by('-created_at')
 		)
 
 
-class ProviderBookingsView(generics.ListAPIView):
+class ProviderBookingsView(CompiledListMixin, generics.ListAPIView):
 	"""List bookings for the current provider"""
 	authentication_classes = [SupabaseAuthentication]
 	permission_classes = [IsAuthenticated, IsServiceProvider]
 	serializer_class = BookingListSerializer
+	compiled_serializer_class = CompiledBookingListSerializer
 	pagination_class = StandardResultsSetPagination
 	
 	@method_decorator(csrf_exempt)
@@ -124,13 +183,13 @@ class ProviderBookingsView(generics.ListAPIView):
 		return (
 			Booking.objects
 			.filter(provider=self.request.user)
-			.select_related('service', 'service__specialization', 'service__specialization__speciality', 'provider', 'customer')
+			.select_related('service', 'service__specialization', 'service__specialization__speciality', 'provider', 'customer', 'payment')
 			.prefetch_related('booking_services__service', 'booking_services__service__specialization', 'booking_services__service__specialization__speciality')
 			.order_by('-created_at')
 		)
 
 
-class BookingDetailView(generics.RetrieveAPIView):
+class BookingDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
 	"""Retrieve a booking if user is customer or provider on it"""
 	authentication_classes = [SupabaseAuthentication]
 	permission_classes = [IsAuthenticated]
@@ -140,28 +199,64 @@ class BookingDetailView(generics.RetrieveAPIView):
 	def dispatch(self, *args, **kwargs):
 		return super().dispatch(*args, **kwargs)
 
+	def get_validators(self, request, pk):
+		user = request.user
+		validators = (
+			Booking.objects
+			.filter(Q(customer=user) | Q(provider=user), pk=pk)
+			.annotate(
+				**related_validators('images', BookingImage, 'booking', 'uploaded_at', 'variants_processed_at'),
+				**related_validators(
+					'services', BookingService, 'booking', 'updated_at', 'service__updated_at',
+					'service__specialization__updated_at', 'service__specialization__speciality__updated_at'
+				),
+			)
+			.values(
+				'updated_at', 'status', 'confirmation_deadline', 'payment__updated_at',
+				'customer__updated_at', 'provider__updated_at', 'service__updated_at',
+				'service__specialization__updated_at', 'service__specialization__speciality__updated_at',
+				'images_count', 'images_uploaded_at', 'images_variants_processed_at',
+				'services_count', 'services_updated_at', 'services_service_updated_at',
+				'services_service_specialization_updated_at', 'services_service_specialization_speciality_updated_at',
+			)
+			.first()
+		)
+		if validators is not None:
+			# A pending booking past its deadline is expired by retrieve()
+			deadline = validators['confirmation_deadline']
+			validators['overdue'] = validators['status'] == 'pending' and deadline is not None and timezone.now() >= deadline
+		return validators
+
 	def get_queryset(self):
 		user = self.request.user
-		return (
-			Booking.objects
-			.select_related('service', 'service__specialization', 'service__specialization__speciality', 'provider', 'customer')
-			.prefetch_related('images', 'booking_services__service', 'booking_services__service__specialization', 'booking_services__service__specialization__speciality')
-			.filter(Q(customer=user) | Q(provider=user))
+		# Only the relations of the requested fields (?fields=/?expand=)
+		return BookingSerializer.optimize_queryset(
+			Booking.objects.filter(Q(customer=user) | Q(provider=user)),
+			Fieldset.from_request(self.request)
 		)
 
 	def retrieve(self, request, *args, **kwargs):
 		instance = self.get_object()
-		# Lazy-expire if overdue
-		if instance.expire_if_overdue():
-			try:
-				send_booking_expiry_notification(instance)
-			except Exception:
-				pass
-			instance.refresh_from_db()
+		# Lazy-expire if overdue (the worker sends the expiry emails)
+		instance.expire_if_overdue()
 		serializer = self.get_serializer(instance)
 		return Response(serializer.data)
 
 
+def _booking_transition(booking_id, transition, user, scope, **fields):
+	"""
+	Apply a lifecycle transition (see bookings.transitions) for an API request.
+	Returns (booking, None) on success or (None, error Response).
+	"""
+	try:
+		booking = BookingTransitionService.apply(booking_id, transition, actor=user, scope=scope, fields=fields)
+	except Booking.DoesNotExist:
+		raise Http404('No Booking matches the given query.')
+	except TransitionError as e:
+		return None, Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+	return booking, None
+
+
 class AcceptBookingView(APIView):
 	"""Provider accepts a pending booking"""
 	authentication_classes = [SupabaseAuthentication]
@@ -172,50 +267,25 @@ class AcceptBookingView(APIView):
 		return super().dispatch(*args, **kwargs)
 
 	def post(self, request, booking_id):
-		booking = get_object_or_404(Booking, id=booking_id, provider=request.user)
-		if booking.status not in ['pending']:
-			return Response({'error': 'Only pending bookings can be accepted'}, status=status.HTTP_400_BAD_REQUEST)
-
-		# Check if the booking has expired (deadline passed)
-		if booking.is_expired:
-			booking.expire_if_overdue()
-			try:
-				send_booking_expiry_notification(booking)
-			except Exception:
-				pass
-			return Response(
-				{'error': 'This booking has expired because you did not respond before the deadline. The customer has been notified.'},
-				status=status.HTTP_400_BAD_REQUEST
-			)
-
-		# Check if the preferred service date/time has already passed
-		if booking.preferred_date and booking.preferred_time:
-			service_dt = datetime.combine(booking.preferred_date, booking.preferred_time, tzinfo=NPT)
-			if service_dt <= timezone.now().astimezone(NPT):
+		# Pending, deadline not passed and service time still ahead are all
+		# checked by the conditional update itself
+		try:
+			booking = BookingTransitionService.apply(booking_id, 'accept', actor=request.user, scope=Q(provider=request.user))
+		except Booking.DoesNotExist:
+			raise Http404('No Booking matches the given query.')
+		except TransitionError as e:
+			# Check if the booking has expired (deadline passed)
+			if e.booking.is_expired:
+				# Expiring records an event; the worker notifies both parties
+				e.booking.expire_if_overdue()
 				return Response(
-					{'error': 'Cannot accept this booking — the requested service date/time has already passed.'},
+					{'error': 'This booking has expired because you did not respond before the deadline. The customer has been notified.'},
 					status=status.HTTP_400_BAD_REQUEST
 				)
+			return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
 
-		booking.status = 'confirmed'
-		booking.accepted_at = booking.accepted_at or timezone.now()
-		booking.save()
-		
-		# Reload booking with booking_services to ensure they're available for email
-		booking.refresh_from_db()
-		
-		# Send email notification to customer (asynchronously to avoid blocking)
-		try:
-			send_booking_acceptance_to_customer(booking)
-			print(f"✅ Email sent to customer: {booking.customer.email}")
-		except Exception as e:
-			# Log error but don't fail the acceptance
-			import logging
-			logger = logging.getLogger(__name__)
-			logger.error(f"❌ Failed to send booking acceptance email: {str(e)}")
-			print(f"❌ Email error: {str(e)}")
-		
-		return Response(BookingSerializer(booking).data)
+		# The customer's acceptance email is sent by the event worker
+		return Response(BookingSerializer(booking, fieldset=Fieldset.from_request(request)).data)
 
 
 class DeclineBookingView(APIView):
@@ -228,19 +298,14 @@ class DeclineBookingView(APIView):
 		return super().dispatch(*args, **kwargs)
 
 	def post(self, request, booking_id):
-		booking = get_object_or_404(Booking, id=booking_id, provider=request.user)
-		if booking.status not in ['pending']:
-			# If it expired in the meantime, give a clear message
-			if booking.status == 'expired':
-				return Response({'error': 'This booking has already expired.'}, status=status.HTTP_400_BAD_REQUEST)
-			return Response({'error': 'Only pending bookings can be declined'}, status=status.HTTP_400_BAD_REQUEST)
-		reason = request.data.get('reason', '')
-		booking.status = 'declined'
-		booking.cancelled_by = request.user
-		booking.cancellation_reason = reason
-		booking.cancelled_at = timezone.now()
-		booking.save()
-		return Response(BookingSerializer(booking).data)
+		booking, error = _booking_transition(
+			booking_id, 'decline', request.user, Q(provider=request.user),
+			cancelled_by=request.user,
+			cancellation_reason=request.data.get('reason', ''),
+		)
+		if error:
+			return error
+		return Response(BookingSerializer(booking, fieldset=Fieldset.from_request(request)).data)
 
 
 class CancelBookingView(APIView):
@@ -253,19 +318,21 @@ class CancelBookingView(APIView):
 		return super().dispatch(*args, **kwargs)
 
 	def post(self, request, booking_id):
-		booking = get_object_or_404(Booking, id=booking_id)
-		# Only participants can cancel
-		if request.user not in [booking.customer, booking.provider]:
-			return Response({'error': 'Not allowed'}, status=status.HTTP_403_FORBIDDEN)
-		if not booking.is_cancellable():
-			return Response({'error': 'Booking cannot be cancelled at this stage'}, status=status.HTTP_400_BAD_REQUEST)
-		reason = request.data.get('reason', '')
-		booking.status = 'cancelled'
-		booking.cancelled_by = request.user
-		booking.cancellation_reason = reason
-		booking.cancelled_at = timezone.now()
-		booking.save()
-		return Response(BookingSerializer(booking).data)
+		participant = Q(customer=request.user) | Q(provider=request.user)
+		try:
+			booking, error = _booking_transition(
+				booking_id, 'cancel', request.user, participant,
+				cancelled_by=request.user,
+				cancellation_reason=request.data.get('reason', ''),
+			)
+		except Http404:
+			# Only participants can cancel
+			if Booking.objects.filter(id=booking_id).exists():
+				return Response({'error': 'Not allowed'}, status=status.HTTP_403_FORBIDDEN)
+			raise
+		if error:
+			return error
+		return Response(BookingSerializer(booking, fieldset=Fieldset.from_request(request)).data)
 
 
 class ScheduleBookingView(APIView):
@@ -278,9 +345,6 @@ class ScheduleBookingView(APIView):
 		return super().dispatch(*args, **kwargs)
 
 	def post(self, request, booking_id):
-		booking = get_object_or_404(Booking, id=booking_id, provider=request.user)
-		if booking.status not in ['confirmed', 'pending']:
-			return Response({'error': 'Only confirmed/pending bookings can be scheduled'}, status=status.HTTP_400_BAD_REQUEST)
 		scheduled_date_str = request.data.get('scheduled_date')
 		scheduled_time_str = request.data.get('scheduled_time')
 		if not scheduled_date_str or not scheduled_time_str:
@@ -307,14 +371,14 @@ class ScheduleBookingView(APIView):
 				'error': f'Scheduled time is in the past. Current Nepal time: {now_npt.strftime("%Y-%m-%d %H:%M:%S")}'
 			}, status=status.HTTP_400_BAD_REQUEST)
 
-		try:
-			booking.scheduled_date = sched_date
-			booking.scheduled_time = sched_time
-			booking.status = 'scheduled'
-			booking.save()
-		except Exception as e:
-			return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-		return Response(BookingSerializer(booking).data)
+		booking, error = _booking_transition(
+			booking_id, 'schedule', request.user, Q(provider=request.user),
+			scheduled_date=sched_date,
+			scheduled_time=sched_time,
+		)
+		if error:
+			return error
+		return Response(BookingSerializer(booking, fieldset=Fieldset.from_request(request)).data)
 
 
 class StartBookingView(APIView):
@@ -327,12 +391,10 @@ class StartBookingView(APIView):
 		return super().dispatch(*args, **kwargs)
 
 	def post(self, request, booking_id):
-		booking = get_object_or_404(Booking, id=booking_id, provider=request.user)
-		if booking.status not in ['scheduled', 'confirmed']:
-			return Response({'error': 'Only scheduled/confirmed bookings can be started'}, status=status.HTTP_400_BAD_REQUEST)
-		booking.status = 'in_progress'
-		booking.save()
-		return Response(BookingSerializer(booking).data)
+		booking, error = _booking_transition(booking_id, 'start', request.user, Q(provider=request.user))
+		if error:
+			return error
+		return Response(BookingSerializer(booking, fieldset=Fieldset.from_request(request)).data)
 
 
 class CompleteBookingView(APIView):
@@ -345,21 +407,16 @@ class CompleteBookingView(APIView):
 		return super().dispatch(*args, **kwargs)
 
 	def post(self, request, booking_id):
-		booking = get_object_or_404(Booking, id=booking_id, provider=request.user)
-		if booking.status not in ['in_progress', 'scheduled']:
-			return Response({'error': 'Only in-progress/scheduled bookings can be completed'}, status=status.HTTP_400_BAD_REQUEST)
-		final_price = request.data.get('final_price', None)
-		if final_price is not None:
-			booking.final_price = final_price
-		booking.status = 'completed'
-		booking.provider_completed_at = timezone.now()
-		booking.completed_at = timezone.now()
-		booking.completion_note = request.data.get('completion_note', '')
-		booking.save()
-		# Trigger payment release
-		from .services import PaymentService
-		PaymentService.release_payment(booking)
-		return Response(BookingSerializer(booking).data)
+		serializer = BookingCompletionSerializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+		fields = {'completion_note': serializer.validated_data.get('completion_note') or ''}
+		if serializer.validated_data.get('final_price') is not None:
+			fields['final_price'] = serializer.validated_data['final_price']
+		booking, error = _booking_transition(booking_id, 'complete', request.user, Q(provider=request.user), **fields)
+		if error:
+			return error
+		# Payment release runs from the 'complete' event
+		return Response(BookingSerializer(booking, fieldset=Fieldset.from_request(request)).data)
 
 
 class DisputeBookingView(APIView):
@@ -372,40 +429,36 @@ class DisputeBookingView(APIView):
 		return super().dispatch(*args, **kwargs)
 
 	def post(self, request, booking_id):
-		booking = get_object_or_404(Booking, id=booking_id, customer=request.user)
-		if booking.status != 'completed':
-			return Response(
-				{'error': 'Only completed bookings can be disputed'},
-				status=status.HTTP_400_BAD_REQUEST
-			)
 		reason = request.data.get('reason', '').strip()
 		if not reason:
 			return Response(
 				{'error': 'A dispute reason is required'},
 				status=status.HTTP_400_BAD_REQUEST
 			)
-		booking.status = 'disputed'
-		booking.dispute_reason = reason
-		booking.dispute_note = request.data.get('note', '')
-		booking.save()
-		# Hold payment via service (if payment exists)
-		from .services import PaymentService
-		PaymentService.hold_payment(booking, reason=booking.dispute_reason)
-		return Response(BookingSerializer(booking).data)
+		booking, error = _booking_transition(
+			booking_id, 'dispute', request.user, Q(customer=request.user),
+			dispute_reason=reason,
+			dispute_note=request.data.get('note', ''),
+		)
+		if error:
+			return error
+		# Payment hold runs from the 'dispute' event
+		return Response(BookingSerializer(booking, fieldset=Fieldset.from_request(request)).data)
 
 
-class ProviderMyServicesView(generics.ListAPIView):
+class ProviderMyServicesView(CompiledListMixin, generics.ListAPIView):
 	"""List services created by the current provider"""
 	authentication_classes = [SupabaseAuthentication]
 	permission_classes = [IsAuthenticated, IsServiceProvider]
 	serializer_class = ServiceSerializer
+	compiled_serializer_class = CompiledServiceSerializer
 	
 	@method_decorator(csrf_exempt)
 	def dispatch(self, *args, **kwargs):
 		return super().dispatch(*args, **kwargs)
 
 	def get_queryset(self):
-		qs = Service.objects.filter(provider=self.request.user).order_by('-created_at')
+		qs = Service.objects.filter(provider=self.request.user).select_related('provider', 'specialization').order_by('-created_at')
 		active = self.request.query_params.get('active')
 		if active in ['true', 'false']:
 			qs = qs.filter(is_active=(active == 'true'))
@@ -462,10 +515,11 @@ class ToggleServiceActiveView(APIView):
 		return Response(ServiceSerializer(service).data)
 
 
-class ServicePublicListView(generics.ListAPIView):
+class ServicePublicListView(CompiledListMixin, generics.ListAPIView):
 	"""Public list of active services with filters and search"""
 	permission_classes = [AllowAny]
 	serializer_class = ServiceSerializer
+	compiled_serializer_class = CompiledServiceSerializer
 	
 	@method_decorator(csrf_exempt)
 	def dispatch(self, *args, **kwargs):
@@ -566,15 +620,27 @@ class ServicePublicListView(generics.ListAPIView):
 		return qs.order_by('-created_at')
 
 
-class ServicePublicDetailView(generics.RetrieveAPIView):
+class ServicePublicDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
 	permission_classes = [AllowAny]
 	serializer_class = ServiceSerializer
 	queryset = Service.objects.select_related('provider', 'specialization').filter(is_active=True)
+	cache_control = PUBLIC_CACHE_CONTROL
 	
 	@method_decorator(csrf_exempt)
 	def dispatch(self, *args, **kwargs):
 		return super().dispatch(*args, **kwargs)
 
+	def get_validators(self, request, pk):
+		return (
+			Service.objects.filter(pk=pk, is_active=True)
+			.values_list('updated_at', 'provider__updated_at', 'specialization__updated_at')
+			.first()
+		)
+
+	def get_last_modified(self, validators):
+		# Every change to the response updates one of these rows
+		return max(validators)
+
 
 class CreateBookingView(generics.CreateAPIView):
 	"""Create a new booking as a customer"""
@@ -592,58 +658,162 @@ class CreateBookingView(generics.CreateAPIView):
 		preferred_date = serializer.validated_data.get('preferred_date')
 		preferred_time = serializer.validated_data.get('preferred_time')
 		if preferred_date and preferred_time:
+			_validate_preferred_slot(preferred_date, preferred_time, primary_service)
+
+		# The serializer writes the booking, its snapshots and its 'created' event
+		# in one transaction; the provider email is sent by the event worker
+		serializer.save(customer=self.request.user, provider=primary_service.provider)
+
+	def create(self, request, *args, **kwargs):
+		serializer = self.get_serializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+		self.perform_create(serializer)
+		# Reload with the relations of the response (services, images, payment)
+		# loaded up front, so serializing it costs the same for any number of services
+		booking = BookingSerializer.optimize_queryset(
+			Booking.objects.filter(pk=serializer.instance.pk), Fieldset.from_request(request)
+		).get()
+		data = self.get_serializer(booking).data
+		return Response(data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(data))
+
+
+class CreateBookingBatchView(APIView):
+	"""
+	Create several bookings for the same job in one request
+	(multi-visit jobs or recurring jobs such as weekly cleaning).
+
+	All slots are validated up front, conflicts are checked with one
+	query, bookings and service snapshots are bulk inserted, and the
+	provider gets a single consolidated email from the event worker.
+	Only the first visit has to fall within the normal advance-booking
+	window; later visits of a series may be further out.
+	"""
+	authentication_classes = [SupabaseAuthentication]
+	permission_classes = [IsAuthenticated, IsServiceSeeker]
+
+	@method_decorator(csrf_exempt)
+	def dispatch(self, *args, **kwargs):
+		return super().dispatch(*args, **kwargs)
+
+	def post(self, request):
+		serializer = BookingBatchSerializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+		data = serializer.validated_data
+
+		primary_service, services = BookingSerializer.resolve_services(data.get('services'), data.get('service'))
+		# create() reuses these instead of resolving them again
+		serializer.context['resolved_services'] = (primary_service, services)
+		slots = data['slots']
+
+		slot_errors = {}
+		for index, (preferred_date, preferred_time) in enumerate(slots):
 			try:
-				requested_dt = datetime.combine(preferred_date, preferred_time, tzinfo=NPT)
-			except Exception:
-				raise ValidationError({'preferred_time': 'Invalid preferred date/time'})
-			now_npt = timezone.now().astimezone(NPT)
-			if requested_dt <= now_npt:
-				raise ValidationError({'preferred_time': f'Selected time is in the past. Current Nepal time: {now_npt.strftime("%Y-%m-%d %H:%M:%S")}'})
-
-			# Maximum advance booking check: at most 5 days ahead
-			max_advance = timedelta(days=Booking.MAX_ADVANCE_BOOKING_DAYS)
-			time_until_service = requested_dt - now_npt
-			if time_until_service > max_advance:
-				raise ValidationError({
-					'preferred_date': f'Bookings can only be made up to {Booking.MAX_ADVANCE_BOOKING_DAYS} days in advance. '
-					f'Please select a date within the next {Booking.MAX_ADVANCE_BOOKING_DAYS} days.'
-				})
-
-			# Minimum advance booking check
-			# Emergency services: at least 30 min | Normal services: at least 1 hour
-			is_emergency = primary_service.emergency_service if primary_service else False
-			min_advance = timedelta(minutes=30) if is_emergency else timedelta(hours=1)
-			min_label = "30 minutes" if is_emergency else "1 hour"
-			if time_until_service < min_advance:
-				raise ValidationError({
-					'preferred_time': f'You must book at least {min_label} before the service time. '
-					f'Please select a later time slot.'
-				})
-
-		booking = serializer.save(customer=self.request.user, provider=primary_service.provider)
-
-		# Calculate and set the confirmation deadline
-		booking.calculate_confirmation_deadline()
-		booking.save(update_fields=['confirmation_deadline'])
-		
-		# Reload booking with booking_services to ensure they're available for email
-		booking.refresh_from_db()
-		
-		# Send email notification to provider (asynchronously to avoid blocking)
+				_validate_preferred_slot(preferred_date, preferred_time, primary_service, enforce_max_advance=(index == 0))
+			except ValidationError as e:
+				slot_errors[index] = e.detail
+		if slot_errors:
+			raise ValidationError({'slots': slot_errors})
+
+		from .services import BookingConflictService
+		conflicts = BookingConflictService.find_slot_conflicts(primary_service.provider, slots, services)
+		if conflicts:
+			return Response({
+				'error': 'Some of the requested time slots are already booked.',
+				'conflicts': [
+					{
+						'preferred_date': c['preferred_date'].isoformat(),
+						'preferred_time': c['preferred_time'].strftime('%H:%M:%S'),
+					}
+					for c in conflicts
+				],
+			}, status=status.HTTP_409_CONFLICT)
+
+		bookings = serializer.save(
+			customer=request.user,
+			customer_name=data.get('customer_name') or request.user.get_full_name() or request.user.email,
+		)
+
+		created = (
+			Booking.objects.filter(id__in=[b.id for b in bookings])
+			.select_related('customer', 'provider', 'service__specialization__speciality', 'payment')
+			.prefetch_related('images', 'booking_services__service__specialization__speciality')
+			.order_by('preferred_date', 'preferred_time')
+		)
+		return Response({
+			'count': len(bookings),
+			'bookings': BookingSerializer(created, many=True).data,
+		}, status=status.HTTP_201_CREATED)
+
+
+# Concurrent storage uploads per multipart image upload request
+IMAGE_UPLOAD_WORKERS = 4
+
+
+def _store_files_concurrently(files, names):
+	"""
+	Save uploaded files to storage under `names` in parallel.
+	If any upload fails, the ones that succeeded are deleted and the first
+	error is raised. Returns the stored names.
+	"""
+	def save(name, f):
 		try:
-			send_booking_notification_to_provider(booking)
-			print(f"✅ Email sent to provider: {booking.provider.email}")
+			return default_storage.save(name, f)
+		finally:
+			# Storage backends may query the database; don't leak this thread's connection
+			connections.close_all()
+
+	with ThreadPoolExecutor(max_workers=min(len(files), IMAGE_UPLOAD_WORKERS)) as pool:
+		futures = [pool.submit(save, name, f) for name, f in zip(names, files)]
+	stored, errors = [], []
+	for future in futures:
+		try:
+			stored.append(future.result())
 		except Exception as e:
-			# Log error but don't fail the booking creation
-			import logging
-			logger = logging.getLogger(__name__)
-			logger.error(f"❌ Failed to send booking notification email: {str(e)}")
-			print(f"❌ Email error: {str(e)}")
+			errors.append(e)
+	if errors:
+		_delete_stored_files(stored)
+		raise errors[0]
+	return stored
+
 
+def _delete_stored_files(names):
+	for name in names:
+		try:
+			default_storage.delete(name)
+		except Exception as e:
+			logger.warning(f"Could not delete orphaned upload {name}: {e}")
+
+
+def _create_booking_images(booking, new_images):
+	"""
+	Insert new_images in one transaction. The per-type limits are re-checked
+	under a lock on the booking row so concurrent uploads cannot both take
+	the last slot. Returns an error message (nothing inserted) or None.
+	"""
+	with transaction.atomic():
+		Booking.objects.select_for_update().filter(id=booking.id).exists()
+		counts = dict(
+			BookingImage.objects.filter(booking=booking)
+			.values('image_type').annotate(n=Count('id')).values_list('image_type', 'n')
+		)
+		for img in new_images:
+			counts[img.image_type] = counts.get(img.image_type, 0) + 1
+			if counts[img.image_type] > IMAGE_TYPE_LIMITS.get(img.image_type, 5):
+				return f'Maximum {IMAGE_TYPE_LIMITS.get(img.image_type, 5)} {img.image_type} images allowed per booking.'
+		BookingImage.objects.bulk_create(new_images)
+	return None
 
 
 class UploadBookingImagesView(APIView):
-	"""Upload booking images (before/during/after)"""
+	"""
+	Upload booking images (before/during/after) through Django.
+	Kept for older clients; new clients use the signed upload flow
+	(BookingImageUploadUrlsView + BookingImageConfirmView).
+
+	The batch is all-or-nothing: the count limit is checked once, files are
+	uploaded in parallel and the rows are inserted together. If anything
+	fails, files already stored are deleted.
+	"""
 	authentication_classes = [SupabaseAuthentication]
 	permission_classes = [IsAuthenticated]
 	parser_classes = [MultiPartParser, FormParser]
@@ -659,21 +829,169 @@ class UploadBookingImagesView(APIView):
 			return Response({'error': 'Not allowed'}, status=status.HTTP_403_FORBIDDEN)
 
 		image_type = request.data.get('image_type')
-		description = request.data.get('description', '')
+		if image_type not in IMAGE_TYPE_LIMITS:
+			return Response({'error': f"image_type must be one of: {', '.join(IMAGE_TYPE_LIMITS)}"}, status=status.HTTP_400_BAD_REQUEST)
+		description = (request.data.get('description') or '')[:255]
 		files = request.FILES.getlist('images')
 		if not files:
 			return Response({'error': 'No images provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-		created = []
-		for f in files:
-			img = BookingImage(booking=booking, image=f, image_type=image_type, uploaded_by=request.user, description=description)
-			try:
-				img.save()
-				created.append(img)
-			except Exception as e:
-				return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+		# One count for the whole batch instead of one per file
+		max_allowed = IMAGE_TYPE_LIMITS[image_type]
+		existing_count = BookingImage.objects.filter(booking=booking, image_type=image_type).count()
+		if existing_count + len(files) > max_allowed:
+			return Response({
+				'error': f'Maximum {max_allowed} {image_type} images allowed per booking. '
+				f'{existing_count} already uploaded.'
+			}, status=status.HTTP_400_BAD_REQUEST)
+
+		prefix = booking_image_prefix(booking.id, image_type)
+		try:
+			names = []
+			for f in files:
+				check_declared_size(f.size, MAX_IMAGE_SIZE_MB * 1024 * 1024, label=f.name)
+				names.append(unique_name(prefix, f.content_type, IMAGE_CONTENT_TYPES))
+		except UploadError as e:
+			return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+		try:
+			stored = _store_files_concurrently(files, names)
+		except Exception as e:
+			logger.error(f"Failed to upload images for booking {booking.id}: {e}")
+			return Response({'error': 'Could not upload images. Please try again.'}, status=status.HTTP_502_BAD_GATEWAY)
+
+		new_images = [
+			BookingImage(booking=booking, image=name, image_type=image_type, uploaded_by=request.user, description=description)
+			for name in stored
+		]
+		try:
+			error = _create_booking_images(booking, new_images)
+		except Exception:
+			_delete_stored_files(stored)
+			raise
+		if error:
+			_delete_stored_files(stored)
+			return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+		return Response(BookingImageSerializer(new_images, many=True, context={'request': request}).data)
+
+
+class BookingImageUploadUrlsView(APIView):
+	"""
+	Issue signed URLs for uploading booking images straight to storage.
+
+	Body: {"image_type": "before", "files": [{"content_type": "image/jpeg", "size": 123456}, ...]}
+	The client PUTs each file to its `upload_url`, then sends the returned
+	`upload_id`s to BookingImageConfirmView. Image bytes never pass through Django.
+	"""
+	authentication_classes = [SupabaseAuthentication]
+	permission_classes = [IsAuthenticated]
+	
+	@method_decorator(csrf_exempt)
+	def dispatch(self, *args, **kwargs):
+		return super().dispatch(*args, **kwargs)
+
+	def post(self, request, booking_id):
+		booking = get_object_or_404(Booking, id=booking_id)
+		# Only customer or provider on the booking can upload
+		if request.user.id not in (booking.customer_id, booking.provider_id):
+			return Response({'error': 'Not allowed'}, status=status.HTTP_403_FORBIDDEN)
+
+		image_type = request.data.get('image_type')
+		if image_type not in IMAGE_TYPE_LIMITS:
+			return Response({'error': f"image_type must be one of: {', '.join(IMAGE_TYPE_LIMITS)}"}, status=status.HTTP_400_BAD_REQUEST)
+		files = request.data.get('files')
+		if not isinstance(files, list) or not files:
+			return Response({'error': 'No images provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+		max_allowed = IMAGE_TYPE_LIMITS[image_type]
+		existing_count = BookingImage.objects.filter(booking=booking, image_type=image_type).count()
+		if existing_count + len(files) > max_allowed:
+			return Response({
+				'error': f'Maximum {max_allowed} {image_type} images allowed per booking. '
+				f'{existing_count} already uploaded.'
+			}, status=status.HTTP_400_BAD_REQUEST)
+
+		prefix = booking_image_prefix(booking.id, image_type)
+		try:
+			names = []
+			for f in files:
+				check_declared_size(f.get('size') if isinstance(f, dict) else None, MAX_IMAGE_SIZE_MB * 1024 * 1024, label='Image')
+				names.append(unique_name(prefix, f.get('content_type'), IMAGE_CONTENT_TYPES))
+		except UploadError as e:
+			return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+		try:
+			uploads = [
+				issue_upload(name, 'booking_image', request.user, booking=booking.id, image_type=image_type)
+				for name in names
+			]
+		except Exception as e:
+			logger.error(f"Failed to create upload URLs for booking {booking.id}: {e}")
+			return Response({'error': 'Could not create upload URLs. Please try again.'}, status=status.HTTP_502_BAD_GATEWAY)
+
+		return Response({'uploads': uploads})
+
+
+class BookingImageConfirmView(APIView):
+	"""
+	Record booking images uploaded through BookingImageUploadUrlsView.
+
+	Body: {"uploads": [{"upload_id": "...", "description": "optional"}, ...]}
+	Size and type are checked against the stored object's metadata; files
+	that fail are deleted from storage. Confirming twice is harmless.
+	"""
+	authentication_classes = [SupabaseAuthentication]
+	permission_classes = [IsAuthenticated]
+	
+	@method_decorator(csrf_exempt)
+	def dispatch(self, *args, **kwargs):
+		return super().dispatch(*args, **kwargs)
+
+	def post(self, request, booking_id):
+		booking = get_object_or_404(Booking, id=booking_id)
+		if request.user.id not in (booking.customer_id, booking.provider_id):
+			return Response({'error': 'Not allowed'}, status=status.HTTP_403_FORBIDDEN)
+
+		uploads = request.data.get('uploads')
+		if not isinstance(uploads, list) or not uploads:
+			return Response({'error': 'No uploads provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+		confirmed = {}
+		try:
+			for upload in uploads:
+				claims = read_upload(upload.get('upload_id') if isinstance(upload, dict) else None, 'booking_image', request.user)
+				if claims.get('booking') != booking.id:
+					raise UploadError('Invalid upload_id')
+				confirmed[claims['path']] = (claims['image_type'], (upload.get('description') or '')[:255])
+		except UploadError as e:
+			return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-		return Response(BookingImageSerializer(created, many=True, context={'request': request}).data)
+		# Already-recorded uploads are returned as they are
+		existing = list(BookingImage.objects.filter(booking=booking, image__in=list(confirmed)))
+		pending = {path: value for path, value in confirmed.items() if path not in {img.image.name for img in existing}}
+
+		try:
+			for path in pending:
+				verify_uploaded_object(path, MAX_IMAGE_SIZE_MB * 1024 * 1024, IMAGE_CONTENT_TYPES)
+		except UploadError as e:
+			return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+		new_images = [
+			BookingImage(
+				booking=booking, image=path, image_type=image_type,
+				uploaded_by=request.user, description=description
+			)
+			for path, (image_type, description) in pending.items()
+		]
+		error = _create_booking_images(booking, new_images)
+		if error:
+			return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+		return Response(
+			BookingImageSerializer(existing + new_images, many=True, context={'request': request}).data,
+			status=status.HTTP_201_CREATED
+		)
 
 
 class MyPaymentsView(generics.ListAPIView):
@@ -723,34 +1041,16 @@ class UserDashboardStatsView(APIView):
 		return super().dispatch(*args, **kwargs)
 
 	def get(self, request):
-		cache_key = f"user_dashboard_stats:{request.user.id}"
+		from .services import DashboardStatsService
+		cache_key = DashboardStatsService.user_cache_key(request.user.id)
 		cached = cache.get(cache_key)
+		metrics.record_cache('user_dashboard_stats', hit=bool(cached))
 		if cached:
 			return Response(cached)
 
-		qs = Booking.objects.filter(customer=request.user)
-		active_statuses = ['pending', 'confirmed', 'scheduled', 'in_progress', 'provider_completed']
-		agg = qs.aggregate(
-			total_bookings=Count('id'),
-			active_jobs=Count('id', filter=Q(status__in=active_statuses)),
-			completed_jobs=Count('id', filter=Q(status='completed')),
-			total_spent=Sum(
-				Coalesce(
-					F('final_price'),
-					F('quoted_price'),
-					Value(0),
-					output_field=DecimalField(max_digits=12, decimal_places=2)
-				),
-				output_field=DecimalField(max_digits=12, decimal_places=2)
-			),
-		)
-		data = {
-			"total_bookings": agg.get('total_bookings') or 0,
-			"active_jobs": agg.get('active_jobs') or 0,
-			"completed_jobs": agg.get('completed_jobs') or 0,
-			"total_spent": float(agg.get('total_spent') or 0),
-		}
-		cache.set(cache_key, data, timeout=60)
+		# Normally rolled up by the event worker after each booking change
+		data = DashboardStatsService.user_stats(request.user.id)
+		cache.set(cache_key, data, timeout=DashboardStatsService.CACHE_TIMEOUT)
 		return Response(data)
 
 
@@ -764,31 +1064,16 @@ class ProviderDashboardStatsView(APIView):
 		return super().dispatch(*args, **kwargs)
 
 	def get(self, request):
-		cache_key = f"provider_dashboard_stats:{request.user.id}"
+		from .services import DashboardStatsService
+		cache_key = DashboardStatsService.provider_cache_key(request.user.id)
 		cached = cache.get(cache_key)
+		metrics.record_cache('provider_dashboard_stats', hit=bool(cached))
 		if cached:
 			return Response(cached)
 
-		booking_qs = Booking.objects.filter(provider=request.user)
-		active_statuses = ['pending', 'confirmed', 'scheduled', 'in_progress']
-		review_qs = Review.objects.filter(provider=request.user)
-		payment_qs = Payment.objects.filter(provider=request.user, status='completed')
-
-		agg_bookings = booking_qs.aggregate(
-			total_jobs=Count('id', filter=Q(status='completed')),
-			active_jobs=Count('id', filter=Q(status__in=active_statuses)),
-		)
-		agg_payments = payment_qs.aggregate(total_earnings=Sum('provider_amount'))
-		agg_reviews = review_qs.aggregate(avg_rating=Avg('rating'), review_count=Count('id'))
-
-		data = {
-			"total_jobs": agg_bookings.get('total_jobs') or 0,
-			"active_jobs": agg_bookings.get('active_jobs') or 0,
-			"total_earnings": float(agg_payments.get('total_earnings') or 0),
-			"average_rating": round(agg_reviews.get('avg_rating') or 0, 1),
-			"review_count": agg_reviews.get('review_count') or 0,
-		}
-		cache.set(cache_key, data, timeout=60)
+		# Normally rolled up by the event worker after each booking change
+		data = DashboardStatsService.provider_stats(request.user.id)
+		cache.set(cache_key, data, timeout=DashboardStatsService.CACHE_TIMEOUT)
 		return Response(data)
 
 
@@ -833,11 +1118,12 @@ class CreateReviewView(generics.CreateAPIView):
 		return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class MyProviderReviewsView(generics.ListAPIView):
+class MyProviderReviewsView(CompiledListMixin, generics.ListAPIView):
 	"""List reviews received by current provider"""
 	authentication_classes = [SupabaseAuthentication]
 	permission_classes = [IsAuthenticated, IsServiceProvider]
 	serializer_class = ReviewSerializer
+	compiled_serializer_class = CompiledReviewSerializer
 	pagination_class = StandardResultsSetPagination
 	
 	@method_decorator(csrf_exempt)
@@ -877,11 +1163,12 @@ class MyProviderReviewsView(generics.ListAPIView):
 		return qs
 
 
-class MyCustomerReviewsView(generics.ListAPIView):
+class MyCustomerReviewsView(CompiledListMixin, generics.ListAPIView):
 	"""List reviews submitted by current customer"""
 	authentication_classes = [SupabaseAuthentication]
 	permission_classes = [IsAuthenticated, IsServiceSeeker]
 	serializer_class = ReviewSerializer
+	compiled_serializer_class = CompiledReviewSerializer
 	pagination_class = StandardResultsSetPagination
 	
 	@method_decorator(csrf_exempt)
@@ -1022,10 +1309,11 @@ class ProviderAvailabilityView(APIView):
 		return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ProviderListView(generics.ListAPIView):
+class ProviderListView(CompiledListMixin, generics.ListAPIView):
 	"""List all service providers with ratings and statistics"""
 	permission_classes = [AllowAny]
 	serializer_class = ProviderListSerializer
+	compiled_serializer_class = CompiledProviderListSerializer
 	
 	@method_decorator(csrf_exempt)
 	def dispatch(self, *args, **kwargs):
@@ -1033,10 +1321,13 @@ class ProviderListView(generics.ListAPIView):
 	
 	def get_queryset(self):
 		"""Get active providers (user_type='offer')"""
+		from .services import ProviderDiscoveryService
+
+		# Rating stats are added by CompiledProviderListSerializer when requested
 		qs = User.objects.filter(
 			user_type='offer',
 			is_active=True
-		).prefetch_related('user_specializations', 'user_specialities', 'services')
+		)
 		
 		# Filters
 		specialization = self.request.query_params.get('specialization')
@@ -1132,20 +1423,95 @@ class ProviderListView(generics.ListAPIView):
 		qs = qs.distinct()
 		return qs
 
-class ProviderDetailView(generics.RetrieveAPIView):
+class NearbyProvidersView(APIView):
+	"""
+	GET /bookings/providers/nearby/?lat=27.7&lng=85.3&radius_km=10
+	Providers near a location whose service radius covers it, nearest first.
+
+	Optional params:
+	- radius_km: search radius (default 10, max 100)
+	- limit: max results (default 50, max 100)
+	"""
+	permission_classes = [AllowAny]
+
+	@method_decorator(csrf_exempt)
+	def dispatch(self, *args, **kwargs):
+		return super().dispatch(*args, **kwargs)
+
+	def get(self, request):
+		from .services import ProviderDiscoveryService
+
+		try:
+			lat = float(request.query_params.get('lat'))
+			lng = float(request.query_params.get('lng'))
+		except (TypeError, ValueError):
+			return Response({'error': 'lat and lng are required numeric parameters'}, status=status.HTTP_400_BAD_REQUEST)
+		if not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+			return Response({'error': 'lat/lng out of range'}, status=status.HTTP_400_BAD_REQUEST)
+
+		try:
+			radius_km = float(request.query_params.get('radius_km', ProviderDiscoveryService.DEFAULT_RADIUS_KM))
+			limit = int(request.query_params.get('limit', ProviderDiscoveryService.DEFAULT_LIMIT))
+		except (TypeError, ValueError):
+			return Response({'error': 'radius_km and limit must be numeric'}, status=status.HTTP_400_BAD_REQUEST)
+		# Written so that NaN is rejected too
+		if not radius_km > 0:
+			return Response({'error': 'radius_km must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+		radius_km = min(radius_km, ProviderDiscoveryService.MAX_RADIUS_KM)
+		limit = max(1, min(limit, ProviderDiscoveryService.MAX_LIMIT))
+
+		fieldset = Fieldset.from_request(request)
+		providers = ProviderDiscoveryService.find_nearby_providers(
+			lat, lng, radius_km=radius_km, limit=limit,
+			stats=NearbyProviderSerializer.list_stats_options(fieldset)
+		)
+		return Response({
+			'lat': lat,
+			'lng': lng,
+			'radius_km': radius_km,
+			'count': len(providers),
+			'results': NearbyProviderSerializer(providers, many=True, fieldset=fieldset).data,
+		}, status=status.HTTP_200_OK)
+
+
+class ProviderDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
 	"""Get detailed information about a specific provider"""
 	permission_classes = [AllowAny]
 	serializer_class = ProviderDetailSerializer
+	# ProviderDetailSerializer queries each of its related fields itself,
+	# so fields left out with ?fields=/?expand= cost nothing
 	queryset = User.objects.filter(
 		user_type='offer',
 		is_active=True
-	).prefetch_related('user_specializations', 'services')
+	)
 	lookup_field = 'id'
+	cache_control = PUBLIC_CACHE_CONTROL
 	
 	@method_decorator(csrf_exempt)
 	def dispatch(self, *args, **kwargs):
 		return super().dispatch(*args, **kwargs)
 
+	def get_validators(self, request, id):
+		return (
+			self.get_queryset()
+			.filter(id=id)
+			.annotate(
+				**related_validators('reviews', Review, 'provider', 'updated_at'),
+				**related_validators('specialities', UserSpeciality, 'user', 'added_at', 'speciality__updated_at'),
+				**related_validators(
+					'services', Service, 'provider', 'updated_at',
+					'specialization__updated_at', 'specialization__speciality__updated_at'
+				),
+			)
+			.values(
+				'updated_at', 'reviews_count', 'reviews_updated_at',
+				'specialities_count', 'specialities_added_at', 'specialities_speciality_updated_at',
+				'services_count', 'services_updated_at',
+				'services_specialization_updated_at', 'services_specialization_speciality_updated_at',
+			)
+			.first()
+		)
+
 
 class ProviderAvailabilityPublicView(APIView):
 	"""
@@ -1233,17 +1599,9 @@ class ProviderBookedSlotsView(APIView):
 			)
 		
 		# Get provider buffer time from availability settings
-		buffer_minutes = 15  # default
-		try:
-			availability = ProviderAvailability.objects.get(provider=provider)
-			buffer_raw = availability.settings.get('bufferTime', 15)
-			# Handle values like "15 minutes" or plain integers
-			if isinstance(buffer_raw, str):
-				buffer_minutes = int(buffer_raw.split()[0])
-			else:
-				buffer_minutes = int(buffer_raw)
-		except (ProviderAvailability.DoesNotExist, ValueError, IndexError):
-			pass
+		from .services import BookingConflictService
+		availability = ProviderAvailability.objects.filter(provider=provider).only('settings').first()
+		buffer_minutes = BookingConflictService.buffer_minutes(availability.settings.get('bufferTime') if availability else None)
 
 		# Get all bookings for this provider on this date (excluding cancelled/declined)
 		# Only block slots for bookings the provider has accepted (not pending)
@@ -1268,10 +1626,7 @@ class ProviderBookedSlotsView(APIView):
 				total_duration_hours += duration
 			
 			# Default to 1 hour if no duration info at all
-			if total_duration_hours <= 0:
-				total_duration_hours = Decimal('1')
-			
-			total_duration_minutes = int(total_duration_hours * 60)
+			total_duration_minutes = BookingConflictService.duration_minutes(total_duration_hours)
 			
 			# Calculate end time and end time with buffer
 			start_dt = datetime.combine(date, start_time)
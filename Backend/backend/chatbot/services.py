@@ -56,10 +56,15 @@
 
 import google.genai as genai
 from google.genai import types
+import logging
 import os
 from decouple import config
 from rest_framework import serializers
 
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
 
 class GeminiChatService:
     def __init__(self):
@@ -116,15 +121,16 @@ Communication style:
             """
             
             # Generate response
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=message,
-                config=types.GenerateContentConfig(
-                    system_instruction=system_instruction,
-                    temperature=0.7,
-                    max_output_tokens=1024,
+            with metrics.external_call('gemini'):
+                response = self.client.models.generate_content(
+                    model=self.model,
+                    contents=message,
+                    config=types.GenerateContentConfig(
+                        system_instruction=system_instruction,
+                        temperature=0.7,
+                        max_output_tokens=1024,
+                    )
                 )
-            )
             
             # Extract text from response
             if response and response.text:
@@ -139,9 +145,7 @@ Communication style:
                 }
             
         except Exception as e:
-            print(f"Error in get_response: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error in get_response: {str(e)}")
             return {
                 'success': False,
                 'message': f"Sorry, I encountered an error. Please try again."
@@ -18,6 +18,7 @@ from decimal import Decimal
 from django.conf import settings
 from django.utils import timezone
 from django.db import transaction as db_transaction
+from backend import metrics
 from .models import Transaction, KhaltiConfig
 from bookings.models import Booking, Payment
 
@@ -138,12 +139,13 @@ class KhaltiService:
             logger.info(f"Khalti initiate URL: {self.initiate_url}")
             
             # Make API request to Khalti
-            response = requests.post(
-                self.initiate_url,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+            with metrics.external_call('khalti'):
+                response = requests.post(
+                    self.initiate_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=30
+                )
             
             response_data = response.json()
             logger.info(f"Khalti initiate response: {response_data}")
@@ -221,12 +223,13 @@ class KhaltiService:
             logger.info(f"Verifying Khalti payment: pidx={pidx}")
             
             # Make lookup request
-            response = requests.post(
-                self.lookup_url,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
+            with metrics.external_call('khalti'):
+                response = requests.post(
+                    self.lookup_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=30
+                )
             
             response_data = response.json()
             logger.info(f"Khalti lookup response: {response_data}")
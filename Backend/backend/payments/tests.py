@@ -1,3 +1,102 @@
+import io
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from backend.renderers import FastJSONParser, FastJSONRenderer
+from bookings.models import Booking, Payment, Service
+from users.models import Speciality, Specialization, User
+
+
+class FastJSONRendererTests(TestCase):
+    """FastJSONRenderer writes the same bytes as DRF's JSONRenderer."""
+
+    def assertSameJSON(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_native_and_fallback_types(self):
+        self.assertSameJSON({
+            'amount': Decimal('1406.25'),
+            'zero': Decimal('0'),
+            'uid': uuid.uuid4(),
+            'utc': datetime(2025, 1, 15, 9, 30, 12, 345678, tzinfo=dt_timezone.utc),
+            'local': datetime(2025, 1, 15, 9, 30, tzinfo=dt_timezone(timedelta(hours=5, minutes=45))),
+            'date': date(2025, 1, 15),
+            'time': time(10, 30),
+            'duration': timedelta(hours=1, minutes=30),
+            'lazy': gettext_lazy('Pending'),
+            'text': 'नमस्ते \u2028 line \u2029 separators',
+            1: 'integer key',
+            'nested': [{'a': (1, 2)}, None, True, 1.5],
+        })
+
+    def test_falls_back_for_what_orjson_refuses(self):
+        self.assertSameJSON({'big': 2 ** 70})
+        self.assertSameJSON({'a': 1}, 'application/json; indent=4')
+
+    def test_parser(self):
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"name": "सीता", "n": 1.5}'.encode())), {'name': 'सीता', 'n': 1.5})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"amount": NaN}'))
+
+
+class ProviderEarningsStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='customer', email='customer@example.com', user_type='find')
+        cls.provider = User.objects.create(username='provider', email='provider@example.com', user_type='offer')
+        service = Service.objects.create(
+            provider=cls.provider,
+            specialization=Specialization.objects.create(
+                speciality=Speciality.objects.create(name='Plumbing', slug='plumbing'), name='Pipe Repair'
+            ),
+            title='Pipe Repair', description='Test service', base_price=800, price_type='fixed'
+        )
+        for method, amount, payment_status in (
+            ('khalti', '1000.00', 'completed'),
+            ('khalti', '2000.00', 'completed'),
+            ('cash', '500.00', 'completed'),
+            ('cash', '700.00', 'pending'),
+        ):
+            booking = Booking.objects.create(
+                customer=cls.customer, provider=cls.provider, service=service, status='completed',
+                preferred_date=(timezone.now() + timedelta(days=1)).date(), preferred_time='10:00',
+                service_address='Lalitpur', service_city='Lalitpur', description='Leak', customer_phone='9800000000'
+            )
+            amount = Decimal(amount)
+            Payment.objects.create(
+                booking=booking, customer=cls.customer, provider=cls.provider, amount=amount,
+                platform_fee=amount / 10, provider_amount=amount - amount / 10,
+                payment_method=method, status=payment_status
+            )
 
-# Create your tests here.
+    def test_stats_render_amounts_as_numbers(self):
+        client = APIClient()
+        client.force_authenticate(self.provider)
+        response = client.get('/api/payments/provider/earnings/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'total_earnings': 3500.0,
+            'provider_earnings': 3150.0,
+            'platform_fees': 350.0,
+            'completed_jobs': 3,
+            'avg_job_value': 1050.0,
+            'pending_amount': 630.0,
+            'pending_count': 1,
+            'payment_methods_breakdown': {
+                'khalti': {'count': 2, 'amount': 2700.0},
+                'cash': {'count': 1, 'amount': 450.0},
+            },
+        })
@@ -506,7 +506,9 @@ class ProviderEarningsStatsView(APIView):
         from django.utils import timezone
         from django.db.models import Sum, Count, Avg, Q
         from datetime import timedelta
+        from decimal import Decimal
         
+        zero = Decimal('0')
         try:
             queryset = Payment.objects.filter(provider=request.user)
             
@@ -549,27 +551,30 @@ class ProviderEarningsStatsView(APIView):
                 pending_count=Count('id'),
             )
             
-            # Payment methods breakdown (completed only)
+            # Payment methods breakdown (completed only), one grouped query
             method_breakdown = {}
-            for method_choice in Payment.PAYMENT_METHOD_CHOICES:
-                method_key = method_choice[0]
-                method_agg = completed_qs.filter(payment_method=method_key).aggregate(
-                    count=Count('id'),
-                    amount=Sum('provider_amount'),
-                )
-                if method_agg['count'] > 0:
+            method_rows = (
+                completed_qs.order_by()
+                .values('payment_method')
+                .annotate(count=Count('id'), amount=Sum('provider_amount'))
+            )
+            method_totals = {row['payment_method']: row for row in method_rows}
+            for method_key, _ in Payment.PAYMENT_METHOD_CHOICES:
+                row = method_totals.get(method_key)
+                if row and row['count'] > 0:
                     method_breakdown[method_key] = {
-                        'count': method_agg['count'],
-                        'amount': float(method_agg['amount'] or 0),
+                        'count': row['count'],
+                        'amount': row['amount'] or zero,
                     }
             
+            # Amounts stay Decimal; the JSON renderer writes them as numbers
             return Response({
-                'total_earnings': float(completed_agg['total_earnings'] or 0),
-                'provider_earnings': float(completed_agg['provider_earnings'] or 0),
-                'platform_fees': float(completed_agg['platform_fees'] or 0),
+                'total_earnings': completed_agg['total_earnings'] or zero,
+                'provider_earnings': completed_agg['provider_earnings'] or zero,
+                'platform_fees': completed_agg['platform_fees'] or zero,
                 'completed_jobs': completed_agg['completed_jobs'] or 0,
-                'avg_job_value': round(float(completed_agg['avg_job_value'] or 0), 2),
-                'pending_amount': float(pending_agg['pending_amount'] or 0),
+                'avg_job_value': round(completed_agg['avg_job_value'] or zero, 2),
+                'pending_amount': pending_agg['pending_amount'] or zero,
                 'pending_count': pending_agg['pending_count'] or 0,
                 'payment_methods_breakdown': method_breakdown,
             }, status=status.HTTP_200_OK)
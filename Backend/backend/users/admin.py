@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth import get_user_model
-from .models import Speciality, Specialization, UserSpeciality, UserSpecialization, Certificate
+from .models import Speciality, Specialization, UserSpeciality, UserSpecialization, Certificate, DocumentVerification
 
 User = get_user_model()
 
@@ -73,4 +73,12 @@ class UserSpecializationAdmin(admin.ModelAdmin):
 class CertificateAdmin(admin.ModelAdmin):
     list_display = ('user', 'name', 'uploaded_at')
     search_fields = ('user__email', 'name')
-    list_filter = ('uploaded_at',)
\ No newline at end of file
+    list_filter = ('uploaded_at',)
+
+
+@admin.register(DocumentVerification)
+class DocumentVerificationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'kind', 'status', 'content_type', 'created_at', 'processed_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('user__email', 'digest', 'phash')
+    readonly_fields = ('digest', 'phash', 'problems', 'duplicates', 'processed_at')
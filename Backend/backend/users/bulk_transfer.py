@@ -0,0 +1,268 @@
+"""
+Bulk file transfer between storages (replaces the old migration_script.py).
+
+A Target describes one file column: which rows hold files still to move, the
+name to store each file under, and the value to write back afterwards.
+BulkTransfer copies a target's files from a source storage to a destination
+storage:
+
+- rows are read in primary-key order with .iterator(chunk_size=...);
+- each chunk's files are uploaded by a bounded thread pool, optionally rate
+  limited;
+- the chunk's new values are written with one bulk_update;
+- then the checkpoint file records the last primary key done, so an
+  interrupted run resumes after the last completed chunk. Rows that failed
+  are recorded too and can be retried with retry_failed=True.
+
+The transfer_files management command is the CLI for this module.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from bookings.models import BookingImage
+
+from .models import User
+
+
+def _local_name(value):
+    """Storage name of a legacy local file value ('/media/x/y.jpg' -> 'x/y.jpg')."""
+    value = str(value or '')
+    if settings.MEDIA_URL and value.startswith(settings.MEDIA_URL):
+        value = value[len(settings.MEDIA_URL):]
+    return value.lstrip('/')
+
+
+def _not_migrated(field):
+    """Rows whose URL field holds a local path rather than an http(s) URL."""
+    return (
+        Q(**{f'{field}__isnull': False})
+        & ~Q(**{field: ''})
+        & ~Q(**{f'{field}__startswith': 'http'})
+    )
+
+
+@dataclass
+class Target:
+    """One file column to transfer."""
+    label: str
+    model: type
+    field: str
+    # Rows to transfer
+    pending: Q
+    # (instance, source name) -> destination name
+    destination_name: Callable
+    # FileFields keep the storage name; URL fields get the public URL
+    stores_url: bool
+
+    def source_name(self, instance):
+        value = getattr(instance, self.field)
+        return _local_name(value.name if hasattr(value, 'name') else value)
+
+
+def _ext(name, default='.jpg'):
+    return os.path.splitext(name)[1].lower() or default
+
+
+TARGETS = {
+    'profile_pictures': Target(
+        label='profile_pictures',
+        model=User,
+        field='profile_picture',
+        pending=_not_migrated('profile_picture'),
+        destination_name=lambda user, name: f"profile_pictures/profile_{user.pk}{_ext(name)}",
+        stores_url=True,
+    ),
+    'citizenship_front': Target(
+        label='citizenship_front',
+        model=User,
+        field='citizenship_front',
+        pending=_not_migrated('citizenship_front'),
+        destination_name=lambda user, name: f"citizenship/citizenship_front_{user.pk}{_ext(name)}",
+        stores_url=True,
+    ),
+    'citizenship_back': Target(
+        label='citizenship_back',
+        model=User,
+        field='citizenship_back',
+        pending=_not_migrated('citizenship_back'),
+        destination_name=lambda user, name: f"citizenship/citizenship_back_{user.pk}{_ext(name)}",
+        stores_url=True,
+    ),
+    'booking_images': Target(
+        label='booking_images',
+        model=BookingImage,
+        field='image',
+        pending=~Q(image=''),
+        # Already named bookings/booking_<id>/<type>_<timestamp>.<ext>
+        destination_name=lambda image, name: name,
+        stores_url=False,
+    ),
+}
+
+
+class Checkpoint:
+    """Per-target progress ({'last_pk': int, 'failed': [pk, ...]}) kept in a JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def get(self, label):
+        return self.data.setdefault(label, {'last_pk': 0, 'failed': []})
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+class RateLimiter:
+    """Allow at most `rate` operations per second across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+@dataclass
+class TransferStats:
+    total: int = 0
+    transferred: int = 0
+    failed: int = 0
+    missing: int = 0
+    bytes: int = 0
+    started: float = 0.0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def summary(self):
+        elapsed = max(self.elapsed, 1e-6)
+        done = self.transferred + self.failed + self.missing
+        return (
+            f"{done}/{self.total} | {self.transferred} transferred, {self.failed} failed, "
+            f"{self.missing} missing | {self.transferred / elapsed:.1f} files/s, "
+            f"{self.bytes / elapsed / (1024 * 1024):.2f} MB/s"
+        )
+
+
+class BulkTransfer:
+    """
+    Copy the files of one or more Targets from `source` to `destination`.
+
+    Args:
+        source, destination: Django storages
+        checkpoint_path: JSON checkpoint file (None disables resuming)
+        workers: concurrent uploads
+        chunk_size: rows per chunk (one bulk_update and checkpoint per chunk)
+        rate: maximum uploads per second (None for unlimited)
+        dry_run: only count what would be transferred
+        retry_failed: only process rows recorded as failed in the checkpoint
+        report: callable receiving progress lines
+    """
+
+    def __init__(self, source, destination, checkpoint_path=None, workers=8, chunk_size=200,
+                 rate=None, dry_run=False, retry_failed=False, report=print):
+        self.source = source
+        self.destination = destination
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.limiter = RateLimiter(rate)
+        self.dry_run = dry_run
+        self.retry_failed = retry_failed
+        self.report = report
+
+    def run(self, target):
+        progress = self.checkpoint.get(target.label)
+        queryset = target.model._default_manager.filter(target.pending).only('pk', target.field).order_by('pk')
+        if self.retry_failed:
+            queryset = queryset.filter(pk__in=progress['failed'])
+        else:
+            queryset = queryset.filter(pk__gt=progress['last_pk'])
+
+        stats = TransferStats(total=queryset.count(), started=time.monotonic())
+        self.report(f"{target.label}: {stats.total} file(s) to transfer")
+        if self.dry_run or not stats.total:
+            return stats
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            chunk = []
+            for instance in queryset.iterator(chunk_size=self.chunk_size):
+                chunk.append(instance)
+                if len(chunk) >= self.chunk_size:
+                    self._run_chunk(target, chunk, pool, progress, stats)
+                    chunk = []
+            if chunk:
+                self._run_chunk(target, chunk, pool, progress, stats)
+        return stats
+
+    def _copy(self, target, instance):
+        """Upload one file. Returns (instance, new value, size) or raises."""
+        name = target.source_name(instance)
+        if not self.source.exists(name):
+            raise FileNotFoundError(name)
+        self.limiter.wait()
+        with self.source.open(name, 'rb') as f:
+            size = f.size
+            stored = self.destination.save(target.destination_name(instance, name), f)
+        value = self.destination.url(stored) if target.stores_url else stored
+        return instance, value, size
+
+    def _run_chunk(self, target, chunk, pool, progress, stats):
+        futures = [pool.submit(self._copy, target, instance) for instance in chunk]
+        updated, failed = [], []
+        for instance, future in zip(chunk, futures):
+            try:
+                _, value, size = future.result()
+            except FileNotFoundError as e:
+                stats.missing += 1
+                failed.append(instance.pk)
+                self.report(f"{target.label}: {instance.pk}: source file not found: {e}")
+                continue
+            except Exception as e:
+                stats.failed += 1
+                failed.append(instance.pk)
+                self.report(f"{target.label}: {instance.pk}: {e}")
+                continue
+            setattr(instance, target.field, value)
+            updated.append(instance)
+            stats.transferred += 1
+            stats.bytes += size or 0
+
+        with transaction.atomic():
+            target.model._default_manager.bulk_update(updated, [target.field], batch_size=self.chunk_size)
+
+        done = {instance.pk for instance in updated}
+        progress['failed'] = sorted((set(progress['failed']) - done) | set(failed))
+        if not self.retry_failed:
+            progress['last_pk'] = chunk[-1].pk
+        self.checkpoint.save()
+        self.report(f"{target.label}: {stats.summary()}")
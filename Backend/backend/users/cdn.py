@@ -0,0 +1,89 @@
+"""
+Public URLs for stored files that browsers and CDNs can cache.
+
+file_url() is what serializers use for any stored file, whether the model
+keeps a storage name (FileField) or a full Supabase URL (URLField):
+
+- Objects whose name can never point at different bytes - content-addressed
+  names (users.content_addressed) and random upload names
+  (users.uploads.unique_name) - are served as-is and uploaded with a
+  one-year immutable Cache-Control.
+- Other objects (e.g. profile_pictures/profile_<id>.jpg, overwritten in
+  place) get a `?v=<version>` parameter from the caller's `version`,
+  typically the row's updated_at, so the URL changes whenever the file may
+  have been replaced. No storage request is made to build a URL.
+- width/height/quality ask Supabase's image transformation endpoint for a
+  resized copy when SUPABASE_IMAGE_TRANSFORMATIONS is enabled; otherwise
+  they are ignored and the stored file is returned.
+
+Set STORAGE_CDN_URL to serve public objects through a CDN in front of
+Supabase (e.g. https://cdn.sajilofix.com); it defaults to SUPABASE_URL.
+"""
+import re
+
+from django.core.files.storage import default_storage
+
+from .content_addressed import is_content_name
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Seconds, for Supabase's cacheControl upload option
+IMMUTABLE_MAX_AGE = 31536000
+DEFAULT_MAX_AGE = 3600
+
+# Suffix added by users.uploads.unique_name: _<uuid4 hex>.<ext>
+_UNIQUE_NAME = re.compile(r'_[0-9a-f]{32}\.[a-z0-9]+$')
+
+
+def is_immutable_name(name):
+    """True if `name` is never reused for different content."""
+    return is_content_name(name) or bool(_UNIQUE_NAME.search(name or ''))
+
+
+def max_age(name):
+    """Cache lifetime in seconds to store `name` with."""
+    return IMMUTABLE_MAX_AGE if is_immutable_name(name) else DEFAULT_MAX_AGE
+
+
+def cache_control(name):
+    """Cache-Control header value to store `name` with."""
+    return IMMUTABLE_CACHE_CONTROL if is_immutable_name(name) else f"max-age={DEFAULT_MAX_AGE}"
+
+
+def version_tag(version):
+    """?v= value for `version`: a datetime (seconds, in hex) or a string."""
+    if version is None or version == '':
+        return None
+    if hasattr(version, 'timestamp'):
+        return format(int(version.timestamp()), 'x')
+    return str(version)
+
+
+def file_url(value, width=None, height=None, quality=None, version=None):
+    """
+    Cacheable public URL of a stored file.
+
+    Args:
+        value: storage name, or a public URL of the default storage.
+            URLs elsewhere (and empty values) are returned unchanged.
+        width, height, quality: optional image transformation parameters
+        version: datetime or string that changes whenever the file behind
+            a reused name may have changed (e.g. the row's updated_at)
+
+    Returns:
+        str or None
+    """
+    if not value:
+        return None
+    value = str(value)
+    storage = default_storage
+    if not hasattr(storage, 'cdn_url'):
+        # Local/in-memory storages: plain URLs
+        return value if value.startswith(('http://', 'https://')) else storage.url(value)
+
+    if value.startswith(('http://', 'https://')):
+        name = storage.name_from_url(value)
+        if name is None:
+            return value
+    else:
+        name = value
+    return storage.cdn_url(name, width=width, height=height, quality=quality, version=version_tag(version))
@@ -0,0 +1,89 @@
+"""
+Content-addressed storage.
+
+ContentAddressedStorageMixin makes a storage backend keep every saved file
+under the SHA-256 of its content:
+
+    bookings/booking_12/before_20250101_120000.jpg
+        -> bookings/cas/3f/3f9a...e1.jpg
+
+The first segment (the Supabase bucket) and the extension are kept. Saving
+content that is already stored skips the upload and returns the existing
+name. A StoredObject row per file counts its references: saves add one,
+delete() removes one, and nothing is removed from storage until the
+gc_stored_objects command purges unreferenced objects.
+"""
+import hashlib
+import os
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+CAS_DIRECTORY = 'cas'
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def content_digest(content):
+    """SHA-256 hex digest and size of a Django File, read chunk by chunk."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def content_name(name, digest):
+    """Content-addressed storage name for a file requested as `name`."""
+    bucket = name.split('/', 1)[0]
+    ext = os.path.splitext(name)[1].lower()
+    return f"{bucket}/{CAS_DIRECTORY}/{digest[:2]}/{digest}{ext}"
+
+
+def is_content_name(name):
+    parts = (name or '').split('/')
+    return len(parts) == 4 and parts[1] == CAS_DIRECTORY
+
+
+class ContentAddressedStorageMixin:
+    """Deduplicating, reference-counted saves for a Storage class."""
+
+    def get_available_name(self, name, max_length=None):
+        # _save picks the final name from the content; it never collides
+        return name
+
+    def _save(self, name, content):
+        from .models import StoredObject
+
+        digest, size = content_digest(content)
+        stored_name = content_name(name, digest)
+
+        # The row lock makes concurrent saves of the same new content wait
+        # for the first upload instead of uploading it again
+        with transaction.atomic():
+            stored, _ = StoredObject.objects.select_for_update().get_or_create(
+                name=stored_name,
+                defaults={'digest': digest, 'size': size},
+            )
+            if stored.uploaded_at is None:
+                super()._save(stored_name, content)
+                stored.uploaded_at = timezone.now()
+            stored.refcount = F('refcount') + 1
+            stored.save(update_fields=['refcount', 'uploaded_at', 'updated_at'])
+        return stored_name
+
+    def delete(self, name):
+        """Drop one reference to a content-addressed file; other names are deleted."""
+        from .models import StoredObject
+
+        if not is_content_name(name):
+            return super().delete(name)
+        StoredObject.objects.filter(name=name, refcount__gt=0).update(
+            refcount=F('refcount') - 1, updated_at=timezone.now()
+        )
+
+    def purge(self, name):
+        """Remove the stored file itself (used by gc_stored_objects)."""
+        super().delete(name)
@@ -0,0 +1,300 @@
+"""
+Document verification.
+
+Citizenship images and certificates are checked off the request path:
+upload views only call enqueue(), which adds a pending DocumentVerification
+row, and the verify_documents worker processes the queue:
+
+- the file type is detected from its magic bytes (not the name or the
+  content type the client declared) and checked against the kind's
+  allowed types and maximum size;
+- images must be at least MIN_IMAGE_SIDE pixels on their short side;
+- a PREVIEW_SIZE JPEG preview (EXIF stripped) is stored for the admin panel;
+- a SHA-256 digest and a 64-bit perceptual hash (dHash) are recorded, and
+  documents matching another account's - identical, or within
+  PHASH_MAX_DISTANCE bits - are flagged on both sides.
+
+Near duplicates are found with multi-index hashing: the hash is also
+stored as four indexed 16-bit bands. Two hashes within PHASH_MAX_DISTANCE
+bits differ in at most PHASH_MAX_DISTANCE // 4 bits of some band, so only
+rows with a band within that distance of ours (17 values per band for a
+distance of 6) are fetched and compared.
+
+PDF certificates get the type, size and digest checks only.
+"""
+import hashlib
+import io
+import logging
+from itertools import combinations
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import DocumentVerification
+from .uploads import DOCUMENT_CONTENT_TYPES, IMAGE_CONTENT_TYPES, sniff_content_type
+
+logger = logging.getLogger(__name__)
+
+# kind -> (allowed content types, max size in bytes)
+DOCUMENT_LIMITS = {
+    'citizenship_front': (IMAGE_CONTENT_TYPES, 5 * 1024 * 1024),
+    'citizenship_back': (IMAGE_CONTENT_TYPES, 5 * 1024 * 1024),
+    'certificate': (DOCUMENT_CONTENT_TYPES, 10 * 1024 * 1024),
+}
+
+MIN_IMAGE_SIDE = 300
+PREVIEW_SIZE = 480
+# Perceptual hashes differing in at most this many of 64 bits are the same document
+PHASH_MAX_DISTANCE = 6
+# phash is also stored split into these 16-bit bands
+PHASH_BAND_FIELDS = ['phash_band0', 'phash_band1', 'phash_band2', 'phash_band3']
+PHASH_BAND_BITS = 16
+# Hashes of blank/uniform images; they would match every other blank image
+_UNIFORM_HASHES = {'0000000000000000', 'ffffffffffffffff'}
+
+# Orientations (EXIF tag 0x0112) that swap width and height
+_ROTATED = {5, 6, 7, 8}
+
+
+def perceptual_hash(image):
+    """
+    64-bit difference hash of a PIL image as 16 hex digits. Survives
+    rescaling, recompression and small brightness changes.
+    """
+    small = image.convert('L').resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def hash_distance(first, second):
+    """Number of differing bits between two perceptual hashes."""
+    return (int(first, 16) ^ int(second, 16)).bit_count()
+
+
+def phash_bands(phash):
+    """The PHASH_BAND_FIELDS values of a perceptual hash (None for no hash)."""
+    if not phash:
+        return [None] * len(PHASH_BAND_FIELDS)
+    digits = PHASH_BAND_BITS // 4
+    return [int(phash[i * digits:(i + 1) * digits], 16) for i in range(len(PHASH_BAND_FIELDS))]
+
+
+def _band_neighbours(band, distance):
+    """Every band value within `distance` bits of `band`."""
+    values = {band}
+    for bits in range(1, distance + 1):
+        for positions in combinations(range(PHASH_BAND_BITS), bits):
+            values.add(band ^ sum(1 << position for position in positions))
+    return values
+
+
+def inspect_document(data, kind):
+    """
+    Run the checks on the bytes of a document of `kind`.
+
+    Returns a dict with content_type, size, digest, width, height, phash,
+    preview (JPEG bytes or None) and problems (list of messages; empty if
+    the document passed).
+    """
+    allowed_types, max_bytes = DOCUMENT_LIMITS[kind]
+    content_type = sniff_content_type(data)
+    result = {
+        'content_type': content_type or '',
+        'size': len(data),
+        'digest': hashlib.sha256(data).hexdigest(),
+        'width': None,
+        'height': None,
+        'phash': '',
+        'preview': None,
+        'problems': [],
+    }
+    problems = result['problems']
+    if len(data) > max_bytes:
+        problems.append(f"File is too large. Maximum size is {max_bytes // (1024 * 1024)}MB")
+    if content_type not in allowed_types:
+        problems.append(
+            f"File content is not an allowed type (detected: {content_type or 'unknown'}; "
+            f"allowed: {', '.join(sorted(allowed_types))})"
+        )
+        return result
+    if not content_type.startswith('image/'):
+        return result
+
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            width, height = original.size
+            if original.getexif().get(0x0112) in _ROTATED:
+                width, height = height, width
+            result['width'], result['height'] = width, height
+            # Decode JPEGs at reduced scale; the preview and hash need few pixels
+            scale = min(1, 2 * PREVIEW_SIZE / max(original.size))
+            original.draft('RGB', (max(1, int(original.width * scale)), max(1, int(original.height * scale))))
+            image = ImageOps.exif_transpose(original).convert('RGB')
+    except Exception as e:
+        problems.append(f"Image could not be read: {e}")
+        return result
+
+    if min(width, height) < MIN_IMAGE_SIDE:
+        problems.append(f"Image is too small ({width}x{height}); the short side must be at least {MIN_IMAGE_SIDE}px")
+    result['phash'] = perceptual_hash(image)
+    image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=75, optimize=True)
+    result['preview'] = out.getvalue()
+    return result
+
+
+def storage_name(value):
+    """Storage name of a stored document URL or name, or None if it is not in our storage."""
+    value = str(value or '')
+    if value.startswith(('http://', 'https://')):
+        name_from_url = getattr(default_storage, 'name_from_url', None)
+        return name_from_url(value) if name_from_url else None
+    if settings.MEDIA_URL and value.startswith(settings.MEDIA_URL):
+        value = value[len(settings.MEDIA_URL):]
+    return value.lstrip('/') or None
+
+
+def enqueue(user, kind, source, certificate=None):
+    """
+    Queue verification of a newly stored document. Earlier checks of the
+    document it replaces (the user's citizenship image of the same side,
+    or the same certificate) are marked superseded, so their results no
+    longer describe the user. Returns the row, or None for an empty source.
+    """
+    if not source:
+        return None
+    with transaction.atomic():
+        if kind != 'certificate' or certificate is not None:
+            DocumentVerification.objects.filter(
+                user=user, kind=kind, certificate=certificate
+            ).exclude(status='superseded').update(status='superseded')
+        return DocumentVerification.objects.create(
+            user=user, kind=kind, source=str(source)[:500], certificate=certificate
+        )
+
+
+def find_duplicates(verification):
+    """
+    Checked documents of other users with the same digest, or a perceptual
+    hash within PHASH_MAX_DISTANCE bits of `verification`'s. Only rows
+    sharing the digest or a near band (see the module docstring) are read.
+    Returns [{'user': id, 'verification': id, 'distance': bits}].
+    """
+    match = Q(digest=verification.digest)
+    near = verification.phash and verification.phash not in _UNIFORM_HASHES
+    if near:
+        band_distance = PHASH_MAX_DISTANCE // len(PHASH_BAND_FIELDS)
+        for field, band in zip(PHASH_BAND_FIELDS, phash_bands(verification.phash)):
+            match |= Q(**{f'{field}__in': _band_neighbours(band, band_distance)})
+    candidates = (
+        DocumentVerification.objects
+        .filter(match, status__in=['valid', 'flagged'])
+        .exclude(user_id=verification.user_id)
+        .values_list('pk', 'user_id', 'digest', 'phash')
+    )
+    duplicates = []
+    for pk, user_id, digest, phash in candidates.iterator():
+        if digest == verification.digest:
+            distance = 0
+        elif near and phash not in _UNIFORM_HASHES:
+            distance = hash_distance(verification.phash, phash)
+        else:
+            continue
+        if distance <= PHASH_MAX_DISTANCE:
+            duplicates.append({'user': user_id, 'verification': pk, 'distance': distance})
+    return duplicates
+
+
+def _store_preview(verification, name, preview):
+    """Replace the stored preview of `verification` (document `name`)."""
+    if verification.preview:
+        try:
+            default_storage.delete(verification.preview.name)
+        except Exception:
+            pass
+    if preview is None:
+        return ''
+    bucket = name.split('/', 1)[0]
+    return default_storage.save(f"{bucket}/previews/verification_{verification.pk}.jpg", ContentFile(preview))
+
+
+def _flag_matches(verification, duplicates):
+    """Record `verification` on the documents it duplicates and flag them too."""
+    for match in DocumentVerification.objects.filter(pk__in=[d['verification'] for d in duplicates]):
+        distance = next(d['distance'] for d in duplicates if d['verification'] == match.pk)
+        match.duplicates = [
+            *[d for d in match.duplicates if d['verification'] != verification.pk],
+            {'user': verification.user_id, 'verification': verification.pk, 'distance': distance},
+        ]
+        match.status = 'flagged'
+        match.save(update_fields=['duplicates', 'status'])
+
+
+def verify(verification):
+    """Run the checks for one DocumentVerification and save the results."""
+    name = storage_name(verification.source)
+    if name is None:
+        raise FileNotFoundError(f"{verification.source} is not in storage")
+
+    _, max_bytes = DOCUMENT_LIMITS[verification.kind]
+    size = default_storage.size(name)
+    if size > max_bytes:
+        # Do not download it; the size alone decides
+        result = {
+            'content_type': '', 'size': size, 'digest': '', 'width': None, 'height': None,
+            'phash': '', 'preview': None,
+            'problems': [f"File is too large. Maximum size is {max_bytes // (1024 * 1024)}MB"],
+        }
+    else:
+        with default_storage.open(name) as f:
+            result = inspect_document(f.read(), verification.kind)
+
+    for field in ('content_type', 'size', 'digest', 'width', 'height', 'phash'):
+        setattr(verification, field, result[field])
+    for field, band in zip(PHASH_BAND_FIELDS, phash_bands(verification.phash)):
+        setattr(verification, field, band)
+    verification.problems = result['problems']
+    verification.preview = _store_preview(verification, name, result['preview'])
+    verification.duplicates = [] if result['problems'] or not verification.digest else find_duplicates(verification)
+    if result['problems']:
+        verification.status = 'invalid'
+    elif verification.duplicates:
+        verification.status = 'flagged'
+    else:
+        verification.status = 'valid'
+    verification.processed_at = timezone.now()
+    verification.save()
+    if verification.duplicates:
+        _flag_matches(verification, verification.duplicates)
+    return verification
+
+
+def verify_documents(verifications):
+    """
+    Verify a batch of DocumentVerification rows. A document that cannot be
+    read is marked 'error' and does not stop the others.
+    Returns (processed, errors) counts.
+    """
+    processed = errors = 0
+    for verification in verifications:
+        try:
+            verify(verification)
+        except Exception as e:
+            logger.warning(f"Could not verify document {verification.pk} of user {verification.user_id}: {e}")
+            DocumentVerification.objects.filter(pk=verification.pk).update(
+                status='error', problems=[f"Could not read the document: {str(e)[:500]}"], processed_at=timezone.now()
+            )
+            errors += 1
+            continue
+        processed += 1
+    return processed, errors
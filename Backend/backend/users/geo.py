@@ -0,0 +1,156 @@
+"""
+Geohash helpers for location-based provider discovery.
+
+Provider coordinates (User.latitude/longitude) are encoded into a geohash
+cell string stored on User.geo_cell. Geohash cells nest by prefix, so a
+"which providers are near this point" query becomes a handful of
+``geo_cell LIKE 'abc%'`` range scans on a plain B-tree index instead of
+a full table scan with trigonometry on every row.
+"""
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_BASE32_INDEX = {char: i for i, char in enumerate(BASE32)}
+
+# Precision stored on User.geo_cell (~4.8m x 4.8m cells). Searches use a
+# shorter prefix of this, picked from the requested radius.
+GEO_CELL_PRECISION = 9
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def encode(latitude, longitude, precision=GEO_CELL_PRECISION):
+    """Encode a coordinate pair into a geohash string of `precision` characters."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # geohash interleaves bits starting with longitude
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lng_lo = mid
+            else:
+                bits <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def decode_bounds(cell):
+    """Return (lat_lo, lat_hi, lng_lo, lng_hi) for a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for char in cell:
+        value = _BASE32_INDEX[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lat_hi, lng_lo, lng_hi
+
+
+def cell_size_degrees(precision):
+    """Return (lat_degrees, lng_degrees) spanned by a cell of `precision` characters."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def precision_for_radius(latitude, radius_km):
+    """
+    Pick the longest prefix whose cells are at least `radius_km` on each side.
+
+    With cells that large, every point within `radius_km` of the centre lies
+    in the centre cell or one of its 8 neighbours.
+    """
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    for precision in range(GEO_CELL_PRECISION, 0, -1):
+        lat_deg, lng_deg = cell_size_degrees(precision)
+        height_km = lat_deg * KM_PER_DEGREE_LAT
+        width_km = lng_deg * KM_PER_DEGREE_LAT * cos_lat
+        if height_km >= radius_km and width_km >= radius_km:
+            return precision
+    return 1
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Return the geohash prefixes whose union covers the circle of
+    `radius_km` around (latitude, longitude): the centre cell plus its
+    neighbours, deduplicated (cells repeat near the poles).
+    """
+    precision = precision_for_radius(latitude, radius_km)
+    center = encode(latitude, longitude, precision)
+    lat_lo, lat_hi, lng_lo, lng_hi = decode_bounds(center)
+    lat_step = lat_hi - lat_lo
+    lng_step = lng_hi - lng_lo
+    center_lat = (lat_lo + lat_hi) / 2
+    center_lng = (lng_lo + lng_hi) / 2
+
+    cells = []
+    for dlat in (-1, 0, 1):
+        lat = center_lat + dlat * lat_step
+        if lat < -90 or lat > 90:
+            continue
+        for dlng in (-1, 0, 1):
+            lng = center_lng + dlng * lng_step
+            # Wrap around the antimeridian
+            lng = ((lng + 180) % 360) - 180
+            cell = encode(lat, lng, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return (min_lat, max_lat, min_lng, max_lng) enclosing the search circle."""
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    lng_delta = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    return (
+        latitude - lat_delta,
+        latitude + lat_delta,
+        longitude - lng_delta,
+        longitude + lng_delta,
+    )
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,127 @@
+"""
+Benchmark memory use of SupabaseStorage uploads and downloads.
+
+Uploads N images of a given size concurrently through the default storage,
+then streams each back and checks its hash. Source files are written to a
+temporary directory first, the way Django spools large uploads to disk
+(TemporaryUploadedFile), so the numbers show what the storage backend itself
+holds in memory.
+
+    python manage.py benchmark_storage_memory
+    python manage.py benchmark_storage_memory --files 20 --size-mb 5 --prefix bookings/benchmark
+
+Objects are deleted afterwards unless --keep is given. Peak Python
+allocations (tracemalloc) should stay around
+workers x (STREAM_CHUNK_SIZE + READ_BUFFER_SIZE), regardless of --size-mb.
+"""
+
+import hashlib
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+
+MB = 1024 * 1024
+
+
+def _max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return rss / MB if sys.platform == 'darwin' else rss / 1024
+
+
+class Command(BaseCommand):
+    help = "Benchmark memory use of concurrent uploads/downloads through the default storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=20, help='Number of files to upload (default 20).')
+        parser.add_argument('--size-mb', type=float, default=5.0, help='Size of each file in MB (default 5).')
+        parser.add_argument('--workers', type=int, help='Concurrent uploads (default: one per file).')
+        parser.add_argument('--prefix', default='bookings/benchmark', help='Storage path prefix; first segment is the bucket.')
+        parser.add_argument('--keep', action='store_true', help='Do not delete the uploaded objects.')
+
+    def handle(self, *args, **options):
+        count = options['files']
+        size = int(options['size_mb'] * MB)
+        workers = options['workers'] or count
+        if count < 1 or size < 1:
+            raise CommandError('--files and --size-mb must be positive')
+
+        # Create the storage and its (lazily built) Supabase client before measuring
+        self.storage = storages['default']
+        self.storage.client
+        run_id = uuid.uuid4().hex[:8]
+        with tempfile.TemporaryDirectory() as tmp:
+            self.stdout.write(f"Writing {count} x {size / MB:.1f} MB source files...")
+            sources = []
+            for i in range(count):
+                path = os.path.join(tmp, f"image_{i}.jpg")
+                digest = hashlib.sha256()
+                with open(path, 'wb') as f:
+                    remaining = size
+                    while remaining:
+                        block = os.urandom(min(MB, remaining))
+                        digest.update(block)
+                        f.write(block)
+                        remaining -= len(block)
+                sources.append((path, f"{options['prefix']}/{run_id}_{i}.jpg", digest.hexdigest()))
+
+            rss_before = _max_rss_mb()
+            tracemalloc.start()
+            try:
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    names = list(pool.map(self._upload, sources))
+                upload_time = time.perf_counter() - start
+                _, upload_peak = tracemalloc.get_traced_memory()
+
+                tracemalloc.reset_peak()
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    digests = list(pool.map(self._download_digest, names))
+                download_time = time.perf_counter() - start
+                _, download_peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        total = count * size
+        self.stdout.write(f"Uploaded {count} files ({total / MB:.0f} MB) with {workers} workers")
+        self.stdout.write(f"  upload:   {upload_time:6.2f} s | peak Python allocations {upload_peak / MB:7.2f} MB")
+        self.stdout.write(f"  download: {download_time:6.2f} s | peak Python allocations {download_peak / MB:7.2f} MB")
+        self.stdout.write(
+            f"  max RSS {_max_rss_mb():.0f} MB (was {rss_before:.0f} MB before the run); "
+            f"buffering whole files would need at least {total / MB:.0f} MB"
+        )
+
+        mismatched = [name for name, (_, _, expected), actual in zip(names, sources, digests) if expected != actual]
+        if mismatched:
+            self.stderr.write(self.style.ERROR(f"{len(mismatched)} file(s) read back with a different hash: {mismatched}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Every file read back intact."))
+
+        if not options['keep']:
+            for name in names:
+                try:
+                    self.storage.delete(name)
+                except Exception as e:
+                    self.stderr.write(f"Could not delete {name}: {e}")
+
+    def _upload(self, source):
+        path, name, _ = source
+        with open(path, 'rb') as f:
+            return self.storage.save(name, File(f, name=os.path.basename(path)))
+
+    def _download_digest(self, name):
+        digest = hashlib.sha256()
+        with self.storage.open(name) as f:
+            for chunk in f.chunks():
+                digest.update(chunk)
+        return digest.hexdigest()
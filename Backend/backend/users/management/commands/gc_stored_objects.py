@@ -0,0 +1,106 @@
+"""
+Garbage-collect content-addressed storage objects (see users.content_addressed).
+
+By default reference counts are first recomputed from the database: every
+FileField value, every URLField value holding the public URL of a
+content-addressed object (profile pictures, citizenship scans, certificates)
+and every booking image variant that names one counts as one reference. Counts maintained by saves
+and deletes drift when rows are removed without deleting their files (e.g.
+cascades), so the recount is what makes collection safe.
+
+Objects with no references that have not been touched for --grace-hours are
+then removed from storage and from the StoredObject table.
+
+    python manage.py gc_stored_objects --dry-run
+    python manage.py gc_stored_objects --grace-hours 48
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.utils import timezone
+
+from bookings.images import variant_names
+from bookings.models import BookingImage
+from users.content_addressed import CAS_DIRECTORY, is_content_name
+from users.models import StoredObject
+
+
+def count_references(storage):
+    """Number of database references to each content-addressed name of `storage`."""
+    name_from_url = getattr(storage, 'name_from_url', None)
+    references = Counter()
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                to_name = None
+            elif isinstance(field, models.URLField) and name_from_url:
+                to_name = name_from_url
+            else:
+                continue
+            values = (
+                model._default_manager
+                .filter(**{f'{field.name}__contains': f'/{CAS_DIRECTORY}/'})
+                .values_list(field.name, flat=True)
+                .iterator()
+            )
+            names = (to_name(value) for value in values) if to_name else values
+            references.update(name for name in names if is_content_name(name))
+
+    for variants in BookingImage.objects.filter(variants_status='ready').values_list('variants', flat=True).iterator():
+        references.update(name for name in variant_names(variants) if is_content_name(name))
+    return references
+
+
+class Command(BaseCommand):
+    help = "Recount references to content-addressed files and delete unreferenced ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24, help='Keep unreferenced objects touched more recently than this (default 24).')
+        parser.add_argument('--no-recount', action='store_true', help='Trust the stored reference counts.')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted without deleting.')
+
+    def handle(self, *args, **options):
+        storage = storages['default']
+        if not hasattr(storage, 'purge'):
+            self.stderr.write(self.style.ERROR("The default storage is not content-addressed; nothing to collect."))
+            return
+
+        if not options['no_recount']:
+            references = count_references(storage)
+            corrected = 0
+            for pk, name, refcount in StoredObject.objects.values_list('pk', 'name', 'refcount').iterator():
+                actual = references.get(name, 0)
+                if actual != refcount:
+                    corrected += 1
+                    if not options['dry_run']:
+                        # Leave updated_at alone so the grace period still protects fresh saves
+                        StoredObject.objects.filter(pk=pk).update(refcount=actual)
+            self.stdout.write(f"Recounted references: {corrected} object(s) corrected")
+
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        candidates = StoredObject.objects.filter(refcount=0, updated_at__lt=cutoff)
+        if options['dry_run']:
+            count = candidates.count()
+            self.stdout.write(f"Would delete {count} unreferenced object(s)")
+            return
+
+        deleted = freed = 0
+        for pk in candidates.values_list('pk', flat=True).iterator():
+            with transaction.atomic():
+                # Re-check under the row lock: a concurrent save may have re-used it
+                stored = StoredObject.objects.select_for_update().filter(pk=pk, refcount=0).first()
+                if stored is None:
+                    continue
+                try:
+                    storage.purge(stored.name)
+                except Exception as e:
+                    self.stderr.write(f"Could not delete {stored.name}: {e}")
+                    continue
+                stored.delete()
+            deleted += 1
+            freed += stored.size
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} object(s), freed {freed / (1024 * 1024):.1f} MB"))
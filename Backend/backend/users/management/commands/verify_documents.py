@@ -0,0 +1,56 @@
+"""
+Management command that verifies uploaded citizenship images and certificates.
+
+Upload views queue a pending DocumentVerification per document; this worker
+checks each one (file type from magic bytes, size, dimensions), stores a
+preview and flags documents reused across accounts. See users.documents.
+
+Run it continuously next to the web process:
+    python manage.py verify_documents --loop
+
+or from cron / Task Scheduler every minute:
+    python manage.py verify_documents
+
+Retry documents that could not be read (e.g. after a storage outage):
+    python manage.py verify_documents --retry-errors
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.documents import verify_documents
+from users.models import DocumentVerification
+
+
+class Command(BaseCommand):
+    help = "Verify queued citizenship and certificate uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new documents.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls when idle (default 5).')
+        parser.add_argument('--batch-size', type=int, default=10, help='Documents per pass (default 10).')
+        parser.add_argument('--retry-errors', action='store_true', help='Queue documents that could not be read again first.')
+        parser.add_argument('--user', type=int, help='Only verify documents of this user.')
+
+    def handle(self, *args, **options):
+        queryset = DocumentVerification.objects.all()
+        if options['user']:
+            queryset = queryset.filter(user_id=options['user'])
+
+        if options['retry_errors']:
+            count = queryset.filter(status='error').update(status='pending', problems=[])
+            self.stdout.write(f"Retrying {count} document(s)")
+
+        pending = queryset.filter(status='pending').order_by('id')
+        try:
+            while True:
+                batch = list(pending[:options['batch_size']])
+                if batch:
+                    processed, errors = verify_documents(batch)
+                    self.stdout.write(f"Verified {processed} document(s), {errors} could not be read")
+                elif not options['loop']:
+                    break
+                else:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
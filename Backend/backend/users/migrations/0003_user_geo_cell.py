@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:29
+
+from django.db import migrations, models
+
+
+def backfill_geo_cells(apps, schema_editor):
+    from users.geo import encode
+
+    User = apps.get_model('users', 'User')
+    users = User.objects.filter(latitude__isnull=False, longitude__isnull=False).only('id', 'latitude', 'longitude')
+    batch = []
+    for user in users.iterator(chunk_size=2000):
+        user.geo_cell = encode(user.latitude, user.longitude)
+        batch.append(user)
+        if len(batch) >= 2000:
+            User.objects.bulk_update(batch, ['geo_cell'])
+            batch = []
+    if batch:
+        User.objects.bulk_update(batch, ['geo_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_user_user_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='geo_cell',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Geohash of latitude/longitude, maintained on save for nearby search', max_length=12, null=True),
+        ),
+        migrations.RunPython(backfill_geo_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_storedobject'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentVerification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('citizenship_front', 'Citizenship Front'), ('citizenship_back', 'Citizenship Back'), ('certificate', 'Certificate')], max_length=20)),
+                ('source', models.CharField(help_text='Stored URL or storage name of the document', max_length=500)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('valid', 'Valid'), ('flagged', 'Flagged'), ('invalid', 'Invalid'), ('error', 'Error')], db_index=True, default='pending', max_length=10)),
+                ('content_type', models.CharField(blank=True, help_text="Type detected from the file's magic bytes", max_length=50)),
+                ('size', models.PositiveIntegerField(blank=True, null=True)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('digest', models.CharField(blank=True, db_index=True, help_text='SHA-256 of the content', max_length=64)),
+                ('phash', models.CharField(blank=True, db_index=True, help_text='Perceptual hash (64-bit dHash, hex)', max_length=16)),
+                ('preview', models.FileField(blank=True, help_text='JPEG thumbnail for the admin panel', max_length=255, upload_to='')),
+                ('problems', models.JSONField(blank=True, default=list)),
+                ('duplicates', models.JSONField(blank=True, default=list, help_text='Matching documents of other users: [{user, verification, distance}]')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('certificate', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='verifications', to='users.certificate')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_verifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:07
+
+from django.db import migrations, models
+
+
+def backfill_phash_bands(apps, schema_editor):
+    from users.documents import PHASH_BAND_FIELDS, phash_bands
+
+    DocumentVerification = apps.get_model('users', 'DocumentVerification')
+    verifications = DocumentVerification.objects.exclude(phash='').only('id', 'phash')
+    batch = []
+    for verification in verifications.iterator(chunk_size=2000):
+        for field, band in zip(PHASH_BAND_FIELDS, phash_bands(verification.phash)):
+            setattr(verification, field, band)
+        batch.append(verification)
+        if len(batch) >= 2000:
+            DocumentVerification.objects.bulk_update(batch, PHASH_BAND_FIELDS)
+            batch = []
+    if batch:
+        DocumentVerification.objects.bulk_update(batch, PHASH_BAND_FIELDS)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_referencedataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentverification',
+            name='phash_band0',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='documentverification',
+            name='phash_band1',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='documentverification',
+            name='phash_band2',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='documentverification',
+            name='phash_band3',
+            field=models.PositiveIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_phash_bands, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:08
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def supersede_replaced_checks(apps, schema_editor):
+    """Checks followed by a newer one of the same document describe a file the user has replaced."""
+    DocumentVerification = apps.get_model('users', 'DocumentVerification')
+    newer_citizenship = DocumentVerification.objects.filter(
+        user=OuterRef('user'), kind=OuterRef('kind'), certificate__isnull=True, pk__gt=OuterRef('pk')
+    )
+    DocumentVerification.objects.filter(
+        Exists(newer_citizenship), certificate__isnull=True
+    ).exclude(kind='certificate').update(status='superseded')
+    newer_certificate = DocumentVerification.objects.filter(certificate=OuterRef('certificate'), pk__gt=OuterRef('pk'))
+    DocumentVerification.objects.filter(
+        Exists(newer_certificate), certificate__isnull=False
+    ).update(status='superseded')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_documentverification_phash_bands'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentverification',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('valid', 'Valid'), ('flagged', 'Flagged'), ('invalid', 'Invalid'), ('error', 'Error'), ('superseded', 'Superseded')], db_index=True, default='pending', max_length=10),
+        ),
+        migrations.RunPython(supersede_replaced_checks, migrations.RunPython.noop),
+    ]
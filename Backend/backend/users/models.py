@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import RegexValidator
+from .geo import encode as geohash_encode
 import os
 
 def user_profile_picture_path(instance, filename):
@@ -24,6 +25,14 @@ class User(AbstractUser):
         # Ensure superusers always have user_type 'admin'
         if self.is_superuser:
             self.user_type = 'admin'
+        # Keep the geohash cell in sync with the coordinates for nearby search
+        if self.latitude is not None and self.longitude is not None:
+            self.geo_cell = geohash_encode(self.latitude, self.longitude)
+        else:
+            self.geo_cell = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geo_cell'}
         super().save(*args, **kwargs)
 
     @classmethod
@@ -101,6 +110,14 @@ class User(AbstractUser):
     postal_code = models.CharField(max_length=20, blank=True, null=True)
     latitude = models.FloatField(blank=True, null=True)
     longitude = models.FloatField(blank=True, null=True)
+    geo_cell = models.CharField(
+        max_length=12,
+        blank=True,
+        null=True,
+        db_index=True,
+        editable=False,
+        help_text="Geohash of latitude/longitude, maintained on save for nearby search"
+    )
 
     # Professional Bio
     bio = models.TextField(blank=True, null=True)
@@ -154,6 +171,7 @@ class Speciality(models.Model):
     slug = models.SlugField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
@@ -172,6 +190,7 @@ class Specialization(models.Model):
     )
     name = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.speciality.name} - {self.name}"
@@ -214,4 +233,88 @@ class Certificate(models.Model):
         return f"{self.user.email} - {self.name}"
     
     class Meta:
-        ordering = ['-uploaded_at']
\ No newline at end of file
+        ordering = ['-uploaded_at']
+
+class DocumentVerification(models.Model):
+    """
+    Automated checks of an uploaded citizenship image or certificate, run
+    by the verify_documents worker (see users.documents). Admins read the
+    results and preview instead of opening the full document.
+    """
+    KIND_CHOICES = [
+        ('citizenship_front', 'Citizenship Front'),
+        ('citizenship_back', 'Citizenship Back'),
+        ('certificate', 'Certificate'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('valid', 'Valid'),
+        ('flagged', 'Flagged'),   # same document used by another account
+        ('invalid', 'Invalid'),   # wrong type, too large or too small
+        ('error', 'Error'),       # could not be read; retried with --retry-errors
+        ('superseded', 'Superseded'),  # the user has since replaced the document
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='document_verifications')
+    certificate = models.ForeignKey(
+        Certificate, on_delete=models.CASCADE, null=True, blank=True, related_name='verifications'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    source = models.CharField(max_length=500, help_text="Stored URL or storage name of the document")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    content_type = models.CharField(max_length=50, blank=True, help_text="Type detected from the file's magic bytes")
+    size = models.PositiveIntegerField(null=True, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    digest = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the content")
+    phash = models.CharField(max_length=16, blank=True, db_index=True, help_text="Perceptual hash (64-bit dHash, hex)")
+    # The four 16-bit quarters of phash, indexed for near-duplicate search (users.documents.find_duplicates)
+    phash_band0 = models.PositiveIntegerField(null=True, blank=True, db_index=True, editable=False)
+    phash_band1 = models.PositiveIntegerField(null=True, blank=True, db_index=True, editable=False)
+    phash_band2 = models.PositiveIntegerField(null=True, blank=True, db_index=True, editable=False)
+    phash_band3 = models.PositiveIntegerField(null=True, blank=True, db_index=True, editable=False)
+    preview = models.FileField(max_length=255, blank=True, help_text="JPEG thumbnail for the admin panel")
+    problems = models.JSONField(default=list, blank=True)
+    duplicates = models.JSONField(
+        default=list, blank=True, help_text="Matching documents of other users: [{user, verification, distance}]"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.kind} ({self.status})"
+    
+    class Meta:
+        ordering = ['-created_at']
+
+class StoredObject(models.Model):
+    """
+    A file kept in storage under its content digest (see users.content_addressed).
+    Identical uploads share one object; refcount counts the saves that
+    returned this name minus the deletes.
+    """
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name, e.g. bookings/cas/ab/<sha256>.jpg")
+    digest = models.CharField(max_length=64, db_index=True, help_text="SHA-256 of the content")
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    uploaded_at = models.DateTimeField(null=True, blank=True, help_text="When the content was uploaded to storage")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+    
+    class Meta:
+        indexes = [models.Index(fields=['refcount', 'updated_at'])]
+
+
+class ReferenceDataVersion(models.Model):
+    """
+    Version of the catalog/locations reference data (see users.reference_data).
+    A single row, set to a new random number whenever the data changes;
+    processes compare it with the version of the snapshot they hold.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Reference data v{self.version}"
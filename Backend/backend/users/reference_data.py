@@ -0,0 +1,232 @@
+"""
+Reference data served by the catalog endpoints: specialities,
+specializations and the cities/districts providers work in.
+
+The data changes rarely (populate_specialities, admin edits, providers
+updating their profile), so it is kept as pre-rendered JSON:
+
+- each process holds a Snapshot in memory;
+- the current version lives in the database (ReferenceDataVersion, one
+  row) and every change replaces it with a new random number, so a version
+  is never reused, even after a rollback. A process re-reads it at
+  most every REFERENCE_DATA_CHECK_INTERVAL seconds, so a change made in
+  another worker or by a management command is picked up within that time
+  whatever the cache backend;
+- built snapshots are also stored in the Django cache under their version,
+  so with a shared cache (Redis, Memcached) a process that sees a new
+  version fetches the snapshot instead of querying the tables. With the
+  default per-process LocMemCache each process builds its own;
+- SpecialitiesListView, SpecializationsListView and LocationsListView
+  answer from the snapshot: no queries between version checks, no
+  serializers (the bytes are written as rendered).
+
+Invalidation is signal driven and happens on commit: saving or deleting a
+Speciality or Specialization, or a provider save/delete that changes which
+(city, district) the provider is listed under, bumps the version and the
+next request rebuilds the snapshot. A user save is compared with the
+stored row in pre_save, which is only read when the save may write a
+location field (update_fields), so loading users costs nothing extra.
+Changes that bypass signals (queryset.update(), raw SQL) are picked up
+when the snapshot expires, REFERENCE_DATA_TTL seconds after it was built.
+
+The snapshot is loaded when the WSGI/ASGI application starts (warm()) and
+lazily on first use otherwise.
+"""
+import hashlib
+import json
+import logging
+import secrets
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+from backend.renderers import FastJSONRenderer
+from .models import ReferenceDataVersion, Speciality, Specialization, User
+
+logger = logging.getLogger(__name__)
+
+# How long a snapshot is used before it is rebuilt from the database
+REFERENCE_DATA_TTL = 60 * 60
+# How often a process reads the version row to notice changes made elsewhere
+REFERENCE_DATA_CHECK_INTERVAL = 5
+
+_SNAPSHOT_KEY = 'reference-data:snapshot:%s'
+
+# Provider fields the locations index is built from
+_LOCATION_FIELDS = ('user_type', 'registration_completed', 'city', 'district')
+
+# Rendered JSON and its digest (for ETags)
+Payload = namedtuple('Payload', 'content digest')
+
+Snapshot = namedtuple('Snapshot', [
+    'version',
+    'built_at',            # time.time()
+    'specialities',        # Payload
+    'specializations',     # {speciality id (str) or None for all: Payload}
+    'locations',           # Payload
+])
+
+_local = None
+# time.monotonic() until which _local is used without reading the version
+_checked_until = 0
+
+
+def _payload(data):
+    content = FastJSONRenderer().render(data)
+    return Payload(content, hashlib.md5(content).hexdigest())
+
+
+EMPTY_LIST = _payload([])
+
+
+def _render_locations(keys):
+    districts = {}
+    for city, district in sorted(keys, key=lambda key: (key[0], key[1] or '')):
+        names = districts.setdefault(city, [])
+        if district and district.strip() and district not in names:
+            names.append(district)
+    return _payload({'cities': sorted(districts), 'districts': districts})
+
+
+def _location_key(city, district, user_type, registration_completed):
+    """The locations index entry a provider with these values counts towards, if any."""
+    if user_type != 'offer' or not registration_completed or not city:
+        return None
+    return (city, district)
+
+
+def _build(version):
+    from .serializers import SpecialitySerializer, SpecializationSerializer
+
+    specializations = SpecializationSerializer(
+        Specialization.objects.select_related('speciality'), many=True
+    ).data
+    by_speciality = {}
+    for specialization in specializations:
+        by_speciality.setdefault(str(specialization['speciality']), []).append(specialization)
+
+    locations = set()
+    for values in User.objects.filter(user_type='offer').values_list(*_LOCATION_FIELDS).distinct():
+        key = _location_key(values[2], values[3], values[0], values[1])
+        if key is not None:
+            locations.add(key)
+
+    return Snapshot(
+        version=version,
+        built_at=time.time(),
+        specialities=_payload(SpecialitySerializer(Speciality.objects.all(), many=True).data),
+        specializations={
+            None: _payload(specializations),
+            **{pk: _payload(items) for pk, items in by_speciality.items()},
+        },
+        locations=_render_locations(locations),
+    )
+
+
+def _current_version():
+    return ReferenceDataVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def _bump_version():
+    ReferenceDataVersion.objects.update_or_create(pk=1, defaults={'version': secrets.randbits(62)})
+
+
+def _fresh(snapshot):
+    return snapshot is not None and time.time() - snapshot.built_at < REFERENCE_DATA_TTL
+
+
+def get():
+    """The current Snapshot."""
+    global _local, _checked_until
+    now = time.monotonic()
+    if now < _checked_until and _fresh(_local):
+        return _local
+
+    # Read before building, so a change committed meanwhile leaves a newer version
+    version = _current_version()
+    snapshot = _local if _local is not None and _local.version == version else cache.get(_SNAPSHOT_KEY % version)
+    if not _fresh(snapshot):
+        snapshot = _build(version)
+        cache.set(_SNAPSHOT_KEY % version, snapshot, REFERENCE_DATA_TTL)
+    _local = snapshot
+    _checked_until = now + REFERENCE_DATA_CHECK_INTERVAL
+    return snapshot
+
+
+def warm():
+    """Load the snapshot at startup; a database that is not reachable yet only delays it."""
+    try:
+        get()
+    except Exception as e:
+        logger.warning(f"Could not load reference data at startup: {e}")
+
+
+def invalidate():
+    """
+    Make the next get() rebuild the snapshot: at once in this process,
+    within REFERENCE_DATA_CHECK_INTERVAL seconds in the others.
+    """
+    global _local
+    _bump_version()
+    _local = None
+
+
+def json_response(request, payload):
+    """`payload` as the response body, or as data for the browsable API."""
+    if request.accepted_renderer.format == 'json':
+        return HttpResponse(payload.content, content_type='application/json')
+    return Response(json.loads(payload.content))
+
+
+# Receivers act once the change is committed, so no other request can cache
+# the data as it was before it.
+
+@receiver([post_save, post_delete], sender=Speciality)
+@receiver([post_save, post_delete], sender=Specialization)
+def _catalog_changed(sender, **kwargs):
+    transaction.on_commit(invalidate)
+
+
+# Marks a save that cannot change the provider's listing
+_UNCHANGED = object()
+
+
+@receiver(pre_save, sender=User)
+def _remember_location(sender, instance, update_fields=None, **kwargs):
+    # Only saves that may write a location field read the stored row
+    if instance._state.adding:
+        instance._reference_location = None
+    elif update_fields is not None and not set(update_fields) & set(_LOCATION_FIELDS):
+        instance._reference_location = _UNCHANGED
+    else:
+        stored = User.objects.filter(pk=instance.pk).values(*_LOCATION_FIELDS).first()
+        instance._reference_location = _location_key(**stored) if stored else None
+
+
+@receiver(post_save, sender=User)
+def _provider_saved(sender, instance, **kwargs):
+    old_key = getattr(instance, '_reference_location', _UNCHANGED)
+    if old_key is _UNCHANGED:
+        return
+    if any(field in instance.get_deferred_fields() for field in _LOCATION_FIELDS):
+        # Loading them would cost a query; rebuild instead
+        new_key = _UNCHANGED
+    else:
+        new_key = _location_key(instance.city, instance.district, instance.user_type, instance.registration_completed)
+    # Most profile saves leave the provider's listing alone
+    if old_key != new_key:
+        transaction.on_commit(invalidate)
+
+
+@receiver(post_delete, sender=User)
+def _provider_deleted(sender, instance, **kwargs):
+    if any(field in instance.get_deferred_fields() for field in _LOCATION_FIELDS) or _location_key(
+        instance.city, instance.district, instance.user_type, instance.registration_completed
+    ) is not None:
+        transaction.on_commit(invalidate)
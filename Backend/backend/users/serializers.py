@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from .cdn import file_url
 from .models import Speciality, Specialization, UserSpeciality, UserSpecialization, Certificate
 
 User = get_user_model()
@@ -32,8 +33,8 @@ class CertificateSerializer(serializers.ModelSerializer):
         read_only_fields = ['uploaded_at']
     
     def get_file_url(self, obj):
-        """Return certificate URL (already a full Supabase URL)"""
-        return obj.file if obj.file else None
+        """Return the cacheable (versioned) certificate URL"""
+        return file_url(obj.file, version=obj.uploaded_at)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -65,8 +66,8 @@ class UserSerializer(serializers.ModelSerializer):
         return ' '.join([p for p in parts if p]).strip()
     
     def get_profile_picture_url(self, obj):
-        """Return profile picture URL (already a full Supabase URL)"""
-        return obj.profile_picture if obj.profile_picture else None
+        """Return the cacheable (versioned) profile picture URL"""
+        return file_url(obj.profile_picture, version=obj.updated_at)
     
     def get_citizenship_front_url(self, obj):
         """Return citizenship front URL (already a full Supabase URL)"""
@@ -78,7 +79,11 @@ class UserSerializer(serializers.ModelSerializer):
     
     def get_specialities(self, obj):
         """Get all specialities for the user"""
-        user_specialities = UserSpeciality.objects.filter(user=obj).select_related('speciality')
+        if 'user_specialities' in getattr(obj, '_prefetched_objects_cache', {}):
+            # Prefetched by list views (user_specialities__speciality)
+            user_specialities = obj.user_specialities.all()
+        else:
+            user_specialities = UserSpeciality.objects.filter(user=obj).select_related('speciality')
         return [
             {
                 'id': us.speciality.id,
@@ -90,9 +95,13 @@ class UserSerializer(serializers.ModelSerializer):
     
     def get_specializations(self, obj):
         """Get all specializations for the user"""
-        user_specializations = UserSpecialization.objects.filter(user=obj).select_related(
-            'specialization', 'specialization__speciality'
-        )
+        if 'user_specializations' in getattr(obj, '_prefetched_objects_cache', {}):
+            # Prefetched by list views (user_specializations__specialization__speciality)
+            user_specializations = obj.user_specializations.all()
+        else:
+            user_specializations = UserSpecialization.objects.filter(user=obj).select_related(
+                'specialization', 'specialization__speciality'
+            )
         return [
             {
                 'id': us.specialization.id,
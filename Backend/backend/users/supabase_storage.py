@@ -1,8 +1,185 @@
-from supabase import create_client
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
 from django.core.files.storage import Storage
-from io import BytesIO
+from urllib.parse import quote, unquote, urlencode, urljoin
+from backend import metrics
+from . import cdn
+from .content_addressed import ContentAddressedStorageMixin
+import base64
+import hashlib
+import httpx
+import io
+import mimetypes
 import os
+import threading
+
+# Files larger than this use a resumable upload in parts of this size
+# (Supabase expects 6MB parts for resumable uploads)
+UPLOAD_CHUNK_SIZE = 6 * 1024 * 1024
+UPLOAD_RETRIES = 3
+UPLOAD_TIMEOUT = httpx.Timeout(20.0, read=60.0, write=60.0)
+
+# Size of the pieces files are streamed in, and of the read buffer of opened files
+STREAM_CHUNK_SIZE = 64 * 1024
+READ_BUFFER_SIZE = 256 * 1024
+
+# Connection pool of the shared client (see get_client)
+HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+HTTP_TIMEOUT = httpx.Timeout(20.0)
+
+# How long exists()/size() answers and directory listings are cached
+METADATA_CACHE_TTL = 60
+LIST_PAGE_SIZE = 100
+
+
+def _read_part(content, offset, length):
+    """Yield `length` bytes of `content` from `offset` in STREAM_CHUNK_SIZE pieces."""
+    content.seek(offset)
+    while length > 0:
+        data = content.read(min(STREAM_CHUNK_SIZE, length))
+        if not data:
+            break
+        length -= len(data)
+        yield data
+
+
+def _etag(value):
+    """
+    An ETag in the quoted form HEAD responses carry. Object listings
+    report the same value with or without the quotes.
+    """
+    if not value:
+        return None
+    return '"{}"'.format(value.removeprefix('W/').strip('"'))
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url, key):
+    """
+    Supabase client shared by all storage instances and threads of this
+    process, created on first use.
+    
+    The supabase package is imported here rather than at module level, so
+    code that never does storage I/O (migrations, most management commands)
+    neither pays for the import nor needs SUPABASE_URL. Clients are keyed by
+    process id, so a forked worker builds its own connection pool instead
+    of sharing its parent's sockets.
+    """
+    client_key = (os.getpid(), url, key)
+    client = _clients.get(client_key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(client_key)
+            if client is None:
+                if not url or not key:
+                    raise ImproperlyConfigured("SUPABASE_URL and SUPABASE_ANON_KEY must be set to use Supabase Storage")
+                from supabase import ClientOptions, create_client
+                # httpx clients are thread-safe; one pool serves every thread
+                http = httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT, follow_redirects=True, http2=True)
+                client = create_client(url, key, options=ClientOptions(httpx_client=http))
+                _clients[client_key] = client
+    return client
+
+
+class SupabaseStreamReader(io.RawIOBase):
+    """
+    Raw, seekable reader over a Supabase object.
+    
+    Reads come from one streaming GET response; seeking drops it and the
+    next read starts a new one at the new offset using an HTTP Range header.
+    Wrap in io.BufferedReader for efficient small reads.
+    """
+    
+    def __init__(self, http, url, headers):
+        self.http = http
+        self.url = url
+        self.headers = headers
+        self.size = None
+        self._position = 0
+        self._response = None
+        self._chunks = None
+        self._pending = memoryview(b'')
+    
+    def connect(self):
+        """Start streaming from the current position. Raises FileNotFoundError if missing."""
+        self._disconnect()
+        headers = {**self.headers, 'Accept-Encoding': 'identity'}
+        if self._position:
+            headers['Range'] = f"bytes={self._position}-"
+        response = self.http.send(self.http.build_request('GET', self.url, headers=headers), stream=True)
+        if response.status_code in (400, 404):
+            # Supabase answers 400 with a not_found error for missing objects
+            response.close()
+            raise FileNotFoundError(f"{self.url} not found")
+        try:
+            response.raise_for_status()
+            if self._position and response.status_code != 206:
+                raise OSError("Storage server ignored the Range request")
+        except Exception:
+            response.close()
+            raise
+        
+        if self.size is None:
+            content_range = response.headers.get('Content-Range')
+            if content_range and '/' in content_range:
+                self.size = int(content_range.rsplit('/', 1)[1])
+            elif 'Content-Length' in response.headers:
+                self.size = self._position + int(response.headers['Content-Length'])
+        self._response = response
+        self._chunks = response.iter_bytes(STREAM_CHUNK_SIZE)
+    
+    def _disconnect(self):
+        if self._response is not None:
+            self._response.close()
+        self._response = None
+        self._chunks = None
+        self._pending = memoryview(b'')
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def readinto(self, buffer):
+        if self.size is not None and self._position >= self.size:
+            return 0
+        if self._response is None:
+            self.connect()
+        while not self._pending:
+            try:
+                self._pending = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        self._position += count
+        return count
+    
+    def tell(self):
+        return self._position
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("Negative seek position")
+        if offset != self._position:
+            self._disconnect()
+            self._position = offset
+        return self._position
+    
+    def close(self):
+        self._disconnect()
+        super().close()
 
 
 class SupabaseStorage(Storage):
@@ -10,13 +187,29 @@ class SupabaseStorage(Storage):
     Custom storage backend for Django that uses Supabase Storage.
     This allows Django to store files in Supabase cloud storage
     instead of the local filesystem.
+    
+    Creating an instance does no I/O; the Supabase client is shared by the
+    whole process and created on first use (see get_client).
     """
     
     def __init__(self):
         self.supabase_url = settings.SUPABASE_URL
         # Prefer SUPABASE_KEY, fallback to SUPABASE_ANON_KEY
         self.supabase_key = getattr(settings, 'SUPABASE_KEY', None) or getattr(settings, 'SUPABASE_ANON_KEY', '')
-        self.client = create_client(self.supabase_url, self.supabase_key)
+        self.storage_url = f"{self.supabase_url.rstrip('/')}/storage/v1"
+        self.headers = {
+            'apikey': self.supabase_key,
+            'Authorization': f"Bearer {self.supabase_key}",
+        }
+    
+    @property
+    def client(self):
+        return get_client(self.supabase_url, self.supabase_key)
+    
+    @property
+    def http(self):
+        # Streaming uploads/downloads go over the client's HTTP connection pool
+        return self.client.storage.session
     
     def _get_bucket_name(self, name):
         """
@@ -36,57 +229,185 @@ class SupabaseStorage(Storage):
         parts = name.split('/', 1)
         return parts[1] if len(parts) > 1 else parts[0]
     
+    def _object_url(self, bucket, file_path):
+        return f"{self.storage_url}/object/{bucket}/{quote(file_path)}"
+    
     def _open(self, name, mode='rb'):
         """
-        Open and read a file from Supabase.
+        Open a file from Supabase for streaming reads.
+        
+        The download is started here but the body is read lazily, one buffer
+        at a time, so memory use does not depend on the file size. Seeking
+        restarts the download from the new offset with an HTTP Range request.
         
         Args:
             name: Full path including bucket name (e.g., 'profile-pictures/profile_1.jpg')
-            mode: File open mode (default: 'rb' for read binary)
+            mode: File open mode (only 'rb' is supported)
         
         Returns:
-            BytesIO object containing file content
+            File object streaming the file content
         """
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            raise ValueError("Supabase files can only be opened for reading; use save() to write")
+        
         bucket = self._get_bucket_name(name)
         file_path = self._get_file_path(name)
         
+        reader = SupabaseStreamReader(self.http, self._object_url(bucket, file_path), self.headers)
         try:
-            response = self.client.storage.from_(bucket).download(file_path)
-            return BytesIO(response)
+            with metrics.external_call('supabase_storage'):
+                reader.connect()
+        except FileNotFoundError:
+            raise
         except Exception as e:
             raise FileNotFoundError(f"File {name} not found in Supabase: {str(e)}")
+        
+        file = File(io.BufferedReader(reader, READ_BUFFER_SIZE), name)
+        file.size = reader.size
+        return file
     
     def _save(self, name, content):
         """
-        Save a file to Supabase.
+        Save a file to Supabase, streaming it from content.chunks().
+        
+        Files up to UPLOAD_CHUNK_SIZE are sent in one streamed request; larger
+        files use Supabase's resumable (TUS) upload, one chunk at a time. The
+        file is never read into memory as a whole.
         
         Args:
             name: Full path including bucket name (e.g., 'profile-pictures/profile_1.jpg')
-            content: File content (can be bytes or file-like object)
+            content: Django File / UploadedFile
         
         Returns:
             name: The saved file path
         """
         bucket = self._get_bucket_name(name)
         file_path = self._get_file_path(name)
+        content_type = (
+            getattr(content, 'content_type', None)
+            or mimetypes.guess_type(name)[0]
+            or 'application/octet-stream'
+        )
         
         try:
-            # Read content if it's a file-like object
-            if hasattr(content, 'read'):
-                file_content = content.read()
-            else:
-                file_content = content
-            
-            # Upload to Supabase with upsert to overwrite if exists
-            self.client.storage.from_(bucket).upload(
-                file_path,
-                file_content,
-                {"upsert": "true"}
-            )
+            with metrics.external_call('supabase_storage'):
+                if content.size <= UPLOAD_CHUNK_SIZE:
+                    self._upload_single(bucket, file_path, content, content_type, cdn.cache_control(name))
+                else:
+                    self._upload_resumable(bucket, file_path, content, content_type, cdn.max_age(name))
+            self._forget(name)
             return name
         except Exception as e:
             raise Exception(f"Failed to save file {name} to Supabase: {str(e)}")
     
+    def _upload_single(self, bucket, file_path, content, content_type, cache_control):
+        """Upload a small file in one request, streaming its chunks."""
+        response = self.http.post(
+            self._object_url(bucket, file_path),
+            content=content.chunks(STREAM_CHUNK_SIZE),
+            headers={
+                **self.headers,
+                'Content-Type': content_type,
+                'Content-Length': str(content.size),
+                'Cache-Control': cache_control,
+                'x-upsert': 'true',
+            },
+            timeout=UPLOAD_TIMEOUT,
+        )
+        response.raise_for_status()
+    
+    def _upload_resumable(self, bucket, file_path, content, content_type, max_age):
+        """
+        Upload a large file with the TUS resumable protocol.
+        
+        Each UPLOAD_CHUNK_SIZE part is streamed from the file. If sending a
+        part fails, the server is asked how much it received and the upload
+        continues from there (up to UPLOAD_RETRIES times per part).
+        """
+        def encode(value):
+            return base64.b64encode(value.encode()).decode()
+        
+        tus_headers = {**self.headers, 'Tus-Resumable': '1.0.0'}
+        response = self.http.post(
+            f"{self.storage_url}/upload/resumable",
+            headers={
+                **tus_headers,
+                'Upload-Length': str(content.size),
+                'Upload-Metadata': ','.join([
+                    f"bucketName {encode(bucket)}",
+                    f"objectName {encode(file_path)}",
+                    f"contentType {encode(content_type)}",
+                    f"cacheControl {encode(str(max_age))}",
+                ]),
+                'x-upsert': 'true',
+            },
+        )
+        response.raise_for_status()
+        upload_url = urljoin(f"{self.storage_url}/", response.headers['Location'])
+        
+        offset = 0
+        failures = 0
+        while offset < content.size:
+            length = min(UPLOAD_CHUNK_SIZE, content.size - offset)
+            try:
+                response = self.http.patch(
+                    upload_url,
+                    content=_read_part(content, offset, length),
+                    headers={
+                        **tus_headers,
+                        'Upload-Offset': str(offset),
+                        'Content-Type': 'application/offset+octet-stream',
+                        'Content-Length': str(length),
+                    },
+                    timeout=UPLOAD_TIMEOUT,
+                )
+                response.raise_for_status()
+                offset = int(response.headers['Upload-Offset'])
+                failures = 0
+            except httpx.HTTPError:
+                failures += 1
+                if failures > UPLOAD_RETRIES:
+                    raise
+                # Resume from whatever the server has stored
+                head = self.http.head(upload_url, headers=tus_headers)
+                head.raise_for_status()
+                offset = int(head.headers['Upload-Offset'])
+    
+    def read_range(self, name, start, length):
+        """
+        Read `length` bytes of a file from offset `start` with one Range
+        request; fewer if the file ends first.
+        
+        Args:
+            name: Full path including bucket name
+            start: Offset of the first byte
+            length: Number of bytes to read
+        
+        Returns:
+            bytes
+        
+        Raises:
+            FileNotFoundError: if the file does not exist
+        """
+        bucket = self._get_bucket_name(name)
+        file_path = self._get_file_path(name)
+        headers = {**self.headers, 'Accept-Encoding': 'identity', 'Range': f"bytes={start}-{start + length - 1}"}
+        with metrics.external_call('supabase_storage'):
+            with self.http.stream('GET', self._object_url(bucket, file_path), headers=headers) as response:
+                if response.status_code in (400, 404):
+                    raise FileNotFoundError(f"File {name} not found in Supabase")
+                if response.status_code == 416:
+                    return b''
+                response.raise_for_status()
+                # A server that ignores Range sends the whole file; stop once the range is in
+                skip = start if response.status_code == 200 else 0
+                data = b''
+                for chunk in response.iter_bytes(STREAM_CHUNK_SIZE):
+                    data += chunk
+                    if len(data) >= skip + length:
+                        break
+        return data[skip:skip + length]
+    
     def delete(self, name):
         """
         Delete a file from Supabase.
@@ -98,13 +419,15 @@ class SupabaseStorage(Storage):
         file_path = self._get_file_path(name)
         
         try:
-            self.client.storage.from_(bucket).remove([file_path])
+            with metrics.external_call('supabase_storage'):
+                self.client.storage.from_(bucket).remove([file_path])
+            self._forget(name)
         except Exception as e:
             raise Exception(f"Failed to delete file {name} from Supabase: {str(e)}")
     
     def exists(self, name):
         """
-        Check if a file exists in Supabase.
+        Check if a file exists in Supabase (HEAD request, no file bytes).
         
         Args:
             name: Full path including bucket name
@@ -112,13 +435,7 @@ class SupabaseStorage(Storage):
         Returns:
             bool: True if file exists, False otherwise
         """
-        try:
-            bucket = self._get_bucket_name(name)
-            file_path = self._get_file_path(name)
-            self.client.storage.from_(bucket).download(file_path)
-            return True
-        except:
-            return False
+        return self._metadata(name) is not None
     
     def url(self, name):
         """
@@ -134,33 +451,228 @@ class SupabaseStorage(Storage):
         file_path = self._get_file_path(name)
         return f"{self.supabase_url}/storage/v1/object/public/{bucket}/{file_path}"
     
+    def public_base_url(self):
+        """Host public objects are served from: STORAGE_CDN_URL, else SUPABASE_URL."""
+        return (getattr(settings, 'STORAGE_CDN_URL', '') or self.supabase_url).rstrip('/')
+    
+    def name_from_url(self, url):
+        """
+        Storage name of a public object URL of this storage, or None for
+        other URLs. Accepts URLs from url() and cdn_url().
+        
+        Args:
+            url: e.g. https://<project>.supabase.co/storage/v1/object/public/profile-pictures/profile_1.jpg
+        
+        Returns:
+            str or None: e.g. 'profile-pictures/profile_1.jpg'
+        """
+        url = url.split('?', 1)[0]
+        for base in {self.supabase_url.rstrip('/'), self.public_base_url()}:
+            for endpoint in ('object/public', 'render/image/public'):
+                prefix = f"{base}/storage/v1/{endpoint}/"
+                if url.startswith(prefix):
+                    return unquote(url[len(prefix):])
+        return None
+    
+    def cdn_url(self, name, width=None, height=None, quality=None, version=None):
+        """
+        Cacheable public URL for a file (see users.cdn). Makes no request.
+        
+        Files whose names are reused for new content get a ?v=<version>
+        parameter. width/height/quality use Supabase's image transformation
+        endpoint when SUPABASE_IMAGE_TRANSFORMATIONS is enabled.
+        
+        Args:
+            name: Full path including bucket name
+            width, height: Resize to fit within these dimensions (pixels)
+            quality: Output quality (20-100)
+            version: Version tag of a reused name (users.cdn.version_tag)
+        
+        Returns:
+            str: Public URL
+        """
+        bucket = self._get_bucket_name(name)
+        file_path = self._get_file_path(name)
+        endpoint = 'object/public'
+        params = {}
+        if (width or height or quality) and getattr(settings, 'SUPABASE_IMAGE_TRANSFORMATIONS', False):
+            endpoint = 'render/image/public'
+            if width:
+                params['width'] = int(width)
+            if height:
+                params['height'] = int(height)
+            if quality:
+                params['quality'] = int(quality)
+            if width and height:
+                params['resize'] = 'contain'
+        if version and not cdn.is_immutable_name(name):
+            params['v'] = version
+        url = f"{self.public_base_url()}/storage/v1/{endpoint}/{bucket}/{quote(file_path)}"
+        return f"{url}?{urlencode(params)}" if params else url
+    
     def size(self, name):
         """
-        Get the size of a file. 
-        Note: Supabase doesn't provide easy size access, so this is a placeholder.
+        Get the size of a file from its metadata.
         
         Args:
             name: Full path including bucket name
         
         Returns:
-            int or None: File size or None if not available
+            int: File size in bytes
         """
-        return None
+        metadata = self._metadata(name)
+        if metadata is None:
+            raise FileNotFoundError(f"File {name} not found in Supabase")
+        return metadata['size']
+    
+    def _metadata(self, name):
+        """
+        Size, content type and ETag of a file, or None if it does not exist.
+        
+        Uses a HEAD request and caches the answer (including "missing") for
+        METADATA_CACHE_TTL seconds; this storage's own saves and deletes
+        clear the entry.
+        """
+        key = self._cache_key('meta', name)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached or None
+        
+        bucket = self._get_bucket_name(name)
+        file_path = self._get_file_path(name)
+        with metrics.external_call('supabase_storage'):
+            response = self.http.head(self._object_url(bucket, file_path), headers=self.headers)
+        if response.status_code in (400, 404):
+            metadata = None
+        else:
+            response.raise_for_status()
+            size = response.headers.get('Content-Length')
+            metadata = {
+                'size': int(size) if size is not None else None,
+                'content_type': response.headers.get('Content-Type'),
+                'etag': _etag(response.headers.get('ETag')),
+            }
+        cache.set(key, metadata or {}, METADATA_CACHE_TTL)
+        return metadata
+    
+    def _cache_key(self, kind, name):
+        digest = hashlib.md5(name.encode()).hexdigest()
+        return f"supabase_storage:{kind}:{digest}"
+    
+    def _forget(self, name):
+        """Drop cached metadata of `name` and the listing of its directory."""
+        cache.delete_many([
+            self._cache_key('meta', name),
+            self._cache_key('list', name.rsplit('/', 1)[0] if '/' in name else name),
+        ])
+    
+    def signed_upload_url(self, name):
+        """
+        Create a short-lived signed URL the client can upload a file to
+        directly, without the bytes passing through Django.
+        
+        Args:
+            name: Full path including bucket name
+        
+        Returns:
+            dict: {'url': signed upload URL, 'token': upload token}
+        """
+        from storage3.exceptions import StorageException
+        
+        bucket = self._get_bucket_name(name)
+        file_path = self._get_file_path(name)
+        try:
+            with metrics.external_call('supabase_storage'):
+                result = self.client.storage.from_(bucket).create_signed_upload_url(file_path)
+        except StorageException as e:
+            raise Exception(f"Failed to create upload URL for {name}: {str(e)}")
+        return {'url': result['signed_url'], 'token': result['token']}
+    
+    def object_info(self, name):
+        """
+        Get stored metadata of a file without downloading it.
+        
+        Args:
+            name: Full path including bucket name
+        
+        Returns:
+            dict or None: {'size': int, 'content_type': str}, or None if the file does not exist
+        """
+        from storage3.exceptions import StorageException
+        
+        bucket = self._get_bucket_name(name)
+        file_path = self._get_file_path(name)
+        try:
+            with metrics.external_call('supabase_storage'):
+                info = self.client.storage.from_(bucket).info(file_path)
+        except StorageException:
+            return None
+        metadata = info.get('metadata') or {}
+        size = info.get('size', metadata.get('size'))
+        return {
+            'size': int(size) if size is not None else None,
+            'content_type': info.get('content_type') or metadata.get('mimetype'),
+        }
     
     def listdir(self, path):
         """
         List contents of a directory in Supabase.
         
+        Pages through the listing LIST_PAGE_SIZE entries at a time. The result
+        is cached for METADATA_CACHE_TTL seconds, and the sizes/types in it
+        prime the metadata cache used by exists() and size().
+        
         Args:
             path: Directory path (format: bucket-name/path)
         
         Returns:
             tuple: (directories, files) lists
         """
-        bucket = path.split('/')[0]
+        path = path.rstrip('/')
+        key = self._cache_key('list', path)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        
+        bucket = self._get_bucket_name(path)
+        prefix = self._get_file_path(path) if '/' in path else ''
+        directories, files, metadata = [], [], {}
         try:
-            response = self.client.storage.from_(bucket).list(path)
-            files = [item['name'] for item in response if item['name']]
-            return [], files
+            offset = 0
+            while True:
+                with metrics.external_call('supabase_storage'):
+                    page = self.client.storage.from_(bucket).list(prefix, {
+                        'limit': LIST_PAGE_SIZE,
+                        'offset': offset,
+                        'sortBy': {'column': 'name', 'order': 'asc'},
+                    })
+                for item in page:
+                    if not item.get('name'):
+                        continue
+                    if item.get('id') is None:
+                        # Folders are listed without an id
+                        directories.append(item['name'])
+                        continue
+                    files.append(item['name'])
+                    info = item.get('metadata') or {}
+                    metadata[self._cache_key('meta', f"{path}/{item['name']}")] = {
+                        'size': info.get('size'),
+                        'content_type': info.get('mimetype'),
+                        'etag': _etag(info.get('eTag')),
+                    }
+                if len(page) < LIST_PAGE_SIZE:
+                    break
+                offset += LIST_PAGE_SIZE
         except Exception as e:
             raise Exception(f"Failed to list directory {path}: {str(e)}")
+        
+        cache.set_many(metadata, METADATA_CACHE_TTL)
+        cache.set(key, (directories, files), METADATA_CACHE_TTL)
+        return directories, files
+
+
+class ContentAddressedSupabaseStorage(ContentAddressedStorageMixin, SupabaseStorage):
+    """
+    SupabaseStorage that stores each distinct file once, under its SHA-256.
+    See users.content_addressed.
+    """
@@ -1,3 +1,742 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+from urllib.parse import unquote
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage, storages
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+import httpx
+from PIL import Image, ImageDraw
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import cdn, documents, geo, reference_data
+from .content_addressed import ContentAddressedStorageMixin
+from .models import DocumentVerification, Speciality, Specialization, StoredObject, User
+from . import supabase_storage
+from .supabase_storage import SupabaseStorage
+from .views import SaveCertificatesView, UploadCitizenshipView
+
+
+class UploadCountingStorage(InMemoryStorage):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.uploads = 0
+
+    def _save(self, name, content):
+        self.uploads += 1
+        return super()._save(name, content)
+
+
+class ContentAddressedTestStorage(ContentAddressedStorageMixin, UploadCountingStorage):
+    """In-memory stand-in for ContentAddressedSupabaseStorage."""
+
+    def name_from_url(self, url):
+        url = url.split('?', 1)[0]
+        return unquote(url[len(self.base_url):]) if url.startswith(self.base_url) else None
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'users.tests.ContentAddressedTestStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class ContentAddressedStorageTests(TestCase):
+
+    def test_identical_content_is_stored_once(self):
+        storage = storages['default']
+        uploads_before = storage.uploads
+        first = storage.save('bookings/booking_1/before_1.jpg', ContentFile(b'same photo'))
+        second = storage.save('bookings/booking_2/after_1.JPG', ContentFile(b'same photo'))
+        other = storage.save('bookings/booking_2/after_2.jpg', ContentFile(b'other photo'))
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith('bookings/cas/'))
+        self.assertNotEqual(first, other)
+        self.assertEqual(StoredObject.objects.get(name=first).refcount, 2)
+        self.assertEqual(storage.uploads - uploads_before, 2)
+
+        # Deleting drops a reference; the file stays until collected
+        storage.delete(first)
+        self.assertEqual(StoredObject.objects.get(name=first).refcount, 1)
+        self.assertTrue(storage.exists(first))
+
+    def test_gc_recounts_and_purges_unreferenced(self):
+        storage = storages['default']
+        name = storage.save('bookings/booking_1/before_1.jpg', ContentFile(b'orphaned photo'))
+
+        # No model row references it, so the recount finds zero references
+        call_command('gc_stored_objects', '--grace-hours', '0', stdout=StringIO())
+        self.assertFalse(StoredObject.objects.filter(name=name).exists())
+        self.assertFalse(storage.exists(name))
+
+    def test_gc_counts_urls_in_url_fields(self):
+        storage = storages['default']
+        name = storage.save('profile_pictures/profile_1.jpg', ContentFile(b'profile photo'))
+        User.objects.create(username='pictured', email='pictured@example.com', profile_picture=storage.url(name))
+        # A stale count that the recount has to correct from the URL field
+        StoredObject.objects.filter(name=name).update(refcount=0)
+
+        call_command('gc_stored_objects', '--grace-hours', '0', stdout=StringIO())
+        self.assertEqual(StoredObject.objects.get(name=name).refcount, 1)
+        self.assertTrue(storage.exists(name))
+
+
+class TransferFilesCommandTests(TestCase):
+    """transfer_files between two local directories."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = os.path.join(self.tmp.name, 'media')
+        self.dest = os.path.join(self.tmp.name, 'dest')
+        self.checkpoint = os.path.join(self.tmp.name, 'checkpoint.json')
+        os.makedirs(os.path.join(self.source, 'profile_pictures'))
+
+        self.users = []
+        for i in range(5):
+            name = f'profile_pictures/local_{i}.png'
+            with open(os.path.join(self.source, name), 'wb') as f:
+                f.write(b'picture %d' % i)
+            self.users.append(User.objects.create(username=f'user{i}', email=f'user{i}@example.com', profile_picture=name))
+        self.migrated = User.objects.create(
+            username='done', email='done@example.com', profile_picture='https://cdn.example.com/profile_pictures/done.png'
+        )
+
+    def _transfer(self, *args):
+        out = StringIO()
+        call_command(
+            'transfer_files', '--target', 'profile_pictures', '--source-root', self.source,
+            '--dest-root', self.dest, '--checkpoint', self.checkpoint, '--chunk-size', '2', *args, stdout=out
+        )
+        return out.getvalue()
+
+    def test_transfers_rewrites_and_resumes(self):
+        os.remove(os.path.join(self.source, 'profile_pictures/local_3.png'))
+        output = self._transfer()
+        self.assertIn('4 transferred, 0 failed, 1 missing', output)
+
+        user = User.objects.get(pk=self.users[0].pk)
+        self.assertEqual(user.profile_picture, f'/media/profile_pictures/profile_{user.pk}.png')
+        with open(os.path.join(self.dest, f'profile_pictures/profile_{user.pk}.png'), 'rb') as f:
+            self.assertEqual(f.read(), b'picture 0')
+        self.assertEqual(User.objects.get(pk=self.migrated.pk).profile_picture, 'https://cdn.example.com/profile_pictures/done.png')
+
+        with open(self.checkpoint) as f:
+            progress = json.load(f)['profile_pictures']
+        self.assertEqual(progress['failed'], [self.users[3].pk])
+
+        # Nothing left past the checkpoint; the missing file is retried once restored
+        self.assertIn('0 file(s) to transfer', self._transfer())
+        with open(os.path.join(self.source, 'profile_pictures/local_3.png'), 'wb') as f:
+            f.write(b'picture 3')
+        self.assertIn('1 transferred', self._transfer('--retry-failed'))
+        self.assertTrue(User.objects.get(pk=self.users[3].pk).profile_picture.startswith('/media/profile_pictures/'))
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'users.tests.ContentAddressedTestStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class TransferFilesContentAddressedTests(TransactionTestCase):
+    """transfer_files into the default (content-addressed) storage, then gc."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        os.makedirs(os.path.join(self.tmp.name, 'profile_pictures'))
+        for i in range(3):
+            name = f'profile_pictures/local_{i}.png'
+            with open(os.path.join(self.tmp.name, name), 'wb') as f:
+                f.write(b'picture %d' % i)
+            User.objects.create(username=f'user{i}', email=f'user{i}@example.com', profile_picture=name)
+
+    def test_transferred_urls_survive_gc(self):
+        out = StringIO()
+        # One upload thread: the test database (SQLite) allows one writer at a time
+        call_command(
+            'transfer_files', '--target', 'profile_pictures', '--source-root', self.tmp.name,
+            '--checkpoint', os.path.join(self.tmp.name, 'checkpoint.json'), '--workers', '1', stdout=out
+        )
+        self.assertIn('3 transferred', out.getvalue())
+
+        storage = storages['default']
+        names = [storage.name_from_url(url) for url in User.objects.values_list('profile_picture', flat=True)]
+        self.assertTrue(all(name.startswith('profile_pictures/cas/') for name in names))
+
+        call_command('gc_stored_objects', '--grace-hours', '0', stdout=StringIO())
+        for name in names:
+            self.assertEqual(StoredObject.objects.get(name=name).refcount, 1)
+            self.assertTrue(storage.exists(name))
+
+
+@override_settings(
+    SUPABASE_URL='https://project.supabase.co',
+    SUPABASE_KEY='eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.signature',
+    STORAGE_CDN_URL='https://cdn.example.com',
+    SUPABASE_IMAGE_TRANSFORMATIONS=True,
+)
+class CdnUrlTests(TestCase):
+    """SupabaseStorage.cdn_url without network access (metadata comes from the cache)."""
+
+    def setUp(self):
+        self.storage = SupabaseStorage()
+        self.addCleanup(cache.clear)
+
+    def test_immutable_names_are_not_versioned(self):
+        name = 'bookings/cas/3f/' + '3f' * 32 + '.jpg'
+        self.assertEqual(self.storage.cdn_url(name), f'https://cdn.example.com/storage/v1/object/public/{name}')
+        self.assertEqual(
+            self.storage.cdn_url(name, width=320, quality=75),
+            f'https://cdn.example.com/storage/v1/render/image/public/{name}?width=320&quality=75',
+        )
+        self.assertEqual(cdn.cache_control(name), cdn.IMMUTABLE_CACHE_CONTROL)
+        self.assertTrue(cdn.is_immutable_name('certificates/user_1/certificate_' + 'a' * 32 + '.pdf'))
+
+    def test_mutable_names_are_versioned_without_io(self):
+        name = 'profile-pictures/profile_1.jpg'
+        updated_at = datetime(2025, 1, 15, 9, 30, tzinfo=dt_timezone.utc)
+        with mock.patch.object(SupabaseStorage, '_metadata', side_effect=AssertionError('no HEAD request')):
+            first = self.storage.cdn_url(name, version=cdn.version_tag(updated_at))
+            self.assertEqual(first, f'https://cdn.example.com/storage/v1/object/public/{name}?v=67878018')
+            # A later update of the row -> new URL
+            later = self.storage.cdn_url(name, version=cdn.version_tag(updated_at + timedelta(seconds=5)))
+            self.assertNotEqual(later, first)
+            self.assertEqual(self.storage.cdn_url(name), f'https://cdn.example.com/storage/v1/object/public/{name}')
+        self.assertEqual(cdn.cache_control(name), 'max-age=3600')
+
+    def test_stored_urls_map_back_to_names(self):
+        stored = 'https://project.supabase.co/storage/v1/object/public/profile-pictures/profile_1.jpg'
+        self.assertEqual(self.storage.name_from_url(stored), 'profile-pictures/profile_1.jpg')
+        self.assertEqual(self.storage.name_from_url(self.storage.cdn_url('profile-pictures/profile_1.jpg', width=160)), 'profile-pictures/profile_1.jpg')
+        self.assertIsNone(self.storage.name_from_url('https://lh3.googleusercontent.com/a/photo.jpg'))
+
+    @override_settings(SUPABASE_IMAGE_TRANSFORMATIONS=False)
+    def test_transformations_disabled(self):
+        name = 'bookings/cas/3f/' + '3f' * 32 + '.jpg'
+        self.assertEqual(self.storage.cdn_url(name, width=320), f'https://cdn.example.com/storage/v1/object/public/{name}')
+
+
+class SupabaseClientTests(TestCase):
+
+    @override_settings(SUPABASE_URL='', SUPABASE_KEY='', SUPABASE_ANON_KEY='')
+    def test_storage_without_configuration_does_no_io(self):
+        storage = SupabaseStorage()
+        self.assertEqual(storage.url('bookings/a.jpg'), '/storage/v1/object/public/bookings/a.jpg')
+        with self.assertRaises(ImproperlyConfigured):
+            storage.client
+
+    @override_settings(SUPABASE_URL='https://project.supabase.co', SUPABASE_KEY='eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.signature')
+    def test_instances_share_one_client(self):
+        self.addCleanup(supabase_storage._clients.clear)
+        first, second = SupabaseStorage(), SupabaseStorage()
+        self.assertIs(first.client, second.client)
+        self.assertIs(first.http, second.http)
+
+
+class GeoTests(TestCase):
+    """Geohash encoding and the cells searched around a point (users.geo)."""
+
+    def test_encode(self):
+        # Reference values from the original geohash.org implementation
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geo.encode(-25.382708, -49.265506, 9), '6gkzwgjzn')
+        self.assertEqual(len(geo.encode(27.7172, 85.3240)), geo.GEO_CELL_PRECISION)
+        # Cells nest by prefix
+        self.assertTrue(geo.encode(27.7172, 85.3240).startswith(geo.encode(27.7172, 85.3240, 4)))
+        lat_lo, lat_hi, lng_lo, lng_hi = geo.decode_bounds(geo.encode(27.7172, 85.3240))
+        self.assertTrue(lat_lo <= 27.7172 < lat_hi and lng_lo <= 85.3240 < lng_hi)
+
+    def test_covering_cells_contain_every_point_in_radius(self):
+        rng = random.Random(7)
+        for latitude, longitude, radius_km in (
+            (27.7172, 85.3240, 10), (27.7172, 85.3240, 1), (28.2096, 83.9856, 50),
+            (64.1466, -21.9426, 25),
+            # Cells on both sides of the antimeridian
+            (-17.7134, 179.999, 5),
+        ):
+            cells = geo.covering_cells(latitude, longitude, radius_km)
+            self.assertLessEqual(len(cells), 9)
+            self.assertEqual(len(set(cells)), len(cells))
+            for _ in range(300):
+                # Random point within radius_km, including right at the edge
+                distance = radius_km * rng.choice([rng.random(), 0.999])
+                bearing = rng.uniform(0, 2 * math.pi)
+                point_lat = latitude + distance * math.cos(bearing) / geo.KM_PER_DEGREE_LAT
+                point_lng = longitude + distance * math.sin(bearing) / (
+                    geo.KM_PER_DEGREE_LAT * math.cos(math.radians(latitude))
+                )
+                point_lng = ((point_lng + 180) % 360) - 180
+                if geo.haversine_km(latitude, longitude, point_lat, point_lng) > radius_km:
+                    continue
+                cell = geo.encode(point_lat, point_lng)
+                with self.subTest(center=(latitude, longitude), radius_km=radius_km, point=(point_lat, point_lng)):
+                    self.assertTrue(any(cell.startswith(prefix) for prefix in cells))
+
+    def test_haversine(self):
+        # One degree along a meridian
+        self.assertAlmostEqual(geo.haversine_km(27.0, 85.3240, 28.0, 85.3240), math.pi * geo.EARTH_RADIUS_KM / 180)
+        self.assertAlmostEqual(geo.haversine_km(0, 179.5, 0, -179.5), geo.haversine_km(0, 0, 0, 1))
+        self.assertEqual(geo.haversine_km(27.7172, 85.3240, 27.7172, 85.3240), 0)
+
+
+class FakeSupabaseServer:
+    """
+    The storage endpoints SupabaseStorage uses, served to an httpx.MockTransport.
+    `fail_patches` lists PATCH request numbers (1-based) that store half of
+    their part and then fail, like a dropped connection. With `ignore_range`
+    GETs always return the whole object.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.requests = []
+        self.uploads = {}
+        self.fail_patches = set()
+        self.ignore_range = False
+
+    def __call__(self, request):
+        self.requests.append(request)
+        path = unquote(request.url.path).removeprefix('/storage/v1/')
+        if path == 'upload/resumable' and request.method == 'POST':
+            metadata = dict(item.split(' ') for item in request.headers['Upload-Metadata'].split(','))
+            name = '/'.join(base64.b64decode(metadata[key]).decode() for key in ('bucketName', 'objectName'))
+            self.uploads['u1'] = {'name': name, 'data': b'', 'length': int(request.headers['Upload-Length'])}
+            return httpx.Response(201, headers={'Location': '/storage/v1/upload/resumable/u1'})
+        if path.startswith('upload/resumable/'):
+            upload = self.uploads[path.rsplit('/', 1)[1]]
+            if request.method == 'PATCH':
+                self.assertOffset(request, upload)
+                body = request.read()
+                if sum(r.method == 'PATCH' for r in self.requests) in self.fail_patches:
+                    upload['data'] += body[:len(body) // 2]
+                    return httpx.Response(503)
+                upload['data'] += body
+                if len(upload['data']) == upload['length']:
+                    self.objects[upload['name']] = (upload['data'], 'application/octet-stream')
+                return httpx.Response(204, headers={'Upload-Offset': str(len(upload['data']))})
+            return httpx.Response(200, headers={'Upload-Offset': str(len(upload['data']))})
+        if path.startswith('object/list/') and request.method == 'POST':
+            return self.list(path.removeprefix('object/list/'), json.loads(request.read()))
+        name = path.removeprefix('object/')
+        if request.method == 'POST':
+            self.objects[name] = (request.read(), request.headers['Content-Type'])
+            return httpx.Response(200, json={'Key': name})
+        if name not in self.objects:
+            return httpx.Response(400, json={'statusCode': '404', 'error': 'not_found'})
+        data, content_type = self.objects[name]
+        headers = {'Content-Type': content_type, 'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+        if request.method == 'HEAD':
+            return httpx.Response(200, headers={**headers, 'Content-Length': str(len(data))})
+        if 'Range' in request.headers and not self.ignore_range:
+            start, _, end = request.headers['Range'].removeprefix('bytes=').partition('-')
+            start, end = int(start), min(int(end or len(data) - 1), len(data) - 1)
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(data)}'
+            return httpx.Response(206, headers=headers, content=data[start:end + 1])
+        return httpx.Response(200, headers=headers, content=data)
+
+    @staticmethod
+    def assertOffset(request, upload):
+        if int(request.headers['Upload-Offset']) != len(upload['data']):
+            raise AssertionError(f"PATCH at {request.headers['Upload-Offset']}, server has {len(upload['data'])}")
+
+    def list(self, bucket, body):
+        prefix = f"{bucket}/{body['prefix']}/" if body['prefix'] else f'{bucket}/'
+        entries = {}
+        for name, (data, content_type) in self.objects.items():
+            if name.startswith(prefix):
+                entry, _, rest = name[len(prefix):].partition('/')
+                entries[entry] = {'name': entry, 'id': None, 'metadata': None} if rest else {
+                    'name': entry, 'id': name,
+                    # The listing reports the ETag without the quotes of the HEAD header
+                    'metadata': {'size': len(data), 'mimetype': content_type, 'eTag': hashlib.md5(data).hexdigest()},
+                }
+        page = [entries[key] for key in sorted(entries)][body['offset']:body['offset'] + body['limit']]
+        return httpx.Response(200, json=page)
+
+
+@override_settings(SUPABASE_URL='https://project.supabase.co', SUPABASE_KEY='eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.signature')
+class SupabaseStorageIOTests(TestCase):
+    """SupabaseStorage against a fake storage server: uploads, streamed reads and cached metadata."""
+
+    def setUp(self):
+        from supabase import ClientOptions, create_client
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.server = FakeSupabaseServer()
+        http = httpx.Client(transport=httpx.MockTransport(self.server))
+        client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY, options=ClientOptions(httpx_client=http))
+        with redirect_stdout(StringIO()):
+            # storage3 prints a warning about the URL form when the client is built
+            client.storage
+        supabase_storage._clients[(os.getpid(), settings.SUPABASE_URL, settings.SUPABASE_KEY)] = client
+        self.addCleanup(supabase_storage._clients.clear)
+        self.storage = SupabaseStorage()
+
+    def _requests(self, method, prefix='/storage/v1/'):
+        return [r for r in self.server.requests if r.method == method and r.url.path.startswith(prefix)]
+
+    def test_small_file_is_streamed_in_one_request(self):
+        data = os.urandom(200 * 1024)
+        self.assertEqual(self.storage.save('bookings/photo.jpg', ContentFile(data)), 'bookings/photo.jpg')
+        upload, = self._requests('POST')
+        self.assertEqual(upload.url.path, '/storage/v1/object/bookings/photo.jpg')
+        self.assertEqual(upload.headers['Content-Length'], str(len(data)))
+        self.assertEqual(upload.headers['Content-Type'], 'image/jpeg')
+        # Sent from content.chunks(), not as one bytes object
+        self.assertIsInstance(upload.stream, httpx.SyncByteStream)
+        self.assertEqual(self.server.objects['bookings/photo.jpg'][0], data)
+
+    def test_large_file_uses_resumable_upload(self):
+        data = os.urandom(supabase_storage.UPLOAD_CHUNK_SIZE * 2 + 1234)
+        self.storage.save('certificates/scan.pdf', ContentFile(data))
+        self.assertEqual(
+            [r.headers['Upload-Offset'] for r in self._requests('PATCH')],
+            ['0', str(supabase_storage.UPLOAD_CHUNK_SIZE), str(2 * supabase_storage.UPLOAD_CHUNK_SIZE)]
+        )
+        create = self._requests('POST')[0]
+        self.assertEqual(create.headers['Upload-Length'], str(len(data)))
+        self.assertEqual(self.server.objects['certificates/scan.pdf'][0], data)
+
+    def test_resumable_upload_resumes_after_a_failed_part(self):
+        self.server.fail_patches = {2}
+        data = os.urandom(supabase_storage.UPLOAD_CHUNK_SIZE * 2 + 1234)
+        self.storage.save('certificates/scan.pdf', ContentFile(data))
+        half = supabase_storage.UPLOAD_CHUNK_SIZE + supabase_storage.UPLOAD_CHUNK_SIZE // 2
+        # The server kept half of the second part; the upload asked and went on from there
+        self.assertEqual(len(self._requests('HEAD', '/storage/v1/upload/')), 1)
+        self.assertEqual(
+            [int(r.headers['Upload-Offset']) for r in self._requests('PATCH')],
+            [0, supabase_storage.UPLOAD_CHUNK_SIZE, half]
+        )
+        self.assertEqual(self.server.objects['certificates/scan.pdf'][0], data)
+
+    def test_resumable_upload_gives_up(self):
+        self.server.fail_patches = set(range(1, 10))
+        with self.assertRaises(Exception):
+            self.storage.save('certificates/scan.pdf', ContentFile(b'x' * (supabase_storage.UPLOAD_CHUNK_SIZE + 1)))
+        self.assertEqual(len(self._requests('PATCH')), supabase_storage.UPLOAD_RETRIES + 1)
+
+    def test_stream_reader_seeks_with_range_requests(self):
+        data = bytes(range(256)) * 2048
+        self.server.objects['bookings/blob.bin'] = (data, 'application/octet-stream')
+        with self.storage.open('bookings/blob.bin') as f:
+            self.assertEqual(f.size, len(data))
+            self.assertEqual(f.read(10), data[:10])
+            f.seek(300_000)
+            self.assertEqual(f.read(5), data[300_000:300_005])
+            f.seek(-3, io.SEEK_END)
+            self.assertEqual(f.read(), data[-3:])
+            self.assertEqual(f.read(), b'')
+        gets = self._requests('GET')
+        self.assertEqual([r.headers.get('Range') for r in gets], [None, 'bytes=300000-', f'bytes={len(data) - 3}-'])
+
+        with self.assertRaises(FileNotFoundError):
+            self.storage.open('bookings/missing.bin')
+
+    def test_read_range(self):
+        data = bytes(range(256)) * 1024
+        self.server.objects['bookings/blob.bin'] = (data, 'application/octet-stream')
+        self.assertEqual(self.storage.read_range('bookings/blob.bin', 0, 16), data[:16])
+        self.assertEqual(self.storage.read_range('bookings/blob.bin', 1000, 10), data[1000:1010])
+        self.assertEqual([r.headers['Range'] for r in self._requests('GET')], ['bytes=0-15', 'bytes=1000-1009'])
+        self.assertEqual(self.storage.read_range('bookings/blob.bin', len(data) - 4, 16), data[-4:])
+
+        self.server.ignore_range = True
+        self.assertEqual(self.storage.read_range('bookings/blob.bin', 1000, 10), data[1000:1010])
+        with self.assertRaises(FileNotFoundError):
+            self.storage.read_range('bookings/missing.bin', 0, 16)
+
+    def test_exists_and_size_are_cached(self):
+        self.server.objects['bookings/photo.jpg'] = (b'x' * 1000, 'image/jpeg')
+        self.assertTrue(self.storage.exists('bookings/photo.jpg'))
+        self.assertEqual(self.storage.size('bookings/photo.jpg'), 1000)
+        # Missing objects are cached too
+        self.assertFalse(self.storage.exists('bookings/missing.jpg'))
+        self.assertFalse(self.storage.exists('bookings/missing.jpg'))
+        with self.assertRaises(FileNotFoundError):
+            self.storage.size('bookings/missing.jpg')
+        self.assertEqual(len(self._requests('HEAD')), 2)
+
+        # Saving through the storage clears the cached "missing"
+        self.storage.save('bookings/missing.jpg', ContentFile(b'y' * 10))
+        self.assertEqual(self.storage.size('bookings/missing.jpg'), 10)
+        self.assertEqual(len(self._requests('HEAD')), 3)
+
+    def test_listdir_pages_and_primes_metadata(self):
+        for i in range(supabase_storage.LIST_PAGE_SIZE + 5):
+            self.server.objects[f'bookings/cas/{i:03d}.jpg'] = (b'x' * i, 'image/jpeg')
+        self.server.objects['bookings/cas/sub/a.jpg'] = (b'a', 'image/jpeg')
+
+        directories, files = self.storage.listdir('bookings/cas')
+        self.assertEqual(directories, ['sub'])
+        self.assertEqual(len(files), supabase_storage.LIST_PAGE_SIZE + 5)
+        self.assertEqual([r.url.path for r in self._requests('POST')], ['/storage/v1/object/list/bookings'] * 2)
+
+        requests = len(self.server.requests)
+        self.assertEqual(self.storage.listdir('bookings/cas/'), (directories, files))
+        self.assertEqual(self.storage.size('bookings/cas/042.jpg'), 42)
+        self.assertTrue(self.storage.exists('bookings/cas/000.jpg'))
+        listed = self.storage._metadata('bookings/cas/007.jpg')
+        self.assertEqual(len(self.server.requests), requests)
+
+        # The listing's ETag is stored in the same form as a HEAD response's
+        cache.clear()
+        self.assertEqual(self.storage._metadata('bookings/cas/007.jpg'), listed)
+        self.assertEqual(listed['etag'], f'"{hashlib.md5(b"x" * 7).hexdigest()}"')
+
+
+def _document_photo(width=800, height=500, quality=90):
+    """A JPEG with shapes, so that its perceptual hash is not uniform."""
+    image = Image.new('RGB', (800, 500), (240, 240, 230))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((40, 40, 300, 320), fill=(30, 60, 120))
+    draw.ellipse((420, 80, 760, 420), fill=(180, 40, 40))
+    draw.line((0, 480, 800, 380), fill=(0, 0, 0), width=12)
+    out = io.BytesIO()
+    image.resize((width, height)).save(out, format='JPEG', quality=quality)
+    return out.getvalue()
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class DocumentVerificationTests(TestCase):
+
+    def setUp(self):
+        self.storage = storages['default']
+        self.alice = User.objects.create(username='alice', email='alice@example.com', user_type='offer')
+        self.bob = User.objects.create(username='bob', email='bob@example.com', user_type='offer')
+
+    def _save_certificate(self, user, name, content):
+        name = self.storage.save(name, ContentFile(content))
+        request = APIRequestFactory().post('/', {'certificates': [{'name': 'Licence', 'url': name}]}, format='json')
+        force_authenticate(request, user=user)
+        response = SaveCertificatesView.as_view()(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        return DocumentVerification.objects.get(user=user, source=name)
+
+    def test_upload_is_queued_then_verified(self):
+        verification = self._save_certificate(self.alice, 'certificates/user_1/licence.jpg', _document_photo())
+        self.assertEqual(verification.status, 'pending')
+
+        call_command('verify_documents', stdout=StringIO())
+        verification.refresh_from_db()
+        self.assertEqual(verification.status, 'valid', verification.problems)
+        self.assertEqual((verification.content_type, verification.width, verification.height), ('image/jpeg', 800, 500))
+        self.assertEqual(len(verification.phash), 16)
+        with self.storage.open(verification.preview.name) as f, Image.open(f) as preview:
+            self.assertEqual(max(preview.size), 480)
+
+    def test_document_reused_by_another_account_is_flagged(self):
+        first = self._save_certificate(self.alice, 'certificates/user_1/licence.jpg', _document_photo())
+        call_command('verify_documents', stdout=StringIO())
+        # Same document, rescaled and recompressed
+        second = self._save_certificate(self.bob, 'certificates/user_2/licence.jpg', _document_photo(1000, 625, quality=60))
+        call_command('verify_documents', stdout=StringIO())
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'flagged')
+        self.assertEqual([d['user'] for d in second.duplicates], [self.alice.pk])
+        self.assertEqual(first.status, 'flagged')
+        self.assertEqual([d['verification'] for d in first.duplicates], [second.pk])
+
+    def test_content_type_and_dimensions_are_checked(self):
+        renamed = self._save_certificate(self.alice, 'certificates/user_1/scan.jpg', b'MZ\x90\x00 not an image')
+        tiny = self._save_certificate(self.alice, 'certificates/user_1/tiny.jpg', _document_photo(200, 125))
+        call_command('verify_documents', stdout=StringIO())
+
+        renamed.refresh_from_db()
+        tiny.refresh_from_db()
+        self.assertEqual(renamed.status, 'invalid')
+        self.assertIn('detected: unknown', renamed.problems[0])
+        self.assertEqual(tiny.status, 'invalid')
+        self.assertIn('too small', tiny.problems[0])
+
+
+    def _upload_citizenship(self, user, front, back):
+        request = APIRequestFactory().post(
+            '/', {'citizenship_front': front, 'citizenship_back': back, 'citizenship_number': '12345678901'}, format='json'
+        )
+        force_authenticate(request, user=user)
+        response = UploadCitizenshipView.as_view()(request)
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_only_changed_documents_are_queued(self):
+        front, back = 'https://cdn.example.com/front_1.jpg', 'https://cdn.example.com/back_1.jpg'
+        self._upload_citizenship(self.alice, front, back)
+        DocumentVerification.objects.filter(kind='citizenship_front').update(status='flagged')
+        # Resubmitting the same files queues nothing
+        self._upload_citizenship(self.alice, front, back)
+        self.assertEqual(DocumentVerification.objects.count(), 2)
+
+        self._upload_citizenship(self.alice, 'https://cdn.example.com/front_2.jpg', back)
+        self.assertEqual(
+            list(DocumentVerification.objects.filter(kind='citizenship_front').order_by('id').values_list('source', 'status')),
+            [(front, 'superseded'), ('https://cdn.example.com/front_2.jpg', 'pending')]
+        )
+        self.assertEqual(DocumentVerification.objects.get(kind='citizenship_back').status, 'pending')
+        # The flag was on the replaced image only
+        self.assertFalse(User.objects.filter(document_verifications__status='flagged').exists())
+
+    def test_near_duplicates_are_found_through_hash_bands(self):
+        base = 0x1234_5678_9abc_def0
+
+        def checked(user, bits):
+            phash = f"{base ^ bits:016x}"
+            bands = dict(zip(documents.PHASH_BAND_FIELDS, documents.phash_bands(phash)))
+            return DocumentVerification.objects.create(
+                user=user, kind='certificate', source='certificates/x.jpg', status='valid',
+                digest=f"{bits:064x}", phash=phash, **bands
+            )
+
+        # 6 bits apart, spread 2/2/1/1 over the bands
+        near = checked(self.bob, 0b11 << 60 | 0b11 << 44 | 1 << 20 | 1 << 4)
+        # 8 bits apart, 2 in every band: not a duplicate and never read
+        checked(self.bob, 0b11 << 60 | 0b11 << 44 | 0b11 << 28 | 0b11 << 12)
+        # 7 bits apart, 1 of them in the last band: read, compared and rejected
+        checked(self.bob, 0b111111 << 58 | 1)
+        checked(self.alice, 0)
+        verification = checked(self.alice, 0)
+        verification.digest = 'f' * 64
+
+        with CaptureQueriesContext(connection) as queries, \
+                mock.patch.object(documents, 'hash_distance', wraps=documents.hash_distance) as compared:
+            duplicates = documents.find_duplicates(verification)
+        self.assertEqual(duplicates, [{'user': self.bob.pk, 'verification': near.pk, 'distance': 6}])
+        self.assertEqual(compared.call_count, 2)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('phash_band3', queries[0]['sql'])
+        self.assertEqual(documents.phash_bands(f"{base:016x}"), [0x1234, 0x5678, 0x9abc, 0xdef0])
+
+    def test_verified_documents_store_hash_bands(self):
+        verification = self._save_certificate(self.alice, 'certificates/user_1/licence.jpg', _document_photo())
+        call_command('verify_documents', stdout=StringIO())
+        verification.refresh_from_db()
+        self.assertEqual(
+            [getattr(verification, field) for field in documents.PHASH_BAND_FIELDS],
+            documents.phash_bands(verification.phash)
+        )
+
+
+class ReferenceDataTests(TestCase):
+    """The catalog lists are served from users.reference_data, kept current by signals, and revalidated with ETags."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plumbing = Speciality.objects.create(name='Plumbing', slug='plumbing')
+        Specialization.objects.create(speciality=cls.plumbing, name='Pipe Repair')
+        cls.provider = User.objects.create(
+            username='provider', email='provider@example.com', user_type='offer',
+            registration_completed=True, city='Lalitpur', district='Lalitpur'
+        )
+
+    def setUp(self):
+        # Snapshots from other tests' fixtures must not leak in
+        reference_data.invalidate()
+
+    def assertRevalidates(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('public', first['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        return first['ETag']
+
+    def test_specialities(self):
+        etag = self.assertRevalidates('/api/auth/specialities/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Speciality.objects.create(name='Cleaning', slug='cleaning')
+        response = self.client.get('/api/auth/specialities/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual([s['name'] for s in response.json()], ['Cleaning', 'Plumbing'])
+
+    def test_specializations(self):
+        etag = self.assertRevalidates('/api/auth/specializations/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plumbing.name = 'Plumbing & Drainage'
+            self.plumbing.save()
+        response = self.client.get(f'/api/auth/specializations/?speciality_id={self.plumbing.pk}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()[0]['speciality_name'], 'Plumbing & Drainage')
+        self.assertEqual(self.client.get('/api/auth/specializations/?speciality_id=999').json(), [])
+
+    def test_locations_follow_provider_changes(self):
+        etag = self.assertRevalidates('/api/auth/locations/')
+        provider = User.objects.get(pk=self.provider.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            provider.city, provider.district = 'Kathmandu', 'Kathmandu'
+            provider.save()
+            User.objects.create(
+                username='hari', email='hari@example.com', user_type='offer',
+                registration_completed=True, city='Kathmandu', district='Kirtipur'
+            )
+            # Not a registered provider: not listed
+            User.objects.create(username='sita', email='sita@example.com', user_type='find', city='Pokhara')
+        response = self.client.get('/api/auth/locations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json(), {'cities': ['Kathmandu'], 'districts': {'Kathmandu': ['Kathmandu', 'Kirtipur']}})
+
+        # Profile edits that leave the listing alone keep the snapshot
+        version = reference_data.get().version
+        with self.captureOnCommitCallbacks(execute=True):
+            provider.bio = 'Licensed plumber'
+            provider.save()
+        self.assertEqual(reference_data.get().version, version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(user_type='offer').delete()
+        self.assertEqual(self.client.get('/api/auth/locations/').json(), {'cities': [], 'districts': {}})
+
+    def test_location_check_only_on_saves_that_may_change_it(self):
+        # Loading users does nothing extra
+        provider = User.objects.get(pk=self.provider.pk)
+        self.assertFalse(hasattr(provider, '_reference_location'))
+
+        # A save limited to other fields reads nothing back
+        version = reference_data.get().version
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            provider.save(update_fields=['last_login'])
+        self.assertEqual(reference_data.get().version, version)
+
+        # Switching a provider to a customer drops their city from the index
+        with self.captureOnCommitCallbacks(execute=True):
+            provider.user_type = 'find'
+            provider.save()
+        self.assertEqual(self.client.get('/api/auth/locations/').json(), {'cities': [], 'districts': {}})
+
+    def test_changes_from_other_processes(self):
+        snapshot = reference_data.get()
+        # Another worker changes the catalog: this process only sees the version row move
+        Speciality.objects.create(name='Cleaning', slug='cleaning')
+        with mock.patch.object(reference_data, '_local', snapshot):
+            reference_data._bump_version()
+            self.assertIs(reference_data.get(), snapshot)
+            with mock.patch.object(reference_data, '_checked_until', 0):
+                names = [s['name'] for s in json.loads(reference_data.get().specialities.content)]
+        self.assertEqual(names, ['Cleaning', 'Plumbing'])
+
+    def test_snapshot_expires(self):
+        snapshot = reference_data.get()
+        # update() sends no signals; the snapshot is rebuilt once it is REFERENCE_DATA_TTL old
+        Speciality.objects.filter(pk=self.plumbing.pk).update(name='Drains')
+        self.assertIs(reference_data.get(), snapshot)
+        with mock.patch.object(reference_data.time, 'time', return_value=snapshot.built_at + reference_data.REFERENCE_DATA_TTL):
+            names = [s['name'] for s in json.loads(reference_data.get().specialities.content)]
+        self.assertEqual(names, ['Drains'])
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+Direct-to-storage uploads.
+
+Instead of posting files to Django, clients ask the API for a signed upload
+URL, PUT the file straight to Supabase Storage, then call a confirm endpoint.
+Django only ever handles the small JSON requests around the upload:
+
+1. issue_upload() reserves a storage path, creates a signed upload URL for
+   it and returns an `upload_id` - a signed, expiring ticket naming the path,
+   its purpose and the user it was issued to.
+2. The client uploads the bytes to `upload_url`.
+3. On confirm, read_upload() checks the ticket and verify_uploaded_object()
+   checks the stored object's size via its metadata and its type from its
+   first bytes (one small Range request), not the content type the client
+   declared. Only then is the database row written.
+"""
+import uuid
+
+from django.core import signing
+from django.core.files.storage import default_storage
+
+# Supabase signed upload URLs are valid for 2 hours; tickets expire with them
+UPLOAD_URL_TTL = 2 * 60 * 60
+
+IMAGE_CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+}
+
+DOCUMENT_CONTENT_TYPES = {
+    **IMAGE_CONTENT_TYPES,
+    'application/pdf': 'pdf',
+}
+
+# Enough leading bytes to tell all the types above apart
+SNIFF_BYTES = 16
+
+_SIGNING_SALT = 'users.uploads'
+
+
+class UploadError(Exception):
+    """An upload request or confirmation that must be rejected (HTTP 400)."""
+
+
+def sniff_content_type(data):
+    """Content type from the file's leading bytes, or None if not a known type."""
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data.startswith(b'%PDF-'):
+        return 'application/pdf'
+    return None
+
+
+def unique_name(prefix, content_type, allowed_types):
+    """
+    Return a fresh storage name `<prefix>_<random>.<ext>` for `content_type`.
+    Random names keep concurrent uploads from overwriting each other.
+    """
+    ext = allowed_types.get(content_type)
+    if ext is None:
+        raise UploadError(f"Unsupported file type '{content_type}'. Allowed: {', '.join(sorted(allowed_types))}")
+    return f"{prefix}_{uuid.uuid4().hex}.{ext}"
+
+
+def check_declared_size(size, max_bytes, label='File'):
+    """Reject a declared file size before issuing a URL (re-checked on confirm)."""
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError(f"{label} size is required")
+    if size <= 0:
+        raise UploadError(f"{label} is empty")
+    if size > max_bytes:
+        raise UploadError(f"{label} is too large. Maximum size is {max_bytes // (1024 * 1024)}MB")
+    return size
+
+
+def issue_upload(name, purpose, user, **claims):
+    """
+    Create a signed upload URL for storage `name` and a ticket to confirm it with.
+
+    Args:
+        name: storage name (first segment is the bucket)
+        purpose: what the upload is for, e.g. 'booking_image'; a ticket is only
+            accepted by the confirm endpoint for the same purpose
+        user: user the upload is issued to
+        **claims: extra data carried to the confirm step (e.g. booking id)
+    """
+    signed = default_storage.signed_upload_url(name)
+    upload_id = signing.dumps(
+        {'path': name, 'purpose': purpose, 'user': user.pk, **claims},
+        salt=_SIGNING_SALT,
+        compress=True,
+    )
+    return {
+        'upload_id': upload_id,
+        'path': name,
+        'upload_url': signed['url'],
+        'token': signed['token'],
+        'expires_in': UPLOAD_URL_TTL,
+    }
+
+
+def read_upload(upload_id, purpose, user):
+    """Validate a ticket from issue_upload() and return its claims."""
+    try:
+        claims = signing.loads(upload_id, salt=_SIGNING_SALT, max_age=UPLOAD_URL_TTL)
+    except signing.SignatureExpired:
+        raise UploadError('Upload has expired. Please request a new upload URL.')
+    except signing.BadSignature:
+        raise UploadError('Invalid upload_id')
+    if claims.get('purpose') != purpose or claims.get('user') != user.pk:
+        raise UploadError('Invalid upload_id')
+    return claims
+
+
+def _leading_bytes(name, length=SNIFF_BYTES):
+    """First `length` bytes of a stored object, with a Range request where the storage supports one."""
+    read_range = getattr(default_storage, 'read_range', None)
+    if read_range:
+        return read_range(name, 0, length)
+    with default_storage.open(name) as f:
+        return f.read(length)
+
+
+def verify_uploaded_object(name, max_bytes, allowed_types):
+    """
+    Check that `name` was uploaded and is within size/type limits: the size
+    from the storage metadata, the type from the object's first bytes
+    (the declared content type must agree with it). Objects that break the
+    limits are deleted. Returns the object info dict.
+    """
+    info = default_storage.object_info(name)
+    if info is None:
+        raise UploadError('File has not been uploaded yet')
+
+    problem = None
+    if info.get('size') is None or info['size'] <= 0:
+        problem = 'Uploaded file is empty'
+    elif info['size'] > max_bytes:
+        problem = f"Uploaded file is too large. Maximum size is {max_bytes // (1024 * 1024)}MB"
+    elif info.get('content_type') not in allowed_types:
+        problem = f"Unsupported file type '{info.get('content_type')}'"
+    else:
+        try:
+            detected = sniff_content_type(_leading_bytes(name))
+        except FileNotFoundError:
+            raise UploadError('File has not been uploaded yet')
+        if detected not in allowed_types:
+            problem = f"File content is not an allowed type (detected: {detected or 'unknown'})"
+        elif detected != info['content_type']:
+            problem = f"File content is {detected}, not {info['content_type']}"
+
+    if problem:
+        try:
+            default_storage.delete(name)
+        except Exception:
+            pass
+        raise UploadError(problem)
+    return info
@@ -25,6 +25,8 @@ from .views import (
     UploadCitizenshipView,
     UploadCertificatesView,
     SaveCertificatesView,
+    DocumentUploadUrlView,
+    DocumentUploadConfirmView,
     SpecialitiesListView,
     SpecializationsListView,
     LocationsListView
@@ -40,6 +42,8 @@ urlpatterns = [
     path('upload-citizenship/', UploadCitizenshipView.as_view(), name='upload-citizenship'),
     path('upload-certificates/', UploadCertificatesView.as_view(), name='upload-certificates'),
     path('save-certificates/', SaveCertificatesView.as_view(), name='save-certificates'),
+    path('documents/upload-url/', DocumentUploadUrlView.as_view(), name='document-upload-url'),
+    path('documents/confirm/', DocumentUploadConfirmView.as_view(), name='document-upload-confirm'),
     path('registration-status/', RegistrationStatusView.as_view(), name='registration-status'),
     
     # Lookup endpoints
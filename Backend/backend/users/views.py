@@ -9,13 +9,23 @@ from django.contrib.auth import get_user_model
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.db.models import Q
+from django.core.files.storage import default_storage
 from rest_framework.decorators import authentication_classes, permission_classes
+from backend.conditional import PUBLIC_CACHE_CONTROL, ConditionalGetMixin
+from . import reference_data
 from .serializers import UserSerializer, SpecialitySerializer, SpecializationSerializer, CertificateSerializer
 from .models import Speciality, Specialization, UserSpeciality, UserSpecialization, Certificate
 from .authentication import SupabaseAuthentication
+from .documents import DOCUMENT_LIMITS, enqueue as enqueue_verification
+from .uploads import (
+    UploadError, check_declared_size, issue_upload, read_upload, unique_name, verify_uploaded_object
+)
 
 User = get_user_model()
 
+import logging
+logger = logging.getLogger(__name__)
+
 # --- Permissions ---
 class IsAdminUserType(BasePermission):
     """Allow access only to users with user_type='admin'"""
@@ -31,7 +41,11 @@ class AdminOnlyUserListView(generics.ListAPIView):
     serializer_class = UserSerializer
 
     def get_queryset(self):
-        return User.objects.all()
+        return User.objects.prefetch_related(
+            'user_specialities__speciality',
+            'user_specializations__specialization__speciality',
+            'certificates',
+        )
 
 class IsRegistrationComplete(BasePermission):
     """Permission to check if user has completed registration (phone verified)"""
@@ -54,7 +68,7 @@ class RegistrationStatusView(APIView):
         return super().dispatch(*args, **kwargs)
     
     def get(self, request):
-        print(f"RegistrationStatusView called - User: {request.user}, Authenticated: {request.user.is_authenticated}")
+        logger.debug(f"RegistrationStatusView called - User: {request.user.id}")
         user = request.user
         admin_complete = user.is_staff or user.is_superuser
         effective_user_type = 'admin' if admin_complete else user.user_type
@@ -433,6 +447,8 @@ class UploadCitizenshipView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
+        previous = {kind: str(getattr(user, kind) or '') for kind in ('citizenship_front', 'citizenship_back')}
+        
         # Update user - prefer URLs, fallback to files
         if citizenship_front_url:
             user.citizenship_front = citizenship_front_url
@@ -462,6 +478,11 @@ class UploadCitizenshipView(APIView):
         
         user.save()
         
+        # Checked in the background by the verify_documents worker; resubmitting the same file needs no new check
+        for kind, source in previous.items():
+            if str(getattr(user, kind) or '') != source:
+                enqueue_verification(user, kind, getattr(user, kind))
+        
         return Response({
             'message': 'Citizenship documents uploaded successfully',
             'user': UserSerializer(user, context={'request': request}).data
@@ -504,6 +525,7 @@ class UploadCertificatesView(APIView):
                 name=file.name,
                 file=file
             )
+            enqueue_verification(user, 'certificate', certificate.file, certificate=certificate)
             uploaded_certificates.append(certificate)
         
         return Response({
@@ -551,6 +573,7 @@ class SaveCertificatesView(APIView):
                 name=cert_name,
                 file=cert_url  # Now stores URL instead of file
             )
+            enqueue_verification(user, 'certificate', cert_url, certificate=certificate)
             uploaded_certificates.append(certificate)
 
         # After all required details are provided, mark provider registration as complete
@@ -568,25 +591,148 @@ class SaveCertificatesView(APIView):
         })
 
 
-class SpecialitiesListView(generics.ListAPIView):
+# Document kinds that can be uploaded directly to storage:
+# kind -> (storage name prefix, allowed content types, max size in bytes)
+DOCUMENT_UPLOADS = {
+    kind: (prefix, *DOCUMENT_LIMITS[kind])
+    for kind, prefix in [
+        ('citizenship_front', 'citizenship/citizenship_{user_id}_front'),
+        ('citizenship_back', 'citizenship/citizenship_{user_id}_back'),
+        ('certificate', 'certificates/user_{user_id}/certificate'),
+    ]
+}
+
+
+class DocumentUploadUrlView(APIView):
+    """
+    Issue a signed URL for uploading a citizenship image or certificate
+    straight to storage.
+
+    Body: {"kind": "citizenship_front" | "citizenship_back" | "certificate",
+           "content_type": "image/jpeg", "size": 123456, "name": "optional certificate name"}
+    The client uploads the file to `upload_url`, then sends `upload_id` to
+    DocumentUploadConfirmView.
+    """
+    authentication_classes = [SupabaseAuthentication]
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser]
+    
+    @method_decorator(csrf_exempt)
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+    
+    def post(self, request):
+        kind = request.data.get('kind')
+        if kind not in DOCUMENT_UPLOADS:
+            return Response(
+                {'error': f"kind must be one of: {', '.join(DOCUMENT_UPLOADS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        prefix, allowed_types, max_bytes = DOCUMENT_UPLOADS[kind]
+        
+        try:
+            check_declared_size(request.data.get('size'), max_bytes)
+            name = unique_name(prefix.format(user_id=request.user.id), request.data.get('content_type'), allowed_types)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        label = (request.data.get('name') or 'Certificate')[:255]
+        try:
+            upload = issue_upload(name, 'document', request.user, kind=kind, label=label)
+        except Exception as e:
+            logger.error(f"Failed to create document upload URL for user {request.user.id}: {e}")
+            return Response(
+                {'error': 'Could not create upload URL. Please try again.'},
+                status=status.HTTP_502_BAD_GATEWAY
+            )
+        return Response(upload)
+
+
+class DocumentUploadConfirmView(APIView):
+    """
+    Record a document uploaded through DocumentUploadUrlView after checking
+    its size and type in storage. Citizenship images are set on the user;
+    certificates are added to the user's certificates.
+
+    Body: {"upload_id": "..."}
+    """
+    authentication_classes = [SupabaseAuthentication]
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser]
+    
+    @method_decorator(csrf_exempt)
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+    
+    def post(self, request):
+        user = request.user
+        try:
+            claims = read_upload(request.data.get('upload_id'), 'document', user)
+            _, allowed_types, max_bytes = DOCUMENT_UPLOADS[claims['kind']]
+            verify_uploaded_object(claims['path'], max_bytes, allowed_types)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        url = default_storage.url(claims['path'])
+        
+        if claims['kind'] == 'certificate':
+            certificate, created = Certificate.objects.get_or_create(user=user, file=url, defaults={'name': claims['label']})
+            if created:
+                enqueue_verification(user, 'certificate', url, certificate=certificate)
+            return Response({
+                'message': 'Certificate uploaded successfully',
+                'certificate': CertificateSerializer(certificate, context={'request': request}).data
+            }, status=status.HTTP_201_CREATED)
+        
+        setattr(user, claims['kind'], url)
+        user.save(update_fields=[claims['kind'], 'updated_at'])
+        enqueue_verification(user, claims['kind'], url)
+        return Response({
+            'message': 'Citizenship document uploaded successfully',
+            'user': UserSerializer(user, context={'request': request}).data
+        })
+
+
+class SpecialitiesListView(ConditionalGetMixin, generics.ListAPIView):
     """Get all available specialities"""
     queryset = Speciality.objects.all()
     serializer_class = SpecialitySerializer
     permission_classes = [AllowAny]
+    cache_control = PUBLIC_CACHE_CONTROL
     
     @method_decorator(csrf_exempt)
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
 
+    # Served pre-rendered from users.reference_data
+    def get_validators(self, request):
+        return reference_data.get().specialities.digest
+
+    def list(self, request, *args, **kwargs):
+        return reference_data.json_response(request, reference_data.get().specialities)
+
 
-class SpecializationsListView(generics.ListAPIView):
+class SpecializationsListView(ConditionalGetMixin, generics.ListAPIView):
     """Get all specializations, optionally filtered by speciality"""
     serializer_class = SpecializationSerializer
     permission_classes = [AllowAny]
+    cache_control = PUBLIC_CACHE_CONTROL
     
     @method_decorator(csrf_exempt)
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
+
+    # Served pre-rendered from users.reference_data; get_queryset() is kept
+    # for the schema and the browsable API forms
+    def get_payload(self):
+        speciality_id = self.request.query_params.get('speciality_id') or None
+        return reference_data.get().specializations.get(speciality_id, reference_data.EMPTY_LIST)
+
+    def get_validators(self, request):
+        return self.get_payload().digest
+
+    def list(self, request, *args, **kwargs):
+        return reference_data.json_response(request, self.get_payload())
     
     def get_queryset(self):
         queryset = Specialization.objects.all().select_related('speciality')
@@ -596,50 +742,31 @@ class SpecializationsListView(generics.ListAPIView):
         return queryset
 
 
-class LocationsListView(APIView):
+class LocationsListView(ConditionalGetMixin, APIView):
     """Get available cities and districts from provider data"""
     permission_classes = [AllowAny]
+    cache_control = PUBLIC_CACHE_CONTROL
     
     @method_decorator(csrf_exempt)
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
-    
+
+    # Served pre-rendered from users.reference_data, which keeps the
+    # (city, district) index up to date as providers change
+    def get_validators(self, request):
+        return reference_data.get().locations.digest
+
     def get(self, request):
         try:
-            # Get all unique cities and districts from users with complete profiles
-            # Filter for users who are service providers with complete registration
-            providers = User.objects.filter(
-                user_type='offer',
-                registration_completed=True,
-                city__isnull=False
-            ).exclude(city='').values_list('city', 'district').distinct()
-            
-            # Build cities and districts
-            cities = {}
-            for city, district in providers:
-                if city not in cities:
-                    cities[city] = []
-                if district and district.strip():  # Check for non-empty district
-                    cities[city].append(district)
-            
-            # Sort and remove duplicates
-            for city in cities:
-                cities[city] = sorted(list(set(cities[city])))
-            
-            sorted_cities = sorted(cities.keys())
-            
-            return Response({
-                'cities': sorted_cities,
-                'districts': cities
-            })
+            return self.conditional_response(request, self.list_locations)
         except Exception as e:
-            # Log the error for debugging
-            print(f"LocationsListView error: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            
+            logger.exception(f"LocationsListView error: {str(e)}")
+
             # Return empty data instead of failing
             return Response({
                 'cities': [],
                 'districts': {}
-            }, status=status.HTTP_200_OK)
\ No newline at end of file
+            }, status=status.HTTP_200_OK)
+
+    def list_locations(self, request):
+        return reference_data.json_response(request, reference_data.get().locations)
\ No newline at end of file